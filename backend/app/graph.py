@@ -7,13 +7,17 @@ Phase 3c: 使用 LangGraph ToolNode 實現工具調用事件追蹤
 - 條件邊控制流程
 """
 
-from typing import TypedDict, Literal, List, Annotated
+from typing import TypedDict, Literal, List, Annotated, Optional, Union
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, ToolMessage
 from langchain_core.tools import tool
+from langchain_core.runnables import RunnableConfig
 from langchain_groq import ChatGroq
 from langgraph.graph import StateGraph, END
-from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
+from app.services.state_policy import prune_messages
+from app.llm.prompt_layout import Section, layout_prompt, record_prompt_usage
+from app.services.profiles import DebateProfile, get_request_profile
+from app.graph_builder import GraphConfig
 import os
 import logging
 
@@ -26,10 +30,11 @@ logger = logging.getLogger(__name__)
 class DebateState(TypedDict):
     """辯論狀態
     
-    ⚠️ messages 使用 add_messages 註解，LangGraph 會自動合併新舊訊息
+    ⚠️ messages 使用 prune_messages 註解：add_messages 合併後刪除已消化的工具往返、
+       只保留最近的發言（app.services.state_policy），狀態大小不隨輪數成長
     ⚠️ current_speaker 新增 "tools" 和 "tool_callback" 選項
     """
-    messages: Annotated[List[BaseMessage], add_messages]
+    messages: Annotated[List[BaseMessage], prune_messages]
     topic: str
     current_speaker: Literal["optimist", "skeptic", "tools", "tool_callback", "moderator", "end"]
     round_count: int
@@ -37,6 +42,7 @@ class DebateState(TypedDict):
     tool_iterations: int  # Phase 3c: 工具迭代計數器
     last_agent: Literal["optimist", "skeptic", ""]  # Phase 3c: 記錄上一個 Agent
     language: str  # Phase 4: 語言設定 ("zh" 或 "en")
+    debate_summary: str  # 滾動摘要：每輪主持人小結增量併入（app.llm.summarizer）
 
 
 # ============================================================
@@ -225,7 +231,7 @@ def get_moderator_final_summary(language: str) -> str:
 # ============================================================
 
 @tool
-async def web_search_tool(query: str) -> str:
+async def web_search_tool(query: str, config: RunnableConfig) -> str:
     """Search the web for latest information, statistics, or facts.
 
     Use this tool when you need:
@@ -241,18 +247,34 @@ async def web_search_tool(query: str) -> str:
         Formatted search results summary
     """
     from app.tools.search import web_search
+    from app.tools.tool_limits import run_tool_call
+    from app.services.research_service import get_research
 
     logger.debug(f"web_search_tool called with query: {query}")
+
+    # 主題預取已涵蓋此查詢時直接使用預取結果
+    research = get_research(config)
+    if research is not None:
+        prefetched = await research.lookup(query)
+        if prefetched:
+            return prefetched
+
     # 由於 @tool 無法存取 state，搜尋工具會根據 query 語言自動判斷
     # 使用簡單的啟發式：如果 query 包含中文字元則用 zh，否則用 en
     import re
     has_chinese = bool(re.search(r'[\u4e00-\u9fff]', query))
     language = 'zh' if has_chinese else 'en'
 
-    result = await web_search(query, language=language)
-
     # 根據偵測到的語言返回不同的錯誤訊息
     fallback = "Search failed" if language == "en" else "搜尋失敗"
+
+    # 同一則 AIMessage 的多個 tool_calls 由 ToolNode 並行執行；
+    # 這裡套用單場 / 全域並行上限與單次逾時，逾時或失敗只回傳錯誤訊息，不影響其他呼叫
+    result = await run_tool_call(
+        lambda: web_search(query, language=language),
+        fallback=lambda e: {"formatted": f"{fallback}: {type(e).__name__}"},
+        config=config,
+    )
     return result.get("formatted", fallback)
 
 
@@ -261,7 +283,7 @@ tools = [web_search_tool]
 
 
 # ============================================================
-# LLM 工廠（含 Rate Limit 模型切換）
+# LLM 工廠（含自適應模型路由）
 # ============================================================
 
 # 預設備用模型列表（按優先順序排列）
@@ -271,31 +293,14 @@ DEFAULT_FALLBACK_MODELS = [
 ]
 
 
-def get_llm(bind_tools: bool = False):
-    """取得 LLM 實例（使用 LangChain 內建 fallback 機制）
-
-    Args:
-        bind_tools: 是否綁定工具（Phase 3c）
+def get_model_chain() -> List[str]:
+    """取得模型呼叫順序：[主模型, *備用模型]
 
     環境變數：
         GROQ_MODEL: 主要模型（預設 openai/gpt-oss-120b）
         GROQ_FALLBACK_MODELS: 備用模型，逗號分隔（可選）
-
-    Fallback 順序：
-        1. PRIMARY_MODEL (from env, 預設 openai/gpt-oss-120b)
-        2. moonshotai/kimi-k2-instruct-0905
-        3. llama-3.1-8b-instant
-
-    重要修正：
-        - 先 bind_tools 再 with_fallbacks（保證所有 fallback 都能呼叫工具）
-        - 使用 api_key 參數（官方標準）
-        - exceptions_to_handle 包含 HTTPStatusError（捕捉 429）
     """
-    from groq import RateLimitError, APIError
-    from httpx import TimeoutException, HTTPStatusError, RequestError
-
     primary_model = os.getenv("GROQ_MODEL", "openai/gpt-oss-120b")
-    api_key = os.getenv("GROQ_API_KEY")
 
     # 解析備用模型列表
     fallback_env = os.getenv("GROQ_FALLBACK_MODELS", "")
@@ -305,53 +310,100 @@ def get_llm(bind_tools: bool = False):
         # 使用預設列表，但排除主模型
         fallback_models = [m for m in DEFAULT_FALLBACK_MODELS if m != primary_model]
 
-    logger.debug(f"get_llm: primary={primary_model}, fallbacks={fallback_models}, bind_tools={bind_tools}")
+    return [primary_model, *fallback_models]
 
-    # 主要模型
-    primary_llm = ChatGroq(
-        model=primary_model,
-        temperature=0.7,
-        max_retries=0,  # 不在 SDK 層重試，讓 LangChain fallback 接手
-        timeout=30.0,
-        api_key=api_key  # 使用官方標準參數
+
+def build_chat_model(model: str, temperature: float = 0.7, timeout: float = 30.0) -> ChatGroq:
+    """建立單一 ChatGroq（共用 app.llm.registry 的 httpx 連線池）"""
+    from app.llm.registry import get_http_clients
+
+    http_client, http_async_client = get_http_clients()
+    return ChatGroq(
+        model=model,
+        temperature=temperature,
+        max_retries=0,  # 不在 SDK 層重試，讓 ModelRouter 切換模型
+        timeout=timeout,
+        api_key=os.getenv("GROQ_API_KEY"),  # 使用官方標準參數
+        http_client=http_client,
+        http_async_client=http_async_client,
     )
 
-    # ✅ 關鍵修正：先綁定工具，再做 fallback
-    if bind_tools:
-        primary_llm = primary_llm.bind_tools(tools)
-
-    # 建立 fallback LLM 列表
-    fallback_llms = []
-    for fallback_model in fallback_models:
-        fallback_llm = ChatGroq(
-            model=fallback_model,
-            temperature=0.7,
-            max_retries=0,  # fallback 層也不重試，保持快速切換
-            timeout=30.0,
-            api_key=api_key
-        )
-        # ✅ 每個 fallback 也要綁定工具
+
+def _build_llm(models: List[str], bind_tools: bool, temperature: float, timeout: float):
+    """建構路由 LLM（只在註冊表 miss 時呼叫）
+
+    重要修正：
+        - 每個模型都先 bind_tools（保證任何被路由到的模型都能呼叫工具）
+        - 呼叫順序交由 app.llm.router 依健康度動態決定，不再固定 with_fallbacks
+    """
+    from app.llm.router import RoutedLLM, get_router
+
+    runnables = {}
+    for model in models:
+        llm = build_chat_model(model, temperature=temperature, timeout=timeout)
+        # ✅ 每個模型（含 fallback）都要綁定工具
         if bind_tools:
-            fallback_llm = fallback_llm.bind_tools(tools)
-
-        fallback_llms.append(fallback_llm)
-
-    # 使用 LangChain 內建 fallback 機制
-    if fallback_llms:
-        llm_with_fallbacks = primary_llm.with_fallbacks(
-            fallbacks=fallback_llms,
-            # ✅ 擴充錯誤類型：包含 HTTPStatusError（429 錯誤）
-            exceptions_to_handle=(
-                RateLimitError,      # Groq SDK 的 rate limit error
-                APIError,            # Groq SDK 的通用 API error
-                HTTPStatusError,     # httpx 的 HTTP 狀態錯誤（含 429）
-                RequestError,        # httpx 的請求錯誤
-                TimeoutException     # httpx 的 timeout
-            )
+            llm = llm.bind_tools(tools)
+        runnables[model] = llm
+
+    return RoutedLLM(runnables, router=get_router())
+
+
+def get_llm(
+    bind_tools: bool = False,
+    temperature: float = 0.7,
+    timeout: float = 30.0,
+    cache: Optional[bool] = None,
+    models: Optional[List[str]] = None
+):
+    """取得 LLM 實例（使用 app.llm.router 自適應路由）
+
+    Args:
+        bind_tools: 是否綁定工具（Phase 3c）
+        temperature: 取樣溫度
+        timeout: 單次 HTTP 請求逾時（秒）
+        cache: 是否包上回應快取（None 時依 LLM_CACHE_ENABLED 決定）
+        models: 指定模型鏈（None 時使用 get_model_chain()，例如摘要改用快速模型）
+
+    設定順序（健康度相同時的優先序）：
+        1. PRIMARY_MODEL (from env, 預設 openai/gpt-oss-120b)
+        2. moonshotai/kimi-k2-instruct-0905
+        3. llama-3.1-8b-instant
+
+    實際呼叫順序由 ModelRouter 依成功率、TTFT、429 與熔斷狀態決定。
+
+    已建構的 runnable 由 app.llm.registry 依
+    (模型列表, bind_tools, temperature, timeout) 快取重用，
+    節點每次呼叫不再重建 ChatGroq 與 fallback 鏈。
+    啟用快取時外層包上 app.llm.cache.CachedLLM（相同 prompt 不再呼叫 Groq）。
+    """
+    from app.llm.registry import LLMKey, get_registry
+    from app.llm.cache import CachedLLM, get_response_cache, is_cache_enabled
+
+    models = list(models) if models else get_model_chain()
+    logger.debug(f"get_llm: models={models}, bind_tools={bind_tools}")
+
+    key = LLMKey(
+        models=tuple(models),
+        bind_tools=bind_tools,
+        temperature=temperature,
+        timeout=timeout,
+    )
+    llm = get_registry().get_or_create(
+        key,
+        lambda: _build_llm(models, bind_tools, temperature, timeout)
+    )
+
+    use_cache = is_cache_enabled() if cache is None else cache
+    if use_cache:
+        llm = CachedLLM(
+            llm,
+            get_response_cache(),
+            models=models,
+            tool_names=[t.name for t in tools] if bind_tools else [],
+            temperature=temperature,
         )
-        return llm_with_fallbacks
-    else:
-        return primary_llm
+    return llm
 
 
 # ============================================================
@@ -373,64 +425,120 @@ def format_messages(messages: List[BaseMessage], limit: int = 4) -> str:
         return "(尚無對話)"
 
 
-def build_prompt(state: DebateState, speaker: str) -> List[BaseMessage]:
-    """為指定發言者建構 prompt（只用於首次調用）"""
-    history = format_messages(state['messages'])
-    round_num = state['round_count'] + 1
-    language = state.get('language', 'zh')
-    is_en = language == "en"
+def build_tool_context(messages: List[BaseMessage], topic: str, is_en: bool) -> str:
+    """把最近的搜尋結果（ToolMessage）壓縮成 prompt 區塊
 
-    # 語言指示（開頭和結尾）
-    lang_start = "*** RESPOND IN ENGLISH ONLY ***\n\n" if is_en else ""
-    lang_end = "\n\n*** IMPORTANT: Your response MUST be in English! ***" if is_en else ""
+    段落依 BM25 對「工具查詢 + 辯論主題」排序、去重後裝進 token 預算
+    （TOOL_CONTEXT_TOKEN_BUDGET，見 app.tools.ranking），取代逐則原文貼上。
+    """
+    from app.tools.ranking import compress_tool_context
 
-    if speaker == "optimist":
-        system = get_optimist_system(language)
-        if state['round_count'] == 0 and len(state['messages']) == 0:
-            if is_en:
-                user_content = f"""{lang_start}Debate Topic: {state['topic']}
+    recent = messages[-6:]
+    contents = [m.content for m in recent if isinstance(m, ToolMessage) and m.content]
+    if not contents:
+        return ""
 
-Opening statement, please speak as the Optimist.{lang_end}"""
-            else:
-                user_content = f"""辯論主題：{state['topic']}
+    queries = [
+        call.get("args", {}).get("query", "")
+        for m in recent if isinstance(m, AIMessage)
+        for call in (m.tool_calls or [])
+    ]
+    passages = compress_tool_context(contents, " ".join(queries), topic)
+    if not passages:
+        return ""
 
-開場白，請以樂觀者身份發言。"""
-        else:
-            if is_en:
-                user_content = f"""{lang_start}Debate Topic: {state['topic']}
+    prefix = "[Search Result]:" if is_en else "[搜尋結果]:"
+    return prefix + "\n" + "\n".join(f"• {p}" for p in passages)
 
-Round {round_num}, please speak as the Optimist.
 
-Conversation History:
-{history}{lang_end}"""
-            else:
-                user_content = f"""辯論主題：{state['topic']}
+def format_research(research_context: str, is_en: bool) -> str:
+    """將主題預取結果格式化為 prompt 區塊（沒有結果時為空字串）"""
+    if not research_context:
+        return ""
+    if is_en:
+        return f"""Background Research:
+{research_context}
 
-第 {round_num} 輪，請以樂觀者身份發言。
+If the background research above already covers what you need, answer directly without calling web_search_tool.
 
-對話歷史：
-{history}"""
-    else:  # skeptic
-        system = get_skeptic_system(language)
-        if is_en:
-            user_content = f"""{lang_start}Debate Topic: {state['topic']}
+"""
+    return f"""背景資料：
+{research_context}
 
-Round {round_num}, please refute the Optimist's arguments as the Skeptic.
+若以上背景資料已足夠支持論點，請直接發言，不需要再呼叫 web_search_tool。
 
-Conversation History:
-{history}{lang_end}"""
-        else:
-            user_content = f"""辯論主題：{state['topic']}
+"""
 
-第 {round_num} 輪，請以懷疑者身份反駁樂觀者的論點。
 
-對話歷史：
-{history}"""
-    
-    return [
-        SystemMessage(content=system),
-        HumanMessage(content=user_content)
-    ]
+def build_prompt(
+    state: DebateState,
+    speaker: str,
+    research_context: str = "",
+    tool_context: Optional[str] = None,
+    focus: str = "",
+    history_limit: int = 4,
+    profile: Optional[DebateProfile] = None
+) -> List[BaseMessage]:
+    """為指定發言者建構 prompt（區塊順序見 app.llm.prompt_layout：穩定在前、易變在後）
+
+    speaker: "optimist" 或 "skeptic"（決定 system prompt 與指示）
+    research_context: 主題預取的搜尋結果（app.services.research_service），可為空
+    tool_context: 本次搜尋結果（build_tool_context）；None 表示不是從工具返回
+    focus: 辯手的關注重點（panel 模式的 persona），放在主題之後
+    history_limit: 對話歷史保留的發言數（panel 模式依辯手人數放寬）
+    profile: 本次請求的 profile（app.services.profiles），決定 token 預算使用的模型鏈與輸出上限
+    """
+    from app.services.state_policy import is_turn
+
+    turns = [m for m in state['messages'] if is_turn(m)]
+    round_num = state['round_count'] + 1
+    language = state.get('language', 'zh')
+    is_en = language == "en"
+    is_opening = state['round_count'] == 0 and not turns
+
+    if is_en:
+        header = f"*** RESPOND IN ENGLISH ONLY ***\n\nDebate Topic: {state['topic']}"
+        if focus:
+            header += f"\nYour Focus: {focus}"
+        history = f"Conversation History:\n{format_messages(turns, history_limit)}" if turns else ""
+        if tool_context is not None:
+            if speaker == "optimist":
+                instruction = "Based on the search results above, please continue speaking as the Optimist. (Please respond directly without searching again)"
+            else:
+                instruction = "Based on the search results above, please continue refuting as the Skeptic. (Please respond directly without searching again)"
+        elif speaker == "optimist":
+            instruction = "Opening statement, please speak as the Optimist." if is_opening else f"Round {round_num}, please speak as the Optimist."
+        elif is_opening:
+            # panel 模式的同時開場：尚無樂觀者論點可反駁
+            instruction = "Opening statement, please state your concerns as the Skeptic."
+        else:
+            instruction = f"Round {round_num}, please refute the Optimist's arguments as the Skeptic."
+        instruction += "\n\n*** IMPORTANT: Your response MUST be in English! ***"
+    else:
+        header = f"辯論主題：{state['topic']}"
+        if focus:
+            header += f"\n你的關注重點：{focus}"
+        history = f"對話歷史：\n{format_messages(turns, history_limit)}" if turns else ""
+        if tool_context is not None:
+            if speaker == "optimist":
+                instruction = "請根據以上搜尋結果，以樂觀者身份繼續發言。（請直接發言，不要再搜尋）"
+            else:
+                instruction = "請根據以上搜尋結果，以懷疑者身份繼續反駁。（請直接發言，不要再搜尋）"
+        elif speaker == "optimist":
+            instruction = "開場白，請以樂觀者身份發言。" if is_opening else f"第 {round_num} 輪，請以樂觀者身份發言。"
+        elif is_opening:
+            instruction = "開場白，請以懷疑者身份提出你的疑慮。"
+        else:
+            instruction = f"第 {round_num} 輪，請以懷疑者身份反駁樂觀者的論點。"
+
+    # 超出 token 預算時依序裁剪：搜尋結果（最低分段落）→ 背景資料 → 對話歷史（最舊發言）
+    return layout_prompt(speaker, language, [
+        header,
+        Section(format_research(research_context, is_en), trim="drop", priority=1),
+        Section(history, trim="head", priority=2),
+        Section(tool_context or "", trim="tail", priority=0),
+        instruction,
+    ], **_layout_kwargs(profile, speaker))
 
 
 def update_state_after_speaker(state: DebateState, speaker: str, content: str) -> DebateState:
@@ -464,7 +572,8 @@ def create_initial_state(topic: str, max_rounds: int = 3, language: str = "zh")
         "max_rounds": max_rounds,
         "tool_iterations": 0,
         "last_agent": "",
-        "language": language
+        "language": language,
+        "debate_summary": ""
     }
 
 
@@ -475,66 +584,52 @@ def create_initial_state(topic: str, max_rounds: int = 3, language: str = "zh")
 MAX_TOOL_ITERATIONS = 3
 
 
-async def optimist_node(state: DebateState) -> dict:
+def _layout_kwargs(profile: Optional[DebateProfile], role: str) -> dict:
+    """profile 的模型鏈與輸出上限（layout_prompt 用；未指定 profile 時使用預設值）"""
+    if profile is None:
+        return {}
+    return {"models": profile.model_chain(), "max_tokens": profile.turn_max_tokens(role)}
+
+
+def _research_context(config: Optional[RunnableConfig]) -> str:
+    """取得目前已完成的主題預取結果（未啟用預取時為空字串）"""
+    from app.services.research_service import get_research
+
+    research = get_research(config)
+    return research.context() if research is not None else ""
+
+
+async def optimist_node(
+    state: DebateState,
+    config: RunnableConfig = None,
+    max_tool_iterations: int = MAX_TOOL_ITERATIONS
+) -> dict:
     """樂觀者節點（Phase 3c: 僅決策，不執行工具）
     
     返回的 AIMessage 可能包含 tool_calls，由條件邊決定下一步
     """
     logger.debug("optimist_node: entering")
     
-    # 檢查是否已達到工具迭代上限
+    # 檢查是否已達到工具迭代上限（graph 變體可調整，0 表示不搜尋）
     tool_iterations = state.get('tool_iterations', 0)
-    should_bind_tools = tool_iterations < MAX_TOOL_ITERATIONS
+    should_bind_tools = tool_iterations < max_tool_iterations
+    profile = get_request_profile(config)
     
-    llm = get_llm(bind_tools=should_bind_tools)
+    llm = get_llm(bind_tools=should_bind_tools, **profile.llm_kwargs())
     logger.debug(f"optimist_node: tool_iterations={tool_iterations}, bind_tools={should_bind_tools}")
     
     messages = state.get('messages', [])
+    tool_context = None
     if messages and isinstance(messages[-1], ToolMessage):
-        # 從工具返回：提取工具結果作為文字
-        language = state.get('language', 'zh')
-        is_en = language == "en"
-        tool_results = []
-        for msg in reversed(messages[-6:]):
-            if isinstance(msg, ToolMessage):
-                prefix = "[Search Result]: " if is_en else "[搜尋結果]: "
-                tool_results.insert(0, f"{prefix}{msg.content}")
-
-        tool_context = "\n".join(tool_results) if tool_results else ""
-        history = format_messages(messages)
-
-        if is_en:
-            user_prompt = f"""*** RESPOND IN ENGLISH ONLY ***
-
-Debate Topic: {state['topic']}
-
-{tool_context}
-
-Based on the search results above, please continue speaking as the Optimist. (Please respond directly without searching again)
-
-Conversation History:
-{history}
-
-*** IMPORTANT: Your response MUST be in English! ***"""
-        else:
-            user_prompt = f"""辯論主題：{state['topic']}
-
-{tool_context}
-
-請根據以上搜尋結果，以樂觀者身份繼續發言。（請直接發言，不要再搜尋）
+        # 從工具返回：搜尋結果接在對話歷史之後，前段與決策呼叫相同（可命中 prefix cache）
+        is_en = state.get('language', 'zh') == "en"
+        tool_context = build_tool_context(messages, state['topic'], is_en)
 
-對話歷史：
-{history}"""
-
-        prompt_messages = [
-            SystemMessage(content=get_optimist_system(language)),
-            HumanMessage(content=user_prompt)
-        ]
-    else:
-        # 首次調用
-        prompt_messages = build_prompt(state, "optimist")
+    # 附上已完成的主題預取結果
+    prompt_messages = build_prompt(state, "optimist", _research_context(config), tool_context, profile=profile)
     
-    response = await llm.ainvoke(prompt_messages)
+    response = await llm.ainvoke(prompt_messages, max_tokens=profile.turn_max_tokens("optimist"))
+    record_prompt_usage("optimist", response, prompt_messages)
     logger.debug(f"optimist_node: response has tool_calls={bool(getattr(response, 'tool_calls', None))}")
     
     # 檢查是否有工具調用
@@ -563,62 +658,34 @@ Conversation History:
         }
 
 
-async def skeptic_node(state: DebateState) -> dict:
+async def skeptic_node(
+    state: DebateState,
+    config: RunnableConfig = None,
+    max_tool_iterations: int = MAX_TOOL_ITERATIONS
+) -> dict:
     """懷疑者節點（Phase 3c: 僅決策，不執行工具）"""
     logger.debug("skeptic_node: entering")
     
-    # 檢查是否已達到工具迭代上限
+    # 檢查是否已達到工具迭代上限（graph 變體可調整，0 表示不搜尋）
     tool_iterations = state.get('tool_iterations', 0)
-    should_bind_tools = tool_iterations < MAX_TOOL_ITERATIONS
+    should_bind_tools = tool_iterations < max_tool_iterations
+    profile = get_request_profile(config)
     
-    llm = get_llm(bind_tools=should_bind_tools)
+    llm = get_llm(bind_tools=should_bind_tools, **profile.llm_kwargs())
     logger.debug(f"skeptic_node: tool_iterations={tool_iterations}, bind_tools={should_bind_tools}")
     
     messages = state.get('messages', [])
+    tool_context = None
     if messages and isinstance(messages[-1], ToolMessage):
-        # 從工具返回：提取工具結果作為文字
-        language = state.get('language', 'zh')
-        is_en = language == "en"
-        tool_results = []
-        for msg in reversed(messages[-6:]):
-            if isinstance(msg, ToolMessage):
-                prefix = "[Search Result]: " if is_en else "[搜尋結果]: "
-                tool_results.insert(0, f"{prefix}{msg.content}")
-
-        tool_context = "\n".join(tool_results) if tool_results else ""
-        history = format_messages(messages)
-
-        if is_en:
-            user_prompt = f"""*** RESPOND IN ENGLISH ONLY ***
-
-Debate Topic: {state['topic']}
-
-{tool_context}
-
-Based on the search results above, please continue refuting as the Skeptic. (Please respond directly without searching again)
-
-Conversation History:
-{history}
-
-*** IMPORTANT: Your response MUST be in English! ***"""
-        else:
-            user_prompt = f"""辯論主題：{state['topic']}
-
-{tool_context}
+        # 從工具返回：搜尋結果接在對話歷史之後，前段與決策呼叫相同（可命中 prefix cache）
+        is_en = state.get('language', 'zh') == "en"
+        tool_context = build_tool_context(messages, state['topic'], is_en)
 
-請根據以上搜尋結果，以懷疑者身份繼續反駁。（請直接發言，不要再搜尋）
-
-對話歷史：
-{history}"""
-
-        prompt_messages = [
-            SystemMessage(content=get_skeptic_system(language)),
-            HumanMessage(content=user_prompt)
-        ]
-    else:
-        prompt_messages = build_prompt(state, "skeptic")
+    # 附上已完成的主題預取結果
+    prompt_messages = build_prompt(state, "skeptic", _research_context(config), tool_context, profile=profile)
     
-    response = await llm.ainvoke(prompt_messages)
+    response = await llm.ainvoke(prompt_messages, max_tokens=profile.turn_max_tokens("skeptic"))
+    record_prompt_usage("skeptic", response, prompt_messages)
     logger.debug(f"skeptic_node: response has tool_calls={bool(getattr(response, 'tool_calls', None))}")
     
     has_tool_calls = hasattr(response, 'tool_calls') and response.tool_calls
@@ -648,7 +715,7 @@ Conversation History:
         }
 
 
-async def tool_callback_node(state: DebateState) -> dict:
+async def tool_callback_node(state: DebateState, max_tool_iterations: int = MAX_TOOL_ITERATIONS) -> dict:
     """工具執行後的回調節點
     
     決定返回哪個 Agent，並檢查迭代限制
@@ -660,7 +727,7 @@ async def tool_callback_node(state: DebateState) -> dict:
     logger.debug(f"tool_callback_node: iterations={iterations}, last_agent={last_agent}")
     
     # 檢查是否超過限制
-    if iterations >= MAX_TOOL_ITERATIONS:
+    if iterations >= max_tool_iterations:
         logger.warning(f"tool_callback_node: max iterations reached, forcing return to {last_agent}")
         return {
             "current_speaker": last_agent,
@@ -673,6 +740,49 @@ async def tool_callback_node(state: DebateState) -> dict:
     }
 
 
+async def tool_summary_node(state: DebateState, config: RunnableConfig = None) -> dict:
+    """工具結果摘要節點（ToolNode 之後、tool_callback 之前）
+
+    啟用 TOOL_SUMMARY_ENABLED 時，以快速模型並行濃縮本步驟的 ToolMessage，
+    並以相同 id 取代原訊息（add_messages 依 id 覆蓋），主模型只看到重點。
+    """
+    import asyncio
+    from app.llm.summarizer import get_tool_summarizer, is_tool_summary_enabled
+
+    if not is_tool_summary_enabled():
+        return {}
+
+    messages = state.get("messages", [])
+    tool_messages: List[ToolMessage] = []
+    queries = {}
+    for m in reversed(messages):
+        if isinstance(m, ToolMessage):
+            if isinstance(m.content, str):
+                tool_messages.append(m)
+            continue
+        if isinstance(m, AIMessage):
+            queries = {call.get("id"): call.get("args", {}).get("query", "") for call in (m.tool_calls or [])}
+        break
+
+    if not tool_messages:
+        return {}
+
+    summarizer = get_tool_summarizer()
+    language = state.get("language", "zh")
+    summaries = await asyncio.gather(*(
+        summarizer.summarize(m.content, queries.get(m.tool_call_id, ""), language)
+        for m in tool_messages
+    ))
+
+    replaced = [
+        ToolMessage(content=summary, tool_call_id=m.tool_call_id, name=m.name, id=m.id)
+        for m, summary in zip(tool_messages, summaries)
+        if summary != m.content
+    ]
+    logger.debug(f"tool_summary_node: condensed {len(replaced)}/{len(tool_messages)} tool results")
+    return {"messages": list(reversed(replaced))} if replaced else {}
+
+
 def should_continue(state: DebateState) -> str:
     """路由函數：根據 current_speaker 決定下一個節點"""
     speaker = state.get("current_speaker", "end")
@@ -680,20 +790,37 @@ def should_continue(state: DebateState) -> str:
     return speaker
 
 
+def get_round_turns(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """本輪（上一則主持人小結之後）的辯手發言（panel 模式可能有多位辯手）"""
+    from app.services.state_policy import is_turn
+
+    turns = []
+    for m in reversed(messages):
+        name = getattr(m, 'name', None)
+        if name == "moderator":
+            break
+        if name and is_turn(m):
+            turns.insert(0, m)
+    return turns
+
+
 # ============================================================
 # Phase 3d: Moderator 節點
 # ============================================================
 
-async def moderator_node(state: DebateState) -> dict:
+async def moderator_node(state: DebateState, config: RunnableConfig = None) -> dict:
     """主持人節點：生成階段性或最終總結
 
     邏輯：
-    - 輪次 < max_rounds: 階段性總結 → 返回 optimist
-    - 輪次 = max_rounds: 最終總結 → 返回 end
+    - 輪次 < max_rounds: 階段性總結 → 併入滾動摘要 → 返回 optimist
+    - 輪次 = max_rounds: 由滾動摘要 + 最後一輪發言生成最終總結 → 返回 end
     """
+    from app.llm.summarizer import update_debate_summary
+
     logger.debug("moderator_node: entering")
 
-    llm = get_llm(bind_tools=False)  # 不綁定工具
+    profile = get_request_profile(config)
+    llm = get_llm(bind_tools=False, **profile.llm_kwargs())  # 不綁定工具
 
     current_round = state.get("round_count", 0) + 1  # Moderator 執行時還未 ++
     max_rounds = state.get("max_rounds", 3)
@@ -702,162 +829,323 @@ async def moderator_node(state: DebateState) -> dict:
     # 選擇 Prompt
     language = state.get('language', 'zh')
     is_en = language == "en"
+    debate_summary = state.get("debate_summary", "")
+
+    # ⚠️ 只提取本輪（上一則 Moderator 總結之後）的辯手發言
+    this_round = format_messages(get_round_turns(state['messages']), limit=6)
+
+    # 區塊順序：主題 → 前幾輪摘要 → 本輪對話 → 指示（見 app.llm.prompt_layout）
+    if is_en:
+        header = f"*** RESPOND IN ENGLISH ONLY ***\n\nDebate Topic: {state['topic']}"
+        lang_end = "\n\n*** IMPORTANT: Your response MUST be in English! ***"
+        if is_final:
+            # 最終報告：滾動摘要（前幾輪）+ 最後一輪原文，prompt 大小與輪數無關
+            earlier = f"Summary of Earlier Rounds:\n{debate_summary}" if debate_summary else ""
+            dialogue = f"Final Round Dialogue:\n{this_round}"
+            instruction = "Please generate the final summary report." + lang_end
+        else:
+            earlier = ""
+            dialogue = f"This Round's Dialogue:\n{this_round}"
+            instruction = f"Please generate the Round {current_round} summary (N = {current_round})." + lang_end
+    else:
+        header = f"辯論主題：{state['topic']}"
+        if is_final:
+            earlier = f"前幾輪摘要：\n{debate_summary}" if debate_summary else ""
+            dialogue = f"最後一輪對話：\n{this_round}"
+            instruction = "請生成最終總結報告。"
+        else:
+            earlier = ""
+            dialogue = f"本輪對話：\n{this_round}"
+            instruction = f"請生成第 {current_round} 輪小結（N = {current_round}）。"
+
+    role = "moderator_final" if is_final else "moderator_round"
+    prompt_messages = layout_prompt(role, language, [
+        header,
+        Section(earlier, trim="head", priority=1),
+        Section(dialogue, trim="head", priority=0),
+        instruction,
+    ], **_layout_kwargs(profile, role))
+
+    response = await llm.ainvoke(prompt_messages, max_tokens=profile.turn_max_tokens(role))
+    record_prompt_usage("moderator", response, prompt_messages)
+    final_response = AIMessage(
+        content=response.content or "(無法生成總結)",
+        name="moderator"
+    )
 
-    if is_final:
-        system_prompt = get_moderator_final_summary(language)
-        if is_en:
-            prompt_context = f"""*** RESPOND IN ENGLISH ONLY ***
+    # 決定下一步
+    new_round = current_round  # Moderator 完成後才更新輪數
+    next_speaker = "end" if is_final else "optimist"
 
-Debate Topic: {state['topic']}
+    logger.debug(f"moderator_node: round={new_round}, next={next_speaker}")
 
-Complete Debate Record:
-{format_messages(state['messages'], limit=30)}
+    update = {
+        "messages": [final_response],
+        "current_speaker": next_speaker,
+        "round_count": new_round,  # ⚠️ 重要：Moderator 負責更新輪數
+        "tool_iterations": 0  # 清零工具計數，讓下一輪可以使用工具
+    }
+    if not is_final:
+        update["debate_summary"] = await update_debate_summary(
+            debate_summary, final_response.content, current_round, language
+        )
+    return update
 
-Please generate the final summary report.
 
-*** IMPORTANT: Your response MUST be in English! ***"""
-        else:
-            prompt_context = f"""辯論主題：{state['topic']}
+async def round_end_node(state: DebateState) -> dict:
+    """輪次結束節點（主持人小結頻率為 final / off 時取代每輪的 moderator）
 
-完整辯論記錄：
-{format_messages(state['messages'], limit=30)}
+    不呼叫主持人 LLM：負責更新輪數與工具計數，並把本輪發言壓縮後併入滾動摘要，
+    讓最終報告（final）仍能涵蓋較早的回合。
+    """
+    from app.llm.summarizer import update_debate_summary
 
-請生成最終總結報告。"""
-    else:
-        system_prompt = get_moderator_round_summary(current_round, language)
+    current_round = state.get("round_count", 0) + 1
+    is_final = current_round >= state.get("max_rounds", 3)
+    logger.debug(f"round_end_node: round={current_round}, final={is_final}")
 
-        # ⚠️ 只提取本輪的 Optimist/Skeptic 對話（避免包含舊的 Moderator 總結）
-        recent_debate_msgs = [
-            m for m in state['messages'][-8:]
-            if getattr(m, 'name', None) in ("optimist", "skeptic")
-        ]
+    update = {
+        "round_count": current_round,
+        "current_speaker": "end" if is_final else "optimist",
+        "tool_iterations": 0,
+    }
+    if not is_final:
+        update["debate_summary"] = await update_debate_summary(
+            state.get("debate_summary", ""),
+            format_messages(get_round_turns(state["messages"]), limit=6),
+            current_round,
+            state.get("language", "zh"),
+        )
+    return update
 
-        if is_en:
-            prompt_context = f"""*** RESPOND IN ENGLISH ONLY ***
 
-Debate Topic: {state['topic']}
+# ============================================================
+# Retrieve-then-generate 節點
+# ============================================================
+#
+# ToolNode 架構中，每次搜尋都要兩次 LLM 呼叫（先決定 tool_call，再帶著結果發言）。
+# retrieve 模式改為：由主題與上一位發言者的內容推導查詢 → 並行搜尋 → 單次 LLM 呼叫發言。
 
-This Round's Dialogue:
-{format_messages(recent_debate_msgs, limit=6)}
+MAX_RETRIEVE_QUERIES = 2
 
-Please generate the Round {current_round} summary.
+_KEYWORD_STOPWORDS = {
+    "this", "that", "with", "from", "have", "will", "would", "could", "should",
+    "they", "their", "there", "which", "about", "these", "those", "while", "being",
+    "more", "than", "also", "only", "into", "your", "what", "when", "where",
+}
 
-*** IMPORTANT: Your response MUST be in English! ***"""
-        else:
-            prompt_context = f"""辯論主題：{state['topic']}
 
-本輪對話：
-{format_messages(recent_debate_msgs, limit=6)}
+def extract_keywords(text: str, limit: int = 4) -> List[str]:
+    """從發言中擷取關鍵字（英文長單字 + 中文詞段），不呼叫 LLM"""
+    import re
 
-請生成第 {current_round} 輪小結。"""
+    keywords: List[str] = []
+    for token in re.findall(r"[A-Za-z][A-Za-z\-]{3,}|[\u4e00-\u9fff]{2,}", text):
+        token = token.lower() if token.isascii() else token[:6]
+        if token in _KEYWORD_STOPWORDS or token in keywords:
+            continue
+        keywords.append(token)
+        if len(keywords) >= limit:
+            break
+    return keywords
 
-    prompt_messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=prompt_context)
-    ]
 
-    response = await llm.ainvoke(prompt_messages)
-    final_response = AIMessage(
-        content=response.content or "(無法生成總結)",
-        name="moderator"
+def derive_search_queries(state: DebateState, speaker: str, max_queries: int = MAX_RETRIEVE_QUERIES) -> List[str]:
+    """由主題與對手上一段發言推導搜尋查詢
+
+    第一個查詢與主題預取（app.services.research_service）的查詢一致，
+    可直接命中預取結果或搜尋快取。
+    """
+    from app.services.research_service import build_topic_queries
+
+    topic = state['topic']
+    topic_queries = build_topic_queries(topic, state.get('language', 'zh'))
+    # 樂觀者找數據，懷疑者找風險
+    queries = [topic_queries[1] if speaker == "optimist" else topic_queries[2]]
+
+    opponent = "skeptic" if speaker == "optimist" else "optimist"
+    for message in reversed(state.get('messages', [])):
+        if getattr(message, 'name', None) == opponent and message.content:
+            keywords = extract_keywords(message.content)
+            if keywords:
+                queries.append(f"{topic} {' '.join(keywords)}")
+            break
+
+    return queries[:max_queries]
+
+
+async def retrieve_context(queries: List[str], config: Optional[RunnableConfig] = None, topic: str = "") -> str:
+    """並行執行搜尋（經由 web_search_tool，保留 on_tool_start/on_tool_end 事件）
+
+    多個查詢的結果合併排序、去重後裝進 TOOL_CONTEXT_TOKEN_BUDGET。
+    """
+    import asyncio
+    from app.tools.ranking import compress_tool_context
+
+    if not queries:
+        return ""
+    results = await asyncio.gather(
+        *(web_search_tool.ainvoke({"query": query}, config=config) for query in queries),
+        return_exceptions=True
     )
+    contents = [r for r in results if isinstance(r, str) and r]
+    passages = compress_tool_context(contents, " ".join(queries), topic)
+    return "\n".join(f"• {p}" for p in passages)
+
+
+async def _retrieve_then_generate(
+    state: DebateState,
+    speaker: str,
+    config: Optional[RunnableConfig],
+    search: bool = True
+) -> AIMessage:
+    """單次 LLM 呼叫產生發言（搜尋結果預先放進 prompt；search=False 時只用主題預取結果）"""
+    if search:
+        queries = derive_search_queries(state, speaker)
+        logger.debug(f"{speaker}_retrieve_node: queries={queries}")
+        context = await retrieve_context(queries, config, state['topic'])
+    else:
+        context = _research_context(config)
 
-    # 決定下一步
-    new_round = current_round  # Moderator 完成後才更新輪數
-    next_speaker = "end" if is_final else "optimist"
+    profile = get_request_profile(config)
+    llm = get_llm(bind_tools=False, **profile.llm_kwargs())
+    prompt_messages = build_prompt(state, speaker, context, profile=profile)
+    response = await llm.ainvoke(prompt_messages, max_tokens=profile.turn_max_tokens(speaker))
+    record_prompt_usage(speaker, response, prompt_messages)
+    return AIMessage(content=response.content or "(無回應)", name=speaker)
 
-    logger.debug(f"moderator_node: round={new_round}, next={next_speaker}")
 
+async def optimist_retrieve_node(state: DebateState, config: RunnableConfig = None, search: bool = True) -> dict:
+    """樂觀者節點（retrieve 模式：先搜尋，再單次發言）"""
+    logger.debug("optimist_retrieve_node: entering")
+    message = await _retrieve_then_generate(state, "optimist", config, search)
     return {
-        "messages": [final_response],
-        "current_speaker": next_speaker,
-        "round_count": new_round,  # ⚠️ 重要：Moderator 負責更新輪數
-        "tool_iterations": 0  # 清零工具計數，讓下一輪可以使用工具
+        "messages": [message],
+        "current_speaker": "skeptic",
+        "last_agent": "optimist",
+    }
+
+
+async def skeptic_retrieve_node(state: DebateState, config: RunnableConfig = None, search: bool = True) -> dict:
+    """懷疑者節點（retrieve 模式：先搜尋，再單次發言）"""
+    logger.debug("skeptic_retrieve_node: entering")
+    message = await _retrieve_then_generate(state, "skeptic", config, search)
+    return {
+        "messages": [message],
+        "current_speaker": "moderator",
+        "last_agent": "skeptic",
     }
 
 
 # ============================================================
-# 建立 StateGraph（Phase 3d）
+# Overlap 模式節點（主持人小結與下一輪樂觀者並行）
+# ============================================================
+#
+# 樂觀者的 prompt 只用到已完成的發言，不依賴本輪小結，
+# 因此非最終輪時 skeptic 之後同時觸發 moderator 與 optimist（同一個 superstep）：
+# - 同一步寫入同一個 LastValue 欄位會衝突，主持人只寫 messages / round_count / debate_summary，
+#   其餘欄位（current_speaker、tool_iterations、last_agent）由樂觀者負責
+# - LangGraph 依節點名稱排序套用同一步的寫入，moderator 的小結會排在 optimist 的訊息之前
+# - moderator 分支在小結後結束，樂觀者分支照常進入工具迴圈與 skeptic
+# SSE 層（app.main.order_overlap_events）負責讓前端先看到小結、再看到樂觀者
+
+async def moderator_overlap_node(state: DebateState, config: RunnableConfig = None) -> dict:
+    """主持人節點（overlap 模式：非最終輪與樂觀者並行，只寫入不衝突的欄位）"""
+    update = await moderator_node(state, config)
+    if update["current_speaker"] == "end":
+        return update
+    return {key: update[key] for key in ("messages", "round_count", "debate_summary")}
+
+
+async def optimist_overlap_node(
+    state: DebateState,
+    config: RunnableConfig = None,
+    max_tool_iterations: int = MAX_TOOL_ITERATIONS
+) -> dict:
+    """樂觀者節點（overlap 模式）
+
+    與主持人並行的那次呼叫看不到主持人更新後的 round_count，自行加一以產生正確輪數；
+    之後的工具往返已在主持人寫入之後，不需調整。
+    """
+    if state.get("last_agent") == "skeptic":
+        state = {**state, "round_count": state.get("round_count", 0) + 1}
+    return await optimist_node(state, config, max_tool_iterations)
+
+
+def route_after_skeptic_overlap(state: DebateState) -> Union[str, List[str]]:
+    """Skeptic 後的路由（overlap 模式）：非最終輪同時觸發主持人小結與下一輪樂觀者"""
+    speaker = should_continue(state)
+    if speaker == "moderator" and state.get("round_count", 0) + 1 < state.get("max_rounds", 3):
+        return ["moderator", "optimist"]
+    return speaker
+
+
+# ============================================================
+# 建立 StateGraph（節點組裝見 app.graph_builder）
 # ============================================================
 
 # 建立 ToolNode
 tool_node = ToolNode(tools)
 
-# 建立 StateGraph
-_graph = StateGraph(DebateState)
-
-# 添加節點
-_graph.add_node("optimist", optimist_node)
-_graph.add_node("skeptic", skeptic_node)
-_graph.add_node("tools", tool_node)
-_graph.add_node("tool_callback", tool_callback_node)
-_graph.add_node("moderator", moderator_node)  # Phase 3d: 新增
-
-# 設定入口點
-_graph.set_conditional_entry_point(
-    should_continue,
-    {
-        "optimist": "optimist",
-        "skeptic": "skeptic",
-        "tools": "tools",
-        "moderator": "moderator",  # Phase 3d: 新增
-        "end": END
-    }
-)
-
-# Optimist 後的路由
-_graph.add_conditional_edges(
-    "optimist",
-    should_continue,
-    {
-        "tools": "tools",
-        "skeptic": "skeptic",
-        "tool_callback": "tool_callback",
-        "moderator": "moderator",  # Phase 3d: 容錯路由
-        "end": END
-    }
-)
-
-# Skeptic 後的路由
-_graph.add_conditional_edges(
-    "skeptic",
-    should_continue,
-    {
-        "tools": "tools",
-        "optimist": "optimist",
-        "tool_callback": "tool_callback",
-        "moderator": "moderator",  # Phase 3d: 主要路由
-        "end": END
-    }
-)
-
-# Tool 執行後進入回調
-_graph.add_edge("tools", "tool_callback")
-
-# Tool 回調後返回 Agent
-_graph.add_conditional_edges(
-    "tool_callback",
-    should_continue,
-    {
-        "optimist": "optimist",
-        "skeptic": "skeptic",
-        "moderator": "moderator",  # Phase 3d: 容錯路由
-        "end": END
-    }
-)
-
-# Moderator 後的路由（Phase 3d）
-_graph.add_conditional_edges(
-    "moderator",
-    should_continue,
-    {
-        "optimist": "optimist",  # 未滿 3 輪，繼續辯論
-        "end": END               # 已滿 3 輪，結束
-    }
-)
 
-# 編譯為可執行的 graph
-debate_graph = _graph.compile()
+def _build_default_graph(mode: str):
+    """以預設設定組裝並編譯該模式的 graph"""
+    from app.graph_builder import build_debate_graph
+
+    return build_debate_graph(GraphConfig(mode=mode))
+
+
+# 預設設定的 graph 在 import 時編譯；節點名稱在各模式相同，SSE 串流邏輯不需區分模式
+debate_graph = _build_default_graph("tools")
+retrieve_debate_graph = _build_default_graph("retrieve")
+overlap_debate_graph = _build_default_graph("overlap")
 
 logger.info("debate_graph compiled successfully (Phase 3d: Moderator Agent)")
 
+
+# ============================================================
+# Graph 模式選擇
+# ============================================================
+
+GRAPH_MODES = ("tools", "retrieve", "overlap", "panel")
+
+
+def get_graph_mode(mode: Optional[str] = None) -> str:
+    """決定 graph 模式（請求指定 > DEBATE_GRAPH_MODE 環境變數 > "tools"）"""
+    mode = (mode or os.getenv("DEBATE_GRAPH_MODE", "tools")).strip().lower()
+    if mode not in GRAPH_MODES:
+        logger.warning(f"unknown graph mode '{mode}', falling back to 'tools'")
+        return "tools"
+    return mode
+
+
+def get_debate_graph(mode: Optional[str] = None, config: Optional[GraphConfig] = None):
+    """取得對應模式的已編譯 graph
+
+    - tools: ToolNode 架構（LLM 決定是否搜尋，搜尋後再呼叫一次 LLM）
+    - retrieve: 先並行搜尋，再單次串流發言
+    - overlap: 同 tools，但主持人小結與下一輪樂觀者並行
+    - panel: 多位辯手，同一階段並行發言（app.graph_builder）
+
+    config: graph 變體（app.graph_builder.GraphConfig，例如 profile 指定的小結頻率與工具迭代上限），
+            mode 以參數為準；與該模式的預設設定相同時使用預先編譯的 graph，
+            否則由 get_compiled_graph 建立並依設定快取
+    """
+    mode = get_graph_mode(mode)
+    if config is not None:
+        from dataclasses import replace
+        from app.graph_builder import get_compiled_graph
+
+        config = replace(config, mode=mode).normalized()
+        if config != GraphConfig(mode=mode).normalized():
+            return get_compiled_graph(config)
+    if mode == "retrieve":
+        return retrieve_debate_graph
+    if mode == "overlap":
+        return overlap_debate_graph
+    if mode == "panel":
+        from app.graph_builder import get_panel_graph
+
+        return get_panel_graph()
+    return debate_graph
+
@@ -0,0 +1,458 @@
+"""
+Graph Builder
+
+組裝並編譯辯論 graph 的變體，編譯結果依設定快取：
+
+GraphConfig（tools / retrieve / overlap 模式）
+- max_tool_iterations: 每位辯手每輪的工具迭代上限（0 表示不搜尋，不加入 ToolNode）
+- moderator: 主持人小結頻率
+    every  每輪小結 + 最終報告
+    final  只在最後生成總結報告，各輪以 round_end 節點更新輪數與滾動摘要（不呼叫 LLM）
+    off    不呼叫主持人，最後一輪結束即完成
+- search: retrieve 模式是否在發言前搜尋（False 時只用主題預取結果）
+
+編譯後的 graph 以 GraphConfig 為 key 放進有上限的 LRU 快取（GraphCache），
+同一種設定只編譯一次，/health 回報 hit / miss。
+
+環境變數：
+    GRAPH_CACHE_SIZE: 快取的已編譯 graph 數（預設 16）
+
+Panel（多位辯手）
+
+由任意數量的辯手（persona）與每輪的發言階段建立 LangGraph：
+- 每個 persona 是一個節點，system prompt 沿用其角色（optimist / skeptic），
+  另以 focus 指定關注重點（例如兩位懷疑者分別關注成本與倫理）
+- 每輪由數個階段組成，同一階段的辯手在同一個 superstep 並行發言（fan-out），
+  全部完成後才進入下一階段（fan-in），最後由主持人小結
+- 第一輪可使用不同的階段安排（例如所有辯手同時開場）
+
+一輪的耗時取決於階段數（依序相依的次數），而不是辯手人數。
+
+路由不需要額外的狀態欄位：同一階段的每個辯手依自己的位置計算下一階段，
+LangGraph 在同一步對同一節點的多次觸發只執行一次，因此自然形成 fan-in。
+辯手節點都是單一步驟（不走 ToolNode 迴圈），搜尋資料來自主題預取
+（app.services.research_service），避免並行辯手各自觸發多次搜尋。
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+import os
+import threading
+import logging
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END, StateGraph
+
+logger = logging.getLogger(__name__)
+
+RESERVED_NODE_NAMES = ("moderator", "tools", "tool_summary", "tool_callback", "round_end")
+
+MODERATOR_CADENCES = ("every", "final", "off")
+DEFAULT_TOOL_ITERATIONS = 3  # 與 app.graph.MAX_TOOL_ITERATIONS 相同
+
+
+# ============================================================
+# Graph 變體設定
+# ============================================================
+
+@dataclass(frozen=True)
+class GraphConfig:
+    """Graph 變體設定（同時是編譯快取的 key）"""
+    mode: str = "tools"
+    max_tool_iterations: int = DEFAULT_TOOL_ITERATIONS
+    moderator: str = "every"
+    search: bool = True
+
+    def normalized(self) -> "GraphConfig":
+        """收斂等價的設定，避免同一種 graph 以不同 key 重複編譯
+
+        - tools / overlap：不搜尋等同工具迭代上限 0
+        - overlap 只在每輪小結時有意義，其他頻率退回 tools
+        - panel 的拓撲由 PanelPlan 決定，不使用這些選項
+        """
+        if self.moderator not in MODERATOR_CADENCES:
+            raise ValueError(f"unknown moderator cadence '{self.moderator}'")
+        if self.mode == "panel":
+            return GraphConfig(mode="panel")
+        if self.mode == "retrieve":
+            return replace(self, max_tool_iterations=DEFAULT_TOOL_ITERATIONS)
+        iterations = max(self.max_tool_iterations, 0) if self.search else 0
+        mode = self.mode if self.moderator == "every" else "tools"
+        return replace(self, mode=mode, max_tool_iterations=iterations, search=iterations > 0)
+
+
+class Persona(NamedTuple):
+    """辯手設定
+
+    name: 節點名稱，也是訊息的 name 與 SSE 的 node（Groq 要求 [a-zA-Z0-9_-]）
+    role: "optimist" 或 "skeptic"，決定 system prompt 與前端樣式
+    """
+    name: str
+    role: str
+    focus_en: str = ""
+    focus_zh: str = ""
+
+    def focus(self, language: str) -> str:
+        return self.focus_en if language == "en" else self.focus_zh
+
+
+class PanelPlan(NamedTuple):
+    """辯手與每輪的發言階段（每個階段是一組並行發言的辯手名稱）"""
+    personas: Tuple[Persona, ...]
+    stages: Tuple[Tuple[str, ...], ...]
+    opening: Optional[Tuple[Tuple[str, ...], ...]] = None
+
+    def stages_for(self, round_count: int) -> Tuple[Tuple[str, ...], ...]:
+        """該輪的階段安排（第一輪可用 opening）"""
+        return self.opening if round_count == 0 and self.opening else self.stages
+
+    def roles(self) -> Dict[str, str]:
+        """節點名稱 → 角色（含主持人）"""
+        return {**{p.name: p.role for p in self.personas}, "moderator": "moderator"}
+
+
+# 預設 panel：三位辯手同時開場，之後每輪樂觀者發言、兩位懷疑者並行反駁
+DEFAULT_PANEL = PanelPlan(
+    personas=(
+        Persona("optimist", "optimist"),
+        Persona(
+            "skeptic_cost", "skeptic",
+            focus_en="economic costs, jobs and who pays for it",
+            focus_zh="經濟成本、就業衝擊與由誰買單",
+        ),
+        Persona(
+            "skeptic_ethics", "skeptic",
+            focus_en="ethics, fairness and privacy risks",
+            focus_zh="倫理、公平與隱私風險",
+        ),
+    ),
+    opening=(("optimist", "skeptic_cost", "skeptic_ethics"),),
+    stages=(("optimist",), ("skeptic_cost", "skeptic_ethics")),
+)
+
+
+# ============================================================
+# 驗證
+# ============================================================
+
+def validate_plan(plan: PanelPlan) -> None:
+    """檢查辯手名稱與階段安排，不合法時拋出 ValueError"""
+    names = [p.name for p in plan.personas]
+    if not names:
+        raise ValueError("panel needs at least one persona")
+    if len(set(names)) != len(names):
+        raise ValueError(f"duplicate persona names: {names}")
+    for persona in plan.personas:
+        if persona.name in RESERVED_NODE_NAMES:
+            raise ValueError(f"persona name '{persona.name}' is reserved")
+        if persona.role not in ("optimist", "skeptic"):
+            raise ValueError(f"persona '{persona.name}' has unknown role '{persona.role}'")
+
+    for stages in filter(None, (plan.opening, plan.stages)):
+        seen: List[str] = []
+        for stage in stages:
+            if not stage:
+                raise ValueError("empty panel stage")
+            for name in stage:
+                if name not in names:
+                    raise ValueError(f"unknown persona '{name}' in panel stages")
+                if name in seen:
+                    # 路由依辯手在本輪的位置決定下一階段，每輪只能出現一次
+                    raise ValueError(f"persona '{name}' appears twice in one round")
+                seen.append(name)
+    if not plan.stages:
+        raise ValueError("panel needs at least one stage per round")
+
+
+# ============================================================
+# 節點與路由
+# ============================================================
+
+def make_persona_node(persona: Persona, history_limit: int):
+    """建立辯手節點：單次 LLM 呼叫，只寫入 messages（並行節點不會互相衝突）"""
+
+    async def persona_node(state, config: RunnableConfig = None) -> dict:
+        from app.graph import _research_context, build_prompt, get_llm
+        from app.llm.prompt_layout import record_prompt_usage
+        from app.services.profiles import get_request_profile
+
+        logger.debug(f"persona_node[{persona.name}]: entering")
+        language = state.get("language", "zh")
+        profile = get_request_profile(config)
+        llm = get_llm(bind_tools=False, **profile.llm_kwargs())
+        prompt_messages = build_prompt(
+            state,
+            persona.role,
+            _research_context(config),
+            focus=persona.focus(language),
+            history_limit=history_limit,
+            profile=profile,
+        )
+        response = await llm.ainvoke(prompt_messages, max_tokens=profile.turn_max_tokens(persona.role))
+        record_prompt_usage(persona.name, response, prompt_messages)
+        return {"messages": [AIMessage(content=response.content or "(無回應)", name=persona.name)]}
+
+    persona_node.__name__ = f"{persona.name}_node"
+    return persona_node
+
+
+def _first_stage(plan: PanelPlan, state) -> Union[str, List[str]]:
+    if state.get("round_count", 0) >= state.get("max_rounds", 3):
+        return END
+    return list(plan.stages_for(state.get("round_count", 0))[0])
+
+
+def make_stage_router(plan: PanelPlan, name: str):
+    """辯手發言後的路由：本輪下一階段，或最後一階段後交給主持人"""
+
+    def route(state) -> Union[str, List[str]]:
+        stages = plan.stages_for(state.get("round_count", 0))
+        index = next(i for i, stage in enumerate(stages) if name in stage)
+        return list(stages[index + 1]) if index + 1 < len(stages) else "moderator"
+
+    route.__name__ = f"route_after_{name}"
+    return route
+
+
+def make_moderator_router(plan: PanelPlan):
+    """主持人之後：結束，或下一輪的第一階段（round_count 已由主持人更新）"""
+
+    def route_after_moderator(state) -> Union[str, List[str]]:
+        if state.get("current_speaker") == "end":
+            return END
+        return _first_stage(plan, state)
+
+    return route_after_moderator
+
+
+# ============================================================
+# Graph 建立
+# ============================================================
+
+def build_panel_graph(plan: PanelPlan = DEFAULT_PANEL):
+    """依 PanelPlan 建立並編譯 graph（狀態沿用 app.graph.DebateState）"""
+    from app.graph import DebateState, moderator_node
+
+    validate_plan(plan)
+    names = [p.name for p in plan.personas]
+    # 對話歷史至少涵蓋上一輪所有辯手的發言與小結
+    history_limit = max(4, len(names) + 1)
+
+    graph = StateGraph(DebateState)
+    for persona in plan.personas:
+        graph.add_node(persona.name, make_persona_node(persona, history_limit))
+    graph.add_node("moderator", moderator_node)
+
+    graph.set_conditional_entry_point(lambda state: _first_stage(plan, state), [*names, END])
+    for name in names:
+        graph.add_conditional_edges(name, make_stage_router(plan, name), [*names, "moderator"])
+    graph.add_conditional_edges("moderator", make_moderator_router(plan), [*names, END])
+
+    compiled = graph.compile()
+    logger.info(f"panel graph compiled: personas={names}, stages={len(plan.stages)}")
+    return compiled
+
+
+_panel_graph = None
+
+
+def get_panel_graph():
+    """取得預設 panel graph 單例"""
+    global _panel_graph
+
+    if _panel_graph is None:
+        _panel_graph = build_panel_graph(DEFAULT_PANEL)
+    return _panel_graph
+
+
+def get_panel_roles() -> Dict[str, str]:
+    """預設 panel 的節點名稱 → 角色（SSE 層用於辨識發言節點）"""
+    return DEFAULT_PANEL.roles()
+
+
+# ============================================================
+# Graph 變體工廠（tools / retrieve / overlap）
+# ============================================================
+
+def _bind_agent(node, **kwargs):
+    """把 graph 變體的參數綁到辯手節點（預設值時直接使用原函數）"""
+    if not kwargs:
+        return node
+
+    async def bound(state, config: RunnableConfig = None) -> dict:
+        return await node(state, config, **kwargs)
+
+    bound.__name__ = node.__name__
+    return bound
+
+
+def make_round_router(moderator: str, overlap: bool = False):
+    """Skeptic 發言後的路由：依主持人小結頻率決定進入 moderator 或 round_end"""
+    from app.graph import route_after_skeptic_overlap, should_continue
+
+    def route_after_skeptic(state) -> Union[str, List[str]]:
+        speaker = should_continue(state)
+        if speaker != "moderator":
+            return speaker
+        if moderator == "every":
+            return route_after_skeptic_overlap(state) if overlap else "moderator"
+        is_final = state.get("round_count", 0) + 1 >= state.get("max_rounds", 3)
+        return "moderator" if moderator == "final" and is_final else "round_end"
+
+    return route_after_skeptic
+
+
+def _build_tool_graph(config: GraphConfig):
+    """tools / overlap 模式：辯手決定是否呼叫工具（ToolNode），max_tool_iterations 為 0 時不加入工具節點"""
+    from app import graph as g
+
+    overlap = config.mode == "overlap"
+    limit = config.max_tool_iterations
+    bind = {"max_tool_iterations": limit} if limit != DEFAULT_TOOL_ITERATIONS else {}
+
+    graph = StateGraph(g.DebateState)
+    graph.add_node("optimist", _bind_agent(g.optimist_overlap_node if overlap else g.optimist_node, **bind))
+    graph.add_node("skeptic", _bind_agent(g.skeptic_node, **bind))
+    graph.add_node("moderator", g.moderator_overlap_node if overlap else g.moderator_node)
+    routes = {"optimist": "optimist", "skeptic": "skeptic", "moderator": "moderator", "end": END}
+
+    if limit > 0:
+        async def tool_callback(state) -> dict:
+            return await g.tool_callback_node(state, max_tool_iterations=limit)
+
+        graph.add_node("tools", g.tool_node)
+        graph.add_node("tool_summary", g.tool_summary_node)
+        graph.add_node("tool_callback", tool_callback if bind else g.tool_callback_node)
+        # Tool 執行後先摘要（未啟用時直接通過），再進入回調
+        graph.add_edge("tools", "tool_summary")
+        graph.add_edge("tool_summary", "tool_callback")
+        routes.update({"tools": "tools", "tool_callback": "tool_callback"})
+    if config.moderator != "every":
+        graph.add_node("round_end", g.round_end_node)
+        routes["round_end"] = "round_end"
+
+    graph.set_conditional_entry_point(g.should_continue, routes)
+    graph.add_conditional_edges("optimist", g.should_continue, routes)
+    graph.add_conditional_edges("skeptic", make_round_router(config.moderator, overlap), routes)
+    if limit > 0:
+        graph.add_conditional_edges("tool_callback", g.should_continue, routes)
+    if overlap:
+        # 最終報告後結束；非最終輪的小結分支也在此結束（下一輪已由樂觀者分支接手）
+        graph.add_edge("moderator", END)
+    else:
+        graph.add_conditional_edges("moderator", g.should_continue, routes)
+    if config.moderator != "every":
+        graph.add_conditional_edges("round_end", g.should_continue, routes)
+    return graph.compile()
+
+
+def _build_retrieve_graph(config: GraphConfig):
+    """retrieve 模式：先搜尋（search=False 時只用預取結果），再單次發言"""
+    from app import graph as g
+
+    bind = {} if config.search else {"search": False}
+    graph = StateGraph(g.DebateState)
+    graph.add_node("optimist", _bind_agent(g.optimist_retrieve_node, **bind))
+    graph.add_node("skeptic", _bind_agent(g.skeptic_retrieve_node, **bind))
+    graph.add_node("moderator", g.moderator_node)
+    routes = {"optimist": "optimist", "skeptic": "skeptic", "moderator": "moderator", "end": END}
+    if config.moderator != "every":
+        graph.add_node("round_end", g.round_end_node)
+        routes["round_end"] = "round_end"
+
+    graph.set_conditional_entry_point(g.should_continue, routes)
+    graph.add_edge("optimist", "skeptic")
+    graph.add_conditional_edges("skeptic", make_round_router(config.moderator), routes)
+    graph.add_conditional_edges("moderator", g.should_continue, routes)
+    if config.moderator != "every":
+        graph.add_conditional_edges("round_end", g.should_continue, routes)
+    return graph.compile()
+
+
+def build_debate_graph(config: GraphConfig):
+    """依 GraphConfig 組裝並編譯 graph（不經快取，見 get_compiled_graph）"""
+    config = config.normalized()
+    if config.mode == "panel":
+        return build_panel_graph(DEFAULT_PANEL)
+    if config.mode == "retrieve":
+        compiled = _build_retrieve_graph(config)
+    else:
+        compiled = _build_tool_graph(config)
+    logger.info(f"debate graph compiled: {config}")
+    return compiled
+
+
+# ============================================================
+# 編譯快取
+# ============================================================
+
+class GraphCache:
+    """以 GraphConfig 快取已編譯的 graph（LRU，執行緒安全）"""
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[GraphConfig, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, config: GraphConfig) -> Any:
+        """取得已編譯的 graph，不存在時編譯（在鎖內執行，同一設定只編譯一次）"""
+        config = config.normalized()
+        with self._lock:
+            compiled = self._entries.get(config)
+            if compiled is not None:
+                self.hits += 1
+                self._entries.move_to_end(config)
+                return compiled
+
+            self.misses += 1
+            compiled = build_debate_graph(config)
+            self._entries[config] = compiled
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return compiled
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_graph_cache: Optional[GraphCache] = None
+
+
+def get_graph_cache() -> GraphCache:
+    """取得 GraphCache 單例（GRAPH_CACHE_SIZE 決定上限）"""
+    global _graph_cache
+
+    if _graph_cache is None:
+        _graph_cache = GraphCache(max_entries=max(int(os.getenv("GRAPH_CACHE_SIZE", "16")), 1))
+    return _graph_cache
+
+
+def get_compiled_graph(config: GraphConfig):
+    """取得該設定的已編譯 graph（同一設定只編譯一次）"""
+    return get_graph_cache().get_or_build(config)
+
+
+def get_graph_cache_stats() -> Dict[str, Any]:
+    """取得編譯快取統計"""
+    return get_graph_cache().stats()
+
+
+def reset_graph_cache() -> None:
+    """
+    清空編譯快取（主要用於測試）
+    """
+    global _graph_cache
+    _graph_cache = None
@@ -0,0 +1 @@
+# LLM 基礎設施模組（連線池、快取、路由）
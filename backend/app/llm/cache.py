@@ -0,0 +1,429 @@
+"""
+LLM Response Cache
+
+內容定址的 LLM 回應快取（opt-in，預設關閉）。
+- Key：sha256(模型列表, 綁定工具, prompt 訊息, temperature, 呼叫參數如 max_tokens / stop)
+- 記憶體層：有上限的 LRU
+- 磁碟層：SQLite，支援 TTL 與筆數上限淘汰
+- 命中時以 ReplayChatModel 逐段重播 token，
+  astream_events 消費者仍會收到 on_chat_model_stream 事件
+
+環境變數：
+    LLM_CACHE_ENABLED: 是否啟用（預設 false）
+    LLM_CACHE_PATH: SQLite 檔案路徑（預設 .llm_cache.sqlite3）
+    LLM_CACHE_TTL: 有效秒數（預設 86400）
+    LLM_CACHE_MEMORY_SIZE: 記憶體 LRU 筆數（預設 256）
+    LLM_CACHE_MAX_ENTRIES: 磁碟最大筆數（預設 5000）
+"""
+
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    convert_to_messages,
+    message_chunk_to_message,
+    message_to_dict,
+    messages_from_dict,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# Cache Key
+# ============================================================
+
+def normalize_input(input: Any) -> List[BaseMessage]:
+    """將 runnable 輸入統一轉成訊息列表"""
+    if isinstance(input, PromptValue):
+        return input.to_messages()
+    if isinstance(input, str):
+        return convert_to_messages([input])
+    return convert_to_messages(input)
+
+
+def normalize_call_kwargs(kwargs: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """正規化呼叫參數：略過 None，stop 等序列轉成 list（tuple 與 list 得到相同 key）"""
+    normalized: Dict[str, Any] = {}
+    for name, value in (kwargs or {}).items():
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = [value] if name == "stop" else value
+        elif isinstance(value, (list, tuple)):
+            value = list(value)
+        normalized[name] = value
+    return normalized
+
+
+def make_cache_key(
+    models: Sequence[str],
+    tool_names: Sequence[str],
+    messages: Sequence[BaseMessage],
+    temperature: float,
+    call_kwargs: Optional[Dict[str, Any]] = None,
+) -> str:
+    """計算內容定址的快取 key
+
+    只取影響輸出的欄位（type/name/content/tool_calls）與正規化後的呼叫參數
+    （max_tokens、stop 等：截斷的回答不會被當成完整回答重播，反之亦然），
+    相同輸入永遠得到相同 key。
+    """
+    payload = {
+        "models": list(models),
+        "tools": sorted(tool_names),
+        "temperature": temperature,
+        "call_kwargs": normalize_call_kwargs(call_kwargs),
+        "messages": [
+            {
+                "type": m.type,
+                "name": getattr(m, "name", None),
+                "content": m.content,
+                "tool_calls": getattr(m, "tool_calls", None) or [],
+            }
+            for m in messages
+        ],
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ============================================================
+# 兩層快取（記憶體 LRU + SQLite）
+# ============================================================
+
+class ResponseCache:
+    """記憶體 LRU + SQLite 兩層快取
+
+    值為序列化後的 AIMessage（message_to_dict 的 JSON）。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = 86400.0,
+        memory_size: int = 256,
+        max_entries: int = 5000,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    # ---------- 記憶體層 ----------
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        value, created_at = entry
+        if now - created_at > self.ttl:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    # ---------- 公開介面（同步） ----------
+
+    def get(self, key: str) -> Optional[AIMessage]:
+        now = time.time()
+        with self._lock:
+            value = self._memory_get(key, now)
+            if value is not None:
+                self.memory_hits += 1
+                return self._decode(value)
+
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, created_at = row
+            if now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self._memory_set(key, value, created_at)
+            self.disk_hits += 1
+            return self._decode(value)
+
+    def set(self, key: str, message: AIMessage) -> None:
+        now = time.time()
+        value = json.dumps(message_to_dict(message), ensure_ascii=False)
+        with self._lock:
+            self._memory_set(key, value, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+            self.writes += 1
+
+    def _evict(self, now: float) -> None:
+        """淘汰過期項目，並將筆數壓回 max_entries（最久未讀取者優先）"""
+        self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    # ---------- 公開介面（非同步） ----------
+
+    async def aget(self, key: str) -> Optional[AIMessage]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, message: AIMessage) -> None:
+        await asyncio.to_thread(self.set, key, message)
+
+    # ---------- 其他 ----------
+
+    @staticmethod
+    def _decode(value: str) -> AIMessage:
+        return messages_from_dict([json.loads(value)])[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (disk_size,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+            return {
+                "enabled": True,
+                "memory_size": len(self._memory),
+                "disk_size": disk_size,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "writes": self.writes,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ============================================================
+# 命中重播模型
+# ============================================================
+
+class ReplayChatModel(BaseChatModel):
+    """將快取的 AIMessage 當作 chat model 輸出重播
+
+    走完整的 BaseChatModel 流程，因此 astream_events 會照常產生
+    on_chat_model_start / on_chat_model_stream / on_chat_model_end。
+    """
+
+    message: AIMessage
+    model_name: str = "cache"
+    chunk_size: int = 8
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay-cache"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self.message)])
+
+    def _iter_chunks(self) -> Iterator[AIMessageChunk]:
+        content = self.message.content if isinstance(self.message.content, str) else ""
+        for i in range(0, len(content), self.chunk_size):
+            yield AIMessageChunk(content=content[i:i + self.chunk_size])
+
+        tool_calls = self.message.tool_calls or []
+        if tool_calls:
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {
+                        "name": tc["name"],
+                        "args": json.dumps(tc["args"], ensure_ascii=False),
+                        "id": tc.get("id"),
+                        "index": i,
+                    }
+                    for i, tc in enumerate(tool_calls)
+                ],
+            )
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        # on_llm_new_token 由 BaseChatModel 統一觸發
+        for chunk in self._iter_chunks():
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        # on_llm_new_token 由 BaseChatModel 統一觸發
+        for chunk in self._iter_chunks():
+            yield ChatGenerationChunk(message=chunk)
+
+
+# ============================================================
+# 快取包裝 Runnable
+# ============================================================
+
+class CachedLLM(Runnable):
+    """包在 get_llm 回傳的 runnable 外層的快取
+
+    miss 時呼叫內層 runnable 並寫入快取；
+    hit 時改由 ReplayChatModel 重播，不消耗任何 Groq 配額。
+    """
+
+    def __init__(
+        self,
+        bound: Runnable,
+        cache: ResponseCache,
+        models: Sequence[str],
+        tool_names: Sequence[str] = (),
+        temperature: float = 0.7,
+    ):
+        self.bound = bound
+        self.cache = cache
+        self.models = tuple(models)
+        self.tool_names = tuple(tool_names)
+        self.temperature = temperature
+
+    def _key(self, input: Any, kwargs: Dict[str, Any]) -> str:
+        return make_cache_key(self.models, self.tool_names, normalize_input(input), self.temperature, kwargs)
+
+    def _replayer(self, message: AIMessage) -> ReplayChatModel:
+        return ReplayChatModel(message=message, model_name=self.models[0] if self.models else "cache")
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        key = self._key(input, kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self._replayer(cached).invoke(input, config)
+
+        result = self.bound.invoke(input, config, **kwargs)
+        if isinstance(result, AIMessage) and (result.content or result.tool_calls):
+            self.cache.set(key, result)
+        return result
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        key = self._key(input, kwargs)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            logger.debug(f"CachedLLM: hit {key[:12]}")
+            return await self._replayer(cached).ainvoke(input, config)
+
+        result = await self.bound.ainvoke(input, config, **kwargs)
+        if isinstance(result, AIMessage) and (result.content or result.tool_calls):
+            await self.cache.aset(key, result)
+        return result
+
+    async def astream(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[BaseMessage]:
+        key = self._key(input, kwargs)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            logger.debug(f"CachedLLM: hit {key[:12]} (stream)")
+            async for chunk in self._replayer(cached).astream(input, config):
+                yield chunk
+            return
+
+        aggregated = None
+        async for chunk in self.bound.astream(input, config, **kwargs):
+            aggregated = chunk if aggregated is None else aggregated + chunk
+            yield chunk
+
+        if isinstance(aggregated, AIMessageChunk):
+            message = message_chunk_to_message(aggregated)
+            if message.content or message.tool_calls:
+                await self.cache.aset(key, message)
+
+
+# ============================================================
+# 單例
+# ============================================================
+
+_response_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def is_cache_enabled() -> bool:
+    """檢查 LLM 回應快取是否啟用"""
+    return os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+
+
+def get_response_cache() -> ResponseCache:
+    """取得 ResponseCache 單例（依環境變數建立）"""
+    global _response_cache
+
+    with _cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                path=os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3"),
+                ttl=float(os.getenv("LLM_CACHE_TTL", "86400")),
+                memory_size=int(os.getenv("LLM_CACHE_MEMORY_SIZE", "256")),
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000")),
+            )
+            logger.info(f"LLM 回應快取已初始化: {_response_cache.path}")
+
+    return _response_cache
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """取得快取統計（未啟用時只回報 enabled=False）"""
+    if not is_cache_enabled() or _response_cache is None:
+        return {"enabled": is_cache_enabled()}
+    return _response_cache.stats()
+
+
+def reset_response_cache() -> None:
+    """
+    關閉並重置快取單例（主要用於測試）
+    """
+    global _response_cache
+    with _cache_lock:
+        if _response_cache is not None:
+            _response_cache.close()
+        _response_cache = None
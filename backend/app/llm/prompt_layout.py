@@ -0,0 +1,258 @@
+"""
+Prompt Layout
+
+辯手 / 主持人 prompt 的組裝順序固定為「穩定 → 易變」，
+讓 provider 端的 prefix caching 能重用前段 token：
+
+    SystemMessage          每個角色 × 語言預先建立一次（主持人小結不含輪數）
+    HumanMessage:
+        1. 語言指示 + 辯論主題   整場辯論不變
+        2. 背景資料              主題預取完成後不變
+        3. 對話歷史              只含完成的發言（不含工具往返），
+                                 同一位辯手「決定搜尋」與「搜尋後發言」兩次呼叫相同
+        4. 本次資料              搜尋結果、本輪對話
+        5. 本次指示              輪數、身份、結尾語言提醒
+
+相同輸入必定產生相同輸出（不含時間、亂數或集合迭代順序）。
+
+組裝後依 app.llm.token_budget 檢查模型鏈中每個模型的 prompt 預算，
+超出時依 Section.priority 裁剪可裁剪的區塊（搜尋結果 → 背景資料 → 對話歷史）。
+
+另記錄每個節點的 tokens（本地計算的 prompt、provider 回報的 input / cached / output），由 /health 回報。
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+import logging
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_ROLES = ("optimist", "skeptic", "moderator_round", "moderator_final")
+
+# 角色 → app.llm.token_budget 的發言種類 / 統計用節點名稱
+ROLE_KINDS = {
+    "optimist": "debater",
+    "skeptic": "debater",
+    "moderator_round": "moderator_round",
+    "moderator_final": "moderator_final",
+}
+ROLE_NODES = {
+    "optimist": "optimist",
+    "skeptic": "skeptic",
+    "moderator_round": "moderator",
+    "moderator_final": "moderator",
+}
+
+
+class Section(NamedTuple):
+    """可裁剪的 prompt 區塊
+
+    trim:
+        head: 保留第一行標題，從最舊的內容行開始刪（對話歷史）
+        tail: 保留第一行標題，從最後一行開始刪（依相關度排序的搜尋結果）
+        drop: 整段移除（背景資料）
+    priority: 數字小者先裁剪
+    """
+    text: str
+    trim: str = "tail"
+    priority: int = 0
+
+
+# ============================================================
+# 組裝
+# ============================================================
+
+@lru_cache(maxsize=None)
+def get_system_message(role: str, language: str) -> SystemMessage:
+    """預先建立的 SystemMessage（同一角色 × 語言共用同一個物件）"""
+    from app.graph import (
+        get_moderator_final_summary,
+        get_moderator_round_summary,
+        get_optimist_system,
+        get_skeptic_system,
+    )
+
+    language = "en" if language == "en" else "zh"
+    if role == "optimist":
+        content = get_optimist_system(language)
+    elif role == "skeptic":
+        content = get_skeptic_system(language)
+    elif role == "moderator_round":
+        # 輪數放在本次指示，system prompt 保持固定
+        content = get_moderator_round_summary("N", language)
+    elif role == "moderator_final":
+        content = get_moderator_final_summary(language)
+    else:
+        raise ValueError(f"unknown prompt role: {role}")
+    return SystemMessage(content=content)
+
+
+def get_turn_max_tokens(role: str, overrides: Optional[Dict[str, int]] = None) -> int:
+    """該角色每次發言的 max_tokens（overrides 以發言種類為 key，例如 profile 的設定）"""
+    from app.llm.token_budget import get_max_tokens
+
+    kind = ROLE_KINDS[role]
+    if overrides and kind in overrides:
+        return overrides[kind]
+    return get_max_tokens(kind)
+
+
+def _join(sections: List[Union[str, Section]]) -> str:
+    texts = [s.text if isinstance(s, Section) else s for s in sections]
+    return "\n\n".join(text.strip("\n") for text in texts if text and text.strip())
+
+
+def _trim_once(section: Section) -> Optional[Section]:
+    """裁掉一行（或整段）；沒有可裁的內容時返回 None"""
+    if section.trim == "drop":
+        return None
+    lines = section.text.strip("\n").split("\n")
+    if len(lines) <= 1:
+        return None
+    lines = [lines[0], *lines[2:]] if section.trim == "head" else lines[:-1]
+    return section._replace(text="\n".join(lines)) if len(lines) > 1 else None
+
+
+def fit_sections(
+    system: str,
+    sections: List[Union[str, Section]],
+    budgets: Dict[str, int],
+) -> Tuple[List[Union[str, Section]], int]:
+    """裁剪區塊直到每個模型都放得下，返回 (區塊, 裁剪次數)"""
+    from app.llm.token_budget import fits
+
+    sections = list(sections)
+    trimmed = 0
+    order = sorted(
+        (i for i, s in enumerate(sections) if isinstance(s, Section) and s.text),
+        key=lambda i: (sections[i].priority, i),
+    )
+    for index in order:
+        while not fits([system, _join(sections)], budgets):
+            section = _trim_once(sections[index])
+            trimmed += 1
+            if section is None:
+                sections[index] = ""
+                break
+            sections[index] = section
+        else:
+            break
+    if trimmed and not fits([system, _join(sections)], budgets):
+        logger.warning("prompt still exceeds the token budget after trimming")
+    return sections, trimmed
+
+
+def layout_prompt(
+    role: str,
+    language: str,
+    sections: Iterable[Union[str, Section]],
+    models: Optional[List[str]] = None,
+    max_tokens: Optional[int] = None,
+) -> List[BaseMessage]:
+    """依序串接非空區塊（呼叫端負責由穩定到易變排列），超出 token 預算時裁剪
+
+    models / max_tokens: 本次呼叫的模型鏈與輸出上限（未指定時使用預設值）
+    """
+    from app.llm.token_budget import get_prompt_budgets
+
+    system = get_system_message(role, language)
+    budgets = get_prompt_budgets(ROLE_KINDS[role], models, max_tokens)
+    sections, trimmed = fit_sections(system.content, list(sections), budgets)
+    if trimmed:
+        get_prompt_cache_stats().record_trim(ROLE_NODES[role], trimmed)
+    return [system, HumanMessage(content=_join(sections))]
+
+
+# ============================================================
+# Cached tokens 統計
+# ============================================================
+
+def extract_usage(response: Any) -> Tuple[int, int]:
+    """從 LLM 回應取出 (input tokens, cached tokens)，沒有回報時為 (0, 0)"""
+    input_tokens, cached_tokens, _ = extract_token_usage(response)
+    return input_tokens, cached_tokens
+
+
+def extract_token_usage(response: Any) -> Tuple[int, int, int]:
+    """從 LLM 回應取出 (input, cached, output) tokens，沒有回報時為 0"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage:
+        details = usage.get("input_token_details") or {}
+        return (
+            int(usage.get("input_tokens") or 0),
+            int(details.get("cache_read") or 0),
+            int(usage.get("output_tokens") or 0),
+        )
+
+    metadata = getattr(response, "response_metadata", None) or {}
+    token_usage = metadata.get("token_usage") or metadata.get("usage") or {}
+    details = token_usage.get("prompt_tokens_details") or {}
+    return (
+        int(token_usage.get("prompt_tokens") or 0),
+        int(details.get("cached_tokens") or 0),
+        int(token_usage.get("completion_tokens") or 0),
+    )
+
+
+class PromptCacheStats:
+    """每個節點的 tokens：本地計算的 prompt、provider 回報的 input / cached / output"""
+
+    def __init__(self):
+        self._nodes: Dict[str, Dict[str, int]] = {}
+
+    def _entry(self, node: str) -> Dict[str, int]:
+        return self._nodes.setdefault(node, {
+            "calls": 0, "prompt_tokens_local": 0, "input_tokens": 0,
+            "cached_tokens": 0, "output_tokens": 0, "trimmed": 0,
+        })
+
+    def record(self, node: str, response: Any, prompt: Optional[List[BaseMessage]] = None) -> None:
+        input_tokens, cached_tokens, output_tokens = extract_token_usage(response)
+        entry = self._entry(node)
+        entry["calls"] += 1
+        entry["input_tokens"] += input_tokens
+        entry["cached_tokens"] += cached_tokens
+        entry["output_tokens"] += output_tokens
+        if prompt:
+            from app.llm.token_budget import count_message_tokens
+
+            entry["prompt_tokens_local"] += count_message_tokens(
+                [m.content for m in prompt if isinstance(m.content, str)]
+            )
+
+    def record_trim(self, node: str, count: int) -> None:
+        self._entry(node)["trimmed"] += count
+
+    def stats(self) -> Dict[str, Any]:
+        nodes = {}
+        for node, entry in sorted(self._nodes.items()):
+            ratio = entry["cached_tokens"] / entry["input_tokens"] if entry["input_tokens"] else None
+            nodes[node] = {**entry, "cached_ratio": round(ratio, 3) if ratio is not None else None}
+        return nodes
+
+
+_prompt_cache_stats: Optional[PromptCacheStats] = None
+
+
+def get_prompt_cache_stats() -> PromptCacheStats:
+    """取得 PromptCacheStats 單例"""
+    global _prompt_cache_stats
+
+    if _prompt_cache_stats is None:
+        _prompt_cache_stats = PromptCacheStats()
+    return _prompt_cache_stats
+
+
+def record_prompt_usage(node: str, response: Any, prompt: Optional[List[BaseMessage]] = None) -> None:
+    """記錄一次 LLM 呼叫的 tokens（prompt 有傳入時另以本地 tokenizer 計算）"""
+    get_prompt_cache_stats().record(node, response, prompt)
+
+
+def reset_prompt_cache_stats() -> None:
+    """
+    重置統計（主要用於測試）
+    """
+    global _prompt_cache_stats
+    _prompt_cache_stats = None
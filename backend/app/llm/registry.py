@@ -0,0 +1,182 @@
+"""
+LLM Registry
+
+行程內共用的 LLM runnable 註冊表，避免每個節點呼叫都重建 ChatGroq。
+- 以 (模型列表, bind_tools, temperature, timeout) 為 key 快取已建構好的 runnable
+- 所有 ChatGroq 共用同一組 keep-alive httpx 連線池（省去重複 TLS 握手）
+- 提供 hit/miss 計數，可從 /health 觀察
+- 連線池在應用程式關閉時（lifespan）由 close_http_clients() 關閉
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+import asyncio
+import os
+import threading
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# 共用 httpx 連線池
+# ============================================================
+
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+_http_lock = threading.Lock()
+
+
+def _pool_limits() -> httpx.Limits:
+    """從環境變數讀取連線池大小
+
+    環境變數：
+        LLM_POOL_MAX_CONNECTIONS: 最大連線數（預設 20）
+        LLM_POOL_MAX_KEEPALIVE: 最大 keep-alive 連線數（預設 10）
+    """
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=30.0,
+    )
+
+
+def get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """取得共用的 (sync, async) httpx 客戶端單例"""
+    global _http_client, _http_async_client
+
+    with _http_lock:
+        if _http_client is None or _http_async_client is None:
+            limits = _pool_limits()
+            _http_client = httpx.Client(limits=limits)
+            _http_async_client = httpx.AsyncClient(limits=limits)
+            logger.info(f"LLM httpx 連線池已初始化: {limits}")
+
+    return _http_client, _http_async_client
+
+
+def _take_http_clients() -> Tuple[Optional[httpx.Client], Optional[httpx.AsyncClient]]:
+    """取出並清空連線池單例（之後 get_http_clients 會建立新的）"""
+    global _http_client, _http_async_client
+
+    with _http_lock:
+        clients = (_http_client, _http_async_client)
+        _http_client = None
+        _http_async_client = None
+    return clients
+
+
+_closing: Set["asyncio.Task[None]"] = set()  # 背景關閉中的 AsyncClient（保留參照避免被回收）
+
+
+def _close_async_client(client: httpx.AsyncClient) -> None:
+    """在同步情境關閉 AsyncClient：有執行中的 event loop 時排入背景，否則直接執行"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    try:
+        if loop is not None:
+            task = loop.create_task(client.aclose())
+            _closing.add(task)
+            task.add_done_callback(_closing.discard)
+        else:
+            asyncio.run(client.aclose())
+    except Exception as e:
+        logger.debug(f"LLM httpx 連線池關閉失敗: {e}")
+
+
+async def close_http_clients() -> None:
+    """關閉共用連線池（lifespan 結束時呼叫）
+
+    已建構的 runnable 綁定在舊的連線池上，一併從註冊表清除。
+    """
+    _registry.clear()
+    client, async_client = _take_http_clients()
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.aclose()
+    logger.info("LLM httpx 連線池已關閉")
+
+
+# ============================================================
+# Runnable 註冊表
+# ============================================================
+
+@dataclass(frozen=True)
+class LLMKey:
+    """註冊表 key：決定一個 runnable 是否可以重用"""
+    models: Tuple[str, ...]
+    bind_tools: bool
+    temperature: float
+    timeout: float
+
+
+class LLMRegistry:
+    """以 LLMKey 快取已建構的 runnable（執行緒安全）"""
+
+    def __init__(self):
+        self._entries: Dict[LLMKey, Any] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_create(self, key: LLMKey, factory: Callable[[], Any]) -> Any:
+        """取得已註冊的 runnable，不存在時呼叫 factory 建立
+
+        factory 在鎖內執行，確保同一個 key 只會建構一次。
+        """
+        with self._lock:
+            runnable = self._entries.get(key)
+            if runnable is not None:
+                self.hits += 1
+                return runnable
+
+            self.misses += 1
+            runnable = factory()
+            self._entries[key] = runnable
+            logger.debug(f"LLMRegistry: built runnable for {key}")
+            return runnable
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_registry = LLMRegistry()
+
+
+def get_registry() -> LLMRegistry:
+    """取得全域 LLM 註冊表"""
+    return _registry
+
+
+def get_registry_stats() -> Dict[str, int]:
+    """取得註冊表 hit/miss 統計"""
+    return _registry.stats()
+
+
+def reset_registry() -> None:
+    """
+    清空註冊表並關閉連線池（主要用於測試）
+    """
+    _registry.clear()
+    client, async_client = _take_http_clients()
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        _close_async_client(async_client)
@@ -0,0 +1,543 @@
+"""
+Adaptive Model Router
+
+取代靜態的 with_fallbacks 順序：依各模型近期健康度動態決定呼叫順序。
+- 每個模型保留滑動視窗：成功率、TTFT（time to first token）、429 次數
+- 熔斷器：closed → open（冷卻）→ half_open（放行一個探測請求）→ closed
+- 每次呼叫依「熔斷狀態 → 成本分數」排序，成本 = TTFT × 優先序權重 ÷ 成功率
+- 熔斷中的模型排在最後，作為最後手段（永遠至少有一個候選）
+- half_open 的探測名額在 begin() 時於鎖內佔用：排序後才開始的並行呼叫若發現名額已被佔用，
+  略過該模型（最後一個候選除外），只有佔用名額的呼叫會釋放它
+
+環境變數：
+    ROUTER_WINDOW_SIZE: 每個模型保留的樣本數（預設 20）
+    ROUTER_WINDOW_SECONDS: 樣本有效秒數（預設 300）
+    ROUTER_FAILURE_RATE: 觸發熔斷的失敗率（預設 0.5）
+    ROUTER_MIN_SAMPLES: 計算失敗率的最少樣本數（預設 4）
+    ROUTER_CONSECUTIVE_FAILURES: 連續失敗幾次即熔斷（預設 3）
+    ROUTER_COOLDOWN: 一般熔斷冷卻秒數（預設 30）
+    ROUTER_RATE_LIMIT_COOLDOWN: 429 熔斷冷卻秒數（預設 60）
+    ROUTER_DEFAULT_TTFT: 尚無樣本時假設的 TTFT 秒數（預設 1.0）
+    ROUTER_PRIORITY_PENALTY: 每降一個設定順位的成本加權（預設 0.25）
+    LLM_TTFT_TIMEOUT: 第一個 chunk 的期限秒數，0 表示停用（預設 10）
+    LLM_STALL_TIMEOUT: chunk 之間的最長間隔秒數，0 表示停用（預設 8）
+    LLM_CONTINUE_ON_FAILURE: 串流中途失敗時由下一個模型接續（預設 true）
+
+串流看門狗：TTFT 或 token 間隔逾時即取消請求並改用下一個模型，
+同時發出 FAILOVER_EVENT 自訂事件（astream_events 中為 on_custom_event）。
+
+中途接續：若失敗前已輸出部分文字，下一個模型會收到
+「原 prompt + 已輸出的部分回應 + 接續指示」，只產生剩餘內容；
+已送到前端的 token 不會被丟棄或重複。
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import os
+import threading
+import time
+import logging
+
+from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+    message_chunk_to_message,
+)
+from langchain_core.runnables import Runnable, RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+# 熔斷器狀態
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 模型切換時發出的自訂事件名稱
+FAILOVER_EVENT = "llm_failover"
+
+# 中途接續時附加給下一個模型的指示
+CONTINUE_PROMPT = (
+    "Your previous reply was cut off. Continue exactly where it stopped, "
+    "in the same language and style. Do not repeat any text that was already written."
+)
+
+
+class StreamTimeoutError(TimeoutError):
+    """串流看門狗逾時（phase: "ttft" 或 "stall"）"""
+
+    def __init__(self, phase: str, timeout: float):
+        super().__init__(f"LLM stream {phase} deadline exceeded ({timeout:.1f}s)")
+        self.phase = phase
+        self.timeout = timeout
+
+
+def get_fallback_exceptions() -> Tuple[type, ...]:
+    """會觸發切換模型的例外類型"""
+    from groq import RateLimitError, APIError
+    from httpx import TimeoutException, HTTPStatusError, RequestError
+
+    return (
+        RateLimitError,      # Groq SDK 的 rate limit error
+        APIError,            # Groq SDK 的通用 API error
+        HTTPStatusError,     # httpx 的 HTTP 狀態錯誤（含 429）
+        RequestError,        # httpx 的請求錯誤
+        TimeoutException,    # httpx 的 timeout
+    )
+
+
+def get_stream_deadlines() -> Tuple[float, float]:
+    """讀取 (TTFT 期限, token 間隔期限)，0 表示停用"""
+    return (
+        float(os.getenv("LLM_TTFT_TIMEOUT", "10")),
+        float(os.getenv("LLM_STALL_TIMEOUT", "8")),
+    )
+
+
+def is_continue_enabled() -> bool:
+    """檢查是否啟用中途接續"""
+    return os.getenv("LLM_CONTINUE_ON_FAILURE", "true").lower() == "true"
+
+
+def build_continuation(input: Any, partial_text: str) -> List[BaseMessage]:
+    """建構接續用的 prompt：原訊息 + 已輸出的部分回應 + 接續指示"""
+    from app.llm.cache import normalize_input
+
+    return [
+        *normalize_input(input),
+        AIMessage(content=partial_text),
+        HumanMessage(content=CONTINUE_PROMPT),
+    ]
+
+
+def failover_reason(exc: BaseException) -> str:
+    """將例外歸類為切換原因"""
+    if isinstance(exc, StreamTimeoutError):
+        return "ttft_timeout" if exc.phase == "ttft" else "stall"
+    if is_rate_limit_error(exc):
+        return "rate_limited"
+    return "error"
+
+
+async def notify_failover(
+    from_model: str,
+    to_model: str,
+    exc: BaseException,
+    continued: bool = False
+) -> None:
+    """發出 FAILOVER_EVENT，讓 SSE 層可以通知前端
+
+    continued=True 表示下一個模型會接續已輸出的部分回應。
+    """
+    data = {
+        "from_model": from_model,
+        "to_model": to_model,
+        "reason": failover_reason(exc),
+        "continued": continued,
+    }
+    logger.warning(f"RoutedLLM: failover {from_model} → {to_model} ({data['reason']})")
+    try:
+        await adispatch_custom_event(FAILOVER_EVENT, data)
+    except RuntimeError:
+        # 不在 runnable 執行環境內（例如直接呼叫 astream），只記錄日誌
+        pass
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """判斷例外是否為 429"""
+    from groq import RateLimitError
+
+    if isinstance(exc, RateLimitError):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429
+
+
+def raise_last_error(last_error: Optional[BaseException]) -> None:
+    """所有候選都失敗時拋出最後一個錯誤；沒有任何候選（未設定模型）時拋出 RuntimeError"""
+    if last_error is None:
+        raise RuntimeError("RoutedLLM: no models configured")
+    raise last_error
+
+
+# ============================================================
+# 單一模型健康度
+# ============================================================
+
+@dataclass
+class CallSample:
+    at: float
+    success: bool
+    ttft: Optional[float]
+    rate_limited: bool
+
+
+@dataclass
+class RouterConfig:
+    window_size: int = 20
+    window_seconds: float = 300.0
+    failure_rate: float = 0.5
+    min_samples: int = 4
+    consecutive_failures: int = 3
+    cooldown: float = 30.0
+    rate_limit_cooldown: float = 60.0
+    default_ttft: float = 1.0
+    priority_penalty: float = 0.25
+
+    @classmethod
+    def from_env(cls) -> "RouterConfig":
+        return cls(
+            window_size=int(os.getenv("ROUTER_WINDOW_SIZE", "20")),
+            window_seconds=float(os.getenv("ROUTER_WINDOW_SECONDS", "300")),
+            failure_rate=float(os.getenv("ROUTER_FAILURE_RATE", "0.5")),
+            min_samples=int(os.getenv("ROUTER_MIN_SAMPLES", "4")),
+            consecutive_failures=int(os.getenv("ROUTER_CONSECUTIVE_FAILURES", "3")),
+            cooldown=float(os.getenv("ROUTER_COOLDOWN", "30")),
+            rate_limit_cooldown=float(os.getenv("ROUTER_RATE_LIMIT_COOLDOWN", "60")),
+            default_ttft=float(os.getenv("ROUTER_DEFAULT_TTFT", "1.0")),
+            priority_penalty=float(os.getenv("ROUTER_PRIORITY_PENALTY", "0.25")),
+        )
+
+
+class ModelHealth:
+    """單一模型的滑動視窗統計與熔斷器"""
+
+    def __init__(self, model: str, config: RouterConfig):
+        self.model = model
+        self.config = config
+        self.samples: Deque[CallSample] = deque(maxlen=config.window_size)
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    # ---------- 統計 ----------
+
+    def _prune(self, now: float) -> None:
+        while self.samples and now - self.samples[0].at > self.config.window_seconds:
+            self.samples.popleft()
+
+    def success_rate(self) -> float:
+        if not self.samples:
+            return 1.0
+        return sum(1 for s in self.samples if s.success) / len(self.samples)
+
+    def avg_ttft(self) -> Optional[float]:
+        ttfts = [s.ttft for s in self.samples if s.success and s.ttft is not None]
+        return sum(ttfts) / len(ttfts) if ttfts else None
+
+    def rate_limit_count(self) -> int:
+        return sum(1 for s in self.samples if s.rate_limited)
+
+    # ---------- 熔斷器 ----------
+
+    def current_state(self, now: float) -> str:
+        if self.state == OPEN and now >= self.open_until:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        return self.state
+
+    def is_available(self, now: float) -> bool:
+        state = self.current_state(now)
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN:
+            return not self.probe_in_flight
+        return False
+
+    def _open(self, now: float, cooldown: float) -> None:
+        self.state = OPEN
+        self.open_until = now + cooldown
+        self.probe_in_flight = False
+        logger.warning(f"ModelRouter: circuit open for {self.model} ({cooldown:.0f}s)")
+
+    def begin(self, now: float, last_resort: bool = False) -> Optional[bool]:
+        """開始一次呼叫，返回是否為佔用探測名額的請求
+
+        half_open 且名額已被其他呼叫佔用時返回 None（呼叫端略過此模型）；
+        last_resort（最後一個候選）仍照常呼叫，但不佔用名額
+        """
+        if self.current_state(now) != HALF_OPEN:
+            return False
+        if not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False if last_resort else None
+
+    def record_success(self, ttft: Optional[float], now: float) -> None:
+        self._prune(now)
+        self.samples.append(CallSample(at=now, success=True, ttft=ttft, rate_limited=False))
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+        if self.state != CLOSED:
+            logger.info(f"ModelRouter: circuit closed for {self.model}")
+        self.state = CLOSED
+
+    def record_failure(self, rate_limited: bool, now: float) -> None:
+        self._prune(now)
+        self.samples.append(CallSample(at=now, success=False, ttft=None, rate_limited=rate_limited))
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+
+        if rate_limited:
+            self._open(now, self.config.rate_limit_cooldown)
+        elif self.current_state(now) == HALF_OPEN:
+            self._open(now, self.config.cooldown)
+        elif self.consecutive_failures >= self.config.consecutive_failures:
+            self._open(now, self.config.cooldown)
+        elif (
+            len(self.samples) >= self.config.min_samples
+            and 1.0 - self.success_rate() >= self.config.failure_rate
+        ):
+            self._open(now, self.config.cooldown)
+
+    def release(self) -> None:
+        """釋放探測名額（探測請求結束時呼叫，含被取消的情況）"""
+        self.probe_in_flight = False
+
+    # ---------- 排序與檢視 ----------
+
+    def cost(self, priority: int) -> float:
+        """路由成本（越小越優先）"""
+        ttft = self.avg_ttft()
+        if ttft is None:
+            ttft = self.config.default_ttft
+        weight = 1.0 + priority * self.config.priority_penalty
+        return ttft * weight / max(self.success_rate(), 0.05)
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        self._prune(now)
+        avg_ttft = self.avg_ttft()
+        state = self.current_state(now)
+        return {
+            "state": state,
+            "samples": len(self.samples),
+            "success_rate": round(self.success_rate(), 3),
+            "avg_ttft": round(avg_ttft, 3) if avg_ttft is not None else None,
+            "rate_limited": self.rate_limit_count(),
+            "consecutive_failures": self.consecutive_failures,
+            "open_for": round(max(self.open_until - now, 0.0), 1) if state == OPEN else 0.0,
+        }
+
+
+# ============================================================
+# Router
+# ============================================================
+
+class ModelRouter:
+    """行程內共用的模型路由器"""
+
+    def __init__(self, config: Optional[RouterConfig] = None):
+        self.config = config or RouterConfig.from_env()
+        self._health: Dict[str, ModelHealth] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, model: str) -> ModelHealth:
+        health = self._health.get(model)
+        if health is None:
+            health = self._health[model] = ModelHealth(model, self.config)
+        return health
+
+    def order(self, models: Sequence[str]) -> List[str]:
+        """依健康度與速度排序候選模型（熔斷中的排最後）"""
+        now = time.monotonic()
+        with self._lock:
+            ranked = []
+            for priority, model in enumerate(models):
+                health = self._get(model)
+                unavailable = 0 if health.is_available(now) else 1
+                ranked.append((unavailable, health.cost(priority), priority, model))
+        ranked.sort()
+        return [model for *_, model in ranked]
+
+    def begin(self, model: str, last_resort: bool = False) -> Optional[bool]:
+        """開始呼叫 model：返回 True（佔用探測名額）、False（一般呼叫）或 None（名額已被佔用，略過）"""
+        with self._lock:
+            return self._get(model).begin(time.monotonic(), last_resort)
+
+    def record_success(self, model: str, ttft: Optional[float]) -> None:
+        with self._lock:
+            self._get(model).record_success(ttft, time.monotonic())
+
+    def record_failure(self, model: str, exc: BaseException) -> None:
+        rate_limited = is_rate_limit_error(exc)
+        with self._lock:
+            self._get(model).record_failure(rate_limited, time.monotonic())
+
+    def release(self, model: str) -> None:
+        """釋放探測名額（只由 begin() 返回 True 的呼叫端呼叫）"""
+        with self._lock:
+            self._get(model).release()
+
+    def snapshot(self, models: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """提供 introspection endpoint 使用的狀態快照"""
+        now = time.monotonic()
+        with self._lock:
+            names = list(models) if models is not None else list(self._health)
+            state = {model: self._get(model).snapshot(now) for model in names}
+        return {
+            "models": state,
+            "order": self.order(names) if names else [],
+        }
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """取得 ModelRouter 單例"""
+    global _router
+
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+    return _router
+
+
+def reset_router() -> None:
+    """
+    重置路由器狀態（主要用於測試）
+    """
+    global _router
+    with _router_lock:
+        _router = None
+
+
+# ============================================================
+# RoutedLLM
+# ============================================================
+
+class RoutedLLM(Runnable):
+    """依 ModelRouter 排序逐一嘗試模型的 runnable
+
+    呼叫一律走串流，藉此量測 TTFT 並套用看門狗期限；
+    ainvoke 會將串流 chunk 聚合成 AIMessage。
+    """
+
+    def __init__(
+        self,
+        runnables: Dict[str, Runnable],
+        router: Optional[ModelRouter] = None,
+        exceptions: Optional[Tuple[type, ...]] = None,
+        ttft_timeout: Optional[float] = None,
+        stall_timeout: Optional[float] = None,
+        continue_partial: Optional[bool] = None,
+    ):
+        self.runnables = runnables
+        self.router = router or get_router()
+        self.exceptions = (exceptions or get_fallback_exceptions()) + (StreamTimeoutError,)
+
+        default_ttft, default_stall = get_stream_deadlines()
+        self.ttft_timeout = default_ttft if ttft_timeout is None else ttft_timeout
+        self.stall_timeout = default_stall if stall_timeout is None else stall_timeout
+        self.continue_partial = is_continue_enabled() if continue_partial is None else continue_partial
+
+    @property
+    def models(self) -> List[str]:
+        return list(self.runnables)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        last_error: Optional[BaseException] = None
+        candidates = self.router.order(self.models)
+        for index, model in enumerate(candidates):
+            probe = self.router.begin(model, last_resort=index + 1 == len(candidates))
+            if probe is None:
+                continue  # 其他呼叫正在探測這個 half_open 模型
+            try:
+                result = self.runnables[model].invoke(input, config, **kwargs)
+            except self.exceptions as e:
+                logger.warning(f"RoutedLLM: {model} failed: {e}")
+                self.router.record_failure(model, e)
+                last_error = e
+                continue
+            finally:
+                if probe:
+                    self.router.release(model)
+            # 同步呼叫量不到 TTFT，不以整段呼叫時間污染排序用的 avg_ttft
+            self.router.record_success(model, None)
+            return result
+        raise_last_error(last_error)
+
+    async def _watch(self, stream: AsyncIterator[BaseMessage]) -> AsyncIterator[BaseMessage]:
+        """對串流套用 TTFT 與 token 間隔期限，逾時即取消底層請求"""
+        iterator = stream.__aiter__()
+        first = True
+        try:
+            while True:
+                timeout = self.ttft_timeout if first else self.stall_timeout
+                try:
+                    if timeout > 0:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), timeout)
+                    else:
+                        chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    raise StreamTimeoutError("ttft" if first else "stall", timeout)
+                first = False
+                yield chunk
+        finally:
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
+
+    async def astream(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[BaseMessage]:
+        last_error: Optional[BaseException] = None
+        failed_model: Optional[str] = None  # 上一個失敗的模型：下一個模型確定執行時才發出切換事件
+        partial_text = ""  # 跨模型累積、已輸出給呼叫端的文字
+        candidates = self.router.order(self.models)
+        for index, model in enumerate(candidates):
+            probe = self.router.begin(model, last_resort=index + 1 == len(candidates))
+            if probe is None:
+                continue  # 其他呼叫正在探測這個 half_open 模型
+            model_input = build_continuation(input, partial_text) if partial_text else input
+            started = time.monotonic()
+            ttft: Optional[float] = None
+            has_tool_chunks = False
+            try:
+                if failed_model is not None:
+                    await notify_failover(failed_model, model, last_error, continued=bool(partial_text))
+                stream = self.runnables[model].astream(model_input, config, **kwargs)
+                async for chunk in self._watch(stream):
+                    if ttft is None:
+                        ttft = time.monotonic() - started
+                    if getattr(chunk, "tool_call_chunks", None):
+                        has_tool_chunks = True
+                    if isinstance(chunk.content, str):
+                        partial_text += chunk.content
+                    yield chunk
+            except self.exceptions as e:
+                logger.warning(f"RoutedLLM: {model} failed: {e}")
+                self.router.record_failure(model, e)
+                # 工具呼叫無法接續；關閉接續時，有文字輸出就不能再切換
+                resumable = not has_tool_chunks and (not partial_text or self.continue_partial)
+                if not resumable:
+                    raise
+                last_error, failed_model = e, model
+                continue
+            finally:
+                if probe:
+                    self.router.release(model)
+            self.router.record_success(model, ttft if ttft is not None else time.monotonic() - started)
+            return
+        raise_last_error(last_error)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        aggregated = None
+        async for chunk in self.astream(input, config, **kwargs):
+            aggregated = chunk if aggregated is None else aggregated + chunk
+        if isinstance(aggregated, AIMessageChunk):
+            return message_chunk_to_message(aggregated)
+        return aggregated
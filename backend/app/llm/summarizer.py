@@ -0,0 +1,246 @@
+"""
+Tool Result Summarizer
+
+ToolNode 之後的可選階段：用快速模型（預設 llama-3.1-8b-instant）把搜尋結果
+濃縮成幾條事實重點，再交給主模型，減少主模型的輸入 token 與延遲。
+- 同一步驟的多個 ToolMessage 並行摘要
+- 以內容雜湊快取（相同搜尋結果不重複摘要）
+- 摘要失敗或逾時時保留原文，不影響辯論
+
+另外提供辯論滾動摘要（update_debate_summary）：每輪主持人小結增量併入
+DebateState.debate_summary，超過長度上限時以同一快速模型壓縮，
+最終報告只需讀取滾動摘要 + 最後一輪發言，prompt 大小不隨輪數成長。
+
+摘要呼叫帶有 SUMMARY_TAG，SSE 串流會略過它的 token。
+
+環境變數：
+    TOOL_SUMMARY_ENABLED: 是否啟用工具結果摘要（預設 false）
+    TOOL_SUMMARY_MODEL: 摘要模型（預設 llama-3.1-8b-instant，滾動摘要共用）
+    TOOL_SUMMARY_MIN_CHARS: 短於此長度的結果不摘要（預設 400）
+    TOOL_SUMMARY_TIMEOUT: 摘要逾時秒數（預設 8）
+    TOOL_SUMMARY_CACHE_SIZE: 摘要快取筆數（預設 256）
+    DEBATE_SUMMARY_MAX_CHARS: 滾動摘要長度上限（預設 1200 字元）
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import os
+import re
+import logging
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TAG = "tool_summary"
+
+SUMMARY_SYSTEM_EN = """You condense web search results for a debater.
+Return at most 4 bullet points ("- ") with the facts most relevant to the query.
+Keep numbers, dates and source names. No opinions, no introduction."""
+
+SUMMARY_SYSTEM_ZH = """你負責為辯手濃縮網路搜尋結果。
+請輸出最多 4 條與查詢最相關的事實重點（以「- 」開頭），使用繁體中文。
+保留數字、日期與來源名稱。不要加入意見或開場白。"""
+
+CONDENSE_SYSTEM_EN = """You maintain a running summary of a debate.
+Rewrite the round-by-round summary below in at most {max_chars} characters.
+Keep each side's core arguments and the main disagreements, oldest rounds most compressed.
+Keep one line per round, starting with "Round N:". No introduction."""
+
+CONDENSE_SYSTEM_ZH = """你負責維護辯論的滾動摘要。
+請將以下逐輪摘要改寫為不超過 {max_chars} 字元，使用繁體中文。
+保留雙方核心論點與主要分歧，越早的回合壓縮越多。
+每輪一行，以「第 N 輪：」開頭。不要加入開場白。"""
+
+
+class ToolSummarizer:
+    """以快速模型摘要工具結果（含內容雜湊快取）"""
+
+    def __init__(self, model: str, min_chars: int = 400, timeout: float = 8.0, max_entries: int = 256):
+        self.model = model
+        self.min_chars = min_chars
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.chars_in = 0
+        self.chars_out = 0
+
+    def _key(self, content: str, query: str, language: str) -> str:
+        payload = "\0".join((self.model, language, query, content))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def summarize(self, content: str, query: str = "", language: str = "zh") -> str:
+        """返回濃縮後的內容；太短、失敗或逾時時返回原文"""
+        if len(content) < self.min_chars:
+            return content
+
+        key = self._key(content, query, language)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        try:
+            summary = await asyncio.wait_for(self._call_model(content, query, language), self.timeout)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"tool summary failed, keeping raw result: {e}")
+            return content
+
+        summary = summary.strip()
+        if not summary:
+            return content
+
+        self.chars_in += len(content)
+        self.chars_out += len(summary)
+        self._cache[key] = summary
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return summary
+
+    async def _call_model(self, content: str, query: str, language: str) -> str:
+        is_en = language == "en"
+        system = SUMMARY_SYSTEM_EN if is_en else SUMMARY_SYSTEM_ZH
+        label = ("Query", "Search results") if is_en else ("查詢", "搜尋結果")
+        return await _invoke_fast_model(
+            self.model,
+            system,
+            f"{label[0]}: {query}\n\n{label[1]}:\n{content}",
+            self.timeout,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "model": self.model,
+            "size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+            "compression": round(self.chars_out / self.chars_in, 3) if self.chars_in else None,
+        }
+
+
+async def _invoke_fast_model(model: str, system: str, user: str, timeout: float) -> str:
+    """以指定的快速模型呼叫一次（帶 SUMMARY_TAG，不串流給前端）"""
+    from app.graph import get_llm
+
+    llm = get_llm(temperature=0.0, timeout=timeout, models=[model])
+    response = await llm.ainvoke(
+        [SystemMessage(content=system), HumanMessage(content=user)],
+        config={"tags": [SUMMARY_TAG]},
+    )
+    return response.content or ""
+
+
+def get_summary_model() -> str:
+    """摘要使用的快速模型"""
+    return os.getenv("TOOL_SUMMARY_MODEL", "llama-3.1-8b-instant")
+
+
+# ============================================================
+# 辯論滾動摘要
+# ============================================================
+
+def compact_round_summary(text: str) -> str:
+    """把主持人小結（Markdown）壓成單行：去掉標題行與粗體標記"""
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        lines.append(re.sub(r"\*\*|__", "", line).lstrip("-• ").strip())
+    return " ".join(line for line in lines if line)
+
+
+def _drop_oldest(lines: List[str], max_chars: int) -> str:
+    """超過上限時從最舊的回合開始捨棄（至少保留最新一行）"""
+    while len(lines) > 1 and len("\n".join(lines)) > max_chars:
+        lines = lines[1:]
+    return "\n".join(lines)[:max_chars]
+
+
+async def update_debate_summary(
+    previous: str,
+    round_summary: str,
+    round_num: int,
+    language: str = "zh",
+    max_chars: Optional[int] = None,
+) -> str:
+    """把本輪小結併入滾動摘要（長度固定在 max_chars 內）
+
+    先以單行附加；超過上限時用快速模型壓縮，失敗則捨棄最舊的回合。
+    """
+    if max_chars is None:
+        max_chars = int(os.getenv("DEBATE_SUMMARY_MAX_CHARS", "1200"))
+
+    is_en = language == "en"
+    label = f"Round {round_num}:" if is_en else f"第 {round_num} 輪："
+    line = f"{label} {compact_round_summary(round_summary)}"
+    summary = f"{previous}\n{line}" if previous else line
+    if len(summary) <= max_chars:
+        return summary
+
+    template = CONDENSE_SYSTEM_EN if is_en else CONDENSE_SYSTEM_ZH
+    timeout = float(os.getenv("TOOL_SUMMARY_TIMEOUT", "8"))
+    try:
+        condensed = await asyncio.wait_for(
+            _invoke_fast_model(get_summary_model(), template.format(max_chars=max_chars), summary, timeout),
+            timeout,
+        )
+    except Exception as e:
+        logger.warning(f"debate summary condense failed, dropping oldest rounds: {e}")
+        condensed = ""
+
+    condensed = condensed.strip()
+    if condensed and len(condensed) <= max_chars:
+        return condensed
+    return _drop_oldest(summary.splitlines(), max_chars)
+
+
+# ============================================================
+# 單例
+# ============================================================
+
+_summarizer: Optional[ToolSummarizer] = None
+
+
+def is_tool_summary_enabled() -> bool:
+    """檢查工具結果摘要是否啟用"""
+    return os.getenv("TOOL_SUMMARY_ENABLED", "false").lower() == "true"
+
+
+def get_tool_summarizer() -> ToolSummarizer:
+    """取得 ToolSummarizer 單例（依環境變數建立）"""
+    global _summarizer
+
+    if _summarizer is None:
+        _summarizer = ToolSummarizer(
+            model=get_summary_model(),
+            min_chars=int(os.getenv("TOOL_SUMMARY_MIN_CHARS", "400")),
+            timeout=float(os.getenv("TOOL_SUMMARY_TIMEOUT", "8")),
+            max_entries=int(os.getenv("TOOL_SUMMARY_CACHE_SIZE", "256")),
+        )
+    return _summarizer
+
+
+def get_tool_summary_stats() -> Dict[str, Any]:
+    """取得摘要統計（未啟用時只回報 enabled=False）"""
+    if not is_tool_summary_enabled() or _summarizer is None:
+        return {"enabled": is_tool_summary_enabled()}
+    return _summarizer.stats()
+
+
+def reset_tool_summarizer() -> None:
+    """
+    重置摘要器單例（主要用於測試）
+    """
+    global _summarizer
+    _summarizer = None
@@ -0,0 +1,182 @@
+"""
+Token Budget
+
+呼叫 LLM 前在本地計算 prompt token 數，確保模型鏈中每個模型都放得下：
+- 依模型選擇本地 tokenizer（tiktoken；gpt-oss 用 o200k_base，其他模型以 cl100k_base 近似）
+  tiktoken 不可用、或編碼仍在載入時退回 app.tools.ranking.estimate_tokens 粗估
+- 編碼在背景執行緒載入（首次使用可能要下載 BPE 檔），計數永不阻塞 event loop；
+  啟動時由 lifespan 呼叫 warm_encodings() 預熱，最多等待 TIKTOKEN_LOAD_TIMEOUT 秒
+- prompt 預算 = 模型鏈中最小的 context window - 本次 max_tokens - 安全邊際
+- 每種發言設定 max_tokens（依 system prompt 的字數規則，並預留推理模型的思考 token）
+
+超出預算時由 app.llm.prompt_layout 依序裁剪搜尋結果、背景資料與對話歷史，
+避免主模型失敗後 fallback 到 context 更小的模型再失敗一次。
+
+環境變數：
+    LLM_CONTEXT_WINDOWS: 覆蓋 context window，格式 "model=tokens,model=tokens"
+    DEBATER_MAX_TOKENS: 辯手每次發言上限（預設 512，規則為 2-3 句話）
+    MODERATOR_ROUND_MAX_TOKENS: 主持人每輪小結上限（預設 512，規則為 80-120 字）
+    MODERATOR_FINAL_MAX_TOKENS: 最終報告上限（預設 1024，規則為 200-300 字）
+    PROMPT_TOKEN_MARGIN: 預算安全邊際（預設 256）
+    TIKTOKEN_LOAD_TIMEOUT: 啟動時等待編碼載入的秒數（預設 10）
+"""
+
+from typing import Any, Dict, List, Optional
+import asyncio
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 已知模型的 context window（tokens）
+MODEL_CONTEXT_WINDOWS = {
+    "openai/gpt-oss-120b": 131072,
+    "openai/gpt-oss-20b": 131072,
+    "moonshotai/kimi-k2-instruct-0905": 262144,
+    "llama-3.1-8b-instant": 131072,
+    "llama-3.3-70b-versatile": 131072,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# 每種發言的輸出上限（gpt-oss 的推理 token 也計入 max_tokens，因此比字數規則寬鬆）
+MAX_TOKENS_DEFAULTS = {
+    "debater": ("DEBATER_MAX_TOKENS", 512),
+    "moderator_round": ("MODERATOR_ROUND_MAX_TOKENS", 512),
+    "moderator_final": ("MODERATOR_FINAL_MAX_TOKENS", 1024),
+}
+
+# 每則訊息的格式開銷（role 標記等）
+MESSAGE_OVERHEAD = 4
+
+
+# ============================================================
+# 計數
+# ============================================================
+
+ENCODING_NAMES = ("o200k_base", "cl100k_base")
+
+
+def _encoding_name(model: str) -> str:
+    return "o200k_base" if model.startswith("openai/") else "cl100k_base"
+
+
+_encodings: Dict[str, Any] = {}  # 編碼名稱 → 編碼（None 表示載入失敗，改用粗估）
+_loading: Dict[str, threading.Thread] = {}
+_encodings_lock = threading.Lock()
+
+
+def _load_encoding(name: str) -> None:
+    """在背景執行緒載入 tiktoken 編碼（首次使用時可能需要下載 BPE 檔）"""
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.info(f"tiktoken encoding {name} unavailable, using estimate: {e}")
+        encoding = None
+    with _encodings_lock:
+        _encodings[name] = encoding
+        _loading.pop(name, None)
+
+
+def _get_encoding(name: str):
+    """取得已載入的編碼；尚未載入時在背景開始載入並返回 None（不阻塞 event loop）"""
+    with _encodings_lock:
+        if name in _encodings:
+            return _encodings[name]
+        if name not in _loading:
+            thread = threading.Thread(target=_load_encoding, args=(name,), name=f"tiktoken-{name}", daemon=True)
+            _loading[name] = thread
+            thread.start()
+    return None
+
+
+def load_encodings(timeout: Optional[float] = None) -> Dict[str, bool]:
+    """等待所有編碼載入（最多 timeout 秒），返回各編碼是否可用"""
+    timeout = float(os.getenv("TIKTOKEN_LOAD_TIMEOUT", "10")) if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    for name in ENCODING_NAMES:
+        _get_encoding(name)
+    for name in ENCODING_NAMES:
+        thread = _loading.get(name)
+        if thread is not None:
+            thread.join(max(deadline - time.monotonic(), 0))
+    return {name: _encodings.get(name) is not None for name in ENCODING_NAMES}
+
+
+async def warm_encodings(timeout: Optional[float] = None) -> Dict[str, bool]:
+    """啟動時預熱編碼（在執行緒中等待，逾時後照常啟動，載入完成前以粗估計數）"""
+    status = await asyncio.to_thread(load_encodings, timeout)
+    logger.info(f"tiktoken encodings ready: {status}")
+    return status
+
+
+def reset_encodings() -> None:
+    """
+    清空已載入的編碼（主要用於測試）
+    """
+    with _encodings_lock:
+        _encodings.clear()
+
+
+def count_tokens(text: str, model: str = "") -> int:
+    """以該模型的本地 tokenizer 計算 token 數"""
+    if not text:
+        return 0
+    encoding = _get_encoding(_encoding_name(model))
+    if encoding is None:
+        from app.tools.ranking import estimate_tokens
+
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(contents: List[str], model: str = "") -> int:
+    """一組訊息內容的 token 數（含每則訊息的格式開銷）"""
+    return sum(count_tokens(content, model) + MESSAGE_OVERHEAD for content in contents)
+
+
+# ============================================================
+# 預算
+# ============================================================
+
+def get_context_window(model: str) -> int:
+    """模型的 context window（LLM_CONTEXT_WINDOWS 可覆蓋）"""
+    for item in os.getenv("LLM_CONTEXT_WINDOWS", "").split(","):
+        name, _, tokens = item.partition("=")
+        if name.strip() == model and tokens.strip().isdigit():
+            return int(tokens)
+    return MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+
+
+def get_max_tokens(kind: str) -> int:
+    """發言種類（debater / moderator_round / moderator_final）的輸出上限"""
+    env, default = MAX_TOKENS_DEFAULTS[kind]
+    return int(os.getenv(env, str(default)))
+
+
+def get_prompt_budgets(
+    kind: str,
+    models: Optional[List[str]] = None,
+    max_tokens: Optional[int] = None,
+) -> Dict[str, int]:
+    """模型鏈中每個模型可用的 prompt token 數
+
+    models / max_tokens 未指定時使用 get_model_chain() 與 get_max_tokens(kind)
+    （請求的 profile 可改用其他模型層級與輸出上限，見 app.services.profiles）
+    """
+    if models is None:
+        from app.graph import get_model_chain
+
+        models = get_model_chain()
+    if max_tokens is None:
+        max_tokens = get_max_tokens(kind)
+    reserved = max_tokens + int(os.getenv("PROMPT_TOKEN_MARGIN", "256"))
+    return {model: get_context_window(model) - reserved for model in models}
+
+
+def fits(contents: List[str], budgets: Dict[str, int]) -> bool:
+    """是否每個模型都放得下"""
+    return all(count_message_tokens(contents, model) <= budget for model, budget in budgets.items())
@@ -7,10 +7,12 @@ Phase 3c: LangGraph ToolNode 架構
 - 修復搜尋指示器無法顯示的問題
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager
+from typing import Optional
 from dotenv import load_dotenv
 import asyncio
 import json
@@ -28,7 +30,19 @@ logger = logging.getLogger(__name__)
 # 載入環境變數
 load_dotenv()
 
-app = FastAPI(title="DebateAI API", version="0.4.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """啟動時預熱 tiktoken 編碼，避免首次計數時在 event loop 上下載 BPE 檔；關閉時釋放 LLM 連線池"""
+    from app.llm.registry import close_http_clients
+    from app.llm.token_budget import warm_encodings
+
+    await warm_encodings()
+    yield
+    await close_http_clients()
+
+
+app = FastAPI(title="DebateAI API", version="0.4.0", lifespan=lifespan)
 
 
 # ============================================================
@@ -66,7 +80,8 @@ app.add_middleware(
     RegexCORSMiddleware,
     allow_origins=["http://localhost:3000"],
     allow_methods=["GET", "POST", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization"],
+    allow_headers=["Content-Type", "Authorization", "Last-Event-ID"],
+    expose_headers=["X-Debate-Id"],
     allow_credentials=True,
 )
 
@@ -78,6 +93,9 @@ class DebateRequest(BaseModel):
     topic: str = Field(..., min_length=1, max_length=200, description="辯論主題，最多 200 字")
     max_rounds: int = Field(default=3, ge=1, le=5, description="辯論輪數，1-5 輪")
     language: str = Field(default="zh", pattern="^(zh|en)$", description="語言設定：zh (繁體中文) 或 en (English)")
+    research_prefetch: Optional[bool] = Field(default=None, description="是否在開場時預取主題搜尋（未指定時依 RESEARCH_PREFETCH_ENABLED）")
+    profile: Optional[str] = Field(default=None, pattern="^(fast|balanced|thorough)$", description="辯論 profile：fast（快速模型、短發言、只做最終報告）、balanced 或 thorough（長發言、更多搜尋），未指定時依 DEBATE_PROFILE")
+    graph_mode: Optional[str] = Field(default=None, pattern="^(tools|retrieve|overlap|panel)$", description="Graph 模式：tools (ToolNode)、retrieve (先搜尋再單次發言)、overlap (主持人小結與下一輪並行) 或 panel (多位辯手並行發言)，未指定時依 DEBATE_GRAPH_MODE")
 
 
 # ============================================================
@@ -88,6 +106,68 @@ def sse_event(data: dict) -> str:
     return f"data: {json.dumps(data)}\n\n"
 
 
+def failover_status_text(data: dict, is_en: bool) -> str:
+    """將 llm_failover 事件轉為前端 status 文字"""
+    from_model = data.get("from_model", "?")
+    to_model = data.get("to_model", "?")
+    reason = data.get("reason", "error")
+    continued = data.get("continued", False)
+
+    if is_en:
+        reasons = {
+            "ttft_timeout": "did not respond in time",
+            "stall": "stalled",
+            "rate_limited": "hit its rate limit",
+        }
+        action = "continuing with" if continued else "switching to"
+        return f"🔁 {from_model} {reasons.get(reason, 'failed')}, {action} {to_model}"
+
+    reasons = {
+        "ttft_timeout": "回應逾時",
+        "stall": "串流停滯",
+        "rate_limited": "達到速率限制",
+    }
+    action = "由" if continued else "改用"
+    suffix = " 接續" if continued else ""
+    return f"🔁 {from_model} {reasons.get(reason, '發生錯誤')}，{action} {to_model}{suffix}"
+
+
+def _node_output_speaker(event: dict) -> Optional[str]:
+    output = (event.get("data") or {}).get("output")
+    return output.get("current_speaker") if isinstance(output, dict) else None
+
+
+async def order_overlap_events(events):
+    """overlap 模式的事件排序
+
+    graph 在 skeptic 之後同時執行主持人小結與下一輪樂觀者，兩者的事件會交錯。
+    skeptic 完成且導向 moderator 後，先暫存其他節點的事件，
+    主持人節點結束後再依原順序送出，前端看到的仍是「小結 → 樂觀者」。
+    """
+    waiting = False
+    buffered = []
+    async for event in events:
+        node = (event.get("metadata") or {}).get("langgraph_node")
+        if waiting and node != "moderator":
+            buffered.append(event)
+            continue
+
+        yield event
+        name = event.get("name")
+        if event.get("event") != "on_chain_end" or name != node:
+            continue
+        if name == "skeptic" and _node_output_speaker(event) == "moderator":
+            waiting = True
+        elif name == "moderator":
+            waiting = False
+            for pending in buffered:
+                yield pending
+            buffered.clear()
+
+    for pending in buffered:
+        yield pending
+
+
 # ============================================================
 # Fake SSE 串流（Fallback）
 # ============================================================
@@ -157,6 +237,7 @@ async def real_debate_stream(topic: str, max_rounds: int = 3, language: str = "z
     msg_llm_init_fail = 'LLM initialization failed: ' if is_en else 'LLM 初始化失敗: '
     msg_llm_stream_fail = 'LLM stream interrupted: ' if is_en else 'LLM 串流中斷: '
     msg_debate_error = '❌ Debate stopped due to error' if is_en else '❌ 辯論因錯誤而中斷'
+    msg_partial_kept = '⚠️ Response was cut off, keeping the partial answer' if is_en else '⚠️ 回應中斷，保留已輸出的內容'
     msg_empty_response = 'LLM returned empty response' if is_en else 'LLM 返回空回應'
 
     yield sse_event({'type': 'status', 'text': msg_init})
@@ -184,6 +265,7 @@ async def real_debate_stream(topic: str, max_rounds: int = 3, language: str = "z
         messages = build_prompt(state, speaker)
 
         # 直接呼叫 llm.astream() 實現 token 串流
+        # （串流中途失敗時，RoutedLLM 會由下一個模型接續已輸出的內容）
         full_content = ""
         try:
             async for chunk in llm.astream(messages):
@@ -191,10 +273,14 @@ async def real_debate_stream(topic: str, max_rounds: int = 3, language: str = "z
                     full_content += chunk.content
                     yield sse_event({'type': 'token', 'node': speaker, 'text': chunk.content})
         except Exception as e:
-            yield sse_event({'type': 'error', 'text': f'{msg_llm_stream_fail}{str(e)}'})
-            yield sse_event({'type': 'speaker_end', 'node': speaker})
-            yield sse_event({'type': 'complete', 'text': msg_debate_error})
-            return
+            if not full_content:
+                yield sse_event({'type': 'error', 'text': f'{msg_llm_stream_fail}{str(e)}'})
+                yield sse_event({'type': 'speaker_end', 'node': speaker})
+                yield sse_event({'type': 'complete', 'text': msg_debate_error})
+                return
+            # 所有模型都無法接續：保留已顯示的部分內容，辯論繼續
+            logger.warning(f"real_debate_stream: keeping partial output for {speaker}: {e}")
+            yield sse_event({'type': 'status', 'text': msg_partial_kept})
 
         # 發送 speaker 結束事件
         yield sse_event({'type': 'speaker_end', 'node': speaker})
@@ -214,50 +300,133 @@ async def real_debate_stream(topic: str, max_rounds: int = 3, language: str = "z
 # ============================================================
 # LangGraph StateGraph 串流（Phase 3c - ToolNode 架構）
 # ============================================================
-async def langgraph_debate_stream(topic: str, max_rounds: int = 3, language: str = "zh"):
+async def langgraph_debate_stream(
+    topic: str,
+    max_rounds: int = 3,
+    language: str = "zh",
+    prefetch: Optional[bool] = None,
+    graph_mode: Optional[str] = None,
+    profile: Optional[str] = None,
+    debate_id: Optional[str] = None
+):
     """Phase 3c: 使用 ToolNode 實現工具事件追蹤
     
     架構改進：
     - Agent 節點只負責決策（返回 AIMessage，可能包含 tool_calls）
     - ToolNode 獨立執行工具，LangGraph 自動觸發 on_tool_start/on_tool_end
     - 修復搜尋指示器無法顯示的問題
+
+    prefetch: 啟用時在開場白串流期間背景搜尋主題（app.services.research_service），
+    結果經由 config["configurable"]["research"] 交給辯手節點與搜尋工具
+
+    graph_mode: "tools"（ToolNode）、"retrieve"（先並行搜尋，每輪單次 LLM 呼叫）
+                、"overlap"（主持人小結與下一輪樂觀者並行，事件經 order_overlap_events 排序）
+                或 "panel"（多位辯手並行發言，token 依 LangGraph 節點標記 node，另附 role）
+
+    profile: "fast" / "balanced" / "thorough"（app.services.profiles），決定模型層級、token 上限、
+             主持人小結頻率與工具迭代上限；graph 變體依設定編譯一次後快取（app.graph_builder）
+
+    debate_id: 作為 config 的 thread_id，狀態大小統計依此分場記錄（app.services.state_policy）；
+               未指定時產生新的 ID
     """
-    from app.graph import debate_graph, create_initial_state
+    from app.graph import get_debate_graph, get_graph_mode, create_initial_state
+    from app.llm.router import FAILOVER_EVENT
+    from app.llm.summarizer import SUMMARY_TAG
+    from app.services.debate_sessions import new_debate_id
+    from app.services.profiles import get_profile
+    from app.services.research_service import is_prefetch_enabled, start_research_prefetch
+    from app.services.state_policy import bind_debate, unbind_debate
+    from app.tools.tool_limits import new_debate_tool_limiter
 
     logger.info(f"🌐 langgraph_debate_stream received language: {language}")
     is_en = language == "en"
+    debate_profile = get_profile(profile)
+    model_name = (debate_profile.model_chain() or [GROQ_MODEL])[0]
 
     yield sse_event({'type': 'status', 'text': '⚡ ' + ('Connecting to AI Debate Engine...' if is_en else '正在喚醒 AI 辯論引擎...')})
-    yield sse_event({'type': 'status', 'text': f'🔥 ' + ('Using model: ' if is_en else '使用模型: ') + f'{GROQ_MODEL} (LangGraph + Tools)'})
+    yield sse_event({'type': 'status', 'text': f'🔥 ' + ('Using model: ' if is_en else '使用模型: ') + f'{model_name} (LangGraph + Tools, {debate_profile.name})'})
 
     # 初始化（language 已整合進 state）
     state = create_initial_state(topic, max_rounds, language)
+    graph_mode = get_graph_mode(graph_mode)
+    debate_graph = get_debate_graph(graph_mode, debate_profile.graph_config(graph_mode))
+
+    # 主題預取：與開場白同時進行
+    research = None
+    if is_prefetch_enabled() if prefetch is None else prefetch:
+        research = start_research_prefetch(topic, language)
+        yield sse_event({'type': 'status', 'text': '🔎 ' + ('Researching the topic in the background...' if is_en else '正在背景搜尋主題資料...')})
+    thread_id = debate_id or new_debate_id()
+    config = {"configurable": {
+        "thread_id": thread_id,
+        "research": research,
+        "tool_limiter": new_debate_tool_limiter(),
+        "profile": debate_profile,
+    }}
     
     current_node = None
     round_count = 0
-    current_tool_query = None
+    active_tools = {}  # run_id -> query（同一步驟的多個 tool_calls 會並行執行）
+    # panel 模式：同一階段的辯手並行發言，事件依 metadata 的 langgraph_node 區分發言者
+    panel_roles = None
+    active_speakers = []
+    if graph_mode == "panel":
+        from app.graph_builder import get_panel_roles
+
+        panel_roles = get_panel_roles()
+    open_streams = []  # 結束或斷線時依序關閉（外層先關）
+    state_binding = bind_debate(thread_id)  # reducer 依此記錄這場辯論的狀態大小
     
     try:
-        async for event in debate_graph.astream_events(
+        events = debate_graph.astream_events(
             state,
+            config=config,
             version="v2"
-        ):
+        )
+        open_streams.append(events)
+        if graph_mode == "overlap":
+            events = order_overlap_events(events)
+            open_streams.insert(0, events)
+
+        async for event in events:
             event_type = event.get("event")
             event_name = event.get("name", "")
             event_tags = event.get("tags", [])
+            event_node = (event.get("metadata") or {}).get("langgraph_node")
             
             # Phase 3c: 診斷日誌
             logger.debug(f"Event: type={event_type}, name={event_name}, tags={event_tags}")
             
+            # panel 模式：節點開始 / 結束各自對應 speaker / speaker_end（可能同時有多位發言者）
+            if panel_roles is not None and event_type in ("on_chain_start", "on_chain_end") \
+                    and event_name in panel_roles and event_name == event_node:
+                if event_type == "on_chain_start":
+                    active_speakers.append(event_name)
+                    if event_name == "moderator":
+                        round_count += 1
+                        speaker_text = 'Summary Report' if is_en else '總結報告'
+                    else:
+                        speaker_text = f'Round {round_count + 1}' if is_en else f'第 {round_count + 1} 輪'
+                    yield sse_event({
+                        'type': 'speaker',
+                        'node': event_name,
+                        'role': panel_roles[event_name],
+                        'text': speaker_text
+                    })
+                elif event_name in active_speakers:
+                    active_speakers.remove(event_name)
+                    yield sse_event({'type': 'speaker_end', 'node': event_name})
+
             # 節點開始
-            if event_type == "on_chain_start":
+            elif event_type == "on_chain_start" and panel_roles is None:
                 name = event.get("name", "")
                 # Phase 3d: 擴展支援 "moderator"
                 if name in ("optimist", "skeptic", "moderator"):
                     if current_node and current_node != name:
                         yield sse_event({'type': 'speaker_end', 'node': current_node})
                         # ⚠️ 當 skeptic → moderator 時增加輪數（表示一輪完成）
-                        if current_node == "skeptic" and name == "moderator":
+                        # 小結頻率為 final / off 時沒有每輪的 moderator，skeptic → optimist 即一輪完成
+                        if current_node == "skeptic" and name in ("moderator", "optimist"):
                             round_count += 1
                     
                     current_node = name
@@ -286,7 +455,7 @@ async def langgraph_debate_stream(topic: str, max_rounds: int = 3, language: str
                 tool_input = event.get("data", {}).get("input", {})
                 unknown_query = "Unknown query" if is_en else "未知查詢"
                 query = tool_input.get("query", unknown_query) if isinstance(tool_input, dict) else str(tool_input)
-                current_tool_query = query
+                active_tools[event.get("run_id")] = query
                 yield sse_event({
                     'type': 'tool_start',
                     'tool': 'web_search',
@@ -296,19 +465,39 @@ async def langgraph_debate_stream(topic: str, max_rounds: int = 3, language: str
             
             # 工具結束（正常或錯誤）
             elif event_type in ("on_tool_end", "on_tool_error"):
+                query = active_tools.pop(event.get("run_id"), None)
                 yield sse_event({
                     'type': 'tool_end',
                     'tool': 'web_search',
+                    'query': query,
+                    'pending': len(active_tools),
                     'node': current_node or "unknown"
                 })
-                current_tool_query = None
             
+            # 模型切換（TTFT/stall 逾時、429 或上游錯誤）
+            elif event_type == "on_custom_event" and event_name == FAILOVER_EVENT:
+                yield sse_event({
+                    'type': 'status',
+                    'text': failover_status_text(event.get("data", {}), is_en)
+                })
+
             # LLM Token 串流
             elif event_type == "on_chat_model_stream":
                 chunk = event.get("data", {}).get("chunk")
+                # 工具結果摘要（快速模型）屬於內部步驟，不串流給前端
+                if SUMMARY_TAG in event_tags:
+                    continue
                 if chunk and hasattr(chunk, "content") and chunk.content:
+                    if panel_roles is not None:
+                        # 並行發言的 token 交錯送出，以節點名稱標記（前端依 node 分流）
+                        if event_node in active_speakers:
+                            yield sse_event({
+                                'type': 'token',
+                                'node': event_node,
+                                'text': chunk.content
+                            })
                     # Phase 3d: 擴展支援 moderator
-                    if current_node in ("optimist", "skeptic", "moderator"):
+                    elif current_node in ("optimist", "skeptic", "moderator"):
                         yield sse_event({
                             'type': 'token',
                             'node': current_node,
@@ -318,6 +507,8 @@ async def langgraph_debate_stream(topic: str, max_rounds: int = 3, language: str
         # 結束
         if current_node:
             yield sse_event({'type': 'speaker_end', 'node': current_node})
+        if current_node == "skeptic":
+            round_count += 1  # 不呼叫主持人（off）時最後一輪在 skeptic 結束
 
         msg_complete = f'✅ Debate complete! {round_count} exciting rounds.' if is_en else f'✅ 辯論完成！共進行了 {round_count} 輪精彩交鋒。'
         yield sse_event({
@@ -327,44 +518,108 @@ async def langgraph_debate_stream(topic: str, max_rounds: int = 3, language: str
     
     except Exception as e:
         # 確保工具指示器被清除
-        if current_tool_query:
-            yield sse_event({'type': 'tool_end', 'tool': 'web_search', 'node': current_node or "unknown"})
+        if active_tools:
+            yield sse_event({'type': 'tool_end', 'tool': 'web_search', 'pending': 0, 'node': current_node or "unknown"})
         msg_error = f'LangGraph error: {str(e)}' if is_en else f'LangGraph 錯誤: {str(e)}'
         yield sse_event({'type': 'error', 'text': msg_error})
         if current_node:
             yield sse_event({'type': 'speaker_end', 'node': current_node})
+        for node in active_speakers:
+            yield sse_event({'type': 'speaker_end', 'node': node})
+
+    finally:
+        # 用戶端斷線時產生器可能停在 yield：明確關閉 astream_events，取消其背景執行的 graph
+        for stream in open_streams:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception as e:
+                    logger.debug(f"langgraph_debate_stream: error while closing events: {e}")
+        if research is not None:
+            research.cancel()
+        unbind_debate(state_binding)
 
 
 # ============================================================
 # SSE 串流接口
 # ============================================================
 @app.post("/debate")
-async def start_debate(req: DebateRequest):
+async def start_debate(req: DebateRequest, request: Request):
     """啟動 AI 辯論串流
     
     串流模式選擇：
     1. USE_FAKE_STREAM=true 或無 GROQ_API_KEY → fake_debate_stream
     2. USE_LANGGRAPH=true（預設）→ langgraph_debate_stream（Phase 3b, astream_events）
     3. USE_LANGGRAPH=false → real_debate_stream（Phase 2 回退）
+
+    辯論在背景執行並寫入事件紀錄（app.services.debate_sessions），本回應是第一個訂閱者：
+    - 第一個事件 {'type': 'debate', 'debate_id': ...}（同 X-Debate-Id header），每個 frame 帶 id: 行
+    - 斷線後以 GET /debate/{debate_id}/events + Last-Event-ID 重新接上，不會重新開始辯論
+    - 斷線由 guard_disconnect 立即偵測；SSE_RESUME_GRACE 秒內沒有重連才取消辯論
     """
+    from app.services.debate_sessions import get_session_store, new_debate_id
+    from app.services.stream_guard import guard_disconnect
     
     # Debug log
     logger.info(f"🚀 /debate API received: topic='{req.topic[:30]}...', max_rounds={req.max_rounds}, language={req.language}")
     
+    debate_id = new_debate_id()
     if USE_FAKE_STREAM or not HAS_GROQ_KEY:
         stream_generator = fake_debate_stream(req.topic, req.max_rounds, req.language)
     elif USE_LANGGRAPH:
-        stream_generator = langgraph_debate_stream(req.topic, req.max_rounds, req.language)
+        stream_generator = langgraph_debate_stream(
+            req.topic,
+            req.max_rounds,
+            req.language,
+            prefetch=req.research_prefetch,
+            graph_mode=req.graph_mode,
+            profile=req.profile,
+            debate_id=debate_id
+        )
     else:
         stream_generator = real_debate_stream(req.topic, req.max_rounds, req.language)
     
-    return StreamingResponse(
+    session = get_session_store().create(
         stream_generator,
+        debate_id,
+        first_frame=sse_event({'type': 'debate', 'debate_id': debate_id})
+    )
+    return sse_response(guard_disconnect(session.subscribe(), request.is_disconnected), debate_id)
+
+
+@app.get("/debate/{debate_id}/events")
+async def resume_debate(debate_id: str, request: Request, last_event_id: Optional[int] = None):
+    """重新接上進行中（或剛結束）的辯論串流
+
+    debate_id 是 /debate 串流的第一個事件所給的 ID（不是 Supabase 的辯論紀錄 ID）。
+    先重播 Last-Event-ID header（或 last_event_id 參數）之後的事件，再接上即時事件；
+    辯論已結束時只重播，紀錄保留 SSE_SESSION_TTL 秒。
+    """
+    from app.services.debate_sessions import get_session_store, parse_last_event_id
+    from app.services.stream_guard import guard_disconnect
+
+    header = request.headers.get("last-event-id")
+    after = parse_last_event_id(header if header is not None else str(last_event_id or 0))
+    stream = get_session_store().resume(debate_id, after)
+    if stream is None:
+        from fastapi import HTTPException
+        raise HTTPException(status_code=404, detail="Debate stream not found or expired")
+
+    logger.info(f"🔁 resuming debate {debate_id} after event {after}")
+    return sse_response(guard_disconnect(stream, request.is_disconnected), debate_id)
+
+
+def sse_response(stream, debate_id: str) -> StreamingResponse:
+    """SSE 串流回應（帶 X-Debate-Id header）"""
+    return StreamingResponse(
+        stream,
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no",
+            "X-Debate-Id": debate_id,
         }
     )
 
@@ -385,6 +640,20 @@ async def root():
 @app.get("/health")
 async def health():
     from app.supabase_client import is_supabase_enabled
+    from app.llm.registry import get_registry_stats
+    from app.llm.cache import get_cache_stats
+    from app.tools.search_cache import get_search_cache_stats
+    from app.tools.search_metrics import get_search_metrics
+    from app.tools.search_io import get_search_io_stats
+    from app.tools.search_health import get_breaker_states
+    from app.tools.tool_limits import get_tool_stats
+    from app.tools.evidence_index import get_evidence_index_stats
+    from app.llm.summarizer import get_tool_summary_stats
+    from app.services.state_policy import get_state_stats
+    from app.llm.prompt_layout import get_prompt_cache_stats
+    from app.graph_builder import get_graph_cache_stats
+    from app.services.stream_guard import get_stream_stats
+    from app.services.debate_sessions import get_session_stats
     return {
         "status": "healthy",
         "version": "0.4.0",
@@ -394,10 +663,33 @@ async def health():
         "use_langgraph": USE_LANGGRAPH,
         "model": GROQ_MODEL if HAS_GROQ_KEY else None,
         "supabase_enabled": is_supabase_enabled(),
+        "llm_registry": get_registry_stats(),
+        "llm_cache": get_cache_stats(),
+        "search_cache": get_search_cache_stats(),
+        "search_latency": get_search_metrics(),
+        "search_io": get_search_io_stats(),
+        "search_breakers": get_breaker_states(),
+        "tool_calls": get_tool_stats(),
+        "evidence_index": get_evidence_index_stats(),
+        "tool_summary": get_tool_summary_stats(),
+        "debate_state": get_state_stats(),
+        "llm_tokens": get_prompt_cache_stats().stats(),
+        "graph_cache": get_graph_cache_stats(),
+        "sse_streams": get_stream_stats().stats(),
+        "debate_sessions": get_session_stats(),
         "note": "Phase 4: Supabase debate history + i18n"
     }
 
 
+@app.get("/llm/router")
+async def llm_router_state():
+    """模型路由器狀態（各模型成功率、TTFT、429 次數、熔斷狀態與目前排序）"""
+    from app.graph import get_model_chain
+    from app.llm.router import get_router
+
+    return get_router().snapshot(get_model_chain())
+
+
 # ============================================================
 # Debate History Endpoints (Phase 4)
 # ============================================================
@@ -0,0 +1,369 @@
+"""
+Resumable Debate Sessions
+
+每場辯論有一個 debate_id 與有上限的記憶體事件紀錄（ring buffer），讓短暫斷線的用戶端
+以 Last-Event-ID 重新接上同一場辯論，而不是重新開始一場（LLM 成本加倍）：
+- 辯論產生器在背景 task 執行，每個 SSE 事件依序編號（1, 2, ...）寫入紀錄；
+  同一發言者連續的 token 事件合併為紀錄中的一筆（重播時送出一個合併的 token frame），
+  紀錄筆數因此與發言段落數成正比，而不是與 token 數成正比
+- 每個連線是一個訂閱者：先重播 Last-Event-ID 之後仍保留的事件，再接上即時事件；
+  每個 frame 帶 id: 行
+- 辯論結束後紀錄保留 SSE_SESSION_TTL 秒供重播，之後移除
+- 最後一個訂閱者斷線後，辯論再執行 SSE_RESUME_GRACE 秒等待重連；沒有人接上就取消
+  （同 app.services.stream_guard 的斷線取消，0 表示立即取消）
+- 辯論建立時 POST 回應的訂閱者尚未接上：至少等待 SSE_ATTACH_GRACE 秒，
+  SSE_RESUME_GRACE=0 時也不會在回應開始讀取前就取消
+
+環境變數：
+    SSE_LOG_SIZE: 每場辯論保留的紀錄筆數（連續 token 算一筆，預設 2000）
+    SSE_SESSION_TTL: 辯論結束後保留紀錄的秒數（預設 300）
+    SSE_RESUME_GRACE: 無訂閱者時等待重連的秒數（預設 10）
+    SSE_ATTACH_GRACE: 建立後等待第一個訂閱者接上的最短秒數（預設 5）
+    SSE_MAX_SESSIONS: 同時保留的辯論數上限，超過時先移除最早結束的（預設 100）
+"""
+
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+import asyncio
+import json
+import os
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# 事件紀錄
+# ============================================================
+
+def _token_event(frame: str) -> Optional[Tuple[str, str]]:
+    """frame 為單純的 token 事件時返回 (node, text)"""
+    if not frame.startswith("data: ") or '"token"' not in frame:
+        return None
+    try:
+        data = json.loads(frame[len("data: "):])
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or data.get("type") != "token" or set(data) != {"type", "node", "text"}:
+        return None
+    return data["node"], data["text"]
+
+
+class LogEntry:
+    """紀錄中的一筆：單一事件，或同一發言者連續的 token（編號 first_id..last_id）"""
+
+    __slots__ = ("first_id", "last_id", "frame", "node", "texts")
+
+    def __init__(self, event_id: int, frame: str, token: Optional[Tuple[str, str]] = None):
+        self.first_id = event_id
+        self.last_id = event_id
+        self.frame = frame
+        self.node = token[0] if token else None
+        self.texts = [token[1]] if token else None
+
+    def extend(self, event_id: int, token: Tuple[str, str]) -> bool:
+        """併入下一個 token 事件（不同發言者或非 token 紀錄時返回 False）"""
+        if self.texts is None or token[0] != self.node or event_id != self.last_id + 1:
+            return False
+        self.texts.append(token[1])
+        self.last_id = event_id
+        return True
+
+    def frame_after(self, after: int) -> str:
+        """編號大於 after 的部分（token 紀錄合併為一個 frame）"""
+        if self.texts is None:
+            return self.frame
+        start = max(after + 1 - self.first_id, 0)
+        if start == 0 and len(self.texts) == 1:
+            return self.frame
+        text = "".join(self.texts[start:])
+        return f"data: {json.dumps({'type': 'token', 'node': self.node, 'text': text})}\n\n"
+
+
+# ============================================================
+# 單場辯論
+# ============================================================
+
+class DebateSession:
+    """單場辯論的事件紀錄與背景產生器"""
+
+    def __init__(
+        self,
+        debate_id: str,
+        max_events: int = 2000,
+        resume_grace: float = 10.0,
+        on_abandoned: Optional[Callable[[], None]] = None
+    ):
+        self.debate_id = debate_id
+        self.resume_grace = resume_grace
+        self.on_abandoned = on_abandoned
+        self.events: Deque[LogEntry] = deque(maxlen=max_events)
+        self.last_id = 0
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.subscribers = 0
+        self._changed = asyncio.Condition()
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._idle_handle: Optional[asyncio.TimerHandle] = None
+
+    def start(self, stream: AsyncIterator[str]) -> None:
+        """在背景 task 執行辯論產生器"""
+        self._task = asyncio.create_task(self._run(stream))
+
+    async def _run(self, stream: AsyncIterator[str]) -> None:
+        try:
+            async for frame in stream:
+                await self.append(frame)
+        except asyncio.CancelledError:
+            logger.info(f"debate session {self.debate_id}: cancelled")
+        except Exception as e:
+            logger.error(f"debate session {self.debate_id}: stream failed: {e}")
+        finally:
+            # 取消時產生器可能停在 yield：關閉它，讓它的 finally（關閉 astream_events、取消預取）執行
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception as e:
+                    logger.debug(f"debate session {self.debate_id}: error while closing stream: {e}")
+            await self._finish()
+
+    def record(self, frame: str) -> int:
+        """寫入一個 SSE 事件，返回其編號（不通知訂閱者，用於開始前的事件）"""
+        self.last_id += 1
+        token = _token_event(frame)
+        if token is None or not self.events or not self.events[-1].extend(self.last_id, token):
+            self.events.append(LogEntry(self.last_id, frame, token))
+        return self.last_id
+
+    async def append(self, frame: str) -> None:
+        """寫入一個 SSE 事件並通知訂閱者"""
+        async with self._changed:
+            self.record(frame)
+            self._changed.notify_all()
+
+    async def _finish(self) -> None:
+        async with self._changed:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._changed.notify_all()
+
+    def replay(self, after: int) -> List[Tuple[int, str]]:
+        """紀錄中編號大於 after 的事件 (id, frame)；連續 token 合併為一個 frame，id 為其中最後一個
+
+        較早的事件已被 ring buffer 淘汰時從最早保留的開始
+        """
+        return [(entry.last_id, entry.frame_after(after)) for entry in self.events if entry.last_id > after]
+
+    async def subscribe(self, last_event_id: int = 0) -> AsyncIterator[str]:
+        """重播 last_event_id 之後的事件，再接上即時事件（每個 frame 帶 id: 行）"""
+        self._attach()
+        try:
+            cursor = last_event_id
+            while True:
+                if self.events and self.events[0].first_id > cursor + 1:
+                    logger.warning(
+                        f"debate session {self.debate_id}: events {cursor + 1}-{self.events[0].first_id - 1} "
+                        f"already dropped from the log"
+                    )
+                pending = self.replay(cursor)
+                for event_id, frame in pending:
+                    cursor = event_id
+                    yield f"id: {event_id}\n{frame}"
+                async with self._changed:
+                    if self.last_id > cursor:
+                        continue
+                    if self.done:
+                        return
+                    await self._changed.wait()
+        finally:
+            self._detach()
+
+    def _attach(self) -> None:
+        self.subscribers += 1
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+
+    def _detach(self) -> None:
+        self.subscribers -= 1
+        if self.subscribers > 0 or self.done:
+            return
+        if self.resume_grace <= 0:
+            self.cancel()
+        else:
+            self.arm_idle_timer()
+
+    def arm_idle_timer(self, delay: Optional[float] = None) -> None:
+        """delay 秒（預設 resume_grace）內沒有訂閱者接上就取消辯論（訂閱者接上時解除）
+
+        建立時就設定：用戶端在回應開始讀取前斷線時，subscribe() 的產生器從未執行，
+        不會有斷線通知，辯論仍須在寬限期後取消。
+        """
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+        loop = asyncio.get_running_loop()
+        delay = self.resume_grace if delay is None else delay
+        self._idle_handle = loop.call_later(max(delay, 0), self._cancel_if_idle)
+
+    def _cancel_if_idle(self) -> None:
+        self._idle_handle = None
+        if self.subscribers == 0 and not self.done:
+            logger.info(f"debate session {self.debate_id}: no client reconnected, cancelling")
+            if self.on_abandoned is not None:
+                self.on_abandoned()
+            self.cancel()
+
+    def cancel(self) -> None:
+        """取消背景辯論（取消會沿 astream_events 傳進 graph 的 LLM / 工具呼叫）"""
+        if self._task is not None and not self._task.done():
+            try:
+                self._task.cancel()
+            except RuntimeError:
+                pass  # event loop 已關閉（測試之間）
+
+    async def wait_closed(self) -> None:
+        """等待背景 task 結束（主要用於測試）"""
+        if self._task is not None:
+            await asyncio.wait({self._task})
+
+    def expired(self, ttl: float, now: float) -> bool:
+        return self.done and self.finished_at is not None and now - self.finished_at > ttl
+
+
+# ============================================================
+# 辯論紀錄表
+# ============================================================
+
+class SessionStore:
+    """debate_id → DebateSession（結束後依 TTL 移除，數量有上限）"""
+
+    def __init__(
+        self,
+        max_events: int = 2000,
+        ttl: float = 300.0,
+        resume_grace: float = 10.0,
+        max_sessions: int = 100,
+        attach_grace: float = 5.0
+    ):
+        self.max_events = max_events
+        self.ttl = ttl
+        self.resume_grace = resume_grace
+        self.attach_grace = attach_grace
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, DebateSession]" = OrderedDict()
+        self.created = 0
+        self.resumed = 0
+        self.replayed_events = 0
+        self.expired = 0
+        self.abandoned = 0
+
+    def create(
+        self,
+        stream: AsyncIterator[str],
+        debate_id: Optional[str] = None,
+        first_frame: Optional[str] = None
+    ) -> DebateSession:
+        """建立一場辯論並在背景開始執行（first_frame 作為 1 號事件，例如告知用戶端 debate_id）"""
+        self.purge()
+        session = DebateSession(
+            debate_id or new_debate_id(),
+            self.max_events,
+            self.resume_grace,
+            on_abandoned=self.record_abandoned,
+        )
+        if first_frame is not None:
+            session.record(first_frame)
+        self._sessions[session.debate_id] = session
+        self.created += 1
+        session.start(stream)
+        # POST 回應的訂閱者要等 StreamingResponse 開始後才接上，寬限期不低於 attach_grace
+        session.arm_idle_timer(max(self.resume_grace, self.attach_grace))
+        return session
+
+    def get(self, debate_id: str) -> Optional[DebateSession]:
+        self.purge()
+        return self._sessions.get(debate_id)
+
+    def resume(self, debate_id: str, last_event_id: int = 0) -> Optional[AsyncIterator[str]]:
+        """重新接上一場辯論（不存在或已過期時返回 None）"""
+        session = self.get(debate_id)
+        if session is None:
+            return None
+        self.resumed += 1
+        self.replayed_events += len(session.replay(last_event_id))
+        return session.subscribe(last_event_id)
+
+    def record_abandoned(self) -> None:
+        self.abandoned += 1
+
+    def purge(self) -> None:
+        """移除過期的紀錄；超過數量上限時再移除最早結束的"""
+        now = time.monotonic()
+        for debate_id in [k for k, s in self._sessions.items() if s.expired(self.ttl, now)]:
+            del self._sessions[debate_id]
+            self.expired += 1
+
+        finished = [k for k, s in self._sessions.items() if s.done]
+        while len(self._sessions) >= self.max_sessions and finished:
+            del self._sessions[finished.pop(0)]
+            self.expired += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "live": sum(1 for s in self._sessions.values() if not s.done),
+            "created": self.created,
+            "resumed": self.resumed,
+            "replayed_events": self.replayed_events,
+            "expired": self.expired,
+            "abandoned": self.abandoned,
+        }
+
+
+_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    """取得 SessionStore 單例（依環境變數建立）"""
+    global _store
+
+    if _store is None:
+        _store = SessionStore(
+            max_events=max(int(os.getenv("SSE_LOG_SIZE", "2000")), 1),
+            ttl=float(os.getenv("SSE_SESSION_TTL", "300")),
+            resume_grace=float(os.getenv("SSE_RESUME_GRACE", "10")),
+            max_sessions=max(int(os.getenv("SSE_MAX_SESSIONS", "100")), 1),
+            attach_grace=float(os.getenv("SSE_ATTACH_GRACE", "5")),
+        )
+    return _store
+
+
+def get_session_stats() -> Dict[str, Any]:
+    """取得辯論紀錄統計"""
+    return get_session_store().stats()
+
+
+def reset_session_store() -> None:
+    """
+    重置紀錄表（主要用於測試；進行中的辯論會被取消）
+    """
+    global _store
+    if _store is not None:
+        for session in _store._sessions.values():
+            session.cancel()
+    _store = None
+
+
+def new_debate_id() -> str:
+    return uuid.uuid4().hex
+
+
+def parse_last_event_id(value: Optional[str]) -> int:
+    """解析 Last-Event-ID（無效值視為 0，即從頭重播）"""
+    try:
+        return max(int((value or "0").strip()), 0)
+    except ValueError:
+        return 0
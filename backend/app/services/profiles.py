@@ -0,0 +1,106 @@
+"""
+Debate Profiles
+
+/debate 的 profile 讓使用者依請求在辯論深度與延遲之間取捨，每個 profile 決定：
+- 模型層級：模型鏈（None 表示 GROQ_MODEL / GROQ_FALLBACK_MODELS）
+- 每種發言的 max_tokens（未列出的種類依 app.llm.token_budget 的預設與環境變數）
+- Graph 變體：主持人小結頻率、工具迭代上限、是否搜尋（app.graph_builder.GraphConfig，
+  編譯一次後依設定快取）
+
+profile 經由 config["configurable"]["profile"] 交給節點（與 research、tool_limiter 相同）。
+
+    fast      快速模型、較短發言、只在最後生成總結報告、每位辯手最多搜尋一次
+    balanced  預設行為（與未指定 profile 相同）
+    thorough  較長發言與報告、每輪小結、允許更多次搜尋
+
+環境變數：
+    DEBATE_PROFILE: 未指定時使用的 profile（預設 balanced）
+    FAST_PROFILE_MODELS: fast profile 的模型鏈，逗號分隔（預設 llama-3.1-8b-instant,openai/gpt-oss-20b）
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import os
+import logging
+
+from langchain_core.runnables import RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAST_MODELS = "llama-3.1-8b-instant,openai/gpt-oss-20b"
+
+
+@dataclass(frozen=True)
+class DebateProfile:
+    """單一 profile 的設定"""
+    name: str
+    fast_models: bool = False  # True 時改用 FAST_PROFILE_MODELS
+    max_tokens: Dict[str, int] = field(default_factory=dict)
+    moderator: str = "every"
+    max_tool_iterations: int = 3
+    search: bool = True
+
+    def model_chain(self) -> Optional[List[str]]:
+        """本 profile 的模型鏈（None 表示預設模型鏈）"""
+        if not self.fast_models:
+            return None
+        models = os.getenv("FAST_PROFILE_MODELS", DEFAULT_FAST_MODELS)
+        return [m.strip() for m in models.split(",") if m.strip()] or None
+
+    def llm_kwargs(self) -> Dict[str, Any]:
+        """傳給 get_llm 的參數（預設模型鏈時不帶 models）"""
+        models = self.model_chain()
+        return {"models": models} if models else {}
+
+    def turn_max_tokens(self, role: str) -> int:
+        """該角色每次發言的 max_tokens"""
+        from app.llm.prompt_layout import get_turn_max_tokens
+
+        return get_turn_max_tokens(role, self.max_tokens)
+
+    def graph_config(self, mode: str):
+        """對應的 Graph 變體設定"""
+        from app.graph_builder import GraphConfig
+
+        return GraphConfig(
+            mode=mode,
+            max_tool_iterations=self.max_tool_iterations,
+            moderator=self.moderator,
+            search=self.search,
+        )
+
+
+PROFILES: Dict[str, DebateProfile] = {
+    "fast": DebateProfile(
+        name="fast",
+        fast_models=True,
+        max_tokens={"debater": 256, "moderator_round": 256, "moderator_final": 768},
+        moderator="final",
+        max_tool_iterations=1,
+    ),
+    "balanced": DebateProfile(name="balanced"),
+    "thorough": DebateProfile(
+        name="thorough",
+        max_tokens={"debater": 768, "moderator_round": 768, "moderator_final": 1536},
+        moderator="every",
+        max_tool_iterations=5,
+    ),
+}
+
+
+def get_profile(name: Optional[str] = None) -> DebateProfile:
+    """取得 profile（請求指定 > DEBATE_PROFILE 環境變數 > balanced）"""
+    name = (name or os.getenv("DEBATE_PROFILE", "balanced")).strip().lower()
+    if name not in PROFILES:
+        logger.warning(f"unknown debate profile '{name}', falling back to 'balanced'")
+        return PROFILES["balanced"]
+    return PROFILES[name]
+
+
+def get_request_profile(config: Optional[RunnableConfig]) -> DebateProfile:
+    """從 RunnableConfig 取出本次辯論的 profile（未指定時依 get_profile()）"""
+    if config:
+        profile = config.get("configurable", {}).get("profile")
+        if isinstance(profile, DebateProfile):
+            return profile
+    return get_profile()
@@ -0,0 +1,170 @@
+"""
+Research Prefetch Service
+
+/debate 請求一進來就在背景並行搜尋一批主題查詢，
+讓第一次搜尋不必等到 optimist 決定呼叫 web_search_tool 才開始：
+- 開場白串流期間，背景查詢已經在跑
+- 已完成的結果作為「背景資料」放進辯手 prompt
+- web_search_tool 的查詢若被預取查詢涵蓋，直接返回預取結果（不再發出搜尋）
+
+預取 handle 透過 RunnableConfig["configurable"]["research"] 傳給節點與工具。
+
+環境變數：
+    RESEARCH_PREFETCH_ENABLED: 預設是否啟用預取（預設 false，可由請求覆蓋）
+    RESEARCH_MAX_QUERIES: 每場辯論的預取查詢數（預設 3）
+    RESEARCH_COVERAGE_THRESHOLD: 視為「已涵蓋」的查詢詞覆蓋率（預設 0.6）
+"""
+
+from typing import Dict, List, Optional, Set
+import asyncio
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 主題查詢後綴（第一個為主題本身）
+QUERY_SUFFIXES = {
+    "zh": ["", "數據 統計", "風險 爭議"],
+    "en": ["", "statistics data", "risks criticism"],
+}
+
+
+# ============================================================
+# 查詢產生與涵蓋判斷
+# ============================================================
+
+def build_topic_queries(topic: str, language: str = "zh", max_queries: int = 3) -> List[str]:
+    """由辯論主題產生預取查詢（主題本身 + 數據 + 風險）"""
+    suffixes = QUERY_SUFFIXES["en" if language == "en" else "zh"]
+    topic = topic.strip()
+    queries = [f"{topic} {suffix}".strip() for suffix in suffixes]
+    return queries[:max(max_queries, 0)]
+
+
+def tokenize(text: str) -> Set[str]:
+    """查詢詞集合（斷詞規則同 app.tools.ranking.tokenize）"""
+    from app.tools.ranking import tokenize as tokenize_terms
+
+    return set(tokenize_terms(text))
+
+
+def coverage(query: str, covered_by: str) -> float:
+    """query 的詞有多少比例出現在 covered_by 中（0-1）"""
+    wanted = tokenize(query)
+    if not wanted:
+        return 0.0
+    return len(wanted & tokenize(covered_by)) / len(wanted)
+
+
+# ============================================================
+# ResearchPrefetch
+# ============================================================
+
+class ResearchPrefetch:
+    """單場辯論的背景研究任務"""
+
+    def __init__(self, topic: str, language: str = "zh", queries: Optional[List[str]] = None, threshold: float = 0.6):
+        self.topic = topic
+        self.language = language
+        self.queries = queries if queries is not None else build_topic_queries(topic, language)
+        self.threshold = threshold
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.served = 0
+
+    def start(self) -> "ResearchPrefetch":
+        """啟動所有查詢（需在 event loop 內呼叫）"""
+        from app.tools.search import web_search
+
+        for query in self.queries:
+            if query not in self._tasks:
+                self._tasks[query] = asyncio.create_task(web_search(query, language=self.language))
+        logger.debug(f"research prefetch started: {self.queries}")
+        return self
+
+    @property
+    def done(self) -> bool:
+        return bool(self._tasks) and all(task.done() for task in self._tasks.values())
+
+    @staticmethod
+    def _result(task: asyncio.Task) -> Optional[dict]:
+        """已完成且成功的搜尋結果"""
+        if not task.done() or task.cancelled() or task.exception() is not None:
+            return None
+        result = task.result()
+        return result if result.get("success") else None
+
+    def context(self) -> str:
+        """目前已完成的預取結果（格式化文字，沒有則為空字串）"""
+        sections = []
+        for task in self._tasks.values():
+            result = self._result(task)
+            if result:
+                sections.append(result["formatted"])
+        return "\n\n".join(sections)
+
+    def _best_match(self, query: str) -> Optional[str]:
+        best, best_score = None, 0.0
+        for prefetched in self._tasks:
+            score = coverage(query, prefetched)
+            if score > best_score:
+                best, best_score = prefetched, score
+        return best if best_score >= self.threshold else None
+
+    async def lookup(self, query: str) -> Optional[str]:
+        """查詢被預取涵蓋時返回預取結果（仍在進行中則等待它完成）"""
+        match = self._best_match(query)
+        if match is None:
+            return None
+
+        task = self._tasks[match]
+        try:
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # 預取被取消時退回一般搜尋；呼叫端本身被取消則照常往外拋
+            if not task.cancelled():
+                raise
+            return None
+        except Exception:
+            return None
+
+        result = self._result(task)
+        if result is None:
+            return None
+        self.served += 1
+        logger.debug(f"research prefetch served '{query}' from '{match}'")
+        return result["formatted"]
+
+    def cancel(self) -> None:
+        """取消尚未完成的查詢（辯論結束或中斷時呼叫）"""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+
+
+# ============================================================
+# 便利函數
+# ============================================================
+
+def is_prefetch_enabled() -> bool:
+    """是否預設啟用主題預取"""
+    return os.getenv("RESEARCH_PREFETCH_ENABLED", "false").lower() == "true"
+
+
+def start_research_prefetch(topic: str, language: str = "zh") -> ResearchPrefetch:
+    """建立並啟動預取任務"""
+    max_queries = int(os.getenv("RESEARCH_MAX_QUERIES", "3"))
+    threshold = float(os.getenv("RESEARCH_COVERAGE_THRESHOLD", "0.6"))
+    prefetch = ResearchPrefetch(
+        topic,
+        language,
+        queries=build_topic_queries(topic, language, max_queries),
+        threshold=threshold,
+    )
+    return prefetch.start()
+
+
+def get_research(config: Optional[dict]) -> Optional[ResearchPrefetch]:
+    """從 RunnableConfig 取出預取 handle（未啟用時為 None）"""
+    if not config:
+        return None
+    return config.get("configurable", {}).get("research")
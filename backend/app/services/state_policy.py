@@ -0,0 +1,243 @@
+"""
+Debate State Policy
+
+DebateState.messages 的 reducer：在 add_messages 合併後套用保留政策，
+讓單場辯論的狀態大小不隨 max_rounds 成長：
+- 已被消化的工具往返（帶 tool_calls 的 AIMessage + ToolMessage）：
+  發起呼叫的辯手（AIMessage.name）之後完成發言即刪除，ToolMessage 依 tool_call_id 隨之刪除
+  （搜尋重點已寫進發言，prompt 也不再引用）；並行 superstep（panel / overlap）中
+  其他發言者完成的發言不會讓尚未消化的工具呼叫被刪除
+- 辯手發言（主持人以外的所有發言者，含 panel 模式的多位辯手）只保留最近 STATE_MAX_TURNS 則
+- 主持人小結只保留最近 STATE_MAX_SUMMARIES 則（作為較早回合的摘要）
+
+每次合併後記錄狀態大小（訊息數、內容位元組）：全部辯論的合計，以及依 debate / thread ID
+分開的每場統計（reducer 拿不到 RunnableConfig，辯論 ID 由 langgraph_debate_stream 以
+bind_debate() 綁定在 context 中，graph 的 task 會繼承），由 /health 回報。
+
+環境變數：
+    STATE_MAX_TURNS: 保留的辯手發言數（預設 10，0 表示不限制）
+    STATE_MAX_SUMMARIES: 保留的主持人小結數（預設 4，0 表示不限制）
+    STATE_STATS_DEBATES: 保留每場統計的最近辯論數（預設 50）
+"""
+
+from collections import OrderedDict
+from contextvars import ContextVar, Token
+from typing import Any, Dict, List, Optional, Set
+import json
+import os
+import logging
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langgraph.graph.message import add_messages
+
+logger = logging.getLogger(__name__)
+
+MODERATOR_NAME = "moderator"
+
+_current_debate: ContextVar[Optional[str]] = ContextVar("state_policy_debate", default=None)
+
+
+# ============================================================
+# 訊息分類與大小
+# ============================================================
+
+def is_tool_traffic(message: BaseMessage) -> bool:
+    """工具往返訊息：ToolMessage 或帶 tool_calls 的 AIMessage"""
+    return isinstance(message, ToolMessage) or (
+        isinstance(message, AIMessage) and bool(message.tool_calls)
+    )
+
+
+def is_turn(message: BaseMessage) -> bool:
+    """完成的發言（沒有 tool_calls 的 AIMessage）"""
+    return isinstance(message, AIMessage) and not message.tool_calls
+
+
+def message_bytes(message: BaseMessage) -> int:
+    """訊息內容的 UTF-8 位元組數（含 tool_calls 參數）"""
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+    size = len(content.encode("utf-8"))
+    if isinstance(message, AIMessage) and message.tool_calls:
+        size += len(json.dumps(message.tool_calls, ensure_ascii=False, default=str).encode("utf-8"))
+    return size
+
+
+def consumed_tool_calls(messages: List[BaseMessage]) -> Set[str]:
+    """已消化的 tool_call_id：發起呼叫的辯手在之後已完成發言"""
+    answered = set()  # 在目前位置之後完成發言的辯手
+    consumed: Set[str] = set()
+    for m in reversed(messages):
+        if is_turn(m):
+            answered.add(m.name)
+        elif isinstance(m, AIMessage) and m.tool_calls and m.name in answered:
+            consumed.update(call.get("id") for call in m.tool_calls)
+    return consumed
+
+
+# ============================================================
+# 狀態大小統計
+# ============================================================
+
+class StateSize:
+    """狀態大小與刪除統計（全部辯論合計或單場辯論）"""
+
+    def __init__(self):
+        self.steps = 0
+        self.last_messages = 0
+        self.last_bytes = 0
+        self.peak_messages = 0
+        self.peak_bytes = 0
+        self.dropped_tool_messages = 0
+        self.dropped_turns = 0
+
+    def observe(self, messages: List[BaseMessage], size: int) -> None:
+        self.steps += 1
+        self.last_messages = len(messages)
+        self.last_bytes = size
+        self.peak_messages = max(self.peak_messages, len(messages))
+        self.peak_bytes = max(self.peak_bytes, size)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "steps": self.steps,
+            "last_messages": self.last_messages,
+            "last_bytes": self.last_bytes,
+            "peak_messages": self.peak_messages,
+            "peak_bytes": self.peak_bytes,
+            "dropped_tool_messages": self.dropped_tool_messages,
+            "dropped_turns": self.dropped_turns,
+        }
+
+
+# ============================================================
+# 保留政策
+# ============================================================
+
+class StatePolicy:
+    """訊息保留政策與狀態大小統計（合計 + 最近 max_debates 場的每場統計）"""
+
+    def __init__(self, max_turns: int = 10, max_summaries: int = 4, max_debates: int = 50):
+        self.max_turns = max_turns
+        self.max_summaries = max_summaries
+        self.max_debates = max_debates
+        self.total = StateSize()
+        self.debates: "OrderedDict[str, StateSize]" = OrderedDict()
+
+    def _sizes(self, debate_id: Optional[str]) -> List[StateSize]:
+        """合計與該場辯論的統計（最近使用的辯論移到最後，超過上限時淘汰最舊者）"""
+        if debate_id is None:
+            return [self.total]
+        size = self.debates.pop(debate_id, None) or StateSize()
+        self.debates[debate_id] = size
+        while len(self.debates) > self.max_debates:
+            self.debates.popitem(last=False)
+        return [self.total, size]
+
+    def apply(self, messages: List[BaseMessage], debate_id: Optional[str] = None) -> List[BaseMessage]:
+        """套用保留政策，返回新的訊息列表（不修改輸入）"""
+        consumed = consumed_tool_calls(messages)
+
+        kept: List[BaseMessage] = []
+        dropped_tool_messages = 0
+        for m in messages:
+            if isinstance(m, ToolMessage):
+                done = m.tool_call_id in consumed
+            else:
+                done = is_tool_traffic(m) and all(call.get("id") in consumed for call in m.tool_calls)
+            if done:
+                dropped_tool_messages += 1
+                continue
+            kept.append(m)
+
+        drop = set()
+        for summaries, limit in ((False, self.max_turns), (True, self.max_summaries)):
+            if limit <= 0:
+                continue
+            turns = [id(m) for m in kept if is_turn(m) and (m.name == MODERATOR_NAME) == summaries]
+            drop.update(turns[:-limit])
+        if drop:
+            kept = [m for m in kept if id(m) not in drop]
+
+        for size in self._sizes(debate_id):
+            size.dropped_tool_messages += dropped_tool_messages
+            size.dropped_turns += len(drop)
+        return kept
+
+    def observe(self, messages: List[BaseMessage], debate_id: Optional[str] = None) -> None:
+        """記錄這一步合併後的狀態大小"""
+        size = sum(message_bytes(m) for m in messages)
+        for record in self._sizes(debate_id):
+            record.observe(messages, size)
+        logger.debug(f"debate state: debate={debate_id}, messages={len(messages)}, bytes={size}")
+
+    def debate_stats(self, debate_id: str) -> Optional[Dict[str, Any]]:
+        size = self.debates.get(debate_id)
+        return size.stats() if size is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_turns": self.max_turns,
+            "max_summaries": self.max_summaries,
+            **self.total.stats(),
+            "debates": {debate_id: size.stats() for debate_id, size in self.debates.items()},
+        }
+
+
+# ============================================================
+# 單例與 reducer
+# ============================================================
+
+_policy: Optional[StatePolicy] = None
+
+
+def get_state_policy() -> StatePolicy:
+    """取得 StatePolicy 單例（依環境變數建立）"""
+    global _policy
+
+    if _policy is None:
+        _policy = StatePolicy(
+            max_turns=int(os.getenv("STATE_MAX_TURNS", "10")),
+            max_summaries=int(os.getenv("STATE_MAX_SUMMARIES", "4")),
+            max_debates=int(os.getenv("STATE_STATS_DEBATES", "50")),
+        )
+    return _policy
+
+
+def get_state_stats() -> Dict[str, Any]:
+    """取得狀態大小統計（合計與每場）"""
+    return get_state_policy().stats()
+
+
+def get_debate_state_stats(debate_id: str) -> Optional[Dict[str, Any]]:
+    """取得單場辯論的狀態大小統計（未記錄或已淘汰時為 None）"""
+    return get_state_policy().debate_stats(debate_id)
+
+
+def bind_debate(debate_id: Optional[str]) -> Token:
+    """將之後的狀態更新歸到 debate_id（在 astream_events 之前呼叫，graph 的 task 繼承 context）"""
+    return _current_debate.set(debate_id)
+
+
+def unbind_debate(token: Token) -> None:
+    """解除 bind_debate（產生器在其他 task 中被關閉時 context 不同，忽略）"""
+    try:
+        _current_debate.reset(token)
+    except ValueError:
+        pass
+
+
+def reset_state_policy() -> None:
+    """
+    重置政策單例（主要用於測試）
+    """
+    global _policy
+    _policy = None
+
+
+def prune_messages(left: List[BaseMessage], right: Any) -> List[BaseMessage]:
+    """DebateState.messages 的 reducer：add_messages 合併後套用保留政策"""
+    policy = get_state_policy()
+    debate_id = _current_debate.get()
+    merged = policy.apply(add_messages(left, right), debate_id)
+    policy.observe(merged, debate_id)
+    return merged
@@ -0,0 +1,177 @@
+"""
+SSE Disconnect Guard
+
+瀏覽器關閉分頁後，StreamingResponse 不會主動停止 SSE 產生器：uvicorn（ASGI spec 2.4）
+只有在下一次送出資料失敗時才發現斷線，在那之前 astream_events 的節點、Groq 串流與搜尋都會繼續執行，
+白白消耗配額與 worker。
+
+guard_disconnect() 包住 SSE 產生器：
+- 產生器在獨立的 producer task 中執行，事件經由容量 1 的佇列交給回應（保留背壓）
+- 等待下一個事件時，每 SSE_DISCONNECT_POLL 秒檢查一次 request.is_disconnected()
+- 斷線（或回應 task 被取消）時取消 producer task：CancelledError 沿 astream_events 傳進
+  LangGraph 的節點 / 工具 task，進行中的 httpx 串流隨之關閉；接著 aclose() 產生器，
+  讓它的 finally（取消主題預取、關閉 astream_events）立即執行
+- 每個串流的結果（完成 / 斷線 / 錯誤）記錄在 StreamStats，/health 回報
+
+/debate 包住的是辯論事件紀錄的訂閱者（app.services.debate_sessions）：斷線時立即停止該連線，
+辯論本身在 SSE_RESUME_GRACE 秒內沒有重連才取消。
+
+環境變數：
+    SSE_DISCONNECT_POLL: 斷線檢查間隔秒數（預設 0.5）
+"""
+
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+import asyncio
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 0.5
+
+_DONE = object()
+
+
+class _StreamError:
+    """producer 端的例外，交給回應端重新拋出"""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+# ============================================================
+# 統計
+# ============================================================
+
+class StreamStats:
+    """SSE 串流結果統計"""
+
+    def __init__(self):
+        self.started = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.disconnected = 0
+        self.max_cleanup_ms = 0.0
+
+    def record_start(self) -> None:
+        self.started += 1
+        self.active += 1
+
+    def record_end(self, outcome: str, cleanup_seconds: float = 0.0) -> None:
+        self.active -= 1
+        if outcome == "completed":
+            self.completed += 1
+        elif outcome == "failed":
+            self.failed += 1
+        else:
+            self.disconnected += 1
+            self.max_cleanup_ms = max(self.max_cleanup_ms, cleanup_seconds * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "started": self.started,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "disconnected": self.disconnected,
+            "max_cleanup_ms": round(self.max_cleanup_ms, 1),
+        }
+
+
+_stats: Optional[StreamStats] = None
+
+
+def get_stream_stats() -> StreamStats:
+    """取得 StreamStats 單例"""
+    global _stats
+
+    if _stats is None:
+        _stats = StreamStats()
+    return _stats
+
+
+def reset_stream_stats() -> None:
+    """
+    重置統計（主要用於測試）
+    """
+    global _stats
+    _stats = None
+
+
+def get_poll_interval() -> float:
+    """斷線檢查間隔（秒）"""
+    return max(float(os.getenv("SSE_DISCONNECT_POLL", str(DEFAULT_POLL_INTERVAL))), 0.01)
+
+
+# ============================================================
+# 斷線取消
+# ============================================================
+
+async def _cancel_producer(producer: "asyncio.Task[None]", stream: AsyncIterator[str]) -> None:
+    """取消 producer task 並關閉產生器（等待兩者的清理完成）"""
+    if not producer.done():
+        producer.cancel()
+    try:
+        await producer
+    except BaseException:
+        pass
+    # producer 卡在佇列時產生器仍停在 yield，aclose() 讓它的 finally 立即執行
+    aclose = getattr(stream, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception as e:
+            logger.debug(f"guard_disconnect: error while closing stream: {e}")
+
+
+async def guard_disconnect(
+    stream: AsyncIterator[str],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    poll_interval: Optional[float] = None
+) -> AsyncIterator[str]:
+    """包住 SSE 產生器：用戶端斷線時立即取消整個辯論（見模組說明）
+
+    Args:
+        stream: SSE 產生器（fake / real / langgraph 串流）
+        is_disconnected: 斷線檢查（通常為 request.is_disconnected）
+        poll_interval: 檢查間隔秒數（None 時依 SSE_DISCONNECT_POLL）
+    """
+    interval = get_poll_interval() if poll_interval is None else poll_interval
+    stats = get_stream_stats()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    async def produce() -> None:
+        try:
+            async for chunk in stream:
+                await queue.put(chunk)
+        except Exception as e:
+            await queue.put(_StreamError(e))
+        else:
+            await queue.put(_DONE)
+
+    stats.record_start()
+    producer = asyncio.create_task(produce())
+    outcome = "disconnected"  # 回應 task 被取消或產生器被提前關閉時也視為斷線
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=interval)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    logger.info("guard_disconnect: client disconnected, cancelling debate")
+                    return
+                continue
+
+            if item is _DONE:
+                outcome = "completed"
+                return
+            if isinstance(item, _StreamError):
+                outcome = "failed"
+                raise item.error
+            yield item
+    finally:
+        started = time.monotonic()
+        await _cancel_producer(producer, stream)
+        stats.record_end(outcome, time.monotonic() - started)
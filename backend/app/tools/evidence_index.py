@@ -0,0 +1,306 @@
+"""
+DebateAI - 跨辯論證據索引
+
+每次 provider 搜尋成功的結果都切段寫入本地 SQLite 倒排索引；
+web_search 先查索引，新鮮且分數夠高的本地命中直接返回，不發出網路請求。
+常見主題（docs/測試題目庫.md）因此只需本地磁碟延遲。
+
+- 段落：依句子切段（app.tools.ranking.split_passages），以內容雜湊去重
+- 倒排表：term → (passage, tf)，斷詞同 app.tools.ranking.tokenize（中文 bigram）
+- 評分：BM25，正規化為 0-1（每個查詢詞在平均長度段落出現一次 ≈ 1.0）
+- 淘汰：超過 max_age 的段落不參與查詢，寫入時刪除；筆數超過上限時刪除最舊者
+
+環境變數：
+    EVIDENCE_INDEX_ENABLED: 是否啟用（預設 false）
+    EVIDENCE_INDEX_PATH: SQLite 檔案路徑（預設 .evidence_index.sqlite3）
+    EVIDENCE_INDEX_MAX_AGE: 段落有效秒數（預設 604800，7 天）
+    EVIDENCE_INDEX_MIN_SCORE: 視為命中的最低正規化分數（預設 0.6）
+    EVIDENCE_INDEX_MIN_PASSAGES: 命中時至少需要的相關段落數（預設 2）
+    EVIDENCE_INDEX_MAX_PASSAGES: 索引最大段落數（預設 20000）
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+from app.tools.ranking import split_passages, tokenize
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+DELETE_BATCH = 500  # 每次 IN (...) 刪除的段落數（低於 SQLite 的參數上限）
+
+
+@dataclass
+class IndexedPassage:
+    """索引查詢結果"""
+    title: str
+    text: str
+    url: str
+    source: str
+    score: float
+
+
+class EvidenceIndex:
+    """以 SQLite 實作的 BM25 倒排索引"""
+
+    def __init__(
+        self,
+        path: str,
+        max_age: float = 604800.0,
+        min_score: float = 0.6,
+        min_passages: int = 2,
+        max_passages: int = 20000,
+    ):
+        self.path = path
+        self.max_age = max_age
+        self.min_score = min_score
+        self.min_passages = min_passages
+        self.max_passages = max_passages
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS passages (
+                id INTEGER PRIMARY KEY,
+                hash TEXT NOT NULL UNIQUE,
+                language TEXT NOT NULL,
+                source TEXT NOT NULL,
+                title TEXT NOT NULL,
+                url TEXT NOT NULL,
+                text TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                passage_id INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, passage_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_passage ON postings (passage_id);
+            CREATE INDEX IF NOT EXISTS idx_passages_created ON passages (language, created_at);
+            CREATE INDEX IF NOT EXISTS idx_passages_age ON passages (created_at);
+            """
+        )
+        self._conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    # ---------- 寫入 ----------
+
+    def add(self, results: List[dict], source: str, language: str) -> int:
+        """將 provider 結果切段寫入索引，返回新增的段落數"""
+        content_key = "body" if source == "duckduckgo" else "content"
+        now = time.time()
+        added = 0
+
+        with self._lock:
+            for result in results:
+                title = result.get("title") or ""
+                url = result.get("url") or result.get("href") or ""
+                for text in split_passages(result.get(content_key) or ""):
+                    terms = tokenize(f"{title} {text}")
+                    if not terms:
+                        continue
+                    digest = hashlib.sha1(f"{language}\0{text}".encode("utf-8")).hexdigest()
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO passages "
+                        "(hash, language, source, title, url, text, length, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (digest, language, source, title, url, text, len(terms), now),
+                    )
+                    if cursor.rowcount == 0:
+                        # 已存在：更新時間，讓常見段落保持新鮮
+                        self._conn.execute("UPDATE passages SET created_at = ? WHERE hash = ?", (now, digest))
+                        continue
+                    passage_id = cursor.lastrowid
+                    self._conn.executemany(
+                        "INSERT INTO postings (term, passage_id, tf) VALUES (?, ?, ?)",
+                        [(term, passage_id, tf) for term, tf in Counter(terms).items()],
+                    )
+                    added += 1
+
+            self._evict(now)
+            self._conn.commit()
+            self.writes += added
+        return added
+
+    def _evict(self, now: float) -> None:
+        """刪除過期段落，並將段落數壓回 max_passages（最舊者優先）
+
+        只刪除被淘汰段落的 postings（走 idx_postings_passage），不掃描整個 postings 表
+        """
+        evicted = [
+            row[0] for row in self._conn.execute(
+                "SELECT id FROM passages WHERE created_at < ?", (now - self.max_age,)
+            )
+        ]
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM passages").fetchone()
+        overflow = count - len(evicted) - self.max_passages
+        if overflow > 0:
+            evicted += [
+                row[0] for row in self._conn.execute(
+                    "SELECT id FROM passages WHERE created_at >= ? ORDER BY created_at ASC LIMIT ?",
+                    (now - self.max_age, overflow),
+                )
+            ]
+        for start in range(0, len(evicted), DELETE_BATCH):
+            batch = evicted[start:start + DELETE_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            self._conn.execute(f"DELETE FROM postings WHERE passage_id IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM passages WHERE id IN ({placeholders})", batch)
+
+    # ---------- 查詢 ----------
+
+    def search(self, query: str, language: str, limit: int = 5) -> List[IndexedPassage]:
+        """以 BM25 查詢新鮮段落，返回依正規化分數排序的結果"""
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+
+        since = time.time() - self.max_age
+        with self._lock:
+            (n, avg_len) = self._conn.execute(
+                "SELECT COUNT(*), AVG(length) FROM passages WHERE language = ? AND created_at >= ?",
+                (language, since),
+            ).fetchone()
+            if not n:
+                return []
+
+            placeholders = ",".join("?" * len(terms))
+            rows = self._conn.execute(
+                f"SELECT p.term, p.passage_id, p.tf, s.length FROM postings p "
+                f"JOIN passages s ON s.id = p.passage_id "
+                f"WHERE p.term IN ({placeholders}) AND s.language = ? AND s.created_at >= ?",
+                (*terms, language, since),
+            ).fetchall()
+
+            doc_freq: Dict[str, int] = Counter(term for term, *_ in rows)
+            idf = {
+                term: math.log(1 + (n - doc_freq.get(term, 0) + 0.5) / (doc_freq.get(term, 0) + 0.5))
+                for term in terms
+            }
+            ideal = sum(idf.values())
+
+            scores: Dict[int, float] = {}
+            for term, passage_id, tf, length in rows:
+                length_norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len)
+                scores[passage_id] = scores.get(passage_id, 0.0) + idf[term] * tf * (BM25_K1 + 1) / (tf + length_norm)
+
+            top = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+            if not top:
+                return []
+
+            details = {
+                row[0]: row[1:]
+                for row in self._conn.execute(
+                    f"SELECT id, title, text, url, source FROM passages "
+                    f"WHERE id IN ({','.join('?' * len(top))})",
+                    [passage_id for passage_id, _ in top],
+                )
+            }
+
+        return [
+            IndexedPassage(*details[passage_id], score=min(score / ideal, 1.0))
+            for passage_id, score in top
+            if passage_id in details
+        ]
+
+    def lookup(self, query: str, language: str, limit: int = 5) -> Optional[List[IndexedPassage]]:
+        """命中時返回相關段落（最高分 ≥ min_score 且相關段落數 ≥ min_passages），否則 None"""
+        passages = self.search(query, language, limit)
+        relevant = [p for p in passages if p.score >= self.min_score / 2]
+        if passages and passages[0].score >= self.min_score and len(relevant) >= self.min_passages:
+            self.hits += 1
+            return relevant
+        self.misses += 1
+        return None
+
+    # ---------- 公開介面（非同步） ----------
+
+    async def alookup(self, query: str, language: str, limit: int = 5) -> Optional[List[IndexedPassage]]:
+        return await asyncio.to_thread(self.lookup, query, language, limit)
+
+    async def aadd(self, results: List[dict], source: str, language: str) -> int:
+        return await asyncio.to_thread(self.add, results, source, language)
+
+    # ---------- 其他 ----------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (passages,) = self._conn.execute("SELECT COUNT(*) FROM passages").fetchone()
+            (terms,) = self._conn.execute("SELECT COUNT(DISTINCT term) FROM postings").fetchone()
+        return {
+            "enabled": True,
+            "passages": passages,
+            "terms": terms,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ============================================================
+# 單例
+# ============================================================
+
+_evidence_index: Optional[EvidenceIndex] = None
+_index_lock = threading.Lock()
+
+
+def is_evidence_index_enabled() -> bool:
+    """檢查證據索引是否啟用"""
+    return os.getenv("EVIDENCE_INDEX_ENABLED", "false").lower() == "true"
+
+
+def get_evidence_index() -> EvidenceIndex:
+    """取得 EvidenceIndex 單例（依環境變數建立）"""
+    global _evidence_index
+
+    with _index_lock:
+        if _evidence_index is None:
+            _evidence_index = EvidenceIndex(
+                path=os.getenv("EVIDENCE_INDEX_PATH", ".evidence_index.sqlite3"),
+                max_age=float(os.getenv("EVIDENCE_INDEX_MAX_AGE", "604800")),
+                min_score=float(os.getenv("EVIDENCE_INDEX_MIN_SCORE", "0.6")),
+                min_passages=int(os.getenv("EVIDENCE_INDEX_MIN_PASSAGES", "2")),
+                max_passages=int(os.getenv("EVIDENCE_INDEX_MAX_PASSAGES", "20000")),
+            )
+            logger.info(f"證據索引已初始化: {_evidence_index.path}")
+
+    return _evidence_index
+
+
+def get_evidence_index_stats() -> Dict[str, Any]:
+    """取得索引統計（未啟用時只回報 enabled=False）"""
+    if not is_evidence_index_enabled() or _evidence_index is None:
+        return {"enabled": is_evidence_index_enabled()}
+    return _evidence_index.stats()
+
+
+def reset_evidence_index() -> None:
+    """
+    關閉並重置索引單例（主要用於測試）
+    """
+    global _evidence_index
+    with _index_lock:
+        if _evidence_index is not None:
+            _evidence_index.close()
+        _evidence_index = None
@@ -0,0 +1,158 @@
+"""
+DebateAI - 近似重複查詢偵測
+
+辯手常用不同說法問同一件事（"AI job loss statistics 2024" vs "AI job losses stats 2024"），
+精確 key 的快取會 miss。這裡提供：
+- 查詢特徵：英文單字（簡易詞幹 + 縮寫還原）、中文 bigram
+- MinHash 簽章 + LSH 分桶，快速找出候選查詢
+- 以特徵集合的 Jaccard 相似度確認，超過門檻才視為同一查詢
+
+斷詞不用字元 n-gram：字元層級會讓 "job loss" 與 "job creation" 比真正的換句話說更相似。
+"""
+
+from typing import Dict, FrozenSet, Hashable, List, Optional, Set, Tuple
+import hashlib
+import random
+import re
+
+_TERM_RE = re.compile(r"[a-z0-9]+|[\u4e00-\u9fff]+")
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]+")
+
+# 常見縮寫 → 詞幹化前的完整詞
+ABBREVIATIONS = {
+    "stats": "statistics",
+    "stat": "statistics",
+    "govt": "government",
+    "gov": "government",
+    "econ": "economy",
+    "pct": "percent",
+    "info": "information",
+    "intl": "international",
+}
+
+STOPWORDS = {"the", "of", "in", "on", "for", "and", "or", "to", "a", "an", "is", "are", "vs", "about"}
+
+# MinHash 雜湊參數（固定種子，讓簽章跨程序穩定）
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_MAX_PERM = 256
+_HASH_PARAMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(_MAX_PERM)]
+
+
+# (字尾, 取代, 最短詞幹)：依序比對，第一個符合者生效（ss 結尾保留，避免 loss → los）
+_SUFFIX_RULES = (
+    ("sses", "ss", 1), ("ies", "y", 2), ("ches", "ch", 1), ("shes", "sh", 1), ("xes", "x", 1),
+    ("ss", "ss", 0), ("ing", "", 3), ("s", "", 3),
+)
+
+
+def stem(word: str) -> str:
+    """極簡英文詞幹（複數與 -ing）"""
+    for suffix, replacement, min_stem in _SUFFIX_RULES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= min_stem:
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def query_features(query: str) -> FrozenSet[str]:
+    """查詢的特徵集合（英文詞幹、中文 bigram，去除停用詞）"""
+    features: Set[str] = set()
+    for run in _TERM_RE.findall(query.lower()):
+        if _CJK_RE.fullmatch(run):
+            if len(run) == 1:
+                features.add(run)
+            else:
+                features.update(run[i:i + 2] for i in range(len(run) - 1))
+        elif run not in STOPWORDS:
+            features.add(stem(ABBREVIATIONS.get(run, run)))
+    return frozenset(features)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _base_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(features: FrozenSet[str], num_perm: int = 64) -> Tuple[int, ...]:
+    """計算 MinHash 簽章（空集合返回空 tuple）"""
+    if not features:
+        return ()
+    hashes = [_base_hash(f) for f in features]
+    return tuple(
+        min((a * h + b) % _PRIME for h in hashes)
+        for a, b in _HASH_PARAMS[:num_perm]
+    )
+
+
+class QueryLSH:
+    """MinHash LSH 索引：key → 特徵，依 band 分桶找候選"""
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16):
+        if num_perm % bands != 0 or num_perm > _MAX_PERM:
+            raise ValueError("num_perm must be a multiple of bands and <= 256")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._features: Dict[Hashable, FrozenSet[str]] = {}
+        self._band_keys: Dict[Hashable, List[Tuple]] = {}
+        self._buckets: Dict[Tuple, Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    def _bands(self, scope: Hashable, signature: Tuple[int, ...]) -> List[Tuple]:
+        return [
+            (scope, i, signature[i * self.rows:(i + 1) * self.rows])
+            for i in range(self.bands)
+        ]
+
+    def add(self, key: Hashable, query: str, scope: Hashable = None) -> None:
+        """加入查詢（scope 不同的查詢彼此不會匹配，例如語言 / provider 鏈）"""
+        self.remove(key)
+        features = query_features(query)
+        signature = minhash(features, self.num_perm)
+        if not signature:
+            return
+        band_keys = self._bands(scope, signature)
+        for band in band_keys:
+            self._buckets.setdefault(band, set()).add(key)
+        self._features[key] = features
+        self._band_keys[key] = band_keys
+
+    def remove(self, key: Hashable) -> None:
+        for band in self._band_keys.pop(key, []):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+        self._features.pop(key, None)
+
+    def query(self, query: str, scope: Hashable = None) -> Optional[Tuple[Hashable, float]]:
+        """找出最相似且超過門檻的已知查詢，返回 (key, 相似度)"""
+        features = query_features(query)
+        signature = minhash(features, self.num_perm)
+        if not signature:
+            return None
+
+        candidates: Set[Hashable] = set()
+        for band in self._bands(scope, signature):
+            candidates |= self._buckets.get(band, set())
+
+        best: Optional[Tuple[Hashable, float]] = None
+        for key in candidates:
+            similarity = jaccard(features, self._features[key])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+
+    def clear(self) -> None:
+        self._features.clear()
+        self._band_keys.clear()
+        self._buckets.clear()
@@ -0,0 +1,203 @@
+"""
+DebateAI - 搜尋結果相關性排序與壓縮
+
+原本 format_results 只取前三筆、每筆截 200 字，辯手節點再把最多六則 ToolMessage
+原封不動貼進 prompt。這裡改為：
+1. 切成句子段落（passage）
+2. 以 BM25 對「查詢 + 辯論主題」評分
+3. 移除近似重複的段落
+4. 依分數把最佳段落裝進 token 預算
+
+斷詞：英數單字 + 中文 bigram（不需額外斷詞套件）。
+
+環境變數：
+    SEARCH_RESULT_TOKEN_BUDGET: 單次搜尋結果的 token 預算（預設 300）
+    TOOL_CONTEXT_TOKEN_BUDGET: 辯手 prompt 中搜尋結果的 token 預算（預設 600）
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+import math
+import os
+import re
+
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]+")
+_TERM_RE = re.compile(r"[a-z0-9]+|[\u4e00-\u9fff]+")
+_SENTENCE_RE = re.compile(r"(?<=[。！？!?；;])|(?<=\.)\s+|\n+")
+
+# 近似重複門檻（詞集合 Jaccard）
+DUPLICATE_THRESHOLD = 0.8
+
+
+@dataclass
+class Passage:
+    """可排序的證據段落"""
+    title: str
+    text: str
+    score: float = 0.0
+    order: int = 0
+
+
+# ============================================================
+# 斷詞與 token 估算
+# ============================================================
+
+def tokenize(text: str) -> List[str]:
+    """斷詞：英數單字（長度 > 1）+ 中文 bigram（單字詞保留原字），保留重複以計算詞頻"""
+    terms: List[str] = []
+    for run in _TERM_RE.findall(text.lower()):
+        if _CJK_RE.fullmatch(run):
+            if len(run) == 1:
+                terms.append(run)
+            else:
+                terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        elif len(run) > 1:
+            terms.append(run)
+    return terms
+
+
+def estimate_tokens(text: str) -> int:
+    """粗估 token 數：中文每字約 1 token，其餘約 4 字元 1 token"""
+    cjk = sum(len(run) for run in _CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+# ============================================================
+# 切段、BM25、去重
+# ============================================================
+
+def split_passages(text: str, max_chars: int = 280) -> List[str]:
+    """依句子邊界切段，每段不超過 max_chars（單一長句直接截斷）"""
+    sentences = [s.strip() for s in _SENTENCE_RE.split(text) if s and s.strip()]
+    passages: List[str] = []
+    current = ""
+    for sentence in sentences:
+        sentence = sentence[:max_chars]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            passages.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip() if current else sentence
+    if current:
+        passages.append(current)
+    return passages
+
+
+def bm25_scores(query_terms: Sequence[str], documents: Sequence[Sequence[str]], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """以 BM25 計算每份文件對查詢的分數"""
+    if not documents:
+        return []
+
+    n = len(documents)
+    avg_len = sum(len(d) for d in documents) / n or 1.0
+    doc_freq: Dict[str, int] = Counter()
+    for doc in documents:
+        doc_freq.update(set(doc))
+
+    query = set(query_terms)
+    scores = []
+    for doc in documents:
+        tf = Counter(doc)
+        length_norm = k1 * (1 - b + b * len(doc) / avg_len)
+        score = 0.0
+        for term in query:
+            freq = tf.get(term)
+            if not freq:
+                continue
+            idf = math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            score += idf * freq * (k1 + 1) / (freq + length_norm)
+        scores.append(score)
+    return scores
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def dedupe_passages(passages: List[Passage], threshold: float = DUPLICATE_THRESHOLD) -> List[Passage]:
+    """移除近似重複段落（保留先出現、也就是分數較高者）"""
+    kept: List[Passage] = []
+    kept_terms: List[set] = []
+    for passage in passages:
+        terms = set(tokenize(passage.text))
+        if any(jaccard(terms, other) >= threshold for other in kept_terms):
+            continue
+        kept.append(passage)
+        kept_terms.append(terms)
+    return kept
+
+
+# ============================================================
+# 排序與預算裝箱
+# ============================================================
+
+def rank_passages(passages: List[Passage], query: str, topic: str = "") -> List[Passage]:
+    """以 BM25 對 query + topic 排序（無查詢詞時維持原順序），並去除近似重複"""
+    query_terms = tokenize(f"{query} {topic}")
+    scores = bm25_scores(query_terms, [tokenize(f"{p.title} {p.text}") for p in passages])
+    for passage, score in zip(passages, scores):
+        passage.score = score
+    ordered = sorted(passages, key=lambda p: (-p.score, p.order))
+    return dedupe_passages(ordered)
+
+
+def pack_passages(passages: List[Passage], budget: int) -> List[Passage]:
+    """依序把段落裝進 token 預算（放不下的跳過，繼續嘗試較短的段落）"""
+    packed: List[Passage] = []
+    used = 0
+    for passage in passages:
+        cost = estimate_tokens(passage.title) + estimate_tokens(passage.text) + 2
+        if used + cost > budget:
+            continue
+        packed.append(passage)
+        used += cost
+    return packed
+
+
+def select_evidence(
+    results: List[dict],
+    content_key: str,
+    query: str,
+    topic: str = "",
+    budget: Optional[int] = None,
+    no_title: str = "",
+) -> List[Passage]:
+    """搜尋結果 → 排序、去重、裝箱後的段落"""
+    budget = get_result_budget() if budget is None else budget
+
+    passages: List[Passage] = []
+    for result in results:
+        title = result.get("title") or no_title
+        for text in split_passages(result.get(content_key) or ""):
+            passages.append(Passage(title=title, text=text, order=len(passages)))
+
+    return pack_passages(rank_passages(passages, query, topic), budget)
+
+
+def compress_tool_context(contents: List[str], query: str, topic: str = "", budget: Optional[int] = None) -> List[str]:
+    """將多則已格式化的搜尋結果（ToolMessage 內容）重新排序、去重並裝進預算
+
+    每行（「• 標題: 內容」）視為一個段落；標頭行（[SOURCE] ...）略過。
+    """
+    budget = get_context_budget() if budget is None else budget
+
+    passages: List[Passage] = []
+    for content in contents:
+        for line in content.splitlines():
+            line = line.strip()
+            if not line or line.startswith("["):
+                continue
+            passages.append(Passage(title="", text=line.lstrip("• ").strip(), order=len(passages)))
+
+    return [p.text for p in pack_passages(rank_passages(passages, query, topic), budget)]
+
+
+def get_result_budget() -> int:
+    return int(os.getenv("SEARCH_RESULT_TOKEN_BUDGET", "300"))
+
+
+def get_context_budget() -> int:
+    return int(os.getenv("TOOL_CONTEXT_TOKEN_BUDGET", "600"))
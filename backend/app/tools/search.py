@@ -5,16 +5,51 @@ DebateAI - 網路搜尋工具模組
 1. Tavily（主）- 專為 AI 設計，極度穩定
 2. DuckDuckGo（備援）- 免費無限次數
 3. 優雅降級 - 搜尋失敗不影響辯論
+
+Hedged 模式（SEARCH_HEDGE_DELAY）：
+- Tavily 先出發，hedge delay 後（或 Tavily 提早失敗時）啟動 DuckDuckGo
+- 先成功者勝出，另一個請求被取消
+- 設為 "off" 時退回原本的循序 fallback
+
+熔斷器（app.tools.search_health）：熔斷中的 provider 會被立即跳過。
+
+證據索引（app.tools.evidence_index，EVIDENCE_INDEX_ENABLED）：
+provider 結果寫入本地 BM25 索引；新鮮且分數夠高的本地命中直接返回，不發出網路請求。
 """
 
 from tavily import TavilyClient
 from duckduckgo_search import DDGS
+from typing import Optional
 import os
+import time
 import asyncio
+import threading
+import logging
+
+from app.tools.search_health import get_breaker
+from app.tools.search_io import run_blocking
+from app.tools.search_metrics import record_cancelled, record_latency
+
+logger = logging.getLogger(__name__)
 
 # 初始化 Tavily 客戶端（可選）
 tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY")) if os.getenv("TAVILY_API_KEY") else None
 
+# DDGS session 以執行緒為單位重用（避免每次搜尋都建立新的 HTTP client）
+# reset_search_io() 換掉 executor 時執行緒（連同其 session）一併更換
+_ddgs_local = threading.local()
+
+
+def _get_ddgs() -> DDGS:
+    """取得目前執行緒的 DDGS session（只在搜尋 executor 執行緒內呼叫）
+
+    session 由模組屬性 DDGS 建立（測試 patch app.tools.search.DDGS 注入假的 client）
+    """
+    ddgs = getattr(_ddgs_local, "ddgs", None)
+    if ddgs is None:
+        ddgs = _ddgs_local.ddgs = DDGS()
+    return ddgs
+
 
 async def tavily_search(query: str) -> dict:
     """第一層：Tavily 搜尋（專業 AI 搜尋）"""
@@ -22,11 +57,13 @@ async def tavily_search(query: str) -> dict:
         return {"success": False, "error": "No Tavily API key"}
 
     try:
-        # Tavily 是同步的，用 asyncio 包裝
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: tavily_client.search(query, max_results=3, search_depth="basic")
+        # Tavily 是同步的，交給搜尋專用 executor（含並行上限）
+        response = await run_blocking(
+            "tavily",
+            tavily_client.search,
+            query,
+            max_results=3,
+            search_depth="basic"
         )
 
         results = response.get("results", [])
@@ -39,18 +76,16 @@ async def tavily_search(query: str) -> dict:
             "source": "tavily"
         }
     except Exception as e:
-        return {"success": False, "error": str(e)}
+        return {"success": False, "error": str(e), "provider_error": True}
 
 
 async def duckduckgo_search(query: str) -> dict:
     """第二層：DuckDuckGo 搜尋（免費備援）"""
     try:
-        # DDGS 是同步的，用 asyncio 包裝
-        loop = asyncio.get_event_loop()
-        ddgs = DDGS()
-        results = await loop.run_in_executor(
-            None,
-            lambda: list(ddgs.text(query, max_results=3))
+        # DDGS 是同步的，交給搜尋專用 executor（含並行上限、重用 session）
+        results = await run_blocking(
+            "duckduckgo",
+            lambda: list(_get_ddgs().text(query, max_results=3))
         )
 
         if not results:
@@ -62,11 +97,20 @@ async def duckduckgo_search(query: str) -> dict:
             "source": "duckduckgo"
         }
     except Exception as e:
-        return {"success": False, "error": str(e)}
+        return {"success": False, "error": str(e), "provider_error": True}
+
+
+def get_provider_chain() -> str:
+    """目前啟用的 provider 鏈（作為快取 key 的一部分）"""
+    return "tavily>duckduckgo" if tavily_client else "duckduckgo"
 
 
 async def web_search(query: str, language: str = "zh") -> dict:
-    """三層容錯網路搜尋
+    """三層容錯網路搜尋（含單飛 TTL 快取）
+
+    相同 (query, language, provider 鏈) 在 TTL 內直接重用結果，
+    並行的相同查詢只會發出一次 provider 請求（見 app.tools.search_cache）。
+    只快取成功的結果，降級訊息不快取。
 
     Args:
         query: 搜尋關鍵字
@@ -80,17 +124,151 @@ async def web_search(query: str, language: str = "zh") -> dict:
             "formatted": str  # 格式化的結果文字
         }
     """
+    from app.tools.search_cache import get_search_cache, is_search_cache_enabled, make_search_key
+
+    if not is_search_cache_enabled():
+        return await _web_search_uncached(query, language)
+
+    key = make_search_key(query, language, get_provider_chain())
+    return await get_search_cache().get_or_fetch(
+        key,
+        lambda: _web_search_uncached(query, language)
+    )
+
+
+def get_hedge_delay() -> Optional[float]:
+    """讀取 hedge delay（秒）；"off" 表示停用 hedged 模式
+
+    環境變數：
+        SEARCH_HEDGE_DELAY: DuckDuckGo 延後啟動的秒數（預設 1.5，0 表示同時出發）
+    """
+    value = os.getenv("SEARCH_HEDGE_DELAY", "1.5").strip().lower()
+    if value in ("off", "false", "none", ""):
+        return None
+    return max(float(value), 0.0)
+
+
+async def _timed_search(provider: str, query: str) -> dict:
+    """呼叫單一 provider：先檢查熔斷器，再記錄延遲與結果
+
+    熔斷中的 provider 直接返回失敗，不發出任何網路請求。
+    """
+    breaker = get_breaker(provider)
+    if not breaker.allow():
+        logger.debug(f"search breaker open, skipping {provider}")
+        return {"success": False, "error": f"{provider} circuit open", "skipped": True}
+
+    search_fn = tavily_search if provider == "tavily" else duckduckgo_search
+    started = time.monotonic()
+    try:
+        result = await search_fn(query)
+    except asyncio.CancelledError:
+        record_cancelled(provider)
+        breaker.release()
+        raise
+    record_latency(provider, time.monotonic() - started, result.get("success", False))
+
+    if result.get("provider_error"):
+        breaker.record_failure()
+    elif result.get("success"):
+        breaker.record_success()
+    else:
+        # 沒有結果 / 未設定 API key：不影響健康度
+        breaker.release()
+    return result
+
 
-    # 第一層：Tavily
-    result = await tavily_search(query)
+async def _sequential_search(query: str) -> dict:
+    """循序 fallback：Tavily 完成（或失敗）後才嘗試 DuckDuckGo"""
+    result = await _timed_search("tavily", query)
     if result["success"]:
-        formatted = format_results(result["results"], result["source"], language)
-        return {**result, "formatted": formatted}
+        return result
+    return await _timed_search("duckduckgo", query)
+
+
+async def _hedged_search(query: str, hedge_delay: float) -> dict:
+    """Hedged 搜尋：先成功者勝出，落後的請求被取消"""
+    tavily_task = asyncio.create_task(_timed_search("tavily", query))
+    pending = {tavily_task}
+    ddg_task = None
+    last_result = {"success": False, "error": "No results"}
+    hedge_at = time.monotonic() + hedge_delay
+
+    try:
+        while pending:
+            timeout = max(hedge_at - time.monotonic(), 0.0) if ddg_task is None else None
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                result = task.result()
+                if result["success"]:
+                    return result
+                last_result = result
+
+            # hedge delay 到期，或 Tavily 已失敗：啟動 DuckDuckGo
+            if ddg_task is None:
+                logger.debug(f"hedged search: starting duckduckgo for '{query}'")
+                ddg_task = asyncio.create_task(_timed_search("duckduckgo", query))
+                pending.add(ddg_task)
+
+        return last_result
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _local_search(query: str, language: str) -> Optional[dict]:
+    """查詢本地證據索引（未啟用、未命中或失敗時返回 None）"""
+    from app.tools.evidence_index import get_evidence_index, is_evidence_index_enabled
+
+    if not is_evidence_index_enabled():
+        return None
+    try:
+        passages = await get_evidence_index().alookup(query, language)
+    except Exception as e:
+        logger.warning(f"evidence index lookup failed: {e}")
+        return None
+    if not passages:
+        return None
+
+    logger.debug(f"evidence index hit for '{query}' ({len(passages)} passages)")
+    return {
+        "success": True,
+        "results": [{"title": p.title, "content": p.text, "url": p.url} for p in passages],
+        "source": "local",
+    }
+
+
+async def _index_results(result: dict, language: str) -> None:
+    """將 provider 結果寫入本地證據索引（失敗不影響搜尋）"""
+    from app.tools.evidence_index import get_evidence_index, is_evidence_index_enabled
+
+    if not is_evidence_index_enabled() or result.get("source") == "local":
+        return
+    try:
+        await get_evidence_index().aadd(result["results"], result["source"], language)
+    except Exception as e:
+        logger.warning(f"evidence index write failed: {e}")
+
+
+async def _web_search_uncached(query: str, language: str = "zh") -> dict:
+    """實際執行三層容錯搜尋（先查本地證據索引）"""
+
+    # 第零層：本地證據索引
+    result = await _local_search(query, language)
+
+    # 第一、二層：Tavily / DuckDuckGo（hedged 或循序）
+    if result is None:
+        hedge_delay = get_hedge_delay()
+        if hedge_delay is None or tavily_client is None:
+            result = await _sequential_search(query)
+        else:
+            result = await _hedged_search(query, hedge_delay)
+        if result["success"]:
+            await _index_results(result, language)
 
-    # 第二層：DuckDuckGo
-    result = await duckduckgo_search(query)
     if result["success"]:
-        formatted = format_results(result["results"], result["source"], language)
+        formatted = format_results(result["results"], result["source"], language, query=query)
         return {**result, "formatted": formatted}
 
     # 第三層：優雅降級
@@ -106,19 +284,32 @@ async def web_search(query: str, language: str = "zh") -> dict:
     }
 
 
-def format_results(results: list, source: str, language: str = "zh") -> str:
+def format_results(
+    results: list,
+    source: str,
+    language: str = "zh",
+    query: str = "",
+    budget: Optional[int] = None
+) -> str:
     """格式化搜尋結果為可讀文字
 
+    結果先切段，以 BM25 對 query 排序、去除近似重複，
+    再依 token 預算挑選段落（見 app.tools.ranking）。
+
     Args:
         results: 搜尋結果列表
-        source: 來源（"tavily" | "duckduckgo"）
+        source: 來源（"tavily" | "duckduckgo" | "local"）
         language: 語言設定 ("zh" 或 "en")
+        query: 搜尋查詢（用於相關性排序，空字串時維持原順序）
+        budget: token 預算（None 時依 SEARCH_RESULT_TOKEN_BUDGET）
 
     Returns:
         格式化的文字
     """
-    # 根據來源選擇內容欄位（Tavily 用 content，DuckDuckGo 用 body）
-    content_key = "content" if source == "tavily" else "body"
+    from app.tools.ranking import select_evidence
+
+    # 根據來源選擇內容欄位（DuckDuckGo 用 body，Tavily / 本地索引用 content）
+    content_key = "body" if source == "duckduckgo" else "content"
     
     if language == "en":
         no_title = "Unknown Title"
@@ -127,10 +318,8 @@ def format_results(results: list, source: str, language: str = "zh") -> str:
         no_title = "未知標題"
         header = f"[{source.upper()}] 搜尋結果："
     
-    lines = [
-        f"• {r.get('title', no_title)}: {r.get(content_key, '')[:200]}..."
-        for r in results[:3]
-    ]
+    passages = select_evidence(results, content_key, query, budget=budget, no_title=no_title)
+    lines = [f"• {p.title}: {p.text}" for p in passages]
     
     formatted = "\n".join(lines)
     return f"{header}\n{formatted}"
@@ -0,0 +1,200 @@
+"""
+DebateAI - 搜尋結果快取
+
+web_search 前的單飛（single-flight）TTL 快取：
+- Key：(正規化 query, 語言, provider 鏈)
+- LRU + TTL 淘汰，只快取成功的結果
+- 相同 key 的並行請求合併為一次 provider 呼叫（在獨立 task 執行，單一呼叫者取消不影響其他人）
+- 精確 key miss 時，以 MinHash LSH 找近似重複的查詢（app.tools.query_similarity）
+- 提供 hit / near_hit / miss / coalesced 計數與命中率，方便評估容量與近似比對的效益
+
+環境變數：
+    SEARCH_CACHE_ENABLED: 是否啟用（預設 true）
+    SEARCH_CACHE_TTL: 有效秒數（預設 600）
+    SEARCH_CACHE_SIZE: 最大筆數（預設 512）
+    SEARCH_CACHE_SIMILARITY: 近似查詢的 Jaccard 門檻（預設 0.8，"off" 停用）
+"""
+
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import os
+import re
+import time
+import unicodedata
+
+from app.tools.query_similarity import QueryLSH
+
+SearchKey = Tuple[str, str, str]
+
+
+def normalize_query(query: str) -> str:
+    """正規化查詢字串：NFKC、轉小寫、合併空白、去除頭尾標點"""
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.strip(" ?？!！.。,，")
+
+
+def make_search_key(query: str, language: str, provider: str) -> SearchKey:
+    return (normalize_query(query), language, provider)
+
+
+class SearchCache:
+    """單飛 + LRU + TTL 的搜尋快取（可選近似查詢比對）"""
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 512, similarity: Optional[float] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[SearchKey, Tuple[float, dict]]" = OrderedDict()
+        self._inflight: Dict[SearchKey, asyncio.Future] = {}
+        self._similar = QueryLSH(threshold=similarity) if similarity else None
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: SearchKey) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if time.monotonic() >= expires_at:
+            self._delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def get_similar(self, key: SearchKey) -> Optional[dict]:
+        """以近似查詢找快取結果（同語言、同 provider 鏈）"""
+        if self._similar is None:
+            return None
+        match = self._similar.query(key[0], scope=key[1:])
+        if match is None:
+            return None
+        return self.get(match[0])
+
+    def set(self, key: SearchKey, result: dict) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        if self._similar is not None:
+            self._similar.add(key, key[0], scope=key[1:])
+        while len(self._entries) > self.max_entries:
+            self._delete(next(iter(self._entries)))
+
+    def _delete(self, key: SearchKey) -> None:
+        self._entries.pop(key, None)
+        if self._similar is not None:
+            self._similar.remove(key)
+
+    async def get_or_fetch(
+        self,
+        key: SearchKey,
+        fetch: Callable[[], Awaitable[dict]],
+        cacheable: Callable[[dict], bool] = lambda r: bool(r.get("success")),
+    ) -> dict:
+        """讀取快取；miss 時執行 fetch，並讓同 key 的並行請求共用結果"""
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        cached = self.get_similar(key)
+        if cached is not None:
+            self.near_hits += 1
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # fetch 在獨立的 task 執行：發起者被取消（工具逾時、預取取消、用戶端斷線）時，
+            # 其他辯論合併進來的等待者仍拿到結果；完成的結果照常寫入快取
+            inflight = asyncio.ensure_future(fetch())
+            self._inflight[key] = inflight
+            inflight.add_done_callback(lambda task: self._fetch_done(key, task, cacheable))
+
+        # shield：每個呼叫者只取消自己的等待，不影響共用的請求
+        return await asyncio.shield(inflight)
+
+    def _fetch_done(self, key: SearchKey, task: "asyncio.Future", cacheable: Callable[[dict], bool]) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        if task.exception() is not None:  # 讀取例外，避免沒有等待者時的警告
+            return
+        result = task.result()
+        if cacheable(result):
+            self.set(key, result)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.near_hits + self.misses + self.coalesced
+        exact = self.hits + self.coalesced
+        return {
+            "enabled": True,
+            "size": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            # 精確比對命中率 vs 加上近似比對後的命中率
+            "exact_hit_rate": round(exact / lookups, 3) if lookups else None,
+            "hit_rate": round((exact + self.near_hits) / lookups, 3) if lookups else None,
+            "similarity": self._similar.threshold if self._similar is not None else None,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._inflight.clear()
+        if self._similar is not None:
+            self._similar.clear()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+
+_search_cache: Optional[SearchCache] = None
+
+
+def is_search_cache_enabled() -> bool:
+    """檢查搜尋快取是否啟用"""
+    return os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+
+
+def get_similarity_threshold() -> Optional[float]:
+    """近似查詢門檻（"off" 或 0 表示只用精確比對）"""
+    value = os.getenv("SEARCH_CACHE_SIMILARITY", "0.8").strip().lower()
+    if value in ("off", "false", "none", ""):
+        return None
+    return float(value) or None
+
+
+def get_search_cache() -> SearchCache:
+    """取得 SearchCache 單例"""
+    global _search_cache
+
+    if _search_cache is None:
+        _search_cache = SearchCache(
+            ttl=float(os.getenv("SEARCH_CACHE_TTL", "600")),
+            max_entries=int(os.getenv("SEARCH_CACHE_SIZE", "512")),
+            similarity=get_similarity_threshold(),
+        )
+    return _search_cache
+
+
+def get_search_cache_stats() -> dict:
+    """取得快取統計（未啟用時只回報 enabled=False）"""
+    if not is_search_cache_enabled():
+        return {"enabled": False}
+    return get_search_cache().stats()
+
+
+def reset_search_cache() -> None:
+    """
+    重置快取單例（主要用於測試）
+    """
+    global _search_cache
+    _search_cache = None
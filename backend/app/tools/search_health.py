@@ -0,0 +1,157 @@
+"""
+DebateAI - 搜尋 provider 熔斷器
+
+Tavily 掛掉或額度用完時，不再讓每次搜尋都先吃一次失敗：
+- closed：正常呼叫，記錄成功 / 失敗
+- open：失敗率或連續失敗超過門檻，冷卻期間直接跳過
+- half_open：冷卻結束後只放行少量探測請求，成功即恢復 closed
+
+只有 provider 例外（provider_error）會計為失敗；「沒有結果」不算。
+
+環境變數：
+    SEARCH_BREAKER_WINDOW: 滑動視窗樣本數（預設 20）
+    SEARCH_BREAKER_FAILURE_RATE: 觸發熔斷的失敗率（預設 0.5）
+    SEARCH_BREAKER_MIN_SAMPLES: 計算失敗率的最少樣本數（預設 4）
+    SEARCH_BREAKER_CONSECUTIVE: 連續失敗幾次即熔斷（預設 3）
+    SEARCH_BREAKER_COOLDOWN: 熔斷冷卻秒數（預設 60）
+    SEARCH_BREAKER_PROBES: half_open 時同時放行的探測數（預設 1）
+"""
+
+from collections import deque
+from typing import Deque, Dict
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProviderBreaker:
+    """單一搜尋 provider 的熔斷器"""
+
+    def __init__(
+        self,
+        provider: str,
+        window: int = 20,
+        failure_rate: float = 0.5,
+        min_samples: int = 4,
+        consecutive: int = 3,
+        cooldown: float = 60.0,
+        probes: int = 1,
+    ):
+        self.provider = provider
+        self.failure_rate = failure_rate
+        self.min_samples = min_samples
+        self.consecutive = consecutive
+        self.cooldown = cooldown
+        self.probes = probes
+
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.consecutive_failures = 0
+        self.probes_in_flight = 0
+        self.skipped = 0
+
+    def _refresh(self, now: float) -> str:
+        if self.state == OPEN and now >= self.open_until:
+            self.state = HALF_OPEN
+            self.probes_in_flight = 0
+            logger.info(f"search breaker half-open: {self.provider}")
+        return self.state
+
+    def allow(self) -> bool:
+        """是否放行這次請求（half_open 時會佔用一個探測名額）"""
+        state = self._refresh(time.monotonic())
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self.probes_in_flight < self.probes:
+            self.probes_in_flight += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self.open_until = now + self.cooldown
+        self.probes_in_flight = 0
+        logger.warning(f"search breaker open: {self.provider} ({self.cooldown:.0f}s)")
+
+    def record_success(self) -> None:
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            logger.info(f"search breaker closed: {self.provider}")
+        self.state = CLOSED
+        self.probes_in_flight = 0
+
+    def record_failure(self) -> None:
+        now = time.monotonic()
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+
+        if self._refresh(now) == HALF_OPEN:
+            self._open(now)
+        elif self.state == CLOSED and (
+            self.consecutive_failures >= self.consecutive
+            or (len(self.outcomes) >= self.min_samples and 1.0 - self.health() >= self.failure_rate)
+        ):
+            self._open(now)
+
+    def release(self) -> None:
+        """請求被取消時釋放探測名額"""
+        if self.state == HALF_OPEN and self.probes_in_flight > 0:
+            self.probes_in_flight -= 1
+
+    def health(self) -> float:
+        """健康分數：視窗內成功率（無樣本時為 1.0）"""
+        if not self.outcomes:
+            return 1.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        state = self._refresh(now)
+        return {
+            "state": state,
+            "health": round(self.health(), 3),
+            "samples": len(self.outcomes),
+            "consecutive_failures": self.consecutive_failures,
+            "skipped": self.skipped,
+            "open_for": round(max(self.open_until - now, 0.0), 1) if state == OPEN else 0.0,
+        }
+
+
+_breakers: Dict[str, ProviderBreaker] = {}
+
+
+def get_breaker(provider: str) -> ProviderBreaker:
+    """取得 provider 的熔斷器（依環境變數建立）"""
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        breaker = _breakers[provider] = ProviderBreaker(
+            provider,
+            window=int(os.getenv("SEARCH_BREAKER_WINDOW", "20")),
+            failure_rate=float(os.getenv("SEARCH_BREAKER_FAILURE_RATE", "0.5")),
+            min_samples=int(os.getenv("SEARCH_BREAKER_MIN_SAMPLES", "4")),
+            consecutive=int(os.getenv("SEARCH_BREAKER_CONSECUTIVE", "3")),
+            cooldown=float(os.getenv("SEARCH_BREAKER_COOLDOWN", "60")),
+            probes=int(os.getenv("SEARCH_BREAKER_PROBES", "1")),
+        )
+    return breaker
+
+
+def get_breaker_states() -> dict:
+    """取得所有 provider 的熔斷器狀態"""
+    return {provider: breaker.snapshot() for provider, breaker in _breakers.items()}
+
+
+def reset_breakers() -> None:
+    """
+    清空所有熔斷器（主要用於測試）
+    """
+    _breakers.clear()
@@ -0,0 +1,118 @@
+"""
+DebateAI - 搜尋 I/O 層
+
+Tavily / DuckDuckGo SDK 都是同步阻塞呼叫。原本用 run_in_executor(None, ...)
+共用預設 thread pool，負載高時會拖慢其他 to_thread 使用者。
+- 專用、有大小上限的 ThreadPoolExecutor
+- 每個 provider 的並行上限（超過的請求在 event loop 上排隊，不佔執行緒）
+- 排隊深度 / 執行中數量指標
+
+環境變數：
+    SEARCH_EXECUTOR_WORKERS: 搜尋專用執行緒數（預設 8）
+    SEARCH_CONCURRENCY_TAVILY: Tavily 並行上限（預設 4）
+    SEARCH_CONCURRENCY_DUCKDUCKGO: DuckDuckGo 並行上限（預設 2）
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import functools
+import os
+
+DEFAULT_CONCURRENCY = {"tavily": 4, "duckduckgo": 2}
+
+
+class ProviderLimiter:
+    """單一 provider 的並行上限與排隊指標"""
+
+    def __init__(self, provider: str, limit: int):
+        self.provider = provider
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+        self.active = 0
+        self.peak_waiting = 0
+        self.total = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        self.total += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "peak_waiting": self.peak_waiting,
+            "total": self.total,
+        }
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_limiters: Dict[str, ProviderLimiter] = {}
+
+
+def get_search_executor() -> ThreadPoolExecutor:
+    """取得搜尋專用 executor 單例"""
+    global _executor
+
+    if _executor is None:
+        workers = int(os.getenv("SEARCH_EXECUTOR_WORKERS", "8"))
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search-io")
+    return _executor
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    """取得 provider 的並行限制器"""
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        env_key = f"SEARCH_CONCURRENCY_{provider.upper()}"
+        limit = int(os.getenv(env_key, str(DEFAULT_CONCURRENCY.get(provider, 2))))
+        limiter = _limiters[provider] = ProviderLimiter(provider, limit)
+    return limiter
+
+
+async def run_blocking(provider: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """在 provider 並行上限內，於專用 executor 執行阻塞呼叫"""
+    async with get_limiter(provider).slot():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_search_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def get_search_io_stats() -> dict:
+    """取得 executor 與各 provider 的排隊指標"""
+    executor = {"workers": None, "queued": 0}
+    if _executor is not None:
+        executor = {
+            "workers": _executor._max_workers,
+            "queued": _executor._work_queue.qsize(),
+        }
+    return {
+        "executor": executor,
+        "providers": {name: limiter.stats() for name, limiter in _limiters.items()},
+    }
+
+
+def reset_search_io() -> None:
+    """
+    關閉 executor 並清空限制器（主要用於測試）
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor = None
+    _limiters.clear()
@@ -0,0 +1,91 @@
+"""
+DebateAI - 搜尋 provider 指標
+
+每個 provider 的延遲直方圖（固定 bucket + 近期樣本百分位數），
+用來把 hedge delay 調整到實際的 p95。
+"""
+
+from bisect import bisect_left
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+# 直方圖 bucket 上界（秒），最後一格為 +Inf
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0]
+
+
+class LatencyHistogram:
+    """單一 provider 的延遲直方圖"""
+
+    def __init__(self, recent_size: int = 200):
+        self.buckets: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.recent: Deque[float] = deque(maxlen=recent_size)
+        self.count = 0
+        self.total = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.cancelled = 0
+
+    def observe(self, seconds: float, success: bool) -> None:
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.recent.append(seconds)
+        self.count += 1
+        self.total += seconds
+        if success:
+            self.successes += 1
+        else:
+            self.failures += 1
+
+    def observe_cancelled(self) -> None:
+        self.cancelled += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """近期樣本的百分位數（q 介於 0-1）"""
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        index = min(int(q * len(ordered)), len(ordered) - 1)
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        labels = [f"le_{b}" for b in LATENCY_BUCKETS] + ["le_inf"]
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "count": self.count,
+            "successes": self.successes,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "avg": round(self.total / self.count, 3) if self.count else None,
+            "p50": round(p50, 3) if p50 is not None else None,
+            "p95": round(p95, 3) if p95 is not None else None,
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+_histograms: Dict[str, LatencyHistogram] = {}
+
+
+def get_histogram(provider: str) -> LatencyHistogram:
+    histogram = _histograms.get(provider)
+    if histogram is None:
+        histogram = _histograms[provider] = LatencyHistogram()
+    return histogram
+
+
+def record_latency(provider: str, seconds: float, success: bool) -> None:
+    get_histogram(provider).observe(seconds, success)
+
+
+def record_cancelled(provider: str) -> None:
+    get_histogram(provider).observe_cancelled()
+
+
+def get_search_metrics() -> dict:
+    """取得所有 provider 的延遲統計"""
+    return {provider: h.snapshot() for provider, h in _histograms.items()}
+
+
+def reset_search_metrics() -> None:
+    """
+    清空所有指標（主要用於測試）
+    """
+    _histograms.clear()
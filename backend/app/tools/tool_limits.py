@@ -0,0 +1,105 @@
+"""
+DebateAI - 工具呼叫並行上限與逾時
+
+ToolNode 在 async 模式下會用 asyncio.gather 同時執行同一則 AIMessage 的所有 tool_calls。
+這裡為每個呼叫加上：
+- 單場辯論並行上限（由 langgraph_debate_stream 建立，經 config["configurable"]["tool_limiter"] 傳入）
+- 全域並行上限（所有辯論共用）
+- 每個呼叫各自的逾時；逾時或失敗只影響該呼叫，不會拖住或中斷其他呼叫
+
+環境變數：
+    TOOL_CALL_TIMEOUT: 單一工具呼叫逾時秒數（預設 12，0 表示不限）
+    TOOL_MAX_CONCURRENCY: 全域並行上限（預設 8）
+    TOOL_MAX_CONCURRENCY_PER_DEBATE: 單場辯論並行上限（預設 3）
+"""
+
+from contextlib import AsyncExitStack
+from typing import Awaitable, Callable, Optional, TypeVar
+import asyncio
+import os
+import logging
+
+from app.tools.search_io import ProviderLimiter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_global_limiter: Optional[ProviderLimiter] = None
+_timeouts = 0
+_failures = 0
+
+
+def get_tool_timeout() -> Optional[float]:
+    """單一工具呼叫逾時（None 表示不限）"""
+    timeout = float(os.getenv("TOOL_CALL_TIMEOUT", "12"))
+    return timeout if timeout > 0 else None
+
+
+def get_global_tool_limiter() -> ProviderLimiter:
+    """取得全域工具並行限制器單例"""
+    global _global_limiter
+
+    if _global_limiter is None:
+        _global_limiter = ProviderLimiter("tools", int(os.getenv("TOOL_MAX_CONCURRENCY", "8")))
+    return _global_limiter
+
+
+def new_debate_tool_limiter() -> ProviderLimiter:
+    """建立單場辯論的工具並行限制器"""
+    return ProviderLimiter("debate", int(os.getenv("TOOL_MAX_CONCURRENCY_PER_DEBATE", "3")))
+
+
+def get_debate_tool_limiter(config: Optional[dict]) -> Optional[ProviderLimiter]:
+    """從 RunnableConfig 取出單場辯論限制器（未設定時為 None）"""
+    if not config:
+        return None
+    return config.get("configurable", {}).get("tool_limiter")
+
+
+async def run_tool_call(
+    call: Callable[[], Awaitable[T]],
+    fallback: Callable[[BaseException], T],
+    config: Optional[dict] = None,
+    timeout: Optional[float] = None,
+) -> T:
+    """在並行上限內執行一次工具呼叫
+
+    先取得單場辯論名額再取得全域名額（排隊時不佔用全域名額）。
+    逾時只計算實際執行時間；逾時或例外時返回 fallback(exc)。
+    """
+    global _timeouts, _failures
+
+    timeout = get_tool_timeout() if timeout is None else timeout
+    limiters = [get_debate_tool_limiter(config), get_global_tool_limiter()]
+
+    async with AsyncExitStack() as stack:
+        for limiter in limiters:
+            if limiter is not None:
+                await stack.enter_async_context(limiter.slot())
+        try:
+            return await asyncio.wait_for(call(), timeout)
+        except asyncio.TimeoutError as e:
+            _timeouts += 1
+            logger.warning(f"tool call timed out after {timeout}s")
+            return fallback(e)
+        except Exception as e:
+            _failures += 1
+            logger.warning(f"tool call failed: {e}")
+            return fallback(e)
+
+
+def get_tool_stats() -> dict:
+    """工具呼叫並行與逾時統計"""
+    limiter = _global_limiter.stats() if _global_limiter is not None else None
+    return {"global": limiter, "timeouts": _timeouts, "failures": _failures}
+
+
+def reset_tool_limits() -> None:
+    """
+    清空全域限制器與統計（主要用於測試）
+    """
+    global _global_limiter, _timeouts, _failures
+    _global_limiter = None
+    _timeouts = 0
+    _failures = 0
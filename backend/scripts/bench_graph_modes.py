@@ -0,0 +1,169 @@
+"""
+DebateAI - Graph 模式效能比較
+
+比較 tools（ToolNode，每次搜尋兩次 LLM 呼叫）與 retrieve（先並行搜尋，單次發言）
+兩種 graph 的辯手回合延遲、LLM 呼叫次數與 token 用量。
+
+預設使用模擬 LLM / 搜尋（固定延遲，token 以字元數估算），不需要 API key：
+    uv run python scripts/bench_graph_modes.py --rounds 3
+
+--live 使用真實 Groq 與搜尋（需 GROQ_API_KEY，token 取自 usage_metadata）：
+    uv run python scripts/bench_graph_modes.py --live --topic "AI 會取代工程師嗎"
+"""
+
+from pathlib import Path
+from typing import Dict, List, Tuple
+from unittest.mock import patch
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_core.callbacks import AsyncCallbackHandler  # noqa: E402
+from langchain_core.messages import AIMessage  # noqa: E402
+from langchain_core.runnables import Runnable  # noqa: E402
+
+SPEAKERS = ("optimist", "skeptic", "moderator")
+
+
+class UsageRecorder(AsyncCallbackHandler):
+    """累計 LLM 呼叫次數與 token 用量"""
+
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def add(self, input_tokens: int, output_tokens: int) -> None:
+        self.calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+
+    async def on_llm_end(self, response, **kwargs) -> None:
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or usage
+        self.add(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+
+
+class SimulatedLLM(Runnable):
+    """模擬 LLM：固定 TTFT + 每 token 延遲；綁定工具且尚無搜尋結果時回傳 tool_call"""
+
+    def __init__(self, recorder: UsageRecorder, bind_tools: bool, ttft: float, per_token: float, output_tokens: int):
+        self.recorder = recorder
+        self.bind_tools = bind_tools
+        self.ttft = ttft
+        self.per_token = per_token
+        self.output_tokens = output_tokens
+
+    def _respond(self, input) -> Tuple[AIMessage, float]:
+        """模擬回應與其延遲（秒）：同步與非同步呼叫共用"""
+        prompt = "\n".join(str(m.content) for m in input)
+        input_tokens = len(prompt) // 4
+        wants_search = self.bind_tools and "[Search Result]" not in prompt and "[搜尋結果]" not in prompt
+
+        output_tokens = 20 if wants_search else self.output_tokens
+        self.recorder.add(input_tokens, output_tokens)
+
+        if wants_search:
+            message = AIMessage(
+                content="",
+                tool_calls=[{"name": "web_search_tool", "args": {"query": "topic data"}, "id": f"call_{self.recorder.calls}"}],
+            )
+        else:
+            message = AIMessage(content="simulated argument " * (self.output_tokens // 3))
+        return message, self.ttft + output_tokens * self.per_token
+
+    def invoke(self, input, config=None, **kwargs):
+        message, delay = self._respond(input)
+        time.sleep(delay)
+        return message
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        message, delay = self._respond(input)
+        await asyncio.sleep(delay)
+        return message
+
+
+async def run_mode(mode: str, args, recorder: UsageRecorder) -> Dict[str, float]:
+    """執行一場辯論並量測辯手回合延遲"""
+    from app.graph import get_debate_graph, create_initial_state
+
+    graph = get_debate_graph(mode)
+    state = create_initial_state(args.topic, args.rounds, args.language)
+    config = {"callbacks": [recorder]} if args.live else {}
+
+    turns: List[float] = []
+    searches = 0
+    current, started = None, 0.0
+    debate_started = time.perf_counter()
+
+    async for event in graph.astream_events(state, config=config, version="v2"):
+        kind, name = event.get("event"), event.get("name", "")
+        if kind == "on_tool_start":
+            searches += 1
+        elif kind == "on_chain_start" and name in SPEAKERS and name != current:
+            now = time.perf_counter()
+            if current in ("optimist", "skeptic"):
+                turns.append(now - started)
+            current, started = name, now
+
+    return {
+        "turns": len(turns),
+        "turn_avg": statistics.mean(turns) if turns else 0.0,
+        "turn_max": max(turns) if turns else 0.0,
+        "total": time.perf_counter() - debate_started,
+        "llm_calls": recorder.calls,
+        "input_tokens": recorder.input_tokens,
+        "output_tokens": recorder.output_tokens,
+        "searches": searches,
+    }
+
+
+async def run_simulated(mode: str, args) -> Dict[str, float]:
+    recorder = UsageRecorder()
+
+    async def fake_web_search(query: str, language: str = "zh") -> dict:
+        await asyncio.sleep(args.search_latency)
+        return {"success": True, "source": "tavily", "formatted": f"[TAVILY] Search Results:\n• {query}: ..." + "x" * 400}
+
+    def fake_get_llm(bind_tools: bool = False, **kwargs):
+        return SimulatedLLM(recorder, bind_tools, args.ttft, args.per_token, args.output_tokens)
+
+    with patch("app.graph.get_llm", fake_get_llm), patch("app.tools.search.web_search", fake_web_search):
+        return await run_mode(mode, args, recorder)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare tools vs retrieve debate graphs")
+    parser.add_argument("--topic", default="AI will replace software engineers")
+    parser.add_argument("--language", default="en", choices=["zh", "en"])
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--live", action="store_true", help="use real Groq / search providers")
+    parser.add_argument("--ttft", type=float, default=0.4, help="simulated time to first token (s)")
+    parser.add_argument("--per-token", type=float, default=0.004, help="simulated seconds per output token")
+    parser.add_argument("--output-tokens", type=int, default=90, help="simulated tokens per argument")
+    parser.add_argument("--search-latency", type=float, default=1.2, help="simulated search latency (s)")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in ("tools", "retrieve"):
+        results[mode] = await (run_mode(mode, args, UsageRecorder()) if args.live else run_simulated(mode, args))
+
+    columns = ["turns", "turn_avg", "turn_max", "total", "llm_calls", "input_tokens", "output_tokens", "searches"]
+    print(f"{'metric':<14}" + "".join(f"{mode:>12}" for mode in results))
+    for column in columns:
+        row = "".join(
+            f"{results[mode][column]:>12.2f}" if isinstance(results[mode][column], float) else f"{results[mode][column]:>12}"
+            for mode in results
+        )
+        print(f"{column:<14}{row}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
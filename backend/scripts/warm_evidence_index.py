@@ -0,0 +1,71 @@
+"""
+DebateAI - 預熱證據索引
+
+從 docs/測試題目庫.md 擷取引號中的辯論題目，為每個題目執行主題預取查詢
+（app.services.research_service.build_topic_queries），把 provider 結果寫入本地證據索引。
+之後相同題目的搜尋可直接命中本地索引。
+
+    uv run python scripts/warm_evidence_index.py --limit 20
+"""
+
+from pathlib import Path
+from typing import List
+import argparse
+import asyncio
+import os
+import re
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+DEFAULT_TOPICS_FILE = ROOT.parent / "docs" / "測試題目庫.md"
+
+
+def load_topics(path: Path) -> List[str]:
+    """擷取文件中所有以雙引號包住的題目（去重、保留順序）"""
+    topics = re.findall(r'"([^"\n]{4,200})"', path.read_text(encoding="utf-8"))
+    return list(dict.fromkeys(t.strip() for t in topics))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Warm the local evidence index with recurring debate topics")
+    parser.add_argument("--file", type=Path, default=DEFAULT_TOPICS_FILE)
+    parser.add_argument("--limit", type=int, default=0, help="only warm the first N topics (0 = all)")
+    parser.add_argument("--concurrency", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ["EVIDENCE_INDEX_ENABLED"] = "true"
+
+    from dotenv import load_dotenv
+    load_dotenv(ROOT / ".env")
+
+    from app.services.research_service import build_topic_queries
+    from app.tools.evidence_index import get_evidence_index
+    from app.tools.search import web_search
+
+    topics = load_topics(args.file)
+    if args.limit:
+        topics = topics[:args.limit]
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def warm(query: str, language: str) -> str:
+        async with semaphore:
+            result = await web_search(query, language=language)
+            return result.get("source", "fallback")
+
+    jobs = []
+    for topic in topics:
+        language = "zh" if re.search(r"[\u4e00-\u9fff]", topic) else "en"
+        jobs.extend((query, language) for query in build_topic_queries(topic, language))
+
+    sources = await asyncio.gather(*(warm(query, language) for query, language in jobs))
+    for (query, _), source in zip(jobs, sources):
+        print(f"[{source:>10}] {query}")
+
+    print(get_evidence_index().stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
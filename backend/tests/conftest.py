@@ -145,10 +145,66 @@ def mock_groq_llm_rate_limit():
         yield mock_llm
 
 
+@pytest.fixture(autouse=True)
+def reset_llm_state():
+    """每個測試前清空 LLM 註冊表、路由器、工具結果摘要器、狀態保留政策、prompt 快取統計、graph 編譯快取、SSE 串流統計與辯論事件紀錄，避免狀態跨測試共用"""
+    from app.llm.registry import reset_registry
+    from app.llm.router import reset_router
+    from app.llm.summarizer import reset_tool_summarizer
+    from app.services.state_policy import reset_state_policy
+    from app.llm.prompt_layout import reset_prompt_cache_stats
+    from app.graph_builder import reset_graph_cache
+    from app.services.stream_guard import reset_stream_stats
+    from app.services.debate_sessions import reset_session_store
+
+    reset_registry()
+    reset_router()
+    reset_tool_summarizer()
+    reset_state_policy()
+    reset_prompt_cache_stats()
+    reset_graph_cache()
+    reset_stream_stats()
+    reset_session_store()
+    yield
+    reset_registry()
+    reset_router()
+    reset_tool_summarizer()
+    reset_state_policy()
+    reset_prompt_cache_stats()
+    reset_graph_cache()
+    reset_stream_stats()
+    reset_session_store()
+
+
 # ============================================================
 # Search Tool Fixtures
 # ============================================================
 
+@pytest.fixture(autouse=True)
+def reset_search_state():
+    """每個測試前清空搜尋快取、指標、I/O 限制器、熔斷器、工具並行限制與證據索引"""
+    from app.tools.search_cache import reset_search_cache
+    from app.tools.search_metrics import reset_search_metrics
+    from app.tools.search_io import reset_search_io
+    from app.tools.search_health import reset_breakers
+    from app.tools.tool_limits import reset_tool_limits
+    from app.tools.evidence_index import reset_evidence_index
+
+    reset_search_cache()
+    reset_search_metrics()
+    reset_search_io()
+    reset_breakers()
+    reset_tool_limits()
+    reset_evidence_index()
+    yield
+    reset_search_cache()
+    reset_search_metrics()
+    reset_search_io()
+    reset_breakers()
+    reset_tool_limits()
+    reset_evidence_index()
+
+
 @pytest.fixture
 def mock_search_tavily():
     """Mock Tavily search success"""
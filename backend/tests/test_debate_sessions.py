@@ -0,0 +1,249 @@
+"""
+Resumable Debate Session Tests
+
+測試 app/services/debate_sessions.py：事件編號、Last-Event-ID 重播、ring buffer 上限、
+結束後 TTL 與無人重連時的取消，以及 /debate/{debate_id}/events 重新接上
+"""
+
+import asyncio
+import json
+import pytest
+from unittest.mock import patch
+
+
+class FeedStream:
+    """由測試控制送出時機的 SSE 產生器，記錄是否被取消"""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.cancelled = False
+
+    async def __call__(self):
+        try:
+            while True:
+                frame = await self.queue.get()
+                if frame is None:
+                    return
+                yield f"data: {frame}\n\n"
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+    def send(self, *frames):
+        for frame in frames:
+            self.queue.put_nowait(frame)
+
+
+async def frames_of(*values):
+    for value in values:
+        yield f"data: {value}\n\n"
+
+
+def event_ids(frames) -> list:
+    return [int(frame.split("\n")[0][len("id: "):]) for frame in frames]
+
+
+# ============================================================
+# Session Tests
+# ============================================================
+
+class TestDebateSession:
+    """事件紀錄、重播與即時接續"""
+
+    @pytest.mark.asyncio
+    async def test_frames_carry_ids(self):
+        from app.services.debate_sessions import SessionStore
+
+        session = SessionStore().create(frames_of("a", "b"), first_frame="data: hello\n\n")
+        frames = [f async for f in session.subscribe()]
+
+        assert frames == ["id: 1\ndata: hello\n\n", "id: 2\ndata: a\n\n", "id: 3\ndata: b\n\n"]
+
+    @pytest.mark.asyncio
+    async def test_resume_replays_then_follows_live(self):
+        from app.services.debate_sessions import SessionStore
+
+        stream = FeedStream()
+        session = SessionStore().create(stream())
+        stream.send("a", "b", "c")
+
+        first = session.subscribe()
+        received = [await first.__anext__() for _ in range(2)]
+        await first.aclose()  # 用戶端斷線，辯論在寬限期內繼續
+
+        resumed = session.subscribe(last_event_id=event_ids(received)[-1])
+        stream.send("d", None)
+        frames = [f async for f in resumed]
+
+        assert event_ids(frames) == [3, 4]
+        assert frames[-1] == "id: 4\ndata: d\n\n"
+        assert not stream.cancelled
+
+    @pytest.mark.asyncio
+    async def test_ring_buffer_is_bounded(self):
+        from app.services.debate_sessions import SessionStore
+
+        session = SessionStore(max_events=3).create(frames_of(*"abcde"))
+        await session.wait_closed()
+
+        assert event_ids([f async for f in session.subscribe()]) == [3, 4, 5]
+
+    @pytest.mark.asyncio
+    async def test_abandoned_debate_is_cancelled(self):
+        from app.services.debate_sessions import SessionStore
+
+        store = SessionStore(resume_grace=0.05)
+        stream = FeedStream()
+        session = store.create(stream())
+        stream.send("a")
+
+        subscriber = session.subscribe()
+        await subscriber.__anext__()
+        await subscriber.aclose()
+        await asyncio.wait_for(session.wait_closed(), timeout=1)
+
+        assert stream.cancelled
+        assert session.done
+
+    @pytest.mark.asyncio
+    async def test_debate_without_subscriber_is_cancelled(self):
+        """用戶端在回應開始讀取前就斷線：subscribe() 從未執行，辯論仍在寬限期後取消"""
+        from app.services.debate_sessions import SessionStore
+
+        store = SessionStore(resume_grace=0, attach_grace=0.05)
+        stream = FeedStream()
+        session = store.create(stream())
+        await asyncio.wait_for(session.wait_closed(), timeout=1)
+
+        assert stream.cancelled
+        assert store.stats()["abandoned"] == 1
+
+    @pytest.mark.asyncio
+    async def test_tokens_are_coalesced_in_log(self):
+        """整段發言的 token 在紀錄中只佔一筆，小 ring buffer 也能重播完整內容"""
+        from app.main import sse_event
+        from app.services.debate_sessions import SessionStore
+
+        async def turn():
+            yield sse_event({'type': 'speaker', 'node': 'optimist', 'text': 'Round 1'})
+            for n in range(5000):
+                yield sse_event({'type': 'token', 'node': 'optimist', 'text': f"{n % 10}"})
+            yield sse_event({'type': 'speaker_end', 'node': 'optimist'})
+
+        session = SessionStore(max_events=3).create(turn())
+        await session.wait_closed()
+        frames = [f async for f in session.subscribe()]
+
+        assert len(session.events) == 3
+        assert event_ids(frames) == [1, 5001, 5002]
+        token = json.loads(frames[1].split("data: ", 1)[1])
+        assert token["text"] == "0123456789" * 500
+
+        # 從一段發言中間重播：只送出之後的 token
+        resumed = [f async for f in session.subscribe(last_event_id=4991)]
+        assert json.loads(resumed[0].split("data: ", 1)[1])["text"] == "0123456789"
+
+    @pytest.mark.asyncio
+    async def test_finished_sessions_expire(self):
+        from app.services.debate_sessions import SessionStore
+
+        store = SessionStore(ttl=0.01)
+        session = store.create(frames_of("a"))
+        await session.wait_closed()
+
+        assert store.get(session.debate_id) is session
+        await asyncio.sleep(0.02)
+        assert store.get(session.debate_id) is None
+        assert store.stats()["expired"] == 1
+
+    @pytest.mark.parametrize("value, expected", [(None, 0), ("7", 7), (" 3 ", 3), ("abc", 0), ("-2", 0)])
+    def test_parse_last_event_id(self, value, expected):
+        from app.services.debate_sessions import parse_last_event_id
+
+        assert parse_last_event_id(value) == expected
+
+
+# ============================================================
+# Endpoint Tests
+# ============================================================
+
+class TestResumeEndpoint:
+    """/debate 的事件 ID 與 GET /debate/{debate_id}/events 重新接上"""
+
+    @staticmethod
+    def parse(body: str) -> list:
+        frames = []
+        for block in body.strip().split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.split("\n"))
+            frames.append((int(lines["id"]), json.loads(lines["data"])))
+        return frames
+
+    @pytest.mark.asyncio
+    async def test_resume_after_last_event_id(self, async_client):
+        from app.main import sse_event
+
+        calls = []
+
+        def quick_stream(topic, max_rounds, language):
+            calls.append(topic)
+
+            async def stream():
+                for n in range(3):
+                    yield sse_event({'type': 'token', 'node': 'optimist', 'text': str(n)})
+                yield sse_event({'type': 'complete', 'text': 'done'})
+            return stream()
+
+        with patch("app.main.USE_FAKE_STREAM", True), patch("app.main.fake_debate_stream", quick_stream):
+            response = await async_client.post("/debate", json={"topic": "AI jobs"})
+            frames = self.parse(response.text)
+            debate_id = frames[0][1]["debate_id"]
+
+            resumed = await async_client.get(f"/debate/{debate_id}/events", headers={"Last-Event-ID": "2"})
+
+        assert response.headers["x-debate-id"] == debate_id
+        assert frames[0] == (1, {"type": "debate", "debate_id": debate_id})
+        assert frames[-1][0] == 5
+        assert "".join(data["text"] for _, data in frames if data["type"] == "token") == "012"
+
+        # 重播時連續 token 合併為一個 frame，id 為其中最後一個
+        assert resumed.status_code == 200
+        assert self.parse(resumed.text) == [
+            (4, {"type": "token", "node": "optimist", "text": "12"}),
+            (5, {"type": "complete", "text": "done"}),
+        ]
+        assert calls == ["AI jobs"]  # 重新接上不會重新開始辯論
+
+    @pytest.mark.asyncio
+    async def test_zero_grace_does_not_cancel_before_attach(self, async_client, monkeypatch):
+        """SSE_RESUME_GRACE=0：POST 回應的訂閱者接上之前，辯論不會被當成無人接上而取消"""
+        from app.main import sse_event
+        from app.services.debate_sessions import get_session_stats
+
+        monkeypatch.setenv("SSE_RESUME_GRACE", "0")
+
+        def slow_stream(topic, max_rounds, language):
+            async def stream():
+                for n in range(3):
+                    await asyncio.sleep(0.01)
+                    yield sse_event({'type': 'token', 'node': 'optimist', 'text': str(n)})
+                yield sse_event({'type': 'complete', 'text': 'done'})
+            return stream()
+
+        with patch("app.main.USE_FAKE_STREAM", True), patch("app.main.fake_debate_stream", slow_stream):
+            response = await async_client.post("/debate", json={"topic": "AI jobs"})
+
+        frames = self.parse(response.text)
+        assert frames[-1][1] == {"type": "complete", "text": "done"}
+        assert get_session_stats()["abandoned"] == 0
+
+    @pytest.mark.asyncio
+    async def test_unknown_debate_returns_404(self, async_client):
+        response = await async_client.get("/debate/missing/events")
+
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_health_reports_sessions(self, async_client):
+        response = await async_client.get("/health")
+
+        assert response.json()["debate_sessions"]["live"] == 0
@@ -0,0 +1,144 @@
+"""
+Evidence Index Tests
+
+測試 app/tools/evidence_index.py 的 BM25 查詢、新鮮度與 web_search 整合
+"""
+
+import pytest
+from unittest.mock import patch, AsyncMock
+
+
+RESULTS_EN = [
+    {"title": "AI jobs report", "content": "AI automation displaced two percent of jobs in 2024.", "url": "https://a"},
+    {"title": "AI jobs outlook", "content": "Economists expect AI to create new jobs in healthcare.", "url": "https://b"},
+    {"title": "Weather", "content": "Heavy rain is expected tomorrow.", "url": "https://c"},
+]
+
+RESULTS_ZH = [
+    {"title": "人工智慧與就業", "content": "人工智慧可能取代部分重複性工作。"},
+    {"title": "人工智慧新職缺", "content": "人工智慧也會創造新的工作機會。"},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    from app.tools.evidence_index import EvidenceIndex
+
+    idx = EvidenceIndex(str(tmp_path / "evidence.sqlite3"))
+    yield idx
+    idx.close()
+
+
+# ============================================================
+# EvidenceIndex Tests
+# ============================================================
+
+class TestEvidenceIndex:
+    """EvidenceIndex 行為測試"""
+
+    def test_add_deduplicates_passages(self, index):
+        assert index.add(RESULTS_EN, "tavily", "en") == 3
+        assert index.add(RESULTS_EN, "tavily", "en") == 0
+        assert index.stats()["passages"] == 3
+
+    def test_search_ranks_relevant_passages(self, index):
+        index.add(RESULTS_EN, "tavily", "en")
+
+        passages = index.search("AI jobs", "en")
+
+        assert {p.url for p in passages[:2]} == {"https://a", "https://b"}
+        assert all(p.url != "https://c" for p in passages)
+        assert 0 < passages[0].score <= 1.0
+
+    def test_cjk_query(self, index):
+        index.add(RESULTS_ZH, "tavily", "zh")
+
+        assert index.lookup("人工智慧 工作", "zh") is not None
+        assert index.search("人工智慧", "en") == []
+
+    def test_lookup_requires_score_and_passages(self, index):
+        index.add(RESULTS_EN, "tavily", "en")
+
+        assert index.lookup("AI jobs", "en") is not None
+        assert index.lookup("quantum cryptography", "en") is None
+        assert index.stats()["hits"] == 1
+        assert index.stats()["misses"] == 1
+
+    def test_stale_passages_are_ignored(self, index):
+        with patch("app.tools.evidence_index.time.time", return_value=0.0):
+            index.add(RESULTS_EN, "tavily", "en")
+        with patch("app.tools.evidence_index.time.time", return_value=index.max_age + 1):
+            assert index.search("AI jobs", "en") == []
+
+    def test_max_passages_evicts_oldest(self, tmp_path):
+        from app.tools.evidence_index import EvidenceIndex
+
+        idx = EvidenceIndex(str(tmp_path / "small.sqlite3"), max_passages=2)
+        with patch("app.tools.evidence_index.time.time", return_value=100.0):
+            idx.add(RESULTS_EN[:1], "tavily", "en")
+        idx.add(RESULTS_EN[1:], "tavily", "en")
+
+        assert idx.stats()["passages"] == 2
+        assert all(p.url != "https://a" for p in idx.search("AI jobs", "en"))
+        idx.close()
+
+    def test_eviction_removes_only_evicted_postings(self, tmp_path):
+        from app.tools.evidence_index import EvidenceIndex
+
+        idx = EvidenceIndex(str(tmp_path / "small.sqlite3"), max_passages=2)
+        with patch("app.tools.evidence_index.time.time", return_value=100.0):
+            idx.add(RESULTS_EN[:1], "tavily", "en")
+        idx.add(RESULTS_EN[1:], "tavily", "en")
+
+        statements = []
+        idx._conn.set_trace_callback(statements.append)
+        idx.add(RESULTS_ZH, "tavily", "zh")
+        idx._conn.set_trace_callback(None)
+
+        assert not any("NOT IN" in sql for sql in statements)
+        passage_ids = {row[0] for row in idx._conn.execute("SELECT id FROM passages")}
+        posting_ids = {row[0] for row in idx._conn.execute("SELECT DISTINCT passage_id FROM postings")}
+        assert posting_ids == passage_ids
+        assert len(passage_ids) == 2
+        idx.close()
+
+
+# ============================================================
+# web_search Integration
+# ============================================================
+
+class TestWebSearchEvidenceIndex:
+    """web_search 先查本地索引"""
+
+    @pytest.mark.asyncio
+    async def test_local_hit_skips_network(self, monkeypatch, tmp_path):
+        from app.tools.search import web_search
+
+        monkeypatch.setenv("EVIDENCE_INDEX_ENABLED", "true")
+        monkeypatch.setenv("EVIDENCE_INDEX_PATH", str(tmp_path / "evidence.sqlite3"))
+        monkeypatch.setenv("SEARCH_CACHE_ENABLED", "false")
+
+        with patch("app.tools.search.tavily_search", new_callable=AsyncMock) as mock_tavily, \
+             patch("app.tools.search.tavily_client", object()), \
+             patch("app.tools.search.get_hedge_delay", return_value=None):
+            mock_tavily.return_value = {"success": True, "results": RESULTS_EN, "source": "tavily"}
+            first = await web_search("AI jobs", language="en")
+            second = await web_search("AI jobs automation", language="en")
+
+        assert mock_tavily.await_count == 1
+        assert first["source"] == "tavily"
+        assert second["source"] == "local"
+        assert "[LOCAL]" in second["formatted"]
+
+    @pytest.mark.asyncio
+    async def test_disabled_by_default(self, tmp_path, monkeypatch):
+        from app.tools.search import web_search
+        from app.tools.evidence_index import get_evidence_index_stats
+
+        monkeypatch.chdir(tmp_path)
+        with patch("app.tools.search.tavily_search", new_callable=AsyncMock) as mock_tavily:
+            mock_tavily.return_value = {"success": True, "results": RESULTS_EN, "source": "tavily"}
+            await web_search("AI jobs", language="en")
+
+        assert get_evidence_index_stats() == {"enabled": False}
+        assert not (tmp_path / ".evidence_index.sqlite3").exists()
@@ -70,6 +70,16 @@ class TestBuildPrompt:
         assert "懷疑辯手" in messages[0].content
         assert "反駁" in messages[1].content
 
+    def test_build_prompt_with_research_context(self):
+        """主題預取結果放進 prompt"""
+        from app.graph import create_initial_state, build_prompt
+
+        state = create_initial_state("AI jobs", language="en")
+        messages = build_prompt(state, "optimist", "[TAVILY] AI jobs data")
+
+        assert "Background Research:" in messages[1].content
+        assert "[TAVILY] AI jobs data" in messages[1].content
+
 
 # ============================================================
 # Format Messages Tests
@@ -204,3 +214,187 @@ class TestToolIterationLimit:
         from app.graph import MAX_TOOL_ITERATIONS
         
         assert MAX_TOOL_ITERATIONS == 3
+
+
+# ============================================================
+# Retrieve-then-generate Tests
+# ============================================================
+
+class TestRetrieveMode:
+    """retrieve 模式（先搜尋再單次發言）測試"""
+
+    def test_opening_queries_match_topic_prefetch(self):
+        """開場只用主題查詢，與預取查詢一致"""
+        from app.graph import create_initial_state, derive_search_queries
+        from app.services.research_service import build_topic_queries
+
+        state = create_initial_state("AI jobs", language="en")
+
+        assert derive_search_queries(state, "optimist") == [build_topic_queries("AI jobs", "en")[1]]
+
+    def test_queries_use_opponent_keywords(self):
+        from app.graph import create_initial_state, derive_search_queries
+        from langchain_core.messages import AIMessage
+
+        state = create_initial_state("AI jobs", language="en")
+        state["messages"] = [AIMessage(content="Automation creates healthcare roles", name="optimist")]
+
+        queries = derive_search_queries(state, "skeptic")
+
+        assert queries[0] == "AI jobs risks criticism"
+        assert queries[1] == "AI jobs automation creates healthcare roles"
+
+    def test_graph_mode_selection(self, monkeypatch):
+        from app.graph import get_debate_graph, debate_graph, retrieve_debate_graph
+
+        assert get_debate_graph("retrieve") is retrieve_debate_graph
+        assert get_debate_graph("unknown") is debate_graph
+
+        monkeypatch.setenv("DEBATE_GRAPH_MODE", "retrieve")
+        assert get_debate_graph() is retrieve_debate_graph
+
+    @pytest.mark.asyncio
+    async def test_turn_uses_single_llm_call(self):
+        """搜尋並行執行，結果放進 prompt，只呼叫一次 LLM"""
+        from app.graph import create_initial_state, optimist_retrieve_node
+        from langchain_core.messages import AIMessage
+
+        mock_llm = MagicMock()
+        mock_llm.ainvoke = AsyncMock(return_value=AIMessage(content="Opening"))
+        search = {"success": True, "source": "tavily", "formatted": "[TAVILY] Search Results:\n• Jobs: jobs data"}
+
+        with patch("app.graph.get_llm", return_value=mock_llm) as mock_get_llm, \
+             patch("app.tools.search.web_search", new_callable=AsyncMock, return_value=search):
+            result = await optimist_retrieve_node(create_initial_state("AI jobs", language="en"))
+
+        mock_get_llm.assert_called_once_with(bind_tools=False)
+        assert mock_llm.ainvoke.await_count == 1
+        assert "Jobs: jobs data" in mock_llm.ainvoke.call_args.args[0][1].content
+        assert result["messages"][0].name == "optimist"
+        assert result["current_speaker"] == "skeptic"
+
+
+# ============================================================
+# Rolling Debate Summary Tests
+# ============================================================
+
+class TestRollingSummary:
+    """主持人小結併入滾動摘要，最終報告 prompt 不隨輪數成長"""
+
+    @staticmethod
+    def round_messages(n: int) -> list:
+        from langchain_core.messages import AIMessage
+
+        return [
+            AIMessage(content=f"optimist argument {chr(65 + n)} " * 10, name="optimist"),
+            AIMessage(content=f"skeptic argument {chr(65 + n)} " * 10, name="skeptic"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_round_summary_updates_state(self):
+        from app.graph import create_initial_state, moderator_node
+        from langchain_core.messages import AIMessage
+
+        mock_llm = MagicMock()
+        mock_llm.ainvoke = AsyncMock(return_value=AIMessage(
+            content="### 🔄 Round 1 Summary\n**Optimist**: growth\n**Skeptic**: risk"
+        ))
+        state = create_initial_state("AI jobs", max_rounds=3, language="en")
+        state["messages"] = self.round_messages(0)
+
+        with patch("app.graph.get_llm", return_value=mock_llm):
+            result = await moderator_node(state)
+
+        assert result["debate_summary"] == "Round 1: Optimist: growth Skeptic: risk"
+
+    @pytest.mark.asyncio
+    async def test_final_prompt_size_constant_in_rounds(self):
+        from app.graph import create_initial_state, moderator_node
+        from langchain_core.messages import AIMessage
+
+        async def final_prompt_length(rounds: int) -> int:
+            mock_llm = MagicMock()
+            mock_llm.ainvoke = AsyncMock(return_value=AIMessage(content="report"))
+            state = create_initial_state("AI jobs", max_rounds=rounds, language="en")
+            state["round_count"] = rounds - 1
+            state["debate_summary"] = "Round 1: growth vs risk"
+            for n in range(rounds):
+                state["messages"] += self.round_messages(n)
+                state["messages"].append(AIMessage(content=f"summary {n}", name="moderator"))
+            state["messages"].pop()  # 最後一輪尚未有小結
+
+            with patch("app.graph.get_llm", return_value=mock_llm):
+                result = await moderator_node(state)
+
+            assert "debate_summary" not in result
+            prompt = mock_llm.ainvoke.call_args.args[0][1].content
+            assert "Round 1: growth vs risk" in prompt
+            assert f"argument {chr(64 + rounds)}" in prompt
+            assert f"argument {chr(63 + rounds)}" not in prompt
+            return len(prompt)
+
+        assert await final_prompt_length(3) == await final_prompt_length(12)
+
+
+# ============================================================
+# Overlap Mode Tests
+# ============================================================
+
+class OverlapLLM:
+    """依 system prompt 回應；主持人小結刻意較慢，記錄呼叫開始 / 結束順序"""
+
+    def __init__(self):
+        self.log = []
+
+    async def ainvoke(self, messages, **kwargs):
+        import asyncio
+        from langchain_core.messages import AIMessage
+
+        system, prompt = messages[0].content, messages[-1].content
+        if "Round N Summary" in system:
+            self.log.append("moderator:start")
+            await asyncio.sleep(0.05)
+            self.log.append("moderator:end")
+            return AIMessage(content="### 🔄 Round 1 Summary\n**Optimist**: growth\n**Skeptic**: risk")
+        if "final summary" in system:
+            return AIMessage(content="## 📊 Debate Summary Report")
+        speaker = "optimist" if "Optimist Debater" in system else "skeptic"
+        self.log.append(f"{speaker}:{prompt.splitlines()[-3]}")
+        return AIMessage(content=f"{speaker} turn")
+
+
+class TestOverlapMode:
+    """主持人小結與下一輪樂觀者並行"""
+
+    def test_graph_mode_selection(self):
+        from app.graph import get_debate_graph, overlap_debate_graph
+
+        assert get_debate_graph("overlap") is overlap_debate_graph
+
+    @pytest.mark.asyncio
+    async def test_summary_overlaps_next_optimist_turn(self):
+        from app.graph import create_initial_state, overlap_debate_graph
+
+        llm = OverlapLLM()
+        with patch("app.graph.get_llm", return_value=llm):
+            result = await overlap_debate_graph.ainvoke(create_initial_state("AI jobs", max_rounds=2, language="en"))
+
+        # 第 2 輪樂觀者在小結完成前就開始，且輪數正確
+        assert llm.log.index("optimist:Round 2, please speak as the Optimist.") < llm.log.index("moderator:end")
+        assert llm.log[-1] == "skeptic:Round 2, please refute the Optimist's arguments as the Skeptic."
+
+        names = [m.name for m in result["messages"]]
+        assert names == ["optimist", "skeptic", "moderator", "optimist", "skeptic", "moderator"]
+        assert result["round_count"] == 2
+        assert result["current_speaker"] == "end"
+        assert result["debate_summary"] == "Round 1: Optimist: growth Skeptic: risk"
+
+    def test_final_round_is_sequential(self):
+        from app.graph import create_initial_state, route_after_skeptic_overlap
+
+        state = create_initial_state("AI jobs", max_rounds=2, language="en")
+        state["current_speaker"] = "moderator"
+        assert route_after_skeptic_overlap(state) == ["moderator", "optimist"]
+
+        state["round_count"] = 1
+        assert route_after_skeptic_overlap(state) == "moderator"
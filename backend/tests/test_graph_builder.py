@@ -0,0 +1,134 @@
+"""
+Panel Graph Builder Tests
+
+測試 app/graph_builder.py 的多辯手 graph：階段並行（fan-out / fan-in）、路由與設定驗證
+"""
+
+import asyncio
+import pytest
+from unittest.mock import patch
+from langchain_core.messages import AIMessage
+
+
+class PanelLLM:
+    """記錄並行數與每次呼叫的 prompt；每次呼叫固定耗時"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.prompts = []
+
+    async def ainvoke(self, messages, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        self.prompts.append(messages[-1].content)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        if "summary" in messages[0].content.lower():
+            return AIMessage(content="### Summary\n**Optimist**: growth\n**Skeptic**: cost")
+        focus = messages[-1].content.split("Your Focus: ")[-1].split("\n")[0] if "Your Focus" in messages[-1].content else "optimist"
+        return AIMessage(content=f"turn on {focus}")
+
+
+async def run_panel(plan=None, max_rounds: int = 2):
+    from app.graph import create_initial_state
+    from app.graph_builder import DEFAULT_PANEL, build_panel_graph
+
+    llm = PanelLLM()
+    graph = build_panel_graph(plan or DEFAULT_PANEL)
+    with patch("app.graph.get_llm", return_value=llm):
+        result = await graph.ainvoke(create_initial_state("AI jobs", max_rounds=max_rounds, language="en"))
+    return result, llm
+
+
+# ============================================================
+# Fan-out / Fan-in Tests
+# ============================================================
+
+class TestPanelGraph:
+    """同一階段並行、階段之間依序"""
+
+    @pytest.mark.asyncio
+    async def test_rounds_follow_stages(self):
+        result, _ = await run_panel()
+
+        names = [m.name for m in result["messages"]]
+        assert names == [
+            "optimist", "skeptic_cost", "skeptic_ethics", "moderator",
+            "optimist", "skeptic_cost", "skeptic_ethics", "moderator",
+        ]
+        assert result["round_count"] == 2
+        assert result["current_speaker"] == "end"
+
+    @pytest.mark.asyncio
+    async def test_opening_statements_run_in_parallel(self):
+        """耗時取決於依序階段數（開場、小結、樂觀者、懷疑者、報告），不是發言次數"""
+        start = asyncio.get_event_loop().time()
+        _, llm = await run_panel()
+        elapsed = asyncio.get_event_loop().time() - start
+
+        assert llm.max_active == 3
+        assert len(llm.prompts) == 8
+        assert elapsed < 8 * llm.delay
+
+    @pytest.mark.asyncio
+    async def test_skeptics_reply_to_same_claim(self):
+        _, llm = await run_panel()
+
+        replies = [p for p in llm.prompts if "Round 2, please refute" in p]
+        assert len(replies) == 2
+        assert all("[optimist]: turn on optimist" in p.split("Conversation History:")[-1] for p in replies)
+        assert "Your Focus: economic costs" in replies[0] or "Your Focus: economic costs" in replies[1]
+
+    @pytest.mark.asyncio
+    async def test_opening_prompts(self):
+        _, llm = await run_panel(max_rounds=1)
+
+        openings = llm.prompts[:3]
+        assert sum("Opening statement, please speak as the Optimist." in p for p in openings) == 1
+        assert sum("Opening statement, please state your concerns as the Skeptic." in p for p in openings) == 2
+        # 主持人看到本輪所有辯手
+        assert llm.prompts[-1].count("turn on") == 3
+
+    @pytest.mark.asyncio
+    async def test_sequential_plan(self):
+        from app.graph_builder import Persona, PanelPlan
+
+        plan = PanelPlan(
+            personas=(Persona("optimist", "optimist"), Persona("skeptic", "skeptic")),
+            stages=(("optimist",), ("skeptic",)),
+        )
+        result, llm = await run_panel(plan, max_rounds=1)
+
+        assert [m.name for m in result["messages"]] == ["optimist", "skeptic", "moderator"]
+        assert llm.max_active == 1
+
+
+# ============================================================
+# Validation Tests
+# ============================================================
+
+class TestValidatePlan:
+    """不合法的 persona / 階段安排"""
+
+    @pytest.mark.parametrize("personas, stages, message", [
+        ((("a", "optimist"), ("a", "skeptic")), (("a",),), "duplicate"),
+        ((("moderator", "skeptic"),), (("moderator",),), "reserved"),
+        ((("a", "judge"),), (("a",),), "unknown role"),
+        ((("a", "optimist"),), (("b",),), "unknown persona"),
+        ((("a", "optimist"), ("b", "skeptic")), (("a",), ("b", "a")), "twice"),
+    ])
+    def test_invalid_plans(self, personas, stages, message):
+        from app.graph_builder import Persona, PanelPlan, validate_plan
+
+        plan = PanelPlan(personas=tuple(Persona(*p) for p in personas), stages=stages)
+        with pytest.raises(ValueError, match=message):
+            validate_plan(plan)
+
+    def test_default_panel_is_valid(self):
+        from app.graph import get_debate_graph
+        from app.graph_builder import DEFAULT_PANEL, get_panel_graph, validate_plan
+
+        validate_plan(DEFAULT_PANEL)
+        assert get_debate_graph("panel") is get_panel_graph()
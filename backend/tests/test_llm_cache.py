@@ -0,0 +1,211 @@
+"""
+LLM Response Cache Tests
+
+測試 app/llm/cache.py 的快取 key、兩層快取與命中重播
+"""
+
+import pytest
+from unittest.mock import patch
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+
+@pytest.fixture
+def response_cache(tmp_path):
+    """使用暫存 SQLite 檔的快取"""
+    from app.llm.cache import ResponseCache
+
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite3"), ttl=60, memory_size=2, max_entries=3)
+    yield cache
+    cache.close()
+
+
+PROMPT = [SystemMessage(content="你是辯手"), HumanMessage(content="辯論主題：AI")]
+
+
+# ============================================================
+# Cache Key Tests
+# ============================================================
+
+class TestMakeCacheKey:
+    """make_cache_key 測試"""
+
+    def test_key_is_deterministic(self):
+        """相同輸入得到相同 key"""
+        from app.llm.cache import make_cache_key
+
+        assert make_cache_key(["m"], [], PROMPT, 0.7) == make_cache_key(["m"], [], PROMPT, 0.7)
+
+    def test_key_depends_on_inputs(self):
+        """模型、工具、溫度、訊息任一不同 key 就不同"""
+        from app.llm.cache import make_cache_key
+
+        base = make_cache_key(["m"], [], PROMPT, 0.7)
+
+        assert make_cache_key(["other"], [], PROMPT, 0.7) != base
+        assert make_cache_key(["m"], ["web_search_tool"], PROMPT, 0.7) != base
+        assert make_cache_key(["m"], [], PROMPT, 0.2) != base
+        assert make_cache_key(["m"], [], PROMPT[:1], 0.7) != base
+
+    def test_key_depends_on_call_kwargs(self):
+        """max_tokens / stop 不同 key 就不同；None 與未指定、tuple 與 list 視為相同"""
+        from app.llm.cache import make_cache_key
+
+        base = make_cache_key(["m"], [], PROMPT, 0.7)
+
+        assert make_cache_key(["m"], [], PROMPT, 0.7, {"max_tokens": 256}) != base
+        assert make_cache_key(["m"], [], PROMPT, 0.7, {"max_tokens": 256}) != \
+            make_cache_key(["m"], [], PROMPT, 0.7, {"max_tokens": 768})
+        assert make_cache_key(["m"], [], PROMPT, 0.7, {"stop": ["\n"]}) != base
+        assert make_cache_key(["m"], [], PROMPT, 0.7, {"stop": ("\n",)}) == \
+            make_cache_key(["m"], [], PROMPT, 0.7, {"stop": ["\n"]})
+        assert make_cache_key(["m"], [], PROMPT, 0.7, {"stop": None}) == base
+
+
+# ============================================================
+# ResponseCache Tests
+# ============================================================
+
+class TestResponseCache:
+    """兩層快取測試"""
+
+    def test_set_and_get(self, response_cache):
+        """寫入後可從記憶體層讀回"""
+        response_cache.set("k", AIMessage(content="hello"))
+
+        assert response_cache.get("k").content == "hello"
+        assert response_cache.memory_hits == 1
+
+    def test_disk_tier_survives_memory_eviction(self, response_cache):
+        """記憶體 LRU 淘汰後仍可從 SQLite 讀回"""
+        for key in ("a", "b", "c"):
+            response_cache.set(key, AIMessage(content=key))
+
+        assert response_cache.get("a").content == "a"
+        assert response_cache.disk_hits == 1
+
+    def test_disk_size_eviction(self, response_cache):
+        """超過 max_entries 時淘汰最久未讀取者"""
+        for key in ("a", "b", "c", "d"):
+            response_cache.set(key, AIMessage(content=key))
+
+        assert response_cache.stats()["disk_size"] == 3
+        response_cache._memory.clear()
+        assert response_cache.get("a") is None
+
+    def test_ttl_expiry(self, response_cache):
+        """超過 TTL 視為 miss"""
+        with patch("app.llm.cache.time.time", return_value=1000.0):
+            response_cache.set("k", AIMessage(content="old"))
+        with patch("app.llm.cache.time.time", return_value=1000.0 + 61):
+            assert response_cache.get("k") is None
+
+    def test_tool_calls_roundtrip(self, response_cache):
+        """tool_calls 可完整序列化"""
+        message = AIMessage(
+            content="",
+            tool_calls=[{"name": "web_search_tool", "args": {"query": "AI"}, "id": "call_1"}],
+        )
+        response_cache.set("k", message)
+        response_cache._memory.clear()
+
+        assert response_cache.get("k").tool_calls[0]["args"] == {"query": "AI"}
+
+
+# ============================================================
+# CachedLLM Tests
+# ============================================================
+
+class TestCachedLLM:
+    """CachedLLM 包裝測試"""
+
+    def _make(self, response_cache, contents):
+        from app.llm.cache import CachedLLM
+
+        inner = GenericFakeChatModel(messages=iter([AIMessage(content=c) for c in contents]))
+        return CachedLLM(inner, response_cache, models=["m"])
+
+    @pytest.mark.asyncio
+    async def test_second_call_is_served_from_cache(self, response_cache):
+        """第二次相同 prompt 不呼叫內層模型"""
+        llm = self._make(response_cache, ["第一次回應"])
+
+        first = await llm.ainvoke(PROMPT)
+        # 內層 iterator 已耗盡，若再呼叫會拋出 StopIteration
+        second = await llm.ainvoke(PROMPT)
+
+        assert first.content == second.content == "第一次回應"
+
+    @pytest.mark.asyncio
+    async def test_different_max_tokens_is_a_miss(self, response_cache):
+        """max_tokens 不同的呼叫不共用快取（截斷的回答不會被當成完整回答重播）"""
+        llm = self._make(response_cache, ["short", "long answer"])
+
+        short = await llm.ainvoke(PROMPT, max_tokens=16)
+        full = await llm.ainvoke(PROMPT, max_tokens=768)
+        again = await llm.ainvoke(PROMPT, max_tokens=16)
+
+        assert (short.content, full.content, again.content) == ("short", "long answer", "short")
+
+    @pytest.mark.asyncio
+    async def test_astream_miss_then_hit(self, response_cache):
+        """astream 累積結果後寫入快取，命中時逐段重播"""
+        llm = self._make(response_cache, ["streamed answer text"])
+
+        first = "".join([c.content async for c in llm.astream(PROMPT)])
+        chunks = [c.content async for c in llm.astream(PROMPT)]
+
+        assert first == "streamed answer text"
+        assert "".join(chunks) == first
+        assert len([c for c in chunks if c]) > 1
+
+    @pytest.mark.asyncio
+    async def test_hit_emits_chat_model_stream_events(self, response_cache):
+        """命中時 astream_events 仍產生 on_chat_model_stream"""
+        from langchain_core.runnables import RunnableLambda
+
+        llm = self._make(response_cache, ["cached tokens for events"])
+        await llm.ainvoke(PROMPT)
+
+        async def node(_):
+            return await llm.ainvoke(PROMPT)
+
+        events = [
+            e async for e in RunnableLambda(node).astream_events(None, version="v2")
+            if e["event"] == "on_chat_model_stream"
+        ]
+        text = "".join(e["data"]["chunk"].content for e in events)
+
+        assert text == "cached tokens for events"
+
+
+# ============================================================
+# get_llm Integration
+# ============================================================
+
+class TestGetLLMCache:
+    """get_llm 的 opt-in 快取"""
+
+    def test_cache_disabled_by_default(self, monkeypatch):
+        from app.graph import get_llm
+        from app.llm.cache import CachedLLM
+
+        monkeypatch.setenv("GROQ_API_KEY", "test-key")
+        monkeypatch.delenv("LLM_CACHE_ENABLED", raising=False)
+
+        assert not isinstance(get_llm(), CachedLLM)
+
+    def test_cache_enabled_by_env(self, monkeypatch, tmp_path):
+        from app.graph import get_llm
+        from app.llm.cache import CachedLLM, reset_response_cache
+
+        monkeypatch.setenv("GROQ_API_KEY", "test-key")
+        monkeypatch.setenv("LLM_CACHE_ENABLED", "true")
+        monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "c.sqlite3"))
+        reset_response_cache()
+        try:
+            llm = get_llm(bind_tools=True)
+            assert isinstance(llm, CachedLLM)
+            assert llm.tool_names == ("web_search_tool",)
+        finally:
+            reset_response_cache()
@@ -0,0 +1,146 @@
+"""
+LLM Registry Tests
+
+測試 app/llm/registry.py 的 runnable 重用與共用連線池
+"""
+
+import pytest
+from unittest.mock import MagicMock
+
+
+# ============================================================
+# LLMRegistry Tests
+# ============================================================
+
+class TestLLMRegistry:
+    """LLMRegistry 快取測試"""
+
+    def test_same_key_reuses_runnable(self):
+        """相同 key 只建構一次"""
+        from app.llm.registry import LLMRegistry, LLMKey
+
+        registry = LLMRegistry()
+        factory = MagicMock(side_effect=lambda: object())
+        key = LLMKey(models=("a", "b"), bind_tools=False, temperature=0.7, timeout=30.0)
+
+        first = registry.get_or_create(key, factory)
+        second = registry.get_or_create(key, factory)
+
+        assert first is second
+        assert factory.call_count == 1
+        assert registry.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+    def test_different_key_builds_new_runnable(self):
+        """bind_tools 不同時建構不同 runnable"""
+        from app.llm.registry import LLMRegistry, LLMKey
+
+        registry = LLMRegistry()
+        key_plain = LLMKey(models=("a",), bind_tools=False, temperature=0.7, timeout=30.0)
+        key_tools = LLMKey(models=("a",), bind_tools=True, temperature=0.7, timeout=30.0)
+
+        plain = registry.get_or_create(key_plain, lambda: object())
+        with_tools = registry.get_or_create(key_tools, lambda: object())
+
+        assert plain is not with_tools
+        assert registry.stats()["misses"] == 2
+
+    def test_clear_resets_counters(self):
+        """clear 清空項目與計數"""
+        from app.llm.registry import LLMRegistry, LLMKey
+
+        registry = LLMRegistry()
+        key = LLMKey(models=("a",), bind_tools=False, temperature=0.7, timeout=30.0)
+        registry.get_or_create(key, lambda: object())
+        registry.clear()
+
+        assert registry.stats() == {"size": 0, "hits": 0, "misses": 0}
+
+
+# ============================================================
+# get_llm Integration Tests
+# ============================================================
+
+class TestGetLLMPooling:
+    """get_llm 透過註冊表重用 runnable"""
+
+    def test_get_llm_returns_cached_runnable(self, monkeypatch):
+        """連續呼叫 get_llm 返回同一個 runnable"""
+        from app.graph import get_llm
+        from app.llm.registry import get_registry_stats
+
+        monkeypatch.setenv("GROQ_API_KEY", "test-key")
+        monkeypatch.delenv("GROQ_FALLBACK_MODELS", raising=False)
+
+        first = get_llm(bind_tools=True)
+        second = get_llm(bind_tools=True)
+
+        assert first is second
+        assert get_registry_stats()["hits"] == 1
+
+    def test_model_change_builds_new_runnable(self, monkeypatch):
+        """GROQ_MODEL 改變時 key 不同"""
+        from app.graph import get_llm
+
+        monkeypatch.setenv("GROQ_API_KEY", "test-key")
+        monkeypatch.setenv("GROQ_MODEL", "model-a")
+        first = get_llm()
+        monkeypatch.setenv("GROQ_MODEL", "model-b")
+        second = get_llm()
+
+        assert first is not second
+
+    def test_chat_models_share_http_pool(self, monkeypatch):
+        """所有 ChatGroq 共用同一組 httpx 客戶端"""
+        from app.graph import build_chat_model
+        from app.llm.registry import get_http_clients
+
+        monkeypatch.setenv("GROQ_API_KEY", "test-key")
+
+        llm_a = build_chat_model("model-a")
+        llm_b = build_chat_model("model-b")
+        http_client, http_async_client = get_http_clients()
+
+        assert llm_a.http_async_client is http_async_client
+        assert llm_b.http_async_client is http_async_client
+        assert llm_a.http_client is http_client
+
+    def test_reset_closes_http_pool(self):
+        """reset_registry 關閉舊的連線池，之後取得新的客戶端"""
+        from app.llm.registry import get_http_clients, reset_registry
+
+        http_client, http_async_client = get_http_clients()
+        reset_registry()
+
+        assert http_client.is_closed
+        assert http_async_client.is_closed
+        assert get_http_clients()[0] is not http_client
+
+    @pytest.mark.asyncio
+    async def test_close_http_clients(self):
+        """應用程式關閉時（lifespan）關閉連線池並清除綁定它的 runnable"""
+        from app.llm.registry import close_http_clients, get_http_clients, get_registry, LLMKey
+        from app.main import app, lifespan
+
+        get_registry().get_or_create(LLMKey(("m",), False, 0.7, 60.0), object)
+        async with lifespan(app):
+            http_client, http_async_client = get_http_clients()
+
+        assert http_client.is_closed and http_async_client.is_closed
+        assert get_registry().stats()["size"] == 0
+        await close_http_clients()  # 沒有連線池時不做事
+
+
+# ============================================================
+# Health Endpoint
+# ============================================================
+
+class TestRegistryHealth:
+    """/health 包含註冊表統計"""
+
+    @pytest.mark.asyncio
+    async def test_health_includes_registry_stats(self, async_client):
+        response = await async_client.get("/health")
+
+        data = response.json()
+        assert "llm_registry" in data
+        assert "hits" in data["llm_registry"]
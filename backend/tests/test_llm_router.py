@@ -0,0 +1,425 @@
+"""
+Adaptive Model Router Tests
+
+測試 app/llm/router.py 的健康度統計、熔斷器與 RoutedLLM 切換
+"""
+
+import asyncio
+import pytest
+import httpx
+from unittest.mock import patch
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.runnables import RunnableGenerator, RunnableLambda
+
+
+class UpstreamError(Exception):
+    """測試用的上游錯誤"""
+
+
+def make_rate_limit_error() -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    return httpx.HTTPStatusError("429", request=request, response=httpx.Response(429, request=request))
+
+
+def failing(exc: Exception) -> RunnableLambda:
+    def _raise(_):
+        raise exc
+    return RunnableLambda(_raise)
+
+
+def fake(*contents: str) -> GenericFakeChatModel:
+    return GenericFakeChatModel(messages=iter([AIMessage(content=c) for c in contents]))
+
+
+@pytest.fixture
+def router():
+    from app.llm.router import ModelRouter, RouterConfig
+
+    return ModelRouter(RouterConfig(consecutive_failures=2, cooldown=30, rate_limit_cooldown=60))
+
+
+# ============================================================
+# ModelRouter Tests
+# ============================================================
+
+class TestModelRouter:
+    """排序與熔斷測試"""
+
+    def test_cold_start_keeps_configured_order(self, router):
+        """無樣本時維持設定順序"""
+        assert router.order(["primary", "backup", "small"]) == ["primary", "backup", "small"]
+
+    def test_faster_model_is_preferred(self, router):
+        """明顯較快的模型會排到前面"""
+        router.record_success("primary", ttft=4.0)
+        router.record_success("backup", ttft=0.5)
+
+        assert router.order(["primary", "backup"]) == ["backup", "primary"]
+
+    def test_rate_limit_opens_circuit(self, router):
+        """429 立即熔斷並排到最後"""
+        router.record_failure("primary", make_rate_limit_error())
+
+        snapshot = router.snapshot(["primary", "backup"])
+        assert snapshot["models"]["primary"]["state"] == "open"
+        assert snapshot["models"]["primary"]["rate_limited"] == 1
+        assert snapshot["order"] == ["backup", "primary"]
+
+    def test_consecutive_failures_open_circuit(self, router):
+        """連續失敗達門檻後熔斷"""
+        router.record_failure("primary", UpstreamError())
+        assert router.snapshot(["primary"])["models"]["primary"]["state"] == "closed"
+
+        router.record_failure("primary", UpstreamError())
+        assert router.snapshot(["primary"])["models"]["primary"]["state"] == "open"
+
+    def test_half_open_after_cooldown(self, router):
+        """冷卻後進入 half_open，探測成功即恢復"""
+        with patch("app.llm.router.time.monotonic", return_value=100.0):
+            router.record_failure("primary", make_rate_limit_error())
+        with patch("app.llm.router.time.monotonic", return_value=161.0):
+            assert router.snapshot(["primary"])["models"]["primary"]["state"] == "half_open"
+            router.begin("primary")
+            # 探測進行中，其他呼叫不會再選它
+            assert router.order(["primary", "backup"]) == ["backup", "primary"]
+            router.record_success("primary", ttft=0.3)
+            assert router.snapshot(["primary"])["models"]["primary"]["state"] == "closed"
+
+
+    def test_probe_is_claimed_once(self, router):
+        """多個呼叫在探測開始前都已排好順序：只有先 begin 的取得探測名額"""
+        with patch("app.llm.router.time.monotonic", return_value=100.0):
+            router.record_failure("primary", make_rate_limit_error())
+        with patch("app.llm.router.time.monotonic", return_value=161.0):
+            assert router.begin("primary") is True
+            assert router.begin("primary") is None
+            assert router.begin("primary", last_resort=True) is False
+
+
+# ============================================================
+# RoutedLLM Tests
+# ============================================================
+
+class TestRoutedLLM:
+    """RoutedLLM 切換測試"""
+
+    @pytest.mark.asyncio
+    async def test_falls_through_to_next_model(self, router):
+        """第一個模型失敗時改用下一個"""
+        from app.llm.router import RoutedLLM
+
+        llm = RoutedLLM(
+            {"primary": failing(UpstreamError("down")), "backup": fake("備用回應")},
+            router=router,
+            exceptions=(UpstreamError,),
+        )
+
+        result = await llm.ainvoke([HumanMessage(content="hi")])
+
+        assert result.content == "備用回應"
+        assert router.snapshot(["primary"])["models"]["primary"]["success_rate"] == 0.0
+
+    @pytest.mark.asyncio
+    async def test_open_model_is_skipped_without_round_trip(self, router):
+        """熔斷中的模型不會先被嘗試"""
+        from app.llm.router import RoutedLLM
+
+        calls = []
+
+        def primary(_):
+            calls.append("primary")
+            return AIMessage(content="primary")
+
+        router.record_failure("primary", make_rate_limit_error())
+        llm = RoutedLLM(
+            {"primary": RunnableLambda(primary), "backup": fake("backup")},
+            router=router,
+            exceptions=(UpstreamError,),
+        )
+
+        result = await llm.ainvoke([HumanMessage(content="hi")])
+
+        assert result.content == "backup"
+        assert calls == []
+
+    @pytest.mark.asyncio
+    async def test_held_probe_is_skipped(self, router):
+        """順序在探測開始前算好：名額已被其他呼叫佔用時略過該模型，且不釋放別人的名額"""
+        from app.llm.router import RoutedLLM
+
+        calls = []
+
+        def primary(_):
+            calls.append("primary")
+            return AIMessage(content="primary")
+
+        with patch("app.llm.router.time.monotonic", return_value=100.0):
+            router.record_failure("primary", make_rate_limit_error())
+        llm = RoutedLLM(
+            {"primary": RunnableLambda(primary), "backup": fake("backup")},
+            router=router,
+            exceptions=(UpstreamError,),
+        )
+
+        with patch("app.llm.router.time.monotonic", return_value=161.0), \
+                patch.object(router, "order", return_value=["primary", "backup"]):
+            assert router.begin("primary") is True  # 另一個呼叫正在探測
+            result = await llm.ainvoke([HumanMessage(content="hi")])
+            assert router.begin("primary") is None
+
+        assert result.content == "backup"
+        assert calls == []
+
+    @pytest.mark.asyncio
+    async def test_all_models_fail_raises_last_error(self, router):
+        """全部失敗時拋出最後一個錯誤"""
+        from app.llm.router import RoutedLLM
+
+        llm = RoutedLLM(
+            {"a": failing(UpstreamError("a")), "b": failing(UpstreamError("b"))},
+            router=router,
+            exceptions=(UpstreamError,),
+        )
+
+        with pytest.raises(UpstreamError):
+            await llm.ainvoke([HumanMessage(content="hi")])
+
+    def test_sync_invoke_does_not_record_ttft(self, router):
+        """同步呼叫不把整段呼叫時間當成 TTFT 樣本"""
+        from app.llm.router import RoutedLLM
+
+        llm = RoutedLLM({"primary": fake("hello")}, router=router, exceptions=(UpstreamError,))
+        llm.invoke([HumanMessage(content="hi")])
+
+        snapshot = router.snapshot(["primary"])["models"]["primary"]
+        assert snapshot["samples"] == 1
+        assert snapshot["avg_ttft"] is None
+
+    @pytest.mark.asyncio
+    async def test_no_models_raises_runtime_error(self, router):
+        from app.llm.router import RoutedLLM
+
+        llm = RoutedLLM({}, router=router, exceptions=(UpstreamError,))
+
+        with pytest.raises(RuntimeError, match="no models configured"):
+            llm.invoke([HumanMessage(content="hi")])
+        with pytest.raises(RuntimeError, match="no models configured"):
+            await llm.ainvoke([HumanMessage(content="hi")])
+
+    @pytest.mark.asyncio
+    async def test_records_ttft_on_success(self, router):
+        """成功呼叫會記錄 TTFT"""
+        from app.llm.router import RoutedLLM
+
+        llm = RoutedLLM({"primary": fake("hello world")}, router=router, exceptions=(UpstreamError,))
+        await llm.ainvoke([HumanMessage(content="hi")])
+
+        assert router.snapshot(["primary"])["models"]["primary"]["avg_ttft"] is not None
+
+
+# ============================================================
+# Stream Watchdog Tests
+# ============================================================
+
+def slow_first_token(delay: float) -> RunnableLambda:
+    async def _slow(_):
+        await asyncio.sleep(delay)
+        return AIMessage(content="too late")
+    return RunnableLambda(_slow)
+
+
+def stalls_after_first_chunk() -> RunnableGenerator:
+    async def _gen(_):
+        yield AIMessageChunk(content="partial ")
+        await asyncio.sleep(5)
+        yield AIMessageChunk(content="never")
+    return RunnableGenerator(_gen)
+
+
+class TestStreamWatchdog:
+    """TTFT / stall 看門狗測試"""
+
+    @pytest.mark.asyncio
+    async def test_ttft_timeout_fails_over(self, router):
+        """第一個 token 逾時即改用下一個模型"""
+        from app.llm.router import RoutedLLM
+
+        llm = RoutedLLM(
+            {"primary": slow_first_token(5), "backup": fake("fast answer")},
+            router=router,
+            exceptions=(UpstreamError,),
+            ttft_timeout=0.05,
+            stall_timeout=0.05,
+        )
+
+        result = await asyncio.wait_for(llm.ainvoke([HumanMessage(content="hi")]), 2)
+
+        assert result.content == "fast answer"
+        assert router.snapshot(["primary"])["models"]["primary"]["consecutive_failures"] == 1
+
+    @pytest.mark.asyncio
+    async def test_stall_after_output_raises_without_continuation(self, router):
+        """關閉接續時，已輸出 token 後停滯會拋出 StreamTimeoutError"""
+        from app.llm.router import RoutedLLM, StreamTimeoutError
+
+        llm = RoutedLLM(
+            {"primary": stalls_after_first_chunk(), "backup": fake("unused")},
+            router=router,
+            exceptions=(UpstreamError,),
+            ttft_timeout=1,
+            stall_timeout=0.05,
+            continue_partial=False,
+        )
+
+        with pytest.raises(StreamTimeoutError) as exc_info:
+            async for _ in llm.astream([HumanMessage(content="hi")]):
+                pass
+        assert exc_info.value.phase == "stall"
+
+    @pytest.mark.asyncio
+    async def test_failover_dispatches_custom_event(self, router):
+        """切換時發出 llm_failover 自訂事件"""
+        from app.llm.router import RoutedLLM, FAILOVER_EVENT
+
+        llm = RoutedLLM(
+            {"primary": slow_first_token(5), "backup": fake("ok")},
+            router=router,
+            exceptions=(UpstreamError,),
+            ttft_timeout=0.05,
+        )
+
+        async def node(_):
+            return await llm.ainvoke([HumanMessage(content="hi")])
+
+        events = [
+            e async for e in RunnableLambda(node).astream_events(None, version="v2")
+            if e["event"] == "on_custom_event"
+        ]
+
+        assert events[0]["name"] == FAILOVER_EVENT
+        assert events[0]["data"] == {
+            "from_model": "primary",
+            "to_model": "backup",
+            "reason": "ttft_timeout",
+            "continued": False,
+        }
+
+    @pytest.mark.asyncio
+    async def test_failover_event_names_model_that_runs(self, router):
+        """下一個候選的探測名額已被佔用而略過時，切換事件指向實際執行的模型"""
+        from app.llm.router import RoutedLLM, FAILOVER_EVENT, HALF_OPEN
+
+        probing = router._get("probing")
+        probing.state, probing.probe_in_flight = HALF_OPEN, True  # 另一個呼叫正在探測
+        llm = RoutedLLM(
+            {"primary": failing(UpstreamError("down")), "probing": fake("unused"), "backup": fake("ok")},
+            router=router,
+            exceptions=(UpstreamError,),
+        )
+
+        async def node(_):
+            return await llm.ainvoke([HumanMessage(content="hi")])
+
+        with patch.object(router, "order", return_value=["primary", "probing", "backup"]):
+            events = [
+                e async for e in RunnableLambda(node).astream_events(None, version="v2")
+                if e["event"] == "on_custom_event" and e["name"] == FAILOVER_EVENT
+            ]
+
+        assert [(e["data"]["from_model"], e["data"]["to_model"]) for e in events] == [("primary", "backup")]
+
+
+# ============================================================
+# Partial Continuation Tests
+# ============================================================
+
+def recording_continuation(received: list, *pieces: str) -> RunnableGenerator:
+    async def _gen(input):
+        async for messages in input:
+            received.append(messages)
+        for piece in pieces:
+            yield AIMessageChunk(content=piece)
+    return RunnableGenerator(_gen)
+
+
+def dies_after(*pieces: str) -> RunnableGenerator:
+    async def _gen(_):
+        for piece in pieces:
+            yield AIMessageChunk(content=piece)
+        raise UpstreamError("connection reset")
+    return RunnableGenerator(_gen)
+
+
+class TestPartialContinuation:
+    """串流中途失敗的接續測試"""
+
+    @pytest.mark.asyncio
+    async def test_next_model_continues_partial_output(self, router):
+        """下一個模型收到部分回應並只產生剩餘內容"""
+        from app.llm.router import RoutedLLM, CONTINUE_PROMPT
+
+        received = []
+        llm = RoutedLLM(
+            {"primary": dies_after("AI 將創造", "新的職缺"), "backup": recording_continuation(received, "，而且更多元。")},
+            router=router,
+            exceptions=(UpstreamError,),
+            continue_partial=True,
+        )
+
+        streamed = [c.content async for c in llm.astream([HumanMessage(content="辯論主題：AI")])]
+
+        assert "".join(streamed) == "AI 將創造新的職缺，而且更多元。"
+        prompt = received[0]
+        assert prompt[0].content == "辯論主題：AI"
+        assert prompt[-2].content == "AI 將創造新的職缺"
+        assert prompt[-1].content == CONTINUE_PROMPT
+
+    @pytest.mark.asyncio
+    async def test_stall_is_continued_with_event(self, router):
+        """停滯後接續，並在事件中標記 continued"""
+        from app.llm.router import RoutedLLM
+
+        received = []
+        llm = RoutedLLM(
+            {"primary": stalls_after_first_chunk(), "backup": recording_continuation(received, "rest")},
+            router=router,
+            exceptions=(UpstreamError,),
+            stall_timeout=0.05,
+            continue_partial=True,
+        )
+
+        async def node(_):
+            return await llm.ainvoke([HumanMessage(content="hi")])
+
+        result = None
+        failovers = []
+        async for e in RunnableLambda(node).astream_events(None, version="v2"):
+            if e["event"] == "on_custom_event":
+                failovers.append(e["data"])
+            elif e["event"] == "on_chain_end" and e["name"] == "node":
+                result = e["data"]["output"]
+
+        assert result.content == "partial rest"
+        assert failovers[0]["reason"] == "stall"
+        assert failovers[0]["continued"] is True
+
+
+# ============================================================
+# Introspection Endpoint
+# ============================================================
+
+class TestRouterEndpoint:
+    """GET /llm/router 測試"""
+
+    @pytest.mark.asyncio
+    async def test_router_endpoint(self, async_client, monkeypatch):
+        monkeypatch.setenv("GROQ_MODEL", "openai/gpt-oss-120b")
+        monkeypatch.delenv("GROQ_FALLBACK_MODELS", raising=False)
+
+        response = await async_client.get("/llm/router")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["order"][0] == "openai/gpt-oss-120b"
+        assert "success_rate" in data["models"]["openai/gpt-oss-120b"]
@@ -4,6 +4,7 @@ API Integration Tests
 測試 app/main.py 的 FastAPI endpoints
 """
 
+import json
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 
@@ -33,6 +34,7 @@ class TestHealthEndpoint:
         data = response.json()
         assert "has_groq_key" in data
         assert "supabase_enabled" in data
+        assert data["graph_cache"]["misses"] == 0
 
 
 class TestRootEndpoint:
@@ -188,6 +190,174 @@ class TestDebateEndpoint:
         
         assert response.status_code == 422
 
+    @pytest.mark.asyncio
+    async def test_debate_endpoint_invalid_profile(self, async_client):
+        """未知的 profile 返回 422"""
+        payload = {"topic": "測試主題", "profile": "turbo"}
+
+        response = await async_client.post("/debate", json=payload)
+
+        assert response.status_code == 422
+
+
+class TestLangGraphStreamFailover:
+    """langgraph_debate_stream 轉發模型切換事件"""
+
+    @pytest.mark.asyncio
+    async def test_failover_event_becomes_status(self):
+        """llm_failover 自訂事件轉為 status SSE"""
+        from app.main import langgraph_debate_stream
+
+        async def fake_events(*args, **kwargs):
+            yield {"event": "on_chain_start", "name": "optimist"}
+            yield {
+                "event": "on_custom_event",
+                "name": "llm_failover",
+                "data": {"from_model": "primary", "to_model": "backup", "reason": "ttft_timeout"},
+            }
+
+        mock_graph = MagicMock()
+        mock_graph.astream_events = fake_events
+
+        with patch("app.graph.debate_graph", mock_graph):
+            frames = [f async for f in langgraph_debate_stream("主題", 1, "en")]
+
+        status = [f for f in frames if '"status"' in f and "switching to backup" in f]
+        assert len(status) == 1
+
+
+class TestOverlapEventOrder:
+    """overlap 模式：主持人小結與樂觀者並行，SSE 仍依「小結 → 樂觀者」送出"""
+
+    @staticmethod
+    def event(kind: str, node: str, name: str = None, **data) -> dict:
+        return {"event": kind, "name": name or node, "metadata": {"langgraph_node": node}, "data": data}
+
+    @pytest.mark.asyncio
+    async def test_buffers_other_nodes_until_moderator_ends(self):
+        from app.main import order_overlap_events
+
+        e = self.event
+        raw = [
+            e("on_chain_end", "skeptic", output={"current_speaker": "moderator"}),
+            e("on_chain_start", "optimist"),
+            e("on_chain_start", "moderator"),
+            e("on_chat_model_stream", "optimist", "ChatGroq"),
+            e("on_chat_model_stream", "moderator", "ChatGroq"),
+            e("on_chain_end", "optimist"),
+            e("on_chain_end", "moderator"),
+            e("on_chain_start", "skeptic"),
+        ]
+
+        async def events():
+            for item in raw:
+                yield item
+
+        ordered = [(x["event"], x["metadata"]["langgraph_node"]) async for x in order_overlap_events(events())]
+        assert ordered == [
+            ("on_chain_end", "skeptic"),
+            ("on_chain_start", "moderator"),
+            ("on_chat_model_stream", "moderator"),
+            ("on_chain_end", "moderator"),
+            ("on_chain_start", "optimist"),
+            ("on_chat_model_stream", "optimist"),
+            ("on_chain_end", "optimist"),
+            ("on_chain_start", "skeptic"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_stream_speaker_order(self):
+        """第 2 輪樂觀者的 speaker 事件在主持人小結完成後才送出"""
+        from app.main import langgraph_debate_stream
+        from tests.test_graph import OverlapLLM
+
+        llm = OverlapLLM()
+        speakers = []
+        with patch("app.graph.get_llm", return_value=llm):
+            async for frame in langgraph_debate_stream("AI jobs", 2, "en", prefetch=False, graph_mode="overlap"):
+                data = json.loads(frame[len("data: "):])
+                assert data["type"] != "error"
+                if data["type"] == "speaker":
+                    speakers.append((data["node"], "moderator:end" in llm.log))
+
+        assert speakers == [
+            ("optimist", False), ("skeptic", False), ("moderator", False),
+            ("optimist", True), ("skeptic", True), ("moderator", True),
+        ]
+
+
+class TestPanelStreamMultiplex:
+    """panel 模式：並行辯手的 token 交錯送出，以節點名稱標記"""
+
+    @pytest.mark.asyncio
+    async def test_tokens_tagged_per_node(self):
+        from app.main import langgraph_debate_stream
+
+        def event(kind, node, name=None, text=None):
+            data = {"chunk": MagicMock(content=text)} if text else {}
+            return {"event": kind, "name": name or node, "metadata": {"langgraph_node": node}, "data": data}
+
+        async def fake_events(*args, **kwargs):
+            yield event("on_chain_start", "optimist")
+            yield event("on_chain_start", "skeptic_cost")
+            yield event("on_chat_model_stream", "skeptic_cost", "ChatGroq", "Cost")
+            yield event("on_chat_model_stream", "optimist", "ChatGroq", "Growth")
+            yield event("on_chain_start", "optimist", "route_after_optimist")
+            yield event("on_chain_end", "optimist")
+            yield event("on_chat_model_stream", "skeptic_cost", "ChatGroq", " risk")
+            yield event("on_chain_end", "skeptic_cost")
+            yield event("on_chain_start", "moderator")
+            yield event("on_chain_end", "moderator")
+
+        mock_graph = MagicMock()
+        mock_graph.astream_events = fake_events
+
+        with patch("app.graph.get_debate_graph", return_value=mock_graph):
+            frames = [
+                json.loads(f[len("data: "):])
+                async for f in langgraph_debate_stream("AI jobs", 1, "en", prefetch=False, graph_mode="panel")
+            ]
+
+        flow = [(f["type"], f.get("node"), f.get("text")) for f in frames if f["type"] != "status"]
+        assert flow == [
+            ("speaker", "optimist", "Round 1"),
+            ("speaker", "skeptic_cost", "Round 1"),
+            ("token", "skeptic_cost", "Cost"),
+            ("token", "optimist", "Growth"),
+            ("speaker_end", "optimist", None),
+            ("token", "skeptic_cost", " risk"),
+            ("speaker_end", "skeptic_cost", None),
+            ("speaker", "moderator", "Summary Report"),
+            ("speaker_end", "moderator", None),
+            ("complete", None, "✅ Debate complete! 1 exciting rounds."),
+        ]
+        roles = {f["node"]: f["role"] for f in frames if f["type"] == "speaker"}
+        assert roles == {"optimist": "optimist", "skeptic_cost": "skeptic", "moderator": "moderator"}
+
+
+class TestRealStreamPartialOutput:
+    """real_debate_stream 串流中斷時保留部分內容"""
+
+    @pytest.mark.asyncio
+    async def test_partial_output_is_kept(self):
+        """已輸出內容時不中止辯論"""
+        from app.main import real_debate_stream
+
+        class FlakyLLM:
+            calls = 0
+
+            async def astream(self, messages):
+                FlakyLLM.calls += 1
+                yield MagicMock(content="部分內容")
+                if FlakyLLM.calls == 1:
+                    raise RuntimeError("stream reset")
+
+        with patch("app.graph.get_llm", return_value=FlakyLLM()):
+            frames = [f async for f in real_debate_stream("主題", 1, "zh")]
+
+        assert any('"speaker", "node": "skeptic"' in f for f in frames)
+        assert not any('"type": "error"' in f for f in frames)
+
 
 # ============================================================
 # CORS Tests
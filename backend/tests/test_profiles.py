@@ -0,0 +1,204 @@
+"""
+Debate Profile & Graph Variant Tests
+
+測試 app/services/profiles.py 的 profile 設定，以及 app/graph_builder.py 依 GraphConfig
+編譯並快取的 graph 變體（主持人小結頻率、工具迭代上限）
+"""
+
+import pytest
+from unittest.mock import patch
+from langchain_core.messages import AIMessage
+
+
+class ProfileLLM:
+    """記錄 get_llm 參數與每次呼叫的 max_tokens；依 system prompt 回應"""
+
+    def __init__(self):
+        self.llm_calls = []
+        self.calls = []
+
+    def get_llm(self, **kwargs):
+        self.llm_calls.append(kwargs)
+        return self
+
+    async def ainvoke(self, messages, **kwargs):
+        system = messages[0].content
+        if "Round N Summary" in system:
+            role = "moderator_round"
+        elif "final summary" in system:
+            role = "moderator_final"
+        else:
+            role = "optimist" if "Optimist Debater" in system else "skeptic"
+        self.calls.append((role, kwargs.get("max_tokens")))
+        if role == "moderator_round":
+            return AIMessage(content="### 🔄 Round 1 Summary\n**Optimist**: growth\n**Skeptic**: risk")
+        return AIMessage(content=f"{role} turn")
+
+    def roles(self):
+        return [role for role, _ in self.calls]
+
+
+async def run_debate(graph, profile=None, max_rounds: int = 2):
+    from app.graph import create_initial_state
+
+    llm = ProfileLLM()
+    config = {"configurable": {"profile": profile}} if profile else None
+    with patch("app.graph.get_llm", side_effect=llm.get_llm):
+        result = await graph.ainvoke(create_initial_state("AI jobs", max_rounds=max_rounds, language="en"), config)
+    return result, llm
+
+
+# ============================================================
+# Profile Tests
+# ============================================================
+
+class TestProfiles:
+    """profile 選擇與每種發言的設定"""
+
+    def test_default_profile(self, monkeypatch):
+        from app.services.profiles import get_profile
+
+        monkeypatch.delenv("DEBATE_PROFILE", raising=False)
+        assert get_profile().name == "balanced"
+
+        monkeypatch.setenv("DEBATE_PROFILE", "fast")
+        assert get_profile().name == "fast"
+        assert get_profile("thorough").name == "thorough"
+
+    def test_unknown_profile_falls_back(self):
+        from app.services.profiles import get_profile
+
+        assert get_profile("turbo").name == "balanced"
+
+    def test_balanced_matches_defaults(self):
+        from app.llm.prompt_layout import get_turn_max_tokens
+        from app.services.profiles import get_profile
+
+        profile = get_profile("balanced")
+        assert profile.llm_kwargs() == {}
+        assert profile.turn_max_tokens("optimist") == get_turn_max_tokens("optimist")
+
+    def test_fast_profile_models(self, monkeypatch):
+        from app.services.profiles import get_profile
+
+        monkeypatch.setenv("FAST_PROFILE_MODELS", "small-a, small-b")
+        profile = get_profile("fast")
+        assert profile.llm_kwargs() == {"models": ["small-a", "small-b"]}
+        assert profile.turn_max_tokens("skeptic") == 256
+        assert profile.turn_max_tokens("moderator_final") == 768
+
+    @pytest.mark.asyncio
+    async def test_fast_profile_reaches_nodes(self, monkeypatch):
+        """fast：快速模型、較短發言、只在最後呼叫一次主持人"""
+        from app.graph import get_debate_graph
+        from app.services.profiles import get_profile
+
+        monkeypatch.setenv("FAST_PROFILE_MODELS", "small-a")
+        profile = get_profile("fast")
+        graph = get_debate_graph("tools", profile.graph_config("tools"))
+        result, llm = await run_debate(graph, profile)
+
+        assert all(kwargs["models"] == ["small-a"] for kwargs in llm.llm_calls)
+        assert llm.roles() == ["optimist", "skeptic", "optimist", "skeptic", "moderator_final"]
+        assert llm.calls[0] == ("optimist", 256)
+        assert llm.calls[-1] == ("moderator_final", 768)
+        assert result["round_count"] == 2
+        assert result["current_speaker"] == "end"
+
+
+# ============================================================
+# Graph Variant Tests
+# ============================================================
+
+class TestGraphVariants:
+    """主持人小結頻率與工具迭代上限"""
+
+    def test_default_tool_iterations_match_graph(self):
+        from app.graph import MAX_TOOL_ITERATIONS
+        from app.graph_builder import DEFAULT_TOOL_ITERATIONS
+
+        assert DEFAULT_TOOL_ITERATIONS == MAX_TOOL_ITERATIONS
+
+    def test_normalization(self):
+        from app.graph_builder import GraphConfig
+
+        assert GraphConfig("panel", max_tool_iterations=9, moderator="off").normalized() == GraphConfig("panel")
+        assert GraphConfig("retrieve", max_tool_iterations=9).normalized() == GraphConfig("retrieve")
+        assert GraphConfig("tools", search=False).normalized().max_tool_iterations == 0
+        assert GraphConfig("overlap", moderator="final").normalized().mode == "tools"
+
+        with pytest.raises(ValueError, match="cadence"):
+            GraphConfig("tools", moderator="weekly").normalized()
+
+    @pytest.mark.asyncio
+    async def test_final_cadence_keeps_rolling_summary(self):
+        from app.graph_builder import GraphConfig, build_debate_graph
+
+        graph = build_debate_graph(GraphConfig("tools", moderator="final"))
+        result, llm = await run_debate(graph, max_rounds=3)
+
+        assert llm.roles().count("moderator_final") == 1
+        assert "moderator_round" not in llm.roles()
+        assert [m.name for m in result["messages"]][-1] == "moderator"
+        assert result["round_count"] == 3
+        assert "Round 1:" in result["debate_summary"] and "Round 2:" in result["debate_summary"]
+
+    @pytest.mark.asyncio
+    async def test_off_cadence_skips_moderator(self):
+        from app.graph_builder import GraphConfig, build_debate_graph
+
+        graph = build_debate_graph(GraphConfig("tools", moderator="off"))
+        result, llm = await run_debate(graph)
+
+        assert llm.roles() == ["optimist", "skeptic", "optimist", "skeptic"]
+        assert "moderator" not in [m.name for m in result["messages"]]
+        assert result["current_speaker"] == "end"
+
+    @pytest.mark.asyncio
+    async def test_no_search_never_binds_tools(self):
+        from app.graph_builder import GraphConfig, build_debate_graph
+
+        graph = build_debate_graph(GraphConfig("tools", search=False))
+        _, llm = await run_debate(graph, max_rounds=1)
+
+        debater_calls = [kwargs for kwargs in llm.llm_calls if "bind_tools" in kwargs]
+        assert debater_calls and not any(kwargs["bind_tools"] for kwargs in debater_calls)
+
+
+# ============================================================
+# Graph Cache Tests
+# ============================================================
+
+class TestGraphCache:
+    """每種變體只編譯一次"""
+
+    def test_default_config_uses_module_graph(self):
+        from app.graph import get_debate_graph, debate_graph
+        from app.graph_builder import GraphConfig, get_graph_cache_stats
+
+        assert get_debate_graph("tools", GraphConfig("tools")) is debate_graph
+        assert get_graph_cache_stats()["misses"] == 0
+
+    def test_variants_compiled_once(self):
+        from app.graph import get_debate_graph
+        from app.graph_builder import GraphConfig, get_graph_cache_stats
+
+        first = get_debate_graph("tools", GraphConfig("tools", moderator="final"))
+        # overlap 搭配 final 小結時沒有可重疊的每輪小結，正規化後等同 tools
+        assert get_debate_graph("overlap", GraphConfig("tools", moderator="final")) is first
+
+        stats = get_graph_cache_stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+
+    def test_lru_eviction(self):
+        from app.graph_builder import GraphCache, GraphConfig
+
+        cache = GraphCache(max_entries=2)
+        for iterations in (1, 2, 1, 4):
+            cache.get_or_build(GraphConfig("tools", max_tool_iterations=iterations))
+
+        stats = cache.stats()
+        assert stats["size"] == 2
+        assert stats["hits"] == 1
+        assert stats["evictions"] == 1
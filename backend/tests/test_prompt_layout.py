@@ -0,0 +1,143 @@
+"""
+Prompt Layout Tests
+
+測試 app/llm/prompt_layout.py 的區塊順序、決定性輸出與 cached tokens 統計
+"""
+
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from langchain_core.messages import AIMessage, ToolMessage
+
+
+def common_prefix(a: str, b: str) -> str:
+    n = 0
+    while n < min(len(a), len(b)) and a[n] == b[n]:
+        n += 1
+    return a[:n]
+
+
+def debate_state(language: str = "en"):
+    from app.graph import create_initial_state
+
+    state = create_initial_state("AI jobs", max_rounds=3, language=language)
+    state["round_count"] = 1
+    state["messages"] = [
+        AIMessage(content="AI creates jobs", name="optimist"),
+        AIMessage(content="AI destroys jobs", name="skeptic"),
+        AIMessage(content="Round 1 summary", name="moderator"),
+    ]
+    return state
+
+
+class TestLayout:
+    """穩定區塊在前，易變指示在後"""
+
+    def test_system_messages_prebuilt(self):
+        from app.llm.prompt_layout import get_system_message
+
+        assert get_system_message("optimist", "en") is get_system_message("optimist", "en")
+        assert get_system_message("optimist", "en") is not get_system_message("optimist", "zh")
+        assert "{round}" not in get_system_message("moderator_round", "zh").content
+
+    def test_same_input_same_output(self):
+        from app.graph import build_prompt
+
+        first = build_prompt(debate_state(), "optimist", "[TAVILY] research")
+        second = build_prompt(debate_state(), "optimist", "[TAVILY] research")
+        assert first == second
+        assert first[0] is second[0]
+
+    def test_order_stable_first(self):
+        from app.graph import build_prompt
+
+        content = build_prompt(debate_state(), "optimist", "[TAVILY] research", "[Search Result]:\n• data")[1].content
+        positions = [
+            content.index("Debate Topic: AI jobs"),
+            content.index("Background Research:"),
+            content.index("Conversation History:"),
+            content.index("[Search Result]:"),
+            content.index("Based on the search results above"),
+        ]
+        assert positions == sorted(positions)
+
+    def test_tool_round_shares_prefix_with_decision_call(self):
+        """搜尋前後兩次呼叫：主題、背景資料與對話歷史完全相同"""
+        from app.graph import build_prompt
+
+        state = debate_state()
+        decision = build_prompt(state, "optimist", "[TAVILY] research")[1].content
+
+        state["messages"] = state["messages"] + [
+            AIMessage(content="", name="optimist", tool_calls=[
+                {"name": "web_search_tool", "args": {"query": "AI jobs"}, "id": "call_1"}
+            ]),
+            ToolMessage(content="[TAVILY] raw", tool_call_id="call_1", name="web_search_tool"),
+        ]
+        after_tools = build_prompt(state, "optimist", "[TAVILY] research", "[Search Result]:\n• data")[1].content
+
+        prefix = common_prefix(decision, after_tools)
+        assert "Round 1 summary" in prefix
+        assert "[TAVILY] raw" not in after_tools
+
+    @pytest.mark.asyncio
+    async def test_moderator_system_prompt_same_every_round(self):
+        from app.graph import moderator_node
+
+        systems = []
+        for round_count in (0, 1):
+            mock_llm = MagicMock()
+            mock_llm.ainvoke = AsyncMock(return_value=AIMessage(content="summary"))
+            state = debate_state("zh")
+            state["max_rounds"] = 5
+            state["round_count"] = round_count
+            with patch("app.graph.get_llm", return_value=mock_llm):
+                await moderator_node(state)
+            prompt = mock_llm.ainvoke.call_args.args[0]
+            systems.append(prompt[0])
+            assert prompt[1].content.endswith(f"請生成第 {round_count + 1} 輪小結（N = {round_count + 1}）。")
+
+        assert systems[0] is systems[1]
+
+
+class TestPromptCacheStats:
+    """provider 回報的 cached tokens"""
+
+    def test_extract_usage_metadata(self):
+        from app.llm.prompt_layout import extract_usage
+
+        message = AIMessage(content="x", usage_metadata={
+            "input_tokens": 900, "output_tokens": 50, "total_tokens": 950,
+            "input_token_details": {"cache_read": 600},
+        })
+        assert extract_usage(message) == (900, 600)
+
+    def test_extract_openai_style_token_usage(self):
+        from app.llm.prompt_layout import extract_usage
+
+        message = AIMessage(content="x", response_metadata={
+            "token_usage": {"prompt_tokens": 400, "prompt_tokens_details": {"cached_tokens": 256}}
+        })
+        assert extract_usage(message) == (400, 256)
+        assert extract_usage(AIMessage(content="x")) == (0, 0)
+
+    @pytest.mark.asyncio
+    async def test_nodes_record_usage(self):
+        from app.graph import skeptic_node
+        from app.llm.prompt_layout import get_prompt_cache_stats
+
+        response = AIMessage(content="rebuttal", usage_metadata={
+            "input_tokens": 1000, "output_tokens": 40, "total_tokens": 1040,
+            "input_token_details": {"cache_read": 750},
+        })
+        mock_llm = MagicMock()
+        mock_llm.ainvoke = AsyncMock(return_value=response)
+
+        with patch("app.graph.get_llm", return_value=mock_llm):
+            await skeptic_node(debate_state())
+            await skeptic_node(debate_state())
+
+        stats = get_prompt_cache_stats().stats()["skeptic"]
+        assert stats["calls"] == 2
+        assert stats["input_tokens"] == 2000
+        assert stats["cached_tokens"] == 1500
+        assert stats["cached_ratio"] == 0.75
@@ -0,0 +1,75 @@
+"""
+Query Similarity Tests
+
+測試 app/tools/query_similarity.py 的特徵、MinHash 與 LSH 查詢
+"""
+
+import pytest
+
+
+class TestQueryFeatures:
+    """query_features / stem 測試"""
+
+    def test_paraphrase_has_same_features(self):
+        from app.tools.query_similarity import query_features
+
+        assert query_features("AI job loss statistics 2024") == query_features("AI job losses stats 2024")
+
+    def test_stem_keeps_double_s(self):
+        from app.tools.query_similarity import stem
+
+        assert stem("loss") == "loss"
+        assert stem("losses") == "loss"
+        assert stem("policies") == "policy"
+
+    def test_cjk_bigrams(self):
+        from app.tools.query_similarity import query_features
+
+        assert query_features("失業率") == frozenset({"失業", "業率"})
+
+    def test_minhash_is_deterministic(self):
+        from app.tools.query_similarity import minhash, query_features
+
+        features = query_features("remote work productivity")
+        assert minhash(features) == minhash(features)
+        assert len(minhash(features, num_perm=32)) == 32
+
+
+class TestQueryLSH:
+    """QueryLSH 行為測試"""
+
+    def test_finds_near_duplicate(self):
+        from app.tools.query_similarity import QueryLSH
+
+        lsh = QueryLSH(threshold=0.8)
+        lsh.add("k1", "AI job loss statistics 2024", scope="en")
+
+        key, similarity = lsh.query("ai job losses stats 2024", scope="en")
+
+        assert key == "k1"
+        assert similarity == 1.0
+
+    def test_different_meaning_below_threshold(self):
+        from app.tools.query_similarity import QueryLSH
+
+        lsh = QueryLSH(threshold=0.8)
+        lsh.add("k1", "AI job loss statistics 2024", scope="en")
+
+        assert lsh.query("AI job creation statistics 2024", scope="en") is None
+
+    def test_scope_isolation_and_remove(self):
+        from app.tools.query_similarity import QueryLSH
+
+        lsh = QueryLSH()
+        lsh.add("k1", "AI job loss", scope="en")
+
+        assert lsh.query("AI job loss", scope="zh") is None
+        lsh.remove("k1")
+        assert lsh.query("AI job loss", scope="en") is None
+        assert len(lsh) == 0
+
+    def test_invalid_band_configuration(self):
+        from app.tools.query_similarity import QueryLSH
+
+        with pytest.raises(ValueError):
+            QueryLSH(num_perm=60, bands=16)
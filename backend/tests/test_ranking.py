@@ -0,0 +1,95 @@
+"""
+Ranking Tests
+
+測試 app/tools/ranking.py 的斷詞、BM25 排序、去重與 token 預算
+"""
+
+import pytest
+
+
+# ============================================================
+# Tokenize / Estimate Tests
+# ============================================================
+
+class TestTokenize:
+    """斷詞與 token 估算"""
+
+    def test_mixed_language(self):
+        from app.tools.ranking import tokenize
+
+        assert tokenize("AI 失業率 a") == ["ai", "失業", "業率"]
+
+    def test_estimate_tokens(self):
+        from app.tools.ranking import estimate_tokens
+
+        assert estimate_tokens("失業率") == 3
+        assert estimate_tokens("abcdefgh") == 2
+
+
+# ============================================================
+# Ranking Tests
+# ============================================================
+
+class TestRanking:
+    """BM25 排序、去重與裝箱"""
+
+    def test_relevant_passage_ranks_first(self):
+        from app.tools.ranking import select_evidence
+
+        results = [
+            {"title": "Weather", "content": "It will rain tomorrow in the city."},
+            {"title": "Jobs report", "content": "AI automation displaced 2% of jobs in 2024."},
+        ]
+
+        passages = select_evidence(results, "content", "AI jobs automation", budget=500)
+
+        assert passages[0].title == "Jobs report"
+
+    def test_near_duplicates_removed(self):
+        from app.tools.ranking import select_evidence
+
+        results = [
+            {"title": "A", "content": "AI will create 97 million new jobs by 2025."},
+            {"title": "B", "content": "AI will create 97 million new jobs by 2025!"},
+        ]
+
+        assert len(select_evidence(results, "content", "AI jobs", budget=500)) == 1
+
+    def test_budget_limits_output(self):
+        from app.tools.ranking import select_evidence, estimate_tokens
+
+        results = [
+            {"title": f"T{i}", "content": f"AI jobs finding number {i}. " * 6}
+            for i in range(5)
+        ]
+
+        passages = select_evidence(results, "content", "AI jobs", budget=60)
+
+        assert passages
+        assert sum(estimate_tokens(p.title) + estimate_tokens(p.text) + 2 for p in passages) <= 60
+
+    def test_compress_tool_context_skips_headers(self):
+        from app.tools.ranking import compress_tool_context
+
+        contents = [
+            "[TAVILY] Search Results:\n• Jobs: AI jobs grew\n• Food: pizza recipes",
+            "[DUCKDUCKGO] Search Results:\n• Jobs: AI jobs grew",
+        ]
+
+        assert compress_tool_context(contents, "AI jobs", budget=500) == ["Jobs: AI jobs grew", "Food: pizza recipes"]
+
+
+class TestFormatResultsRanking:
+    """format_results 使用排序與預算"""
+
+    def test_query_orders_results(self):
+        from app.tools.search import format_results
+
+        results = [
+            {"title": "Recipes", "content": "How to bake bread at home."},
+            {"title": "Labor", "content": "Remote work adoption doubled."},
+        ]
+
+        formatted = format_results(results, "tavily", "en", query="remote work")
+
+        assert formatted.index("Labor") < formatted.index("Recipes")
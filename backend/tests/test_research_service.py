@@ -0,0 +1,185 @@
+"""
+Research Prefetch Tests
+
+測試 app/services/research_service.py 的查詢產生、涵蓋判斷與預取流程
+"""
+
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+
+def search_result(query: str) -> dict:
+    return {"success": True, "results": [], "source": "tavily", "formatted": f"[TAVILY] {query}"}
+
+
+# ============================================================
+# Query Building / Coverage Tests
+# ============================================================
+
+class TestTopicQueries:
+    """build_topic_queries / coverage 測試"""
+
+    def test_queries_follow_language(self):
+        from app.services.research_service import build_topic_queries
+
+        assert build_topic_queries("AI jobs", "en") == [
+            "AI jobs", "AI jobs statistics data", "AI jobs risks criticism"
+        ]
+        assert build_topic_queries("AI 失業", "zh", max_queries=1) == ["AI 失業"]
+
+    def test_cjk_coverage(self):
+        """中文以 bigram 比對"""
+        from app.services.research_service import coverage
+
+        assert coverage("人工智慧 失業率", "人工智慧 失業率 數據 統計") == 1.0
+        assert coverage("核能 發電", "人工智慧 失業率") == 0.0
+
+    def test_english_coverage(self):
+        from app.services.research_service import coverage
+
+        assert coverage("AI jobs statistics", "ai jobs statistics data") == 1.0
+        assert coverage("remote work", "AI jobs") == 0.0
+
+
+# ============================================================
+# ResearchPrefetch Tests
+# ============================================================
+
+class TestResearchPrefetch:
+    """ResearchPrefetch 行為測試"""
+
+    @pytest.mark.asyncio
+    async def test_queries_run_concurrently(self):
+        from app.services.research_service import ResearchPrefetch
+
+        running = 0
+        peak = 0
+
+        async def fake_search(query, language="zh"):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+            return search_result(query)
+
+        with patch("app.tools.search.web_search", side_effect=fake_search):
+            prefetch = ResearchPrefetch("AI jobs", "en").start()
+            await asyncio.sleep(0.05)
+
+        assert peak == 3
+        assert prefetch.done
+        assert "[TAVILY] AI jobs statistics data" in prefetch.context()
+
+    @pytest.mark.asyncio
+    async def test_lookup_waits_for_covering_query(self):
+        """涵蓋的查詢仍在進行中時，lookup 等待它完成"""
+        from app.services.research_service import ResearchPrefetch
+
+        async def slow_search(query, language="zh"):
+            await asyncio.sleep(0.02)
+            return search_result(query)
+
+        with patch("app.tools.search.web_search", side_effect=slow_search):
+            prefetch = ResearchPrefetch("AI jobs", "en", queries=["AI jobs statistics data"]).start()
+            assert prefetch.context() == ""
+            result = await prefetch.lookup("AI jobs statistics")
+
+        assert result == "[TAVILY] AI jobs statistics data"
+        assert prefetch.served == 1
+
+    @pytest.mark.asyncio
+    async def test_uncovered_or_failed_queries_return_none(self):
+        from app.services.research_service import ResearchPrefetch
+
+        fallback = {"success": False, "source": "fallback", "formatted": "[注意] ..."}
+        with patch("app.tools.search.web_search", new_callable=AsyncMock, return_value=fallback):
+            prefetch = ResearchPrefetch("AI jobs", "en", queries=["AI jobs"]).start()
+            assert await prefetch.lookup("remote work") is None
+            assert await prefetch.lookup("AI jobs") is None
+
+        assert prefetch.context() == ""
+
+    @pytest.mark.asyncio
+    async def test_cancel_stops_pending_queries(self):
+        from app.services.research_service import ResearchPrefetch
+
+        async def hanging_search(query, language="zh"):
+            await asyncio.sleep(10)
+
+        with patch("app.tools.search.web_search", side_effect=hanging_search):
+            prefetch = ResearchPrefetch("AI jobs", "en", queries=["AI jobs"]).start()
+            await asyncio.sleep(0)
+            prefetch.cancel()
+            await asyncio.sleep(0)
+
+        assert prefetch.done
+        assert await prefetch.lookup("AI jobs") is None
+
+
+# ============================================================
+# Graph / Stream Integration
+# ============================================================
+
+class TestPrefetchIntegration:
+    """預取結果交給搜尋工具與 SSE 串流"""
+
+    @pytest.mark.asyncio
+    async def test_tool_uses_prefetched_result(self):
+        """被涵蓋的查詢不再呼叫 web_search"""
+        from app.graph import web_search_tool
+        from app.services.research_service import ResearchPrefetch
+
+        with patch("app.tools.search.web_search", new_callable=AsyncMock) as mock_search:
+            mock_search.side_effect = lambda query, language="zh": search_result(query)
+            prefetch = ResearchPrefetch("AI jobs", "en", queries=["AI jobs statistics data"]).start()
+            await asyncio.sleep(0)
+
+            result = await web_search_tool.ainvoke(
+                {"query": "AI jobs statistics"},
+                config={"configurable": {"research": prefetch}},
+            )
+
+        assert result == "[TAVILY] AI jobs statistics data"
+        assert mock_search.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_stream_starts_prefetch_and_passes_config(self):
+        from app.main import langgraph_debate_stream
+
+        captured = {}
+
+        async def fake_events(state, config=None, **kwargs):
+            captured["config"] = config
+            yield {"event": "on_chain_start", "name": "optimist"}
+
+        mock_graph = MagicMock()
+        mock_graph.astream_events = fake_events
+        handle = MagicMock()
+
+        with patch("app.graph.debate_graph", mock_graph), \
+             patch("app.services.research_service.start_research_prefetch", return_value=handle):
+            frames = [f async for f in langgraph_debate_stream("AI jobs", 1, "en", prefetch=True)]
+
+        assert captured["config"]["configurable"]["research"] is handle
+        assert any("Researching the topic" in f for f in frames)
+        handle.cancel.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_stream_prefetch_disabled_by_default(self):
+        from app.main import langgraph_debate_stream
+
+        captured = {}
+
+        async def fake_events(state, config=None, **kwargs):
+            captured["config"] = config
+            yield {"event": "on_chain_start", "name": "optimist"}
+
+        mock_graph = MagicMock()
+        mock_graph.astream_events = fake_events
+
+        with patch("app.graph.debate_graph", mock_graph):
+            [f async for f in langgraph_debate_stream("AI jobs", 1, "en")]
+
+        assert captured["config"]["configurable"]["research"] is None
@@ -4,6 +4,7 @@ Search Tools Tests
 測試 app/tools/search.py 的搜尋功能
 """
 
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 
@@ -141,3 +142,80 @@ class TestResultFormatting:
         
         assert "[DUCKDUCKGO]" in formatted
         assert "Title 1" in formatted
+
+
+# ============================================================
+# Hedged Search Tests
+# ============================================================
+
+def delayed(delay: float, result: dict, calls: list = None):
+    """建立延遲回傳的假 provider"""
+    async def _search(query):
+        if calls is not None:
+            calls.append(query)
+        await asyncio.sleep(delay)
+        return result
+    return _search
+
+
+TAVILY_OK = {"success": True, "results": [{"title": "T", "content": "C"}], "source": "tavily"}
+DDG_OK = {"success": True, "results": [{"title": "D", "body": "B"}], "source": "duckduckgo"}
+
+
+class TestHedgedSearch:
+    """Hedged 搜尋測試"""
+
+    @pytest.mark.asyncio
+    async def test_fast_tavily_skips_duckduckgo(self, monkeypatch):
+        """Tavily 在 hedge delay 內成功時不啟動 DuckDuckGo"""
+        from app.tools.search import web_search
+
+        monkeypatch.setenv("SEARCH_HEDGE_DELAY", "0.5")
+        ddg_calls = []
+        with patch("app.tools.search.tavily_client", MagicMock()), \
+             patch("app.tools.search.tavily_search", delayed(0.01, TAVILY_OK)), \
+             patch("app.tools.search.duckduckgo_search", delayed(0.01, DDG_OK, ddg_calls)):
+            result = await web_search("q", language="en")
+
+        assert result["source"] == "tavily"
+        assert ddg_calls == []
+
+    @pytest.mark.asyncio
+    async def test_slow_tavily_loses_to_duckduckgo(self, monkeypatch):
+        """Tavily 過慢時 DuckDuckGo 勝出，Tavily 被取消"""
+        from app.tools.search import web_search
+        from app.tools.search_metrics import get_search_metrics
+
+        monkeypatch.setenv("SEARCH_HEDGE_DELAY", "0.05")
+        with patch("app.tools.search.tavily_client", MagicMock()), \
+             patch("app.tools.search.tavily_search", delayed(5, TAVILY_OK)), \
+             patch("app.tools.search.duckduckgo_search", delayed(0.01, DDG_OK)):
+            result = await asyncio.wait_for(web_search("q", language="en"), 2)
+        await asyncio.sleep(0)
+
+        assert result["source"] == "duckduckgo"
+        metrics = get_search_metrics()
+        assert metrics["duckduckgo"]["successes"] == 1
+        assert metrics["tavily"]["cancelled"] == 1
+
+    @pytest.mark.asyncio
+    async def test_tavily_failure_starts_duckduckgo_immediately(self, monkeypatch):
+        """Tavily 提早失敗時不必等 hedge delay"""
+        from app.tools.search import web_search
+
+        monkeypatch.setenv("SEARCH_HEDGE_DELAY", "10")
+        with patch("app.tools.search.tavily_client", MagicMock()), \
+             patch("app.tools.search.tavily_search", delayed(0.01, {"success": False, "error": "quota"})), \
+             patch("app.tools.search.duckduckgo_search", delayed(0.01, DDG_OK)):
+            result = await asyncio.wait_for(web_search("q", language="en"), 2)
+
+        assert result["source"] == "duckduckgo"
+
+    @pytest.mark.asyncio
+    async def test_hedge_off_is_sequential(self, monkeypatch):
+        """SEARCH_HEDGE_DELAY=off 時循序執行"""
+        from app.tools.search import get_hedge_delay
+
+        monkeypatch.setenv("SEARCH_HEDGE_DELAY", "off")
+
+        assert get_hedge_delay() is None
@@ -0,0 +1,253 @@
+"""
+Search Cache Tests
+
+測試 app/tools/search_cache.py 的正規化、TTL/LRU 與單飛合併
+"""
+
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+
+
+SUCCESS = {"success": True, "results": [], "source": "tavily", "formatted": "ok"}
+
+
+# ============================================================
+# Key Normalization Tests
+# ============================================================
+
+class TestNormalizeQuery:
+    """normalize_query 測試"""
+
+    def test_case_and_whitespace(self):
+        from app.tools.search_cache import normalize_query
+
+        assert normalize_query("  AI   Job  Loss ") == "ai job loss"
+
+    def test_fullwidth_and_punctuation(self):
+        """全形字元與結尾問號被正規化"""
+        from app.tools.search_cache import normalize_query
+
+        assert normalize_query("ＡＩ 失業率？") == normalize_query("ai 失業率")
+
+
+# ============================================================
+# SearchCache Tests
+# ============================================================
+
+class TestSearchCache:
+    """SearchCache 行為測試"""
+
+    @pytest.mark.asyncio
+    async def test_hit_after_miss(self):
+        from app.tools.search_cache import SearchCache
+
+        cache = SearchCache()
+        fetch = AsyncMock(return_value=SUCCESS)
+
+        await cache.get_or_fetch(("q", "en", "p"), fetch)
+        await cache.get_or_fetch(("q", "en", "p"), fetch)
+
+        assert fetch.await_count == 1
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failures_are_not_cached(self):
+        from app.tools.search_cache import SearchCache
+
+        cache = SearchCache()
+        fetch = AsyncMock(return_value={"success": False, "source": "fallback"})
+
+        await cache.get_or_fetch(("q", "en", "p"), fetch)
+        await cache.get_or_fetch(("q", "en", "p"), fetch)
+
+        assert fetch.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_ttl_expiry(self):
+        from app.tools.search_cache import SearchCache
+
+        cache = SearchCache(ttl=10)
+        with patch("app.tools.search_cache.time.monotonic", return_value=0.0):
+            cache.set(("q", "en", "p"), SUCCESS)
+        with patch("app.tools.search_cache.time.monotonic", return_value=11.0):
+            assert cache.get(("q", "en", "p")) is None
+
+    def test_lru_eviction(self):
+        from app.tools.search_cache import SearchCache
+
+        cache = SearchCache(max_entries=2)
+        cache.set(("a", "en", "p"), SUCCESS)
+        cache.set(("b", "en", "p"), SUCCESS)
+        cache.get(("a", "en", "p"))
+        cache.set(("c", "en", "p"), SUCCESS)
+
+        assert cache.get(("b", "en", "p")) is None
+        assert cache.get(("a", "en", "p")) is not None
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_are_coalesced(self):
+        """並行相同查詢只呼叫一次 provider"""
+        from app.tools.search_cache import SearchCache
+
+        cache = SearchCache()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return SUCCESS
+
+        results = await asyncio.gather(*[
+            cache.get_or_fetch(("q", "en", "p"), fetch) for _ in range(5)
+        ])
+
+        assert calls == 1
+        assert all(r is SUCCESS for r in results)
+        assert cache.stats()["coalesced"] == 4
+
+    @pytest.mark.asyncio
+    async def test_coalesced_waiters_receive_error(self):
+        """共用請求失敗時，所有等待者都收到例外"""
+        from app.tools.search_cache import SearchCache
+
+        cache = SearchCache()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("provider down")
+
+        results = await asyncio.gather(
+            cache.get_or_fetch(("q", "en", "p"), fetch),
+            cache.get_or_fetch(("q", "en", "p"), fetch),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert cache.stats()["inflight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_owner_cancel_does_not_cancel_waiters(self):
+        """發起請求的辯論逾時取消，合併進來的其他辯論仍拿到結果"""
+        from app.tools.search_cache import SearchCache
+        from app.tools.tool_limits import run_tool_call
+
+        cache = SearchCache()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.2)
+            return SUCCESS
+
+        def search():
+            return cache.get_or_fetch(("q", "en", "p"), fetch)
+
+        fallback = {"success": False}
+        owner, waiter = await asyncio.gather(
+            run_tool_call(search, lambda e: fallback, timeout=0.05),
+            run_tool_call(search, lambda e: fallback, timeout=5),
+        )
+
+        assert owner is fallback
+        assert waiter is SUCCESS
+        assert calls == 1
+        assert cache.get(("q", "en", "p")) is SUCCESS
+        assert cache.stats()["inflight"] == 0
+
+
+# ============================================================
+# Near-duplicate Query Tests
+# ============================================================
+
+class TestSimilarQueries:
+    """近似查詢比對"""
+
+    @pytest.mark.asyncio
+    async def test_near_duplicate_reuses_result(self):
+        from app.tools.search_cache import SearchCache, make_search_key
+
+        cache = SearchCache(similarity=0.8)
+        fetch = AsyncMock(return_value=SUCCESS)
+
+        await cache.get_or_fetch(make_search_key("AI job loss statistics 2024", "en", "p"), fetch)
+        result = await cache.get_or_fetch(make_search_key("AI job losses stats 2024", "en", "p"), fetch)
+
+        assert result is SUCCESS
+        assert fetch.await_count == 1
+        stats = cache.stats()
+        assert stats["near_hits"] == 1
+        assert stats["exact_hit_rate"] == 0.0
+        assert stats["hit_rate"] == 0.5
+
+    @pytest.mark.asyncio
+    async def test_exact_only_when_disabled(self):
+        from app.tools.search_cache import SearchCache, make_search_key
+
+        cache = SearchCache()
+        fetch = AsyncMock(return_value=SUCCESS)
+
+        await cache.get_or_fetch(make_search_key("AI job loss statistics", "en", "p"), fetch)
+        await cache.get_or_fetch(make_search_key("AI job losses stats", "en", "p"), fetch)
+
+        assert fetch.await_count == 2
+
+    def test_evicted_entries_leave_similarity_index(self):
+        from app.tools.search_cache import SearchCache
+
+        cache = SearchCache(max_entries=1, similarity=0.8)
+        cache.set(("ai job loss", "en", "p"), SUCCESS)
+        cache.set(("remote work", "en", "p"), SUCCESS)
+
+        assert cache.get_similar(("ai job losses", "en", "p")) is None
+        assert len(cache._similar) == 1
+
+    def test_similarity_threshold_env(self, monkeypatch):
+        from app.tools.search_cache import get_similarity_threshold
+
+        assert get_similarity_threshold() == 0.8
+        monkeypatch.setenv("SEARCH_CACHE_SIMILARITY", "off")
+        assert get_similarity_threshold() is None
+
+
+# ============================================================
+# web_search Integration
+# ============================================================
+
+class TestWebSearchCache:
+    """web_search 使用快取"""
+
+    @pytest.mark.asyncio
+    async def test_web_search_reuses_result(self):
+        from app.tools.search import web_search
+
+        with patch("app.tools.search.tavily_search", new_callable=AsyncMock) as mock_tavily:
+            mock_tavily.return_value = {
+                "success": True,
+                "results": [{"title": "T", "content": "C"}],
+                "source": "tavily",
+            }
+            first = await web_search("AI jobs", language="en")
+            second = await web_search("  ai JOBS ", language="en")
+
+        assert mock_tavily.await_count == 1
+        assert first["formatted"] == second["formatted"]
+
+    @pytest.mark.asyncio
+    async def test_cache_can_be_disabled(self, monkeypatch):
+        from app.tools.search import web_search
+
+        monkeypatch.setenv("SEARCH_CACHE_ENABLED", "false")
+        with patch("app.tools.search.tavily_search", new_callable=AsyncMock) as mock_tavily:
+            mock_tavily.return_value = {
+                "success": True,
+                "results": [{"title": "T", "content": "C"}],
+                "source": "tavily",
+            }
+            await web_search("AI jobs", language="en")
+            await web_search("AI jobs", language="en")
+
+        assert mock_tavily.await_count == 2
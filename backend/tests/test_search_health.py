@@ -0,0 +1,112 @@
+"""
+Search Breaker Tests
+
+測試 app/tools/search_health.py 的熔斷器狀態轉換與 web_search 整合
+"""
+
+import pytest
+from unittest.mock import patch, AsyncMock
+
+
+class TestProviderBreaker:
+    """ProviderBreaker 狀態轉換"""
+
+    def test_consecutive_failures_open(self):
+        from app.tools.search_health import ProviderBreaker
+
+        breaker = ProviderBreaker("tavily", consecutive=2)
+        breaker.record_failure()
+        assert breaker.allow() is True
+        breaker.record_failure()
+
+        assert breaker.allow() is False
+        assert breaker.snapshot()["state"] == "open"
+        assert breaker.snapshot()["skipped"] == 1
+
+    def test_failure_rate_opens(self):
+        """失敗率達門檻時熔斷（即使沒有連續失敗）"""
+        from app.tools.search_health import ProviderBreaker
+
+        breaker = ProviderBreaker("tavily", consecutive=10, min_samples=4, failure_rate=0.5)
+        for ok in (True, False, True, False):
+            breaker.record_success() if ok else breaker.record_failure()
+
+        assert breaker.snapshot()["state"] == "open"
+
+    def test_half_open_probe_then_close(self):
+        """冷卻後只放行一個探測，成功即恢復"""
+        from app.tools.search_health import ProviderBreaker
+
+        breaker = ProviderBreaker("tavily", consecutive=1, cooldown=10, probes=1)
+        with patch("app.tools.search_health.time.monotonic", return_value=0.0):
+            breaker.record_failure()
+        with patch("app.tools.search_health.time.monotonic", return_value=11.0):
+            assert breaker.allow() is True
+            assert breaker.allow() is False
+            breaker.record_success()
+            assert breaker.snapshot()["state"] == "closed"
+
+    def test_half_open_failure_reopens(self):
+        from app.tools.search_health import ProviderBreaker
+
+        breaker = ProviderBreaker("tavily", consecutive=1, cooldown=10)
+        with patch("app.tools.search_health.time.monotonic", return_value=0.0):
+            breaker.record_failure()
+        with patch("app.tools.search_health.time.monotonic", return_value=11.0):
+            assert breaker.allow() is True
+            breaker.record_failure()
+            assert breaker.snapshot()["state"] == "open"
+
+
+class TestWebSearchBreaker:
+    """web_search 跳過熔斷中的 provider"""
+
+    @pytest.mark.asyncio
+    async def test_open_provider_is_skipped(self, monkeypatch):
+        """Tavily 熔斷後直接使用 DuckDuckGo"""
+        from app.tools.search import web_search
+        from app.tools.search_health import get_breaker
+
+        monkeypatch.setenv("SEARCH_CACHE_ENABLED", "false")
+        monkeypatch.setenv("SEARCH_HEDGE_DELAY", "off")
+        for _ in range(3):
+            get_breaker("tavily").record_failure()
+
+        with patch("app.tools.search.tavily_search", new_callable=AsyncMock) as mock_tavily, \
+             patch("app.tools.search.duckduckgo_search", new_callable=AsyncMock) as mock_ddg:
+            mock_ddg.return_value = {
+                "success": True,
+                "results": [{"title": "D", "body": "B"}],
+                "source": "duckduckgo",
+            }
+            result = await web_search("q", language="en")
+
+        assert result["source"] == "duckduckgo"
+        mock_tavily.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_no_results_does_not_trip_breaker(self, monkeypatch):
+        """沒有結果不算 provider 失敗"""
+        from app.tools.search import web_search
+        from app.tools.search_health import get_breaker
+
+        monkeypatch.setenv("SEARCH_CACHE_ENABLED", "false")
+        monkeypatch.setenv("SEARCH_HEDGE_DELAY", "off")
+        with patch("app.tools.search.tavily_search", new_callable=AsyncMock) as mock_tavily, \
+             patch("app.tools.search.duckduckgo_search", new_callable=AsyncMock) as mock_ddg:
+            mock_tavily.return_value = {"success": False, "error": "No results"}
+            mock_ddg.return_value = {"success": False, "error": "boom", "provider_error": True}
+            for _ in range(3):
+                await web_search("q", language="en")
+
+        assert get_breaker("tavily").snapshot()["state"] == "closed"
+        assert get_breaker("duckduckgo").snapshot()["state"] == "open"
+
+    @pytest.mark.asyncio
+    async def test_health_reports_breakers(self, async_client):
+        from app.tools.search_health import get_breaker
+
+        get_breaker("tavily")
+        response = await async_client.get("/health")
+
+        assert response.json()["search_breakers"]["tavily"]["state"] == "closed"
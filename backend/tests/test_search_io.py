@@ -0,0 +1,91 @@
+"""
+Search I/O Tests
+
+測試 app/tools/search_io.py 的專用 executor 與 provider 並行上限
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+
+
+class TestRunBlocking:
+    """run_blocking 測試"""
+
+    @pytest.mark.asyncio
+    async def test_runs_on_dedicated_executor(self):
+        """阻塞呼叫在 search-io 執行緒執行"""
+        from app.tools.search_io import run_blocking
+
+        name = await run_blocking("tavily", lambda: threading.current_thread().name)
+
+        assert name.startswith("search-io")
+
+    @pytest.mark.asyncio
+    async def test_provider_concurrency_limit(self, monkeypatch):
+        """超過 provider 上限的請求在 event loop 上排隊"""
+        from app.tools.search_io import run_blocking, get_search_io_stats
+
+        monkeypatch.setenv("SEARCH_CONCURRENCY_DUCKDUCKGO", "1")
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def work():
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+
+        await asyncio.gather(*[run_blocking("duckduckgo", work) for _ in range(4)])
+
+        stats = get_search_io_stats()["providers"]["duckduckgo"]
+        assert peak == 1
+        assert stats["total"] == 4
+        assert stats["peak_waiting"] >= 1
+        assert stats["active"] == 0
+
+
+class TestDDGSSessionReuse:
+    """DDGS session 重用"""
+
+    @pytest.mark.asyncio
+    async def test_ddgs_instance_is_reused(self, monkeypatch):
+        """同一執行緒的多次搜尋只建立一個 DDGS"""
+        from app.tools.search import duckduckgo_search
+
+        monkeypatch.setenv("SEARCH_EXECUTOR_WORKERS", "1")
+        mock_ddgs_instance = MagicMock()
+        mock_ddgs_instance.text.return_value = [{"title": "R", "body": "B"}]
+        factory = MagicMock(return_value=mock_ddgs_instance)
+
+        with patch("app.tools.search.DDGS", factory):
+            await duckduckgo_search("a")
+            await duckduckgo_search("b")
+
+        assert factory.call_count == 1
+        assert mock_ddgs_instance.text.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_reset_replaces_sessions(self, monkeypatch):
+        """reset_search_io 換掉 executor 執行緒，之後的搜尋以目前的 DDGS 建立新 session"""
+        from app.tools.search import duckduckgo_search
+        from app.tools.search_io import reset_search_io
+
+        monkeypatch.setenv("SEARCH_EXECUTOR_WORKERS", "1")
+        first, second = MagicMock(), MagicMock()
+        first.text.return_value = second.text.return_value = [{"title": "R", "body": "B"}]
+
+        with patch("app.tools.search.DDGS", MagicMock(return_value=first)):
+            await duckduckgo_search("a")
+        reset_search_io()
+        with patch("app.tools.search.DDGS", MagicMock(return_value=second)):
+            await duckduckgo_search("b")
+
+        assert first.text.call_count == 1
+        assert second.text.call_count == 1
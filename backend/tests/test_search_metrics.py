@@ -0,0 +1,52 @@
+"""
+Search Metrics Tests
+
+測試 app/tools/search_metrics.py 的延遲直方圖
+"""
+
+
+class TestLatencyHistogram:
+    """LatencyHistogram 測試"""
+
+    def test_observe_fills_buckets(self):
+        from app.tools.search_metrics import LatencyHistogram
+
+        histogram = LatencyHistogram()
+        histogram.observe(0.05, True)
+        histogram.observe(0.3, True)
+        histogram.observe(20.0, False)
+
+        snapshot = histogram.snapshot()
+        assert snapshot["buckets"]["le_0.1"] == 1
+        assert snapshot["buckets"]["le_0.5"] == 1
+        assert snapshot["buckets"]["le_inf"] == 1
+        assert snapshot["failures"] == 1
+
+    def test_percentiles(self):
+        from app.tools.search_metrics import LatencyHistogram
+
+        histogram = LatencyHistogram()
+        for i in range(1, 101):
+            histogram.observe(i / 100, True)
+
+        assert histogram.percentile(0.5) == 0.51
+        assert histogram.percentile(0.95) == 0.96
+
+    def test_empty_histogram(self):
+        from app.tools.search_metrics import LatencyHistogram
+
+        assert LatencyHistogram().snapshot()["p95"] is None
+
+
+class TestSearchMetricsRegistry:
+    """全域指標測試"""
+
+    def test_record_and_snapshot(self):
+        from app.tools.search_metrics import get_search_metrics, record_cancelled, record_latency
+
+        record_latency("tavily", 0.4, True)
+        record_cancelled("tavily")
+
+        metrics = get_search_metrics()
+        assert metrics["tavily"]["count"] == 1
+        assert metrics["tavily"]["cancelled"] == 1
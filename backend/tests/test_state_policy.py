@@ -0,0 +1,188 @@
+"""
+State Policy Tests
+
+測試 app/services/state_policy.py 的訊息保留政策（DebateState.messages reducer）
+"""
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+
+SEARCH_PAYLOAD = "[TAVILY] results\n" + "• some long search result text. " * 40
+
+
+def tool_round(speaker: str, n: int) -> list:
+    """單次工具往返：帶 tool_calls 的 AIMessage + ToolMessage"""
+    call_id = f"{speaker}_call_{n}"
+    return [
+        AIMessage(content="", name=speaker, tool_calls=[
+            {"name": "web_search_tool", "args": {"query": f"q{n}"}, "id": call_id}
+        ]),
+        ToolMessage(content=SEARCH_PAYLOAD, tool_call_id=call_id, name="web_search_tool"),
+    ]
+
+
+def run_debate(rounds: int) -> list:
+    """以 reducer 模擬 graph 每一步的狀態更新"""
+    from app.services.state_policy import prune_messages
+
+    messages = prune_messages([], [])
+    for n in range(rounds):
+        for update in (
+            tool_round("optimist", n),
+            [AIMessage(content=f"optimist turn {n}", name="optimist")],
+            tool_round("skeptic", n),
+            [AIMessage(content=f"skeptic turn {n}", name="skeptic")],
+            [AIMessage(content=f"round {n} summary", name="moderator")],
+        ):
+            messages = prune_messages(messages, update)
+    return messages
+
+
+class TestStatePolicy:
+    """工具往返刪除與發言視窗"""
+
+    def test_consumed_tool_traffic_dropped(self):
+        from app.services.state_policy import prune_messages
+
+        messages = prune_messages([], tool_round("optimist", 0))
+        assert len(messages) == 2  # 尚未消化：保留給 build_tool_context
+
+        messages = prune_messages(messages, [AIMessage(content="turn", name="optimist")])
+        assert [m.content for m in messages] == ["turn"]
+
+    def test_pending_tool_traffic_kept_after_last_turn(self):
+        from app.services.state_policy import prune_messages
+
+        messages = prune_messages([], [AIMessage(content="opt", name="optimist")])
+        messages = prune_messages(messages, tool_round("skeptic", 0))
+        assert len(messages) == 3
+        assert isinstance(messages[-1], ToolMessage)
+
+    def test_turn_window(self, monkeypatch):
+        monkeypatch.setenv("STATE_MAX_TURNS", "4")
+        monkeypatch.setenv("STATE_MAX_SUMMARIES", "1")
+
+        messages = run_debate(5)
+        names = [m.name for m in messages]
+        assert names == ["optimist", "skeptic", "optimist", "skeptic", "moderator"]
+        assert messages[0].content == "optimist turn 3"
+        assert messages[-1].content == "round 4 summary"
+
+    def test_zero_disables_window(self, monkeypatch):
+        monkeypatch.setenv("STATE_MAX_TURNS", "0")
+        monkeypatch.setenv("STATE_MAX_SUMMARIES", "0")
+        assert len(run_debate(6)) == 18
+
+    def test_replacement_by_id_still_works(self):
+        from app.services.state_policy import prune_messages
+
+        messages = prune_messages([], tool_round("optimist", 0))
+        tool = messages[-1]
+        replaced = ToolMessage(content="- short", tool_call_id=tool.tool_call_id, id=tool.id)
+        messages = prune_messages(messages, [replaced])
+        assert len(messages) == 2
+        assert messages[-1].content == "- short"
+
+    def test_panel_personas_share_turn_window(self, monkeypatch):
+        """panel 模式的辯手名稱不限 optimist / skeptic，一樣計入發言視窗"""
+        from app.services.state_policy import prune_messages
+
+        monkeypatch.setenv("STATE_MAX_TURNS", "3")
+        messages = []
+        for n in range(3):
+            for name in ("optimist", "skeptic_cost", "skeptic_ethics"):
+                messages = prune_messages(messages, [AIMessage(content=f"{name} {n}", name=name)])
+        assert [m.content for m in messages] == ["optimist 2", "skeptic_cost 2", "skeptic_ethics 2"]
+
+    def test_sibling_turn_keeps_fresh_tool_call(self):
+        """並行 superstep：另一位辯手完成發言，不會刪除這位辯手尚未消化的工具呼叫"""
+        from app.services.state_policy import prune_messages
+
+        call, result = tool_round("skeptic_cost", 0)
+        messages = prune_messages([], [call, AIMessage(content="optimist turn", name="optimist")])
+        assert messages[0] is call
+
+        messages = prune_messages(messages, [result])
+        assert [type(m).__name__ for m in messages] == ["AIMessage", "AIMessage", "ToolMessage"]
+
+        messages = prune_messages(messages, [AIMessage(content="cost turn", name="skeptic_cost")])
+        assert [m.content for m in messages] == ["optimist turn", "cost turn"]
+
+
+class TestStateSize:
+    """狀態大小統計：peak 不隨輪數成長"""
+
+    def test_peak_is_flat_across_rounds(self):
+        from app.services.state_policy import get_state_stats, reset_state_policy
+
+        run_debate(5)
+        short = get_state_stats()
+        reset_state_policy()
+        run_debate(30)
+        long = get_state_stats()
+
+        assert long["steps"] > short["steps"]
+        assert long["peak_messages"] <= 10 + 4 + 2
+        assert long["peak_bytes"] <= short["peak_bytes"] * 1.1
+        assert long["dropped_tool_messages"] == 30 * 4
+
+    def test_last_step_size(self):
+        from app.services.state_policy import get_state_stats
+
+        run_debate(1)
+        stats = get_state_stats()
+        assert stats["last_messages"] == 3
+        assert stats["last_bytes"] > 0
+
+    @pytest.mark.asyncio
+    async def test_stats_keyed_by_debate(self):
+        """並行的辯論各自記錄狀態大小（綁定在各自 task 的 context 中）"""
+        import asyncio
+        from app.services.state_policy import (
+            bind_debate, get_debate_state_stats, get_state_stats, unbind_debate,
+        )
+
+        async def debate(debate_id: str, rounds: int):
+            token = bind_debate(debate_id)
+            try:
+                for _ in range(rounds):
+                    run_debate(1)
+                    await asyncio.sleep(0)
+            finally:
+                unbind_debate(token)
+
+        await asyncio.gather(debate("short", 1), debate("long", 3))
+
+        short, long = get_debate_state_stats("short"), get_debate_state_stats("long")
+        assert long["steps"] == 3 * short["steps"]
+        assert long["dropped_tool_messages"] == 3 * 4
+        stats = get_state_stats()
+        assert stats["steps"] == short["steps"] + long["steps"]
+        assert set(stats["debates"]) == {"short", "long"}
+        assert get_debate_state_stats("missing") is None
+
+    def test_debate_stats_are_bounded(self, monkeypatch):
+        from app.services.state_policy import bind_debate, get_state_stats, unbind_debate
+
+        monkeypatch.setenv("STATE_STATS_DEBATES", "2")
+        for debate_id in ("a", "b", "c"):
+            token = bind_debate(debate_id)
+            run_debate(1)
+            unbind_debate(token)
+
+        assert list(get_state_stats()["debates"]) == ["b", "c"]
+
+    @pytest.mark.asyncio
+    async def test_graph_run_recorded_under_debate_id(self):
+        """langgraph_debate_stream 以 debate_id 作為 thread_id，graph 中的 reducer 依此分場記錄"""
+        from unittest.mock import patch
+        from app.main import langgraph_debate_stream
+        from app.services.state_policy import get_debate_state_stats
+        from tests.test_graph import OverlapLLM
+
+        with patch("app.graph.get_llm", return_value=OverlapLLM()):
+            async for _ in langgraph_debate_stream("AI jobs", 1, "en", prefetch=False, debate_id="d1"):
+                pass
+
+        stats = get_debate_state_stats("d1")
+        assert stats is not None and stats["steps"] > 0
@@ -0,0 +1,166 @@
+"""
+SSE Disconnect Guard Tests
+
+測試 app/services/stream_guard.py：用戶端斷線時立即取消辯論產生器與其中進行中的呼叫
+"""
+
+import asyncio
+import json
+import pytest
+from unittest.mock import patch
+
+
+class Disconnect:
+    """在送出指定數量的事件後回報斷線"""
+
+    def __init__(self, after: int = 0):
+        self.after = after
+        self.received = 0
+
+    async def __call__(self) -> bool:
+        return self.received >= self.after
+
+
+async def consume(guarded, disconnect: Disconnect = None) -> list:
+    frames = []
+    async for frame in guarded:
+        frames.append(frame)
+        if disconnect is not None:
+            disconnect.received += 1
+    return frames
+
+
+class SlowStream:
+    """送出一個事件後等待很久（模擬進行中的 LLM / 搜尋呼叫），記錄取消與清理"""
+
+    def __init__(self):
+        self.cancelled = False
+        self.closed = False
+
+    async def __call__(self):
+        try:
+            yield "data: first\n\n"
+            await asyncio.sleep(30)
+            yield "data: never\n\n"
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        finally:
+            self.closed = True
+
+
+# ============================================================
+# Guard Tests
+# ============================================================
+
+class TestGuardDisconnect:
+    """斷線取消與串流統計"""
+
+    @pytest.mark.asyncio
+    async def test_passes_frames_through(self):
+        from app.services.stream_guard import guard_disconnect, get_stream_stats
+
+        async def frames():
+            for n in range(3):
+                yield f"data: {n}\n\n"
+
+        result = await consume(guard_disconnect(frames(), Disconnect(after=99), poll_interval=0.01))
+
+        assert result == ["data: 0\n\n", "data: 1\n\n", "data: 2\n\n"]
+        stats = get_stream_stats().stats()
+        assert stats["completed"] == 1
+        assert stats["active"] == 0
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_pending_call(self):
+        from app.services.stream_guard import guard_disconnect, get_stream_stats
+
+        stream = SlowStream()
+        disconnect = Disconnect(after=1)
+        result = await asyncio.wait_for(
+            consume(guard_disconnect(stream(), disconnect, poll_interval=0.01), disconnect),
+            timeout=1,
+        )
+
+        assert result == ["data: first\n\n"]
+        assert stream.cancelled and stream.closed
+        stats = get_stream_stats().stats()
+        assert stats["disconnected"] == 1
+        assert stats["completed"] == 0
+
+    @pytest.mark.asyncio
+    async def test_closed_response_closes_stream(self):
+        """回應端提前關閉（送出失敗）時，停在 yield 的產生器也立即執行 finally"""
+        from app.services.stream_guard import guard_disconnect, get_stream_stats
+
+        stream = SlowStream()
+        guarded = guard_disconnect(stream(), Disconnect(after=99), poll_interval=0.01)
+        assert await guarded.__anext__() == "data: first\n\n"
+        await guarded.aclose()
+
+        assert stream.closed
+        assert get_stream_stats().stats()["disconnected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_stream_error_propagates(self):
+        from app.services.stream_guard import guard_disconnect, get_stream_stats
+
+        async def broken():
+            yield "data: first\n\n"
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError, match="boom"):
+            await consume(guard_disconnect(broken(), Disconnect(after=99), poll_interval=0.01))
+        assert get_stream_stats().stats()["failed"] == 1
+
+
+# ============================================================
+# Debate Stream Tests
+# ============================================================
+
+class HangingLLM:
+    """開場白永遠不返回（模擬卡住的 Groq 串流），記錄是否被取消"""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def ainvoke(self, messages, **kwargs):
+        self.started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+class TestDebateCancellation:
+    """斷線時 graph 中進行中的 LLM 呼叫被取消"""
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_graph_run(self):
+        from app.main import langgraph_debate_stream
+        from app.services.stream_guard import guard_disconnect, get_stream_stats
+
+        llm = HangingLLM()
+
+        async def disconnected() -> bool:
+            return llm.started.is_set()
+
+        with patch("app.graph.get_llm", return_value=llm):
+            stream = langgraph_debate_stream("AI jobs", 2, "en", prefetch=False)
+            frames = await asyncio.wait_for(
+                consume(guard_disconnect(stream, disconnected, poll_interval=0.01)),
+                timeout=2,
+            )
+
+        types = [json.loads(f[len("data: "):])["type"] for f in frames]
+        assert "complete" not in types
+        assert llm.cancelled
+        assert get_stream_stats().stats()["disconnected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_health_reports_streams(self, async_client):
+        response = await async_client.get("/health")
+
+        assert response.json()["sse_streams"]["disconnected"] == 0
@@ -0,0 +1,200 @@
+"""
+Tool Summarizer Tests
+
+測試 app/llm/summarizer.py 與 graph 的 tool_summary_node
+"""
+
+import asyncio
+import pytest
+from unittest.mock import patch
+from langchain_core.messages import AIMessage, ToolMessage
+
+LONG_RESULT = "[TAVILY] AI jobs\n" + "• Report: automation displaced 1.2 million jobs in 2024. " * 12
+
+
+def make_summarizer(delay: float = 0.0, fail: bool = False, **kwargs):
+    from app.llm.summarizer import ToolSummarizer
+
+    summarizer = ToolSummarizer("fast-model", **kwargs)
+    calls = []
+
+    async def fake_call(content, query, language):
+        calls.append(query)
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError("rate limited")
+        return f"- summary of {query}"
+
+    summarizer._call_model = fake_call
+    return summarizer, calls
+
+
+# ============================================================
+# ToolSummarizer Tests
+# ============================================================
+
+class TestToolSummarizer:
+    """摘要、快取與失敗退回"""
+
+    @pytest.mark.asyncio
+    async def test_summarizes_long_result(self):
+        summarizer, calls = make_summarizer()
+        result = await summarizer.summarize(LONG_RESULT, "AI jobs")
+        assert result == "- summary of AI jobs"
+        assert calls == ["AI jobs"]
+        assert summarizer.stats()["compression"] < 0.1
+
+    @pytest.mark.asyncio
+    async def test_short_result_passes_through(self):
+        summarizer, calls = make_summarizer()
+        assert await summarizer.summarize("[TAVILY] short", "q") == "[TAVILY] short"
+        assert calls == []
+
+    @pytest.mark.asyncio
+    async def test_cached_by_content_hash(self):
+        summarizer, calls = make_summarizer()
+        await summarizer.summarize(LONG_RESULT, "AI jobs")
+        await summarizer.summarize(LONG_RESULT, "AI jobs")
+        await summarizer.summarize(LONG_RESULT + " more", "AI jobs")
+        assert len(calls) == 2
+        assert summarizer.hits == 1
+        assert summarizer.misses == 2
+
+    @pytest.mark.asyncio
+    async def test_cache_is_bounded(self):
+        summarizer, _ = make_summarizer(max_entries=2)
+        for i in range(4):
+            await summarizer.summarize(LONG_RESULT + str(i), "q")
+        assert summarizer.stats()["size"] == 2
+
+    @pytest.mark.asyncio
+    async def test_failure_keeps_raw_result(self):
+        summarizer, _ = make_summarizer(fail=True)
+        assert await summarizer.summarize(LONG_RESULT, "q") == LONG_RESULT
+        assert summarizer.failures == 1
+        assert summarizer.stats()["size"] == 0
+
+    @pytest.mark.asyncio
+    async def test_timeout_keeps_raw_result(self):
+        summarizer, _ = make_summarizer(delay=1.0, timeout=0.05)
+        assert await summarizer.summarize(LONG_RESULT, "q") == LONG_RESULT
+        assert summarizer.failures == 1
+
+    def test_stats_when_disabled(self, monkeypatch):
+        from app.llm.summarizer import get_tool_summary_stats
+
+        monkeypatch.delenv("TOOL_SUMMARY_ENABLED", raising=False)
+        assert get_tool_summary_stats() == {"enabled": False}
+
+
+# ============================================================
+# tool_summary_node Tests
+# ============================================================
+
+def tool_round_state(*queries: str) -> dict:
+    calls = [
+        {"name": "web_search_tool", "args": {"query": q}, "id": f"call_{i}"}
+        for i, q in enumerate(queries)
+    ]
+    messages = [AIMessage(content="", tool_calls=calls, name="optimist")]
+    messages += [
+        ToolMessage(content=LONG_RESULT, tool_call_id=f"call_{i}", name="web_search_tool", id=f"tool_{i}")
+        for i in range(len(queries))
+    ]
+    return {"messages": messages, "language": "en"}
+
+
+class TestToolSummaryNode:
+    """graph 節點：並行摘要並以相同 id 取代 ToolMessage"""
+
+    @pytest.mark.asyncio
+    async def test_disabled_is_noop(self, monkeypatch):
+        from app.graph import tool_summary_node
+
+        monkeypatch.delenv("TOOL_SUMMARY_ENABLED", raising=False)
+        assert await tool_summary_node(tool_round_state("a")) == {}
+
+    @pytest.mark.asyncio
+    async def test_replaces_tool_messages_concurrently(self, monkeypatch):
+        from app.graph import tool_summary_node
+
+        monkeypatch.setenv("TOOL_SUMMARY_ENABLED", "true")
+        summarizer, calls = make_summarizer(delay=0.1)
+
+        with patch("app.llm.summarizer.get_tool_summarizer", return_value=summarizer):
+            start = asyncio.get_event_loop().time()
+            update = await tool_summary_node(tool_round_state("q1", "q2", "q3"))
+            elapsed = asyncio.get_event_loop().time() - start
+
+        assert elapsed < 0.25
+        assert sorted(calls) == ["q1", "q2", "q3"]
+        replaced = update["messages"]
+        assert [m.id for m in replaced] == ["tool_0", "tool_1", "tool_2"]
+        assert [m.content for m in replaced] == ["- summary of q1", "- summary of q2", "- summary of q3"]
+        assert all(m.tool_call_id == f"call_{i}" for i, m in enumerate(replaced))
+
+    @pytest.mark.asyncio
+    async def test_replacement_overwrites_in_state(self, monkeypatch):
+        from langgraph.graph.message import add_messages
+        from app.graph import tool_summary_node
+
+        monkeypatch.setenv("TOOL_SUMMARY_ENABLED", "true")
+        summarizer, _ = make_summarizer()
+        state = tool_round_state("q1")
+
+        with patch("app.llm.summarizer.get_tool_summarizer", return_value=summarizer):
+            update = await tool_summary_node(state)
+
+        merged = add_messages(state["messages"], update["messages"])
+        assert len(merged) == 2
+        assert merged[-1].content == "- summary of q1"
+
+
+# ============================================================
+# Rolling Debate Summary Tests
+# ============================================================
+
+class TestDebateSummary:
+    """滾動摘要：增量附加、超過上限時壓縮或捨棄最舊回合"""
+
+    def test_compact_round_summary(self):
+        from app.llm.summarizer import compact_round_summary
+
+        text = "### 🔄 第 1 輪小結\n**樂觀者**: 創造就業\n**懷疑者**: 取代勞工\n"
+        assert compact_round_summary(text) == "樂觀者: 創造就業 懷疑者: 取代勞工"
+
+    @pytest.mark.asyncio
+    async def test_appends_without_model_call(self):
+        from app.llm.summarizer import update_debate_summary
+
+        with patch("app.llm.summarizer._invoke_fast_model") as mock_invoke:
+            summary = await update_debate_summary("", "**Optimist**: a", 1, "en")
+            summary = await update_debate_summary(summary, "**Optimist**: b", 2, "en")
+
+        mock_invoke.assert_not_called()
+        assert summary == "Round 1: Optimist: a\nRound 2: Optimist: b"
+
+    @pytest.mark.asyncio
+    async def test_condenses_over_budget(self):
+        from app.llm.summarizer import update_debate_summary
+
+        async def condense(model, system, user, timeout):
+            assert "80" in system
+            return "Round 1-2: short"
+
+        with patch("app.llm.summarizer._invoke_fast_model", side_effect=condense):
+            summary = await update_debate_summary("Round 1: " + "x" * 60, "y" * 40, 2, "en", max_chars=80)
+
+        assert summary == "Round 1-2: short"
+
+    @pytest.mark.asyncio
+    async def test_drops_oldest_when_condense_fails(self):
+        from app.llm.summarizer import update_debate_summary
+
+        previous = "Round 1: " + "x" * 50 + "\nRound 2: " + "y" * 20
+        with patch("app.llm.summarizer._invoke_fast_model", side_effect=RuntimeError("down")):
+            summary = await update_debate_summary(previous, "z" * 20, 3, "en", max_chars=80)
+
+        assert len(summary) <= 80
+        assert summary.splitlines()[0].startswith("Round 2:")
+        assert summary.endswith("z" * 20)
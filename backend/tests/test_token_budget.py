@@ -0,0 +1,195 @@
+"""
+Token Budget Tests
+
+測試 app/llm/token_budget.py 的計數、預算，以及 prompt 超出預算時的裁剪
+"""
+
+import sys
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from langchain_core.messages import AIMessage
+
+SMALL_WINDOWS = "primary=1400,fallback=1000"
+
+
+@pytest.fixture
+def small_chain(monkeypatch):
+    """兩個 context 很小的模型，其中 fallback 更小"""
+    monkeypatch.setenv("GROQ_MODEL", "primary")
+    monkeypatch.setenv("GROQ_FALLBACK_MODELS", "fallback")
+    monkeypatch.setenv("LLM_CONTEXT_WINDOWS", SMALL_WINDOWS)
+    monkeypatch.setenv("DEBATER_MAX_TOKENS", "200")
+    monkeypatch.setenv("PROMPT_TOKEN_MARGIN", "50")
+
+
+class TestBudget:
+    """計數與預算"""
+
+    def test_count_tokens(self):
+        from app.llm.token_budget import count_tokens
+
+        assert count_tokens("") == 0
+        assert count_tokens("hello world", "openai/gpt-oss-120b") > 0
+        assert count_tokens("人工智慧" * 10, "llama-3.1-8b-instant") >= 10
+
+    def test_context_window_override(self, monkeypatch):
+        from app.llm.token_budget import get_context_window
+
+        assert get_context_window("llama-3.1-8b-instant") == 131072
+        assert get_context_window("unknown-model") == 8192
+        monkeypatch.setenv("LLM_CONTEXT_WINDOWS", "llama-3.1-8b-instant=6000")
+        assert get_context_window("llama-3.1-8b-instant") == 6000
+
+    def test_budgets_cover_every_model_in_chain(self, small_chain):
+        from app.llm.token_budget import get_prompt_budgets
+
+        assert get_prompt_budgets("debater") == {"primary": 1150, "fallback": 750}
+
+    def test_max_tokens_per_kind(self, monkeypatch):
+        from app.llm.token_budget import get_max_tokens
+
+        assert get_max_tokens("moderator_final") > get_max_tokens("moderator_round")
+        monkeypatch.setenv("MODERATOR_ROUND_MAX_TOKENS", "300")
+        assert get_max_tokens("moderator_round") == 300
+
+
+class SlowTiktoken:
+    """get_encoding 需要一段時間（模擬首次下載 BPE 檔）"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def get_encoding(self, name):
+        import time
+
+        time.sleep(self.delay)
+        encoding = MagicMock()
+        encoding.encode.side_effect = lambda text, **kwargs: text.split()
+        return encoding
+
+
+class TestEncodingLoad:
+    """編碼在背景載入，計數不阻塞 event loop"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_encodings(self):
+        from app.llm.token_budget import reset_encodings
+
+        reset_encodings()
+        yield
+        from app.llm.token_budget import load_encodings
+
+        load_encodings(timeout=5)  # 等背景載入結束，避免假編碼留給其他測試
+        reset_encodings()
+
+    def test_count_does_not_wait_for_load(self, monkeypatch):
+        import time
+        from app.llm.token_budget import count_tokens, load_encodings
+        from app.tools.ranking import estimate_tokens
+
+        monkeypatch.setitem(sys.modules, "tiktoken", SlowTiktoken(0.3))
+        text = "one two three four five six"
+
+        start = time.monotonic()
+        assert count_tokens(text) == estimate_tokens(text)
+        assert time.monotonic() - start < 0.1
+
+        assert load_encodings(timeout=2) == {"o200k_base": True, "cl100k_base": True}
+        assert count_tokens(text) == 6
+
+    @pytest.mark.asyncio
+    async def test_warm_up_is_bounded(self, monkeypatch):
+        import time
+        from app.llm.token_budget import warm_encodings
+
+        monkeypatch.setitem(sys.modules, "tiktoken", SlowTiktoken(1))
+
+        start = time.monotonic()
+        status = await warm_encodings(timeout=0.05)
+        assert time.monotonic() - start < 0.5
+        assert status == {"o200k_base": False, "cl100k_base": False}
+
+
+class TestTrimming:
+    """超出預算時裁剪搜尋結果 → 對話歷史 → 背景資料"""
+
+    @staticmethod
+    def long_state():
+        from app.graph import create_initial_state
+
+        state = create_initial_state("AI jobs", language="en")
+        state["round_count"] = 2
+        state["messages"] = [
+            AIMessage(content=f"turn {i} " + "argument " * 60, name="optimist" if i % 2 == 0 else "skeptic")
+            for i in range(4)
+        ]
+        return state
+
+    def test_small_prompt_untouched(self, small_chain):
+        from app.graph import create_initial_state, build_prompt
+        from app.llm.prompt_layout import get_prompt_cache_stats
+
+        build_prompt(create_initial_state("AI jobs", language="en"), "optimist")
+        assert get_prompt_cache_stats().stats() == {}
+
+    @staticmethod
+    def set_room(monkeypatch, build_base, room: int):
+        """讓 fallback 模型在（未裁剪的）基本 prompt 之外只剩 room 個 token"""
+        from app.llm.token_budget import count_message_tokens
+
+        monkeypatch.setenv("LLM_CONTEXT_WINDOWS", "primary=100000,fallback=100000")
+        base = count_message_tokens([m.content for m in build_base()], "fallback")
+        window = base + 200 + 50 + room
+        monkeypatch.setenv("LLM_CONTEXT_WINDOWS", f"primary={window + 1000},fallback={window}")
+
+    def test_tool_context_trimmed_lowest_ranked_first(self, small_chain, monkeypatch):
+        from app.graph import build_prompt
+        from app.llm.prompt_layout import get_prompt_cache_stats
+        from app.llm.token_budget import count_message_tokens, get_prompt_budgets
+
+        state = self.long_state()
+        self.set_room(monkeypatch, lambda: build_prompt(state, "optimist", "", "[Search Result]:"), 150)
+
+        bullets = "\n".join(f"• passage {i} " + "evidence " * 30 for i in range(10))
+        prompt = build_prompt(state, "optimist", "", f"[Search Result]:\n{bullets}")
+        content = prompt[1].content
+
+        assert "passage 0" in content          # 最相關的段落保留
+        assert "passage 9" not in content      # 最低分的段落先被裁掉
+        assert "turn 0" in content             # 對話歷史不受影響
+        assert get_prompt_cache_stats().stats()["optimist"]["trimmed"] > 0
+        for model, budget in get_prompt_budgets("debater").items():
+            assert count_message_tokens([m.content for m in prompt], model) <= budget
+
+    def test_research_then_oldest_history(self, small_chain, monkeypatch):
+        from app.graph import build_prompt
+
+        state = self.long_state()
+        self.set_room(monkeypatch, lambda: build_prompt(state, "skeptic"), -60)
+        content = build_prompt(state, "skeptic", "[TAVILY] " + "research " * 200)[1].content
+
+        assert "Background Research:" not in content
+        assert "turn 3" in content
+        assert "turn 0" not in content
+        assert content.endswith("as the Skeptic.\n\n*** IMPORTANT: Your response MUST be in English! ***")
+
+    @pytest.mark.asyncio
+    async def test_node_sets_max_tokens_and_reports_tokens(self, monkeypatch):
+        from app.graph import create_initial_state, optimist_node
+        from app.llm.prompt_layout import get_prompt_cache_stats
+
+        monkeypatch.setenv("DEBATER_MAX_TOKENS", "321")
+        response = AIMessage(content="Opening", usage_metadata={
+            "input_tokens": 500, "output_tokens": 60, "total_tokens": 560,
+        })
+        mock_llm = MagicMock()
+        mock_llm.ainvoke = AsyncMock(return_value=response)
+
+        with patch("app.graph.get_llm", return_value=mock_llm):
+            await optimist_node(create_initial_state("AI jobs", language="en"))
+
+        assert mock_llm.ainvoke.call_args.kwargs["max_tokens"] == 321
+        stats = get_prompt_cache_stats().stats()["optimist"]
+        assert stats["input_tokens"] == 500
+        assert stats["output_tokens"] == 60
+        assert stats["prompt_tokens_local"] > 0
@@ -0,0 +1,170 @@
+"""
+Tool Concurrency Tests
+
+測試 app/tools/tool_limits.py 與 ToolNode 的並行 tool_calls
+"""
+
+import asyncio
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from langchain_core.messages import AIMessage
+
+
+def tool_call_message(*queries: str) -> dict:
+    calls = [
+        {"name": "web_search_tool", "args": {"query": q}, "id": f"call_{i}"}
+        for i, q in enumerate(queries)
+    ]
+    return {"messages": [AIMessage(content="", tool_calls=calls, name="optimist")]}
+
+
+def tool_graph():
+    """只包含 ToolNode 的 graph（ToolNode 需要在 graph runtime 內執行）"""
+    from langgraph.graph import StateGraph, MessagesState, END
+    from app.graph import tool_node
+
+    graph = StateGraph(MessagesState)
+    graph.add_node("tools", tool_node)
+    graph.set_entry_point("tools")
+    graph.add_edge("tools", END)
+    return graph.compile()
+
+
+async def slow_search(query, language="zh"):
+    if query == "hang":
+        await asyncio.sleep(10)
+    if query == "boom":
+        raise RuntimeError("provider exploded")
+    await asyncio.sleep(0.1)
+    return {"success": True, "source": "tavily", "formatted": f"[TAVILY] {query}"}
+
+
+# ============================================================
+# run_tool_call Tests
+# ============================================================
+
+class TestRunToolCall:
+    """run_tool_call 並行上限與逾時"""
+
+    @pytest.mark.asyncio
+    async def test_per_debate_cap(self):
+        from app.tools.search_io import ProviderLimiter
+        from app.tools.tool_limits import run_tool_call
+
+        limiter = ProviderLimiter("debate", 1)
+        config = {"configurable": {"tool_limiter": limiter}}
+
+        async def call():
+            await asyncio.sleep(0.02)
+            return limiter.active
+
+        results = await asyncio.gather(*[
+            run_tool_call(call, fallback=lambda e: None, config=config) for _ in range(3)
+        ])
+
+        assert results == [1, 1, 1]
+        assert limiter.stats()["peak_waiting"] == 2
+
+    @pytest.mark.asyncio
+    async def test_global_cap(self, monkeypatch):
+        from app.tools.tool_limits import run_tool_call, get_global_tool_limiter
+
+        monkeypatch.setenv("TOOL_MAX_CONCURRENCY", "2")
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            peak = max(peak, get_global_tool_limiter().active)
+            await asyncio.sleep(0.02)
+
+        await asyncio.gather(*[run_tool_call(call, fallback=lambda e: None) for _ in range(5)])
+
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_timeout_returns_fallback(self):
+        from app.tools.tool_limits import run_tool_call, get_tool_stats
+
+        async def call():
+            await asyncio.sleep(1)
+
+        result = await run_tool_call(call, fallback=lambda e: type(e).__name__, timeout=0.01)
+
+        assert result == "TimeoutError"
+        assert get_tool_stats()["timeouts"] == 1
+
+
+# ============================================================
+# ToolNode Integration
+# ============================================================
+
+class TestConcurrentToolCalls:
+    """同一則 AIMessage 的多個 tool_calls 並行執行"""
+
+    @pytest.mark.asyncio
+    async def test_calls_run_concurrently(self):
+        """三個查詢的總時間約等於最慢的一個"""
+        tool_node = tool_graph()
+
+        with patch("app.tools.search.web_search", side_effect=slow_search):
+            started = time.perf_counter()
+            result = await tool_node.ainvoke(tool_call_message("a", "b", "c"))
+            elapsed = time.perf_counter() - started
+
+        assert [m.content for m in result["messages"]] == ["", "[TAVILY] a", "[TAVILY] b", "[TAVILY] c"]
+        assert elapsed < 0.25
+
+    @pytest.mark.asyncio
+    async def test_slow_or_failed_call_does_not_block_others(self, monkeypatch):
+        tool_node = tool_graph()
+
+        monkeypatch.setenv("TOOL_CALL_TIMEOUT", "0.2")
+        with patch("app.tools.search.web_search", side_effect=slow_search):
+            started = time.perf_counter()
+            result = await tool_node.ainvoke(tool_call_message("a", "hang", "boom"))
+            elapsed = time.perf_counter() - started
+
+        contents = [m.content for m in result["messages"][1:]]
+        assert contents[0] == "[TAVILY] a"
+        assert contents[1] == "Search failed: TimeoutError"
+        assert contents[2] == "Search failed: RuntimeError"
+        assert elapsed < 0.5
+
+    @pytest.mark.asyncio
+    async def test_each_call_emits_tool_events(self):
+        tool_node = tool_graph()
+
+        with patch("app.tools.search.web_search", side_effect=slow_search):
+            events = [
+                e["event"] async for e in tool_node.astream_events(tool_call_message("a", "b"), version="v2")
+                if e["event"] in ("on_tool_start", "on_tool_end")
+            ]
+
+        assert events.count("on_tool_start") == 2
+        assert events.count("on_tool_end") == 2
+
+
+class TestToolSSEEvents:
+    """langgraph_debate_stream 追蹤並行工具"""
+
+    @pytest.mark.asyncio
+    async def test_tool_end_reports_pending(self):
+        import json
+        from app.main import langgraph_debate_stream
+
+        async def fake_events(*args, **kwargs):
+            yield {"event": "on_chain_start", "name": "optimist"}
+            yield {"event": "on_tool_start", "run_id": "1", "data": {"input": {"query": "a"}}}
+            yield {"event": "on_tool_start", "run_id": "2", "data": {"input": {"query": "b"}}}
+            yield {"event": "on_tool_end", "run_id": "2"}
+            yield {"event": "on_tool_end", "run_id": "1"}
+
+        mock_graph = MagicMock()
+        mock_graph.astream_events = fake_events
+
+        with patch("app.graph.debate_graph", mock_graph):
+            frames = [f async for f in langgraph_debate_stream("topic", 1, "en")]
+
+        ends = [json.loads(f[6:]) for f in frames if '"tool_end"' in f]
+        assert [(e["query"], e["pending"]) for e in ends] == [("b", 1), ("a", 0)]
@@ -3,7 +3,13 @@
 import React, { useState, useRef, useEffect, useCallback } from "react";
 import { MessageBubble } from "./MessageBubble";
 import { TopicForm } from "./TopicForm";
-import { streamDebate, SSEEvent, saveDebate } from "../lib/api";
+import {
+  streamDebate,
+  SSEEvent,
+  saveDebate,
+  displayRole,
+  DebateRole,
+} from "../lib/api";
 import {
   Card,
   CardHeader,
@@ -65,6 +71,7 @@ export function DebateUI() {
   // ============================================================
   const textBufferRef = useRef<{ [key: string]: string }>({});
   const roundInfoRef = useRef<{ [key: string]: string }>({});
+  const nodeRoleRef = useRef<{ [key: string]: DebateRole }>({}); // panel 模式：節點 → 顯示角色
   const messagesRef = useRef<Message[]>([]); // Phase 4: 同步追蹤訊息避免 race condition
   const currentTopicRef = useRef<string>(""); // Phase 4: 避免 stale closure
   const addNewDebateRef = useRef(addNewDebate); // Phase 4: 避免 stale closure
@@ -96,6 +103,7 @@ export function DebateUI() {
   const clearAllBuffers = useCallback(() => {
     textBufferRef.current = {};
     roundInfoRef.current = {};
+    nodeRoleRef.current = {};
     messagesRef.current = []; // Phase 4: 清空 ref
     setCurrentText({});
     setCurrentRound({});
@@ -181,7 +189,9 @@ export function DebateUI() {
           setStatus(event.text);
           break;
 
+        // 緩衝區依節點名稱區分（panel 模式的多位辯手可能同時發言），顯示時才對應到角色
         case "speaker":
+          nodeRoleRef.current[event.node] = displayRole(event.node, event.role);
           textBufferRef.current[event.node] = "";
           roundInfoRef.current[event.node] = event.text;
           setCurrentRound((prev) => ({
@@ -205,7 +215,11 @@ export function DebateUI() {
           const roundInfo = roundInfoRef.current[event.node] || "";
 
           // Phase 4: 同步更新 ref（先於 state 更新）
-          const newMessage = { node: event.node, text: finalText, roundInfo };
+          const newMessage = {
+            node: displayRole(event.node, nodeRoleRef.current[event.node]),
+            text: finalText,
+            roundInfo,
+          };
           messagesRef.current = [...messagesRef.current, newMessage];
 
           setMessages((prev) => [...prev, newMessage]);
@@ -240,13 +254,15 @@ export function DebateUI() {
             node: event.node,
           });
           const searchingRole =
-            event.node === "optimist"
+            displayRole(event.node, nodeRoleRef.current[event.node]) === "optimist"
               ? t("debateOptimistSearching")
               : t("debateSkepticSearching");
           setStatus(`🔍 ${searchingRole}${t("debateSearchFor")}${event.query}`);
           break;
 
         case "tool_end":
+          // 並行搜尋：全部完成後才清除搜尋狀態
+          if (event.pending) break;
           setSearchStatus({ isSearching: false });
           setStatus(t("debateSearchComplete"));
           break;
@@ -480,7 +496,7 @@ export function DebateUI() {
             text ? (
               <MessageBubble
                 key={`typing-${node}`}
-                node={node as "optimist" | "skeptic"}
+                node={displayRole(node, nodeRoleRef.current[node])}
                 text={text}
                 isTyping={true}
                 roundInfo={currentRound[node]}
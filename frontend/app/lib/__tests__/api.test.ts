@@ -11,6 +11,7 @@ import {
   saveDebate, 
   getRecentDebates, 
   getDebateById,
+  displayRole,
   SSEEvent
 } from '@/app/lib/api'
 
@@ -167,6 +168,54 @@ describe('API Client', () => {
       expect((events[0] as { type: 'status'; text: string }).text).toBe('開始辯論')
     })
 
+    it('should resume the same debate after the stream drops', async () => {
+      const encoder = new TextEncoder()
+      const first = new ReadableStream({
+        start(controller) {
+          controller.enqueue(encoder.encode(
+            'id: 1\ndata: {"type":"debate","debate_id":"abc"}\n\n' +
+            'id: 2\ndata: {"type":"status","text":"開始辯論"}\n\n'
+          ))
+          controller.error(new TypeError('network error'))
+        }
+      })
+      const resumed = new ReadableStream({
+        start(controller) {
+          controller.enqueue(encoder.encode('id: 3\ndata: {"type":"complete","text":"done"}\n\n'))
+          controller.close()
+        }
+      })
+      mockFetch
+        .mockResolvedValueOnce({ ok: true, body: first })
+        .mockResolvedValueOnce({ ok: true, body: resumed })
+      const timer = vi.spyOn(globalThis, 'setTimeout').mockImplementation(((fn: () => void) => {
+        fn()
+        return 0
+      }) as unknown as typeof setTimeout)
+
+      const events: SSEEvent[] = []
+      await streamDebate({ topic: 'Test' }, (event) => events.push(event))
+      timer.mockRestore()
+
+      expect(mockFetch).toHaveBeenCalledTimes(2)
+      expect(mockFetch.mock.calls[1][0]).toBe('http://localhost:8000/debate/abc/events')
+      expect(mockFetch.mock.calls[1][1].headers).toEqual({ 'Last-Event-ID': '2' })
+      expect(events.map(e => e.type)).toEqual(['status', 'status', 'complete'])
+    })
+
+    it('should send graph_mode and profile when set', async () => {
+      mockFetch.mockResolvedValue({
+        ok: true,
+        body: new ReadableStream({ start(controller) { controller.close() } })
+      })
+
+      await streamDebate({ topic: 'Test', graph_mode: 'panel', profile: 'fast' }, () => {})
+
+      expect(JSON.parse(mockFetch.mock.calls[0][1].body)).toEqual({
+        topic: 'Test', max_rounds: 3, language: 'zh', graph_mode: 'panel', profile: 'fast'
+      })
+    })
+
     it('should handle abort signal', async () => {
       const abortController = new AbortController()
       
@@ -212,4 +261,14 @@ describe('API Client', () => {
       expect(events.some(e => e.type === 'error')).toBe(true)
     })
   })
+
+  describe('displayRole', () => {
+    it('should map panel persona nodes to a display role', () => {
+      expect(displayRole('optimist')).toBe('optimist')
+      expect(displayRole('skeptic_cost')).toBe('skeptic')
+      expect(displayRole('skeptic_ethics')).toBe('skeptic')
+      expect(displayRole('moderator')).toBe('moderator')
+      expect(displayRole('skeptic_cost', 'optimist')).toBe('optimist')
+    })
+  })
 })
@@ -2,30 +2,151 @@
  * API 客戶端 - SSE 串流處理
  */
 
+// 發言者的顯示角色（panel 模式的多位辯手各自對應其中之一）
+export type DebateRole = 'optimist' | 'skeptic' | 'moderator';
+
+// Graph 模式與 profile（對應後端 DebateRequest 的 graph_mode / profile）
+export type GraphMode = 'tools' | 'retrieve' | 'overlap' | 'panel';
+export type DebateProfile = 'fast' | 'balanced' | 'thorough';
+
 // SSE 事件類型定義
+// node 為 LangGraph 節點名稱：panel 模式下可能是 skeptic_cost / skeptic_ethics 等，speaker 事件另附 role
 export type SSEEvent =
     | { type: 'status'; text: string }
-    | { type: 'speaker'; node: 'optimist' | 'skeptic' | 'moderator'; text: string }
-    | { type: 'token'; node: 'optimist' | 'skeptic' | 'moderator'; text: string }
-    | { type: 'speaker_end'; node: 'optimist' | 'skeptic' | 'moderator' }
+    | { type: 'speaker'; node: string; role?: DebateRole; text: string }
+    | { type: 'token'; node: string; text: string }
+    | { type: 'speaker_end'; node: string }
     | { type: 'tool_start'; tool: string; query: string; node: string }  // Phase 3b
-    | { type: 'tool_end'; tool: string; node: string }                   // Phase 3b
+    | { type: 'tool_end'; tool: string; node: string; query?: string; pending?: number }  // pending: 仍在執行的搜尋數
     | { type: 'complete'; text: string }
-    | { type: 'error'; text: string };
+    | { type: 'error'; text: string }
+    | { type: 'debate'; debate_id: string };  // 串流 ID：斷線後以此 ID 重新接上
 
 // 辯論請求參數
 export interface DebateRequest {
     topic: string;
     max_rounds?: number;
     language?: string;  // "zh" 或 "en"
+    graph_mode?: GraphMode;  // 未指定時依 NEXT_PUBLIC_DEBATE_GRAPH_MODE，再未設定則由後端決定
+    profile?: DebateProfile;  // 未指定時依 NEXT_PUBLIC_DEBATE_PROFILE，再未設定則由後端決定
 }
 
 // API URL（從環境變數讀取）
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+const DEFAULT_GRAPH_MODE = (process.env.NEXT_PUBLIC_DEBATE_GRAPH_MODE || undefined) as GraphMode | undefined;
+const DEFAULT_PROFILE = (process.env.NEXT_PUBLIC_DEBATE_PROFILE || undefined) as DebateProfile | undefined;
+
+/**
+ * 將節點名稱對應到顯示角色
+ *
+ * speaker 事件附帶的 role 優先；否則依節點名稱前綴判斷（skeptic_cost → skeptic）
+ */
+export function displayRole(node: string, role?: DebateRole): DebateRole {
+    if (role) {
+        return role;
+    }
+    if (node === 'moderator' || node.startsWith('moderator_')) {
+        return 'moderator';
+    }
+    if (node === 'optimist' || node.startsWith('optimist_')) {
+        return 'optimist';
+    }
+    return 'skeptic';
+}
+
+// 斷線後重新接上同一場辯論的次數上限與間隔（後端保留事件紀錄，重連不會重新開始辯論）
+const MAX_RESUME_ATTEMPTS = 3;
+const RESUME_DELAY_MS = 1000;
+
+/** 串流進度：debate ID、最後收到的事件 ID、是否已收到結束事件 */
+interface StreamCursor {
+    debateId: string | null;
+    lastEventId: string;
+    finished: boolean;
+}
+
+function isAbortError(error: unknown): boolean {
+    return error instanceof Error && error.name === 'AbortError';
+}
+
+/**
+ * 讀取 SSE 串流直到結束
+ *
+ * data: 行交給 onData，id: 行記錄在 cursor.lastEventId（重新接上時作為 Last-Event-ID）
+ */
+async function readSSE(
+    body: ReadableStream<Uint8Array>,
+    onData: (event: SSEEvent) => void,
+    cursor: StreamCursor
+): Promise<void> {
+    const reader = body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+
+        if (done) {
+            break;
+        }
+
+        // 解碼並累積到 buffer
+        buffer += decoder.decode(value, { stream: true });
+
+        // 按行分割處理
+        const lines = buffer.split('\n');
+        buffer = lines.pop() || ''; // 保留最後一個不完整的行
+
+        for (const line of lines) {
+            if (line.startsWith('id: ')) {
+                cursor.lastEventId = line.slice(4).trim();
+            } else if (line.startsWith('data: ')) {
+                try {
+                    const data = JSON.parse(line.slice(6)) as SSEEvent;
+                    onData(data);
+                } catch (e) {
+                    console.error('Failed to parse SSE event:', line, e);
+                }
+            }
+        }
+    }
+
+    // 處理 buffer 中剩餘的資料
+    if (buffer.startsWith('data: ')) {
+        try {
+            const data = JSON.parse(buffer.slice(6)) as SSEEvent;
+            onData(data);
+        } catch {
+            // 忽略不完整的最後一行
+        }
+    }
+}
+
+/**
+ * 重新接上進行中的辯論（重播 Last-Event-ID 之後的事件，再接上即時事件）
+ */
+async function resumeStream(
+    cursor: StreamCursor,
+    abortSignal?: AbortSignal
+): Promise<ReadableStream<Uint8Array>> {
+    const response = await fetch(`${API_URL}/debate/${cursor.debateId}/events`, {
+        method: 'GET',
+        headers: cursor.lastEventId ? { 'Last-Event-ID': cursor.lastEventId } : {},
+        signal: abortSignal,
+    });
+
+    if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+    }
+    return response.body;
+}
 
 /**
  * 串流辯論 API
  * 
+ * 串流中斷（行動網路切換等）時，以 debate ID 與 Last-Event-ID 重新接上同一場辯論，
+ * 最多 MAX_RESUME_ATTEMPTS 次；不會重新開始一場新的辯論。
+ * 
  * @param request - 辯論請求參數
  * @param onEvent - SSE 事件回調
  * @param abortSignal - 用於取消請求的 AbortSignal
@@ -36,13 +157,32 @@ export async function streamDebate(
     onEvent: (event: SSEEvent) => void,
     abortSignal?: AbortSignal
 ): Promise<void> {
-    const { topic, max_rounds = 3, language = "zh" } = request;
+    const {
+        topic,
+        max_rounds = 3,
+        language = "zh",
+        graph_mode = DEFAULT_GRAPH_MODE,
+        profile = DEFAULT_PROFILE,
+    } = request;
+    const cursor: StreamCursor = { debateId: null, lastEventId: '', finished: false };
+
+    const handleEvent = (event: SSEEvent) => {
+        if (event.type === 'debate') {
+            cursor.debateId = event.debate_id;
+            return;
+        }
+        if (event.type === 'complete' || event.type === 'error') {
+            cursor.finished = true;
+        }
+        onEvent(event);
+    };
 
     try {
         const response = await fetch(`${API_URL}/debate`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ topic, max_rounds, language }),
+            // 未設定的 graph_mode / profile 不送出（JSON.stringify 省略 undefined），由後端環境變數決定
+            body: JSON.stringify({ topic, max_rounds, language, graph_mode, profile }),
             signal: abortSignal,
         });
 
@@ -54,44 +194,39 @@ export async function streamDebate(
             throw new Error('Response body is null');
         }
 
-        // 使用 ReadableStream 讀取 SSE
-        const reader = response.body.getReader();
-        const decoder = new TextDecoder();
-        let buffer = '';
+        cursor.debateId = response.headers?.get('X-Debate-Id') ?? null;
+        let body: ReadableStream<Uint8Array> | null = response.body;
+        let attempts = 0;
 
         while (true) {
-            const { done, value } = await reader.read();
-
-            if (done) {
-                break;
-            }
-
-            // 解碼並累積到 buffer
-            buffer += decoder.decode(value, { stream: true });
-
-            // 按行分割處理
-            const lines = buffer.split('\n');
-            buffer = lines.pop() || ''; // 保留最後一個不完整的行
-
-            for (const line of lines) {
-                if (line.startsWith('data: ')) {
-                    try {
-                        const data = JSON.parse(line.slice(6)) as SSEEvent;
-                        onEvent(data);
-                    } catch (e) {
-                        console.error('Failed to parse SSE event:', line, e);
+            if (body) {
+                try {
+                    await readSSE(body, handleEvent, cursor);
+                    if (cursor.finished || !cursor.debateId) {
+                        return;
+                    }
+                } catch (error) {
+                    if (isAbortError(error) || !cursor.debateId || attempts >= MAX_RESUME_ATTEMPTS) {
+                        throw error;
                     }
                 }
             }
-        }
 
-        // 處理 buffer 中剩餘的資料
-        if (buffer.startsWith('data: ')) {
+            // 串流在結束事件之前中斷：重新接上同一場辯論
+            if (attempts >= MAX_RESUME_ATTEMPTS) {
+                throw new Error(language === 'en' ? 'Lost connection to the debate' : '與辯論的連線中斷');
+            }
+            attempts += 1;
+            onEvent({ type: 'status', text: language === 'en' ? '🔄 Reconnecting...' : '🔄 重新連線中...' });
+            await new Promise(resolve => setTimeout(resolve, RESUME_DELAY_MS * attempts));
+
             try {
-                const data = JSON.parse(buffer.slice(6)) as SSEEvent;
-                onEvent(data);
-            } catch {
-                // 忽略不完整的最後一行
+                body = await resumeStream(cursor, abortSignal);
+            } catch (error) {
+                if (isAbortError(error) || attempts >= MAX_RESUME_ATTEMPTS) {
+                    throw error;
+                }
+                body = null;
             }
         }
     } catch (error) {